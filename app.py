@@ -39,7 +39,8 @@ if script_name:
 
 # Переопределяем некоторые настройки для совместимости
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or 'tournament-system-secret-key-2024'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///tournament.db'
+# DATABASE_URL (PostgreSQL на сервере) или локальный SQLite (instance/tournament.db)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or 'sqlite:///tournament.db'
 
 # Настройки сессий для Railway
 app.config['SESSION_COOKIE_SECURE'] = False  # Для HTTP (Railway может не иметь HTTPS)
@@ -143,9 +144,46 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Адрес базы и пул соединений PostgreSQL (services/database_backend.py)
+from services.database_backend import init_database_backend
+init_database_backend(app)
+
 # Инициализация базы данных
 db.init_app(app)
 
+# PRAGMA для соединений SQLite (WAL, busy_timeout и др. из config.py)
+from services.sqlite_tuning import init_sqlite_tuning
+init_sqlite_tuning(app, db)
+
+# Отдельный движок только для чтения для зрительских страниц (после создания основного движка)
+from services.read_replica import init_read_replica
+init_read_replica(app, db)
+
+# Версии данных турниров для ETag в API обновлений
+from services.change_version import init_change_tracking
+init_change_tracking()
+
+# Инкрементальная турнирная таблица (обновляется после сохранения результатов)
+from services.standings import init_standings_tracking
+init_standings_tracking()
+
+# Отложенная пакетная запись активности пользователей (запись остатка при остановке)
+from utils.activity_buffer import init_activity_buffer
+init_activity_buffer(app, db, UserActivity)
+
+# Очередь исходящих сообщений Telegram (отправка в фоновом потоке)
+from models import OutboundMessage
+from services.telegram_outbox import init_telegram_outbox
+init_telegram_outbox(app, db, OutboundMessage)
+
+# Письма с паролями: очередь в таблице tokens, отправка ограниченным пулом потоков
+from services.mail_dispatcher import init_mail_dispatcher
+init_mail_dispatcher(app, db, Token)
+
+# Кэш файлов выгрузки Excel по версии данных турнира
+from services.export_cache import init_export_cache
+init_export_cache(app)
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -159,103 +197,12 @@ def load_user(user_id):
 
 # Функция инициализации базы данных
 def init_db():
+    """Применяет недостающие миграции схемы (services/migrations.py; при деплое - python migrate.py)"""
+    from services.migrations import run_migrations
     with app.app_context():
-        try:
-            # Создаем все таблицы
-            db.create_all()
-            logger.info("База данных инициализирована успешно")
-            # Лёгкая миграция: добавить столбец tokens.telegram, если его нет
-            try:
-                from sqlalchemy import text
-                conn = db.engine.connect()
-                cols = conn.execute(text("PRAGMA table_info('tokens')")).fetchall()
-                col_names = {c[1] for c in cols}
-                if 'telegram' not in col_names:
-                    conn.execute(text("ALTER TABLE tokens ADD COLUMN telegram VARCHAR(100)"))
-                    logger.info("Добавлен столбец 'telegram' в таблицу tokens")
-                if 'telegram_chat_id' not in col_names:
-                    conn.execute(text("ALTER TABLE tokens ADD COLUMN telegram_chat_id VARCHAR(32)"))
-                    logger.info("Добавлен столбец 'telegram_chat_id' в таблицу tokens")
-                if 'telegram_link_token' not in col_names:
-                    conn.execute(text("ALTER TABLE tokens ADD COLUMN telegram_link_token VARCHAR(128)"))
-                    logger.info("Добавлен столбец 'telegram_link_token' в таблицу tokens")
-                conn.close()
-            except Exception as mig_e:
-                logger.warning(f"Миграция tokens.telegram пропущена: {mig_e}")
-            
-            # Лёгкая миграция: добавить столбец participant.telegram, если его нет
-            try:
-                from sqlalchemy import text
-                conn = db.engine.connect()
-                # Проверяем таблицу participant
-                cols = conn.execute(text("PRAGMA table_info('participant')")).fetchall()
-                col_names = {c[1] for c in cols}
-                if 'telegram' not in col_names:
-                    conn.execute(text("ALTER TABLE participant ADD COLUMN telegram VARCHAR(100)"))
-                    logger.info("Добавлен столбец 'telegram' в таблицу participant")
-                # Проверяем таблицу waiting_list
-                cols_waiting = conn.execute(text("PRAGMA table_info('waiting_list')")).fetchall()
-                col_names_waiting = {c[1] for c in cols_waiting}
-                if 'telegram' not in col_names_waiting:
-                    conn.execute(text("ALTER TABLE waiting_list ADD COLUMN telegram VARCHAR(100)"))
-                    logger.info("Добавлен столбец 'telegram' в таблицу waiting_list")
-                if 'telegram_token' not in col_names_waiting:
-                    conn.execute(text("ALTER TABLE waiting_list ADD COLUMN telegram_token VARCHAR(100)"))
-                    logger.info("Добавлен столбец 'telegram_token' в таблицу waiting_list")
-                if 'status' not in col_names_waiting:
-                    conn.execute(text("ALTER TABLE waiting_list ADD COLUMN status VARCHAR(20) DEFAULT 'ожидает'"))
-                    logger.info("Добавлен столбец 'status' в таблицу waiting_list")
-                if 'created_at' not in col_names_waiting:
-                    conn.execute(text("ALTER TABLE waiting_list ADD COLUMN created_at DATETIME"))
-                    logger.info("Добавлен столбец 'created_at' в таблицу waiting_list")
-                conn.close()
-            except Exception as mig_e:
-                logger.warning(f"Миграция participant.telegram пропущена: {mig_e}")
-            
-            # Лёгкая миграция: добавить столбцы actual_start_time и actual_end_time в таблицу match, если их нет
-            try:
-                from sqlalchemy import text
-                conn = db.engine.connect()
-                cols_match = conn.execute(text("PRAGMA table_info('match')")).fetchall()
-                col_names_match = {c[1] for c in cols_match}
-                if 'actual_start_time' not in col_names_match:
-                    conn.execute(text("ALTER TABLE match ADD COLUMN actual_start_time DATETIME"))
-                    logger.info("Добавлен столбец 'actual_start_time' в таблицу match")
-                if 'actual_end_time' not in col_names_match:
-                    conn.execute(text("ALTER TABLE match ADD COLUMN actual_end_time DATETIME"))
-                    logger.info("Добавлен столбец 'actual_end_time' в таблицу match")
-                conn.close()
-            except Exception as mig_e:
-                logger.warning(f"Миграция match.actual_start_time пропущена: {mig_e}")
-            
-            # Создание/обновление администратора по умолчанию
-            admin = User.query.filter_by(username='admin').first()
-            if not admin:
-                admin = User(username='admin', password_hash=generate_password_hash('adm555'), role='администратор')
-                db.session.add(admin)
-                db.session.commit()
-                logger.info("Администратор создан: admin/adm555")
-            else:
-                # Обновляем пароль администратора на случай, если он был изменен
-                admin.password_hash = generate_password_hash('adm555')
-                db.session.commit()
-                logger.info("Пароль администратора обновлен: admin/adm555")
-            
-            # Инициализация настроек по умолчанию
-            Settings.set_setting('max_tokens', '10', 'Максимальное количество паролей для создания турниров')
-            logger.info("Настройки по умолчанию инициализированы")
-                
-        except Exception as e:
-            logger.error(f"Ошибка инициализации базы данных: {e}")
-            # На Railway может не быть прав на запись, попробуем альтернативный путь
-            try:
-                import tempfile
-                temp_db_path = os.path.join(tempfile.gettempdir(), 'tournament.db')
-                app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{temp_db_path}'
-                db.create_all()
-                logger.info(f"База данных создана в временной папке: {temp_db_path}")
-            except Exception as e2:
-                logger.error(f"Критическая ошибка создания базы данных: {e2}")
+        applied = run_migrations(db)
+        logger.info(f"База данных инициализирована успешно (применено миграций: {len(applied)})")
+        return applied
 
 # Обработчик ошибок для отладки
 @app.errorhandler(500)
@@ -268,8 +215,9 @@ def not_found_error(error):
     logger.error(f"Not Found Error: {error}")
     return "Not Found", 404
 
-# Инициализация базы данных при импорте (для Railway)
-init_db()
+# Схема базы данных обновляется при деплое (python migrate.py); воркер только сверяет ее версию
+from services.migrations import ensure_schema
+ensure_schema(app, db)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
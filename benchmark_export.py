@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Замер выгрузки турнира (/export-tournament) на круговом турнире
+
+Сравнивает заполнение шахматки перебором участников для каждого матча
+(как раньше, O(матчей x участников)) и словарем id -> индекс
+(routes.export.build_match_grid, O(матчей)), а также полную выгрузку CSV
+и Excel (сборка и повторная выдача из кэша). При переходе от 64 к 128 участникам матчей становится в ~4 раза
+больше: линейная выгрузка должна замедлиться примерно во столько же раз.
+
+Запуск: python benchmark_export.py [--sizes 64 128] [--repeat 3]
+"""
+import argparse
+import logging
+import time
+from itertools import combinations
+from types import SimpleNamespace
+
+from models import db
+from routes.export import build_match_grid
+from services.export_cache import export_cache
+from testing_support import create_test_app, fill_tournament
+
+
+def fill_matrix_by_scan(participants, matches):
+    """Шахматка как раньше: поиск номеров участников перебором для каждого матча"""
+    n = len(participants)
+    results_matrix = [['-' for _ in range(n)] for _ in range(n)]
+    for match in matches:
+        p1_idx = next((i for i, p in enumerate(participants) if p.id == match.participant1_id), -1)
+        p2_idx = next((i for i, p in enumerate(participants) if p.id == match.participant2_id), -1)
+        if p1_idx != -1 and p2_idx != -1:
+            results_matrix[p1_idx][p2_idx] = f"{match.sets_won_1}:{match.sets_won_2}"
+            results_matrix[p2_idx][p1_idx] = f"{match.sets_won_2}:{match.sets_won_1}"
+    return results_matrix
+
+
+def round_robin(participants_count):
+    participants = [SimpleNamespace(id=1000 + i, name=f'Игрок {i:03d}') for i in range(participants_count)]
+    matches = [SimpleNamespace(participant1_id=p1.id, participant2_id=p2.id, sets_won_1=2, sets_won_2=0)
+               for p1, p2 in combinations(participants, 2)]
+    return participants, matches
+
+
+def best_time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def measure(participants_count, repeat):
+    participants, matches = round_robin(participants_count)
+    result = {
+        'matches': len(matches),
+        'Шахматка: перебор участников (как раньше)': best_time(lambda: fill_matrix_by_scan(participants, matches), repeat),
+        'Шахматка: словарь id -> индекс': best_time(lambda: build_match_grid(participants, matches), repeat),
+    }
+
+    app = create_test_app()
+    with app.app_context():
+        db.create_all()
+        tournament_id = fill_tournament(participants_count)
+    client = app.test_client()
+    csv_url = f'/export-tournament/{tournament_id}'
+    xlsx_url = f'/export-tournament/{tournament_id}?format=xlsx'
+
+    def build_xlsx():
+        export_cache.clear()
+        client.get(xlsx_url).get_data()
+
+    result['Выгрузка CSV'] = best_time(lambda: client.get(csv_url).get_data(), repeat)
+    result['Выгрузка Excel'] = best_time(build_xlsx, repeat)
+    result['Выгрузка Excel из кэша'] = best_time(lambda: client.get(xlsx_url).get_data(), repeat)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 128])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = {size: measure(size, args.repeat) for size in args.sizes}
+
+    names = [name for name in results[args.sizes[0]] if name != 'matches']
+    headers = [f"{size} уч. ({results[size]['matches']} матчей)" for size in args.sizes]
+    print(f"{'':<44}" + ''.join(f"{header:>24}" for header in headers) + f"{'рост':>8}")
+    for name in names:
+        timings = [results[size][name] for size in args.sizes]
+        print(f"{name:<44}" + ''.join(f"{t * 1000:>21.1f} мс" for t in timings)
+              + f"{timings[-1] / timings[0]:>7.1f}x")
+    first, last = results[args.sizes[0]]['matches'], results[args.sizes[-1]]['matches']
+    print(f"Рост числа матчей: {last / first:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Замер смешанной нагрузки на SQLite: судьи сохраняют счет, зрители опрашивают турнир
+
+Файловая база, турнир с круговым расписанием. Одновременно работают
+отдельные процессы (как воркеры gunicorn):
+- писатели - как автосохранение счета: обновляют счет случайного матча
+  и фиксируют транзакцию (версия турнира увеличивается в той же транзакции);
+- читатели - как страница зрителя: GET /api/tournaments/<id>/updates.
+
+Сравниваются параметры SQLite по умолчанию (журнал отката, как раньше)
+и настройка services/sqlite_tuning.py (WAL, busy_timeout, synchronous=NORMAL,
+cache_size, mmap_size). Для каждого режима - операций в секунду и число
+ошибок "database is locked" (после busy_timeout).
+
+Запуск: python benchmark_sqlite.py [--participants 8] [--writers 4] [--readers 8] [--seconds 5]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from models import db, Match
+from services.sqlite_tuning import DEFAULTS, install_sqlite_tuning, read_sqlite_pragmas
+from testing_support import create_test_app, fill_tournament
+
+
+def create_benchmark_app(database_uri, tuned):
+    app = create_test_app(database_uri)
+    if tuned:
+        with app.app_context():
+            install_sqlite_tuning(db.engine, DEFAULTS)
+    return app
+
+
+def writer(app, match_ids, deadline, seed):
+    """Автосохранение счета: обновление матча и фиксация транзакции"""
+    rng = random.Random(seed)
+    done, locked, latencies = 0, 0, []
+    with app.app_context():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                match = db.session.get(Match, rng.choice(match_ids))
+                match.set1_score1 = rng.randint(0, 21)
+                match.set1_score2 = rng.randint(0, 21)
+                db.session.commit()
+                done += 1
+                latencies.append(time.perf_counter() - started)
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' not in str(e):
+                    raise
+                locked += 1
+        db.session.remove()
+    return done, locked, latencies
+
+
+def reader(app, tournament_id, deadline):
+    """Страница зрителя: опрос данных турнира"""
+    client = app.test_client()
+    done, locked, latencies = 0, 0, []
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        response = client.get(f'/api/tournaments/{tournament_id}/updates')
+        if response.status_code == 200:
+            done += 1
+            latencies.append(time.perf_counter() - started)
+        else:
+            locked += 1
+    return done, locked, latencies
+
+
+def worker_process(app, kind, tournament_id, match_ids, start_at, deadline, seed, results):
+    """Отдельный процесс, как воркер gunicorn: свои соединения с базой"""
+    with app.app_context():
+        # Соединения родительского процесса не используются после fork
+        db.engine.dispose(close=False)
+    # Замер начинается одновременно во всех процессах
+    time.sleep(max(start_at - time.monotonic(), 0))
+    if kind == 'writes':
+        results.put((kind, *writer(app, match_ids, deadline, seed)))
+    else:
+        results.put((kind, *reader(app, tournament_id, deadline)))
+
+
+def run_mode(name, tuned, args):
+    database_dir = tempfile.mkdtemp()
+    database_uri = f"sqlite:///{os.path.join(database_dir, 'benchmark.db')}"
+    app = create_benchmark_app(database_uri, tuned)
+    with app.app_context():
+        db.create_all()
+        tournament_id = fill_tournament(args.participants)
+        match_ids = [match_id for (match_id,) in db.session.query(Match.id).filter_by(tournament_id=tournament_id)]
+        with db.engine.connect() as connection:
+            pragmas = read_sqlite_pragmas(connection)
+        db.session.remove()
+        db.engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    start_at = time.monotonic() + 1.0
+    deadline = start_at + args.seconds
+    kinds = ['writes'] * args.writers + ['reads'] * args.readers
+    processes = [context.Process(target=worker_process,
+                                 args=(app, kind, tournament_id, match_ids, start_at, deadline, i, results))
+                 for i, kind in enumerate(kinds)]
+    for process in processes:
+        process.start()
+    totals = {'writes': 0, 'reads': 0}
+    locked, latencies = 0, []
+    for _ in processes:
+        kind, done, kind_locked, kind_latencies = results.get()
+        totals[kind] += done
+        locked += kind_locked
+        latencies.extend(kind_latencies)
+    for process in processes:
+        process.join()
+    shutil.rmtree(database_dir, ignore_errors=True)
+
+    latencies = sorted(latencies) or [0.0]
+    p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+    print(f"{name:<28} journal_mode={pragmas['journal_mode']:<7} "
+          f"записей {totals['writes'] / args.seconds:7.1f}/с  чтений {totals['reads'] / args.seconds:7.1f}/с  "
+          f"p95 {p95 * 1000:6.1f} мс  locked: {locked}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--participants', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f"{args.participants} участников, {args.writers} писателей, {args.readers} читателей, {args.seconds} с")
+    baseline = run_mode('По умолчанию (как раньше)', False, args)
+    tuned = run_mode('services/sqlite_tuning.py', True, args)
+    print(f"Записей: x{tuned['writes'] / max(baseline['writes'], 1):.1f}, "
+          f"чтений: x{tuned['reads'] / max(baseline['reads'], 1):.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Замер пропускной способности обработчика бота (telegram_bot_handler.py) без сети
+
+Запускает локальную заглушку Bot API с задержкой ответа (имитация сети),
+кладет в нее пачку команд от разных чатов и замеряет, за сколько они
+обработаны:
+- как раньше: последовательно, новое соединение на каждый запрос;
+- пул keep-alive соединений, последовательно;
+- пул соединений и пул потоков.
+
+Запуск: python benchmark_telegram_bot.py [--updates 200] [--chats 50] [--latency-ms 20] [--workers 8]
+"""
+import argparse
+import logging
+import time
+
+import requests
+from flask import Flask, jsonify
+
+from routes.telegram_stub import serve_telegram_stub
+from telegram_bot_handler import TelegramBotHandler
+
+
+def create_fake_app_api(latency_ms):
+    """Приложение заглушки с /api/telegram/link-token (привязка токена заявки)"""
+    app = Flask('telegram_bot_benchmark')
+
+    @app.route('/api/telegram/link-token', methods=['POST'])
+    def link_token():
+        time.sleep(latency_ms / 1000.0)
+        return jsonify({'success': True, 'participant_name': 'Тест', 'tournament_id': 1})
+
+    return app
+
+
+def run_mode(name, api_url, app_api_url, state, updates_count, chats, workers, pooled):
+    handler = TelegramBotHandler('benchmark-token', app_api_url=app_api_url, telegram_api_url=api_url, workers=workers)
+    if not pooled:
+        # Как до пула соединений: модульные requests.get/post, новое соединение на каждый запрос
+        handler.http = requests
+    handler.last_update_id = state.next_update_id - 1
+
+    commands = ['/start link-token-{0}', '/id', '/help']
+    state.add_updates({'chat_id': 1000 + i % chats, 'text': commands[i % len(commands)].format(i)}
+                      for i in range(updates_count))
+    sent_before = len(state.messages)
+
+    started = time.perf_counter()
+    while len(state.messages) - sent_before < updates_count:
+        handler.process_updates(handler.get_updates())
+    elapsed = time.perf_counter() - started
+    handler.executor.shutdown(wait=True)
+    if pooled:
+        handler.http.close()
+
+    print(f"{name:<42} {elapsed:7.2f} с  {updates_count / elapsed:8.1f} обновлений/с")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--updates', type=int, default=200)
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--latency-ms', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    server, api_url, state = serve_telegram_stub(latency_ms=args.latency_ms,
+                                                 app=create_fake_app_api(args.latency_ms))
+    app_api_url = api_url.rsplit('/telegram-stub', 1)[0]
+    print(f"Заглушка Bot API: {api_url}, задержка {args.latency_ms} мс, "
+          f"{args.updates} обновлений из {args.chats} чатов")
+    try:
+        baseline = run_mode('Без пула, последовательно (как раньше)', api_url, app_api_url, state,
+                            args.updates, args.chats, workers=1, pooled=False)
+        run_mode('Пул соединений, последовательно', api_url, app_api_url, state,
+                 args.updates, args.chats, workers=1, pooled=True)
+        best = run_mode(f'Пул соединений + {args.workers} потоков', api_url, app_api_url, state,
+                        args.updates, args.chats, workers=args.workers, pooled=True)
+        print(f"Ускорение: x{baseline / best:.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -62,6 +62,11 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'noreply@tournament-system.com'
+    # Отправка писем с паролями (services/mail_dispatcher.py): очередь - записи tokens со статусом 'pending'
+    MAIL_WORKERS = int(os.environ.get('MAIL_WORKERS', 2))  # Потоков отправки на процесс
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE', 10))  # Писем на одно SMTP-соединение
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', 5))  # Попыток до статуса 'failed'
+    MAIL_RETRY_BACKOFF_SECONDS = float(os.environ.get('MAIL_RETRY_BACKOFF_SECONDS', 30))  # Пауза перед первым повтором (далее x2)
     
     # Настройки EmailJS (для Railway)
     EMAILJS_SERVICE_ID = os.environ.get('EMAILJS_SERVICE_ID')
@@ -78,6 +83,61 @@ class Config:
     ADMIN_SESSION_MANAGEMENT = os.environ.get('ADMIN_SESSION_MANAGEMENT', 'true').lower() in ['true', 'on', '1']  # Включить управление сессиями для админа
     SESSION_HISTORY_RETENTION_DAYS = int(os.environ.get('SESSION_HISTORY_RETENTION_DAYS', 90))  # Хранение истории сессий (дни)
     ENABLE_PAGE_TRACKING = os.environ.get('ENABLE_PAGE_TRACKING', 'true').lower() in ['true', 'on', '1']  # Включить отслеживание страниц
+    # Активность пользователей пишется в базу пакетом (utils/activity_buffer.py): раз в N секунд или после M событий
+    ACTIVITY_FLUSH_SECONDS = float(os.environ.get('ACTIVITY_FLUSH_SECONDS', 10))  # Интервал записи буфера активности
+    ACTIVITY_FLUSH_EVENTS = int(os.environ.get('ACTIVITY_FLUSH_EVENTS', 500))  # Запись буфера после стольких событий
+
+    # Миграции схемы выполняет python migrate.py при деплое; при старте воркер только сверяет версию схемы
+    MIGRATE_ON_STARTUP = os.environ.get('MIGRATE_ON_STARTUP', 'true').lower() in ['true', 'on', '1']  # Применить недостающие миграции при старте
+
+    # Соединения SQLite (services/sqlite_tuning.py): WAL - зрители читают, пока судьи сохраняют счет
+    SQLITE_TUNING_ENABLED = os.environ.get('SQLITE_TUNING_ENABLED', 'true').lower() in ['true', 'on', '1']  # Выполнять PRAGMA при открытии соединения
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')  # Режим журнала (WAL или DELETE)
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))  # Ожидание блокировки записи вместо "database is locked"
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')  # NORMAL в WAL не теряет целостность при сбое процесса
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 16 * 1024))  # Кэш страниц на соединение
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))  # Чтение файла базы через mmap (0 - выключено)
+
+    # Пул соединений PostgreSQL (services/database_backend.py); на каждый воркер gunicorn - свой пул
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))  # Постоянных соединений на процесс
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))  # Дополнительных соединений при пиковой нагрузке
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))  # Ожидание свободного соединения, секунд
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # Пересоздавать соединения старше, секунд
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ['true', 'on', '1']  # Проверять соединение перед выдачей из пула
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))  # statement_timeout PostgreSQL (0 - без ограничения)
+
+    # Зрительские страницы читают через отдельный движок только для чтения (services/read_replica.py)
+    READ_REPLICA_ENABLED = os.environ.get('READ_REPLICA_ENABLED', 'true').lower() in ['true', 'on', '1']  # Отдельные соединения для чтения зрителями
+    READ_DATABASE_URL = os.environ.get('READ_DATABASE_URL')  # Реплика PostgreSQL; пусто - тот же файл SQLite с mode=ro
+
+    # Настройки живых обновлений (Server-Sent Events для зрителей)
+    # Поток занимает соединение, поэтому нужен worker_class gthread/gevent (см. gunicorn_optimized.conf.py)
+    LIVE_EVENTS_ENABLED = os.environ.get('LIVE_EVENTS_ENABLED', 'true').lower() in ['true', 'on', '1']  # Включить SSE
+    LIVE_EVENTS_STREAM_SECONDS = int(os.environ.get('LIVE_EVENTS_STREAM_SECONDS', 55))  # Длительность одного потока (меньше timeout воркера)
+    LIVE_EVENTS_HEARTBEAT_SECONDS = int(os.environ.get('LIVE_EVENTS_HEARTBEAT_SECONDS', 15))  # Интервал heartbeat
+    LIVE_EVENTS_VERSION_CHECK_SECONDS = float(os.environ.get('LIVE_EVENTS_VERSION_CHECK_SECONDS', 1))  # Проверка изменений из других процессов
+
+    # Кэш файлов выгрузки Excel (services/export_cache.py): файл собирается заново после изменения турнира
+    EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES', 32 * 1024 * 1024))  # Объем кэша на процесс
+    EXPORT_CACHE_MAX_ENTRIES = int(os.environ.get('EXPORT_CACHE_MAX_ENTRIES', 64))  # Турниров в кэше
+
+    # Минимальный отдых участника между матчами при составлении расписания (в минутах).
+    # Перерыв турнира (break_duration) уже входит в отдых; 0 - можно играть в соседних слотах
+    SCHEDULE_MIN_REST_MINUTES = int(os.environ.get('SCHEDULE_MIN_REST_MINUTES', 0))
+
+    # Очередь исходящих сообщений Telegram (services/telegram_outbox.py): обработчики только ставят
+    # сообщения в очередь, фоновый поток каждого процесса отправляет их с ограничением скорости
+    TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')  # Адрес Bot API (или локальной заглушки)
+    TELEGRAM_STUB_ENABLED = os.environ.get('TELEGRAM_STUB_ENABLED', 'false').lower() in ['true', 'on', '1']  # Заглушка Bot API /telegram-stub
+    TELEGRAM_OUTBOX_BATCH_SIZE = int(os.environ.get('TELEGRAM_OUTBOX_BATCH_SIZE', 20))  # Сообщений в одной пачке
+    TELEGRAM_OUTBOX_POLL_SECONDS = float(os.environ.get('TELEGRAM_OUTBOX_POLL_SECONDS', 5))  # Проверка очереди (сообщения других процессов)
+    TELEGRAM_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('TELEGRAM_OUTBOX_MAX_ATTEMPTS', 5))  # Попыток до статуса 'failed'
+    TELEGRAM_OUTBOX_BACKOFF_SECONDS = float(os.environ.get('TELEGRAM_OUTBOX_BACKOFF_SECONDS', 5))  # Пауза перед первым повтором (далее x2)
+    TELEGRAM_RATE_PER_SECOND = int(os.environ.get('TELEGRAM_RATE_PER_SECOND', 25))  # Сообщений в секунду на процесс (лимит Telegram - 30)
+    TELEGRAM_CHAT_INTERVAL_SECONDS = float(os.environ.get('TELEGRAM_CHAT_INTERVAL_SECONDS', 1))  # Интервал сообщений в один чат
+    TELEGRAM_BOT_WORKERS = int(os.environ.get('TELEGRAM_BOT_WORKERS', 8))  # Потоков обработки пачки getUpdates в telegram_bot_handler.py
+    TELEGRAM_WEBHOOK_ENABLED = os.environ.get('TELEGRAM_WEBHOOK_ENABLED', 'false').lower() in ['true', 'on', '1']  # Прием обновлений бота на /api/telegram/webhook вместо long polling
+    TELEGRAM_WEBHOOK_SECRET = os.environ.get('TELEGRAM_WEBHOOK_SECRET')  # Секрет заголовка X-Telegram-Bot-Api-Secret-Token (setWebhook secret_token); без него webhook отвечает 403
 
     # Динамический username Telegram-бота (после загрузки .env/.env.dev)
     # Проверяем APP_ENV еще раз после загрузки .env файлов
@@ -90,6 +150,10 @@ class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///tournament.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Локальная база: WAL и ожидание блокировок как в продакшене, без mmap и с небольшим кэшем
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 2 * 1024))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 0))
     
     # Настройки email для разработки
     MAIL_SERVER = 'smtp.gmail.com'
@@ -104,7 +168,12 @@ class ProductionConfig(Config):
     DEBUG = False
     # Railway автоматически предоставляет DATABASE_URL для PostgreSQL
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
     
+    # Сервер: кэш страниц и mmap побольше (значения из окружения имеют приоритет)
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
     # Настройки безопасности для продакшена
     SESSION_COOKIE_SECURE = True
     SESSION_COOKIE_HTTPONLY = True
@@ -124,7 +124,9 @@ if [ "$UPDATE_MODE" = true ]; then
         BACKUP_DIR="/home/deploy/backups"
         mkdir -p "$BACKUP_DIR"
         BACKUP_FILE="$BACKUP_DIR/tournament_$(date +%Y%m%d_%H%M%S).db"
-        cp instance/tournament.db "$BACKUP_FILE"
+        # База в режиме WAL: часть данных может быть в tournament.db-wal, поэтому не cp, а backup API SQLite
+        python3 -c "import sqlite3, sys; src = sqlite3.connect(sys.argv[1]); dst = sqlite3.connect(sys.argv[2]); src.backup(dst); dst.close(); src.close()" \
+            instance/tournament.db "$BACKUP_FILE"
         log_info "✓ Бэкап создан: $BACKUP_FILE"
     fi
     
@@ -137,6 +139,10 @@ if [ "$UPDATE_MODE" = true ]; then
     # Установка/обновление зависимостей
     install_dependencies
     
+    # Миграции схемы базы данных (воркеры при старте только сверяют версию схемы)
+    log_info "Применение миграций базы данных..."
+    python migrate.py
+    
     # Перезапуск сервиса
     log_info "Шаг 2/3: Перезапуск приложения..."
     sudo systemctl restart tournaments
@@ -55,13 +55,27 @@ cd "$APP_DIR"
 log_info "=== Деплой Development окружения ==="
 log_info "Директория: $APP_DIR"
 
+# Старый setup_dev_environment.sh записывал в .env DATABASE_URL=...tournament_dev.db,
+# но до поддержки DATABASE_URL приложение всегда работало с instance/tournament.db.
+# Возвращаем .env на фактический файл, чтобы dev не переключился на пустую базу.
+if [ -f ".env" ] && grep -q "^DATABASE_URL=sqlite:///instance/tournament_dev.db" .env; then
+    if [ -f "instance/tournament_dev.db" ] && [ ! -f "instance/tournament.db" ]; then
+        log_warn "Данные dev находятся в instance/tournament_dev.db, .env не изменён"
+    else
+        sed -i 's|^DATABASE_URL=sqlite:///instance/tournament_dev.db|DATABASE_URL=sqlite:///instance/tournament.db|' .env
+        log_info "✓ DATABASE_URL в .env исправлен на instance/tournament.db"
+    fi
+fi
+
 # Шаг 1: Резервное копирование БД (опционально)
 log_info "Шаг 1/5: Резервное копирование базы данных..."
-if [ -f "instance/tournament_dev.db" ]; then
+if [ -f "instance/tournament.db" ]; then
     BACKUP_DIR="$HOME/backups"
     mkdir -p "$BACKUP_DIR"
     BACKUP_FILE="$BACKUP_DIR/tournament_dev_$(date +%Y%m%d_%H%M%S).db"
-    cp "instance/tournament_dev.db" "$BACKUP_FILE"
+    # База в режиме WAL: часть данных может быть в tournament.db-wal, поэтому не cp, а backup API SQLite
+    python3 -c "import sqlite3, sys; src = sqlite3.connect(sys.argv[1]); dst = sqlite3.connect(sys.argv[2]); src.backup(dst); dst.close(); src.close()" \
+        instance/tournament.db "$BACKUP_FILE"
     log_info "✓ Резервная копия создана: $BACKUP_FILE"
 else
     log_warn "База данных не найдена, пропускаем резервное копирование"
@@ -61,7 +61,9 @@ if [ -f "instance/tournament.db" ]; then
     BACKUP_DIR="$HOME/backups"
     mkdir -p "$BACKUP_DIR"
     BACKUP_FILE="$BACKUP_DIR/tournament_$(date +%Y%m%d_%H%M%S).db"
-    cp "instance/tournament.db" "$BACKUP_FILE"
+    # База в режиме WAL: часть данных может быть в tournament.db-wal, поэтому не cp, а backup API SQLite
+    python3 -c "import sqlite3, sys; src = sqlite3.connect(sys.argv[1]); dst = sqlite3.connect(sys.argv[2]); src.backup(dst); dst.close(); src.close()" \
+        instance/tournament.db "$BACKUP_FILE"
     log_info "✓ Резервная копия создана: $BACKUP_FILE"
 else
     log_warn "База данных не найдена, пропускаем резервное копирование"
@@ -94,6 +96,11 @@ pip install --upgrade pip
 pip install -r requirements.txt
 log_info "✓ Зависимости обновлены"
 
+# Миграции схемы базы данных (воркеры при старте только сверяют версию схемы)
+log_info "Применение миграций базы данных..."
+python migrate.py
+log_info "✓ Схема базы данных актуальна"
+
 # Шаг 5: Перезапуск сервиса
 log_info "Шаг 5/5: Перезапуск сервиса..."
 sudo systemctl restart tournaments
@@ -105,8 +105,8 @@ SECRET_KEY=DEV_SECRET_KEY_CHANGE_THIS
 HOST=127.0.0.1
 PORT=5001
 
-# Database
-DATABASE_URL=sqlite:///instance/tournament_dev.db
+# Database (отдельный файл в директории dev, production не затрагивается)
+DATABASE_URL=sqlite:///instance/tournament.db
 
 # Security
 SESSION_COOKIE_SECURE=False
@@ -9,370 +9,506 @@
     --source: путь к исходной БД (локальная)
     --target: путь к целевой БД (серверная)
     --output: путь к результирующей БД (по умолчанию: instance/tournament_merged.db)
-    --backup: создать бэкап целевой БД перед слиянием (по умолчанию: True)
+    --no-backup: не создавать бэкап целевой БД перед слиянием
+    --dry-run: только показать, что будет добавлено и какие есть конфликты, ничего не записывая
+    --batch-size: строк в пачке (по умолчанию: 5000)
+    --memory-ids: сколько соответствий id одной таблицы держать в памяти,
+                  остальные - во временной таблице SQLite (по умолчанию: 100000)
+
+Результирующая БД - копия целевой, в которую добавляются записи исходной.
+Каждая таблица читается из исходной БД потоком (fetchmany) и записывается
+пачками (executemany) в одной транзакции на таблицу: таблица с ошибкой
+откатывается целиком, остальные сливаются. Соответствия старых id новым
+(для обновления внешних ключей) хранятся в словаре, а при росте -
+во временной таблице SQLite, поэтому память не растет с размером rally и
+user_activity.
+
+Производные таблицы (standings, tournament_version, schema_version) не
+сливаются: в них нет внешних ключей, поэтому id турниров и участников
+исходной БД в них не пересчитываются. После слияния standings
+пересобирается по матчам для всех турниров результирующей БД.
 """
 
 import sqlite3
 import argparse
 import os
-import shutil
+import time
 from datetime import datetime
-from collections import defaultdict
+from pathlib import Path
+
+# Параметров в одном запросе SQLite (SQLITE_MAX_VARIABLE_NUMBER старых версий - 999)
+MAX_QUERY_PARAMS = 900
+
+
+def _read_only_uri(path):
+    return Path(path).resolve().as_uri() + '?mode=ro'
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _chunks(values, size=MAX_QUERY_PARAMS):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def copy_database_file(source_path, destination_path):
+    """Копирует БД через backup API SQLite (с учетом WAL, в отличие от копирования файла)"""
+    source = sqlite3.connect(_read_only_uri(source_path), uri=True)
+    destination = sqlite3.connect(destination_path)
+    try:
+        source.backup(destination)
+    finally:
+        destination.close()
+        source.close()
+
+
+class IdMapping:
+    """
+    Соответствие старых id записей таблицы новым
+
+    Хранятся только измененные id (у остальных записей id совпадает).
+    Пока соответствий меньше memory_limit - словарь, затем они переносятся
+    во временную таблицу temp.merge_id_map соединения conn.
+    """
+
+    def __init__(self, conn, table_name, memory_limit):
+        self.conn = conn
+        self.table_name = table_name
+        self.memory_limit = memory_limit
+        self.memory = {}
+        self.stored = 0
+
+    def __len__(self):
+        return self.stored + len(self.memory)
+
+    def add(self, old_id, new_id):
+        self.memory[old_id] = new_id
+        if len(self.memory) >= self.memory_limit:
+            self.flush()
+
+    def flush(self):
+        """Переносит соответствия из памяти во временную таблицу"""
+        if not self.memory:
+            return
+        self.conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS merge_id_map ("
+            "table_name TEXT NOT NULL, old_id INTEGER NOT NULL, new_id INTEGER NOT NULL, "
+            "PRIMARY KEY (table_name, old_id)) WITHOUT ROWID"
+        )
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO temp.merge_id_map (table_name, old_id, new_id) VALUES (?, ?, ?)",
+            ((self.table_name, old_id, new_id) for old_id, new_id in self.memory.items())
+        )
+        self.stored += len(self.memory)
+        self.memory.clear()
+
+    def resolve(self, ids):
+        """Новые id для тех из ids, которые менялись: {старый id: новый id}"""
+        ids = {value for value in ids if value is not None}
+        found = {value: self.memory[value] for value in ids if value in self.memory}
+        if self.stored:
+            for chunk in _chunks(ids - found.keys()):
+                cursor = self.conn.execute(
+                    f"SELECT old_id, new_id FROM temp.merge_id_map "
+                    f"WHERE table_name = ? AND old_id IN ({','.join('?' * len(chunk))})",
+                    [self.table_name, *chunk]
+                )
+                found.update(cursor.fetchall())
+        return found
+
 
 class DatabaseMerger:
-    def __init__(self, source_db, target_db, output_db, create_backup=True):
+    # Поля, по которым запись исходной БД считается уже существующей в целевой
+    # (для остальных таблиц - тот же id при совпадении всех остальных колонок)
+    unique_fields = {
+        'tournament': 'name',
+        'user': 'username',
+        'player': 'name',
+        'tokens': 'token',
+        'settings': 'key',
+    }
+
+    # Таблицы, которые вычисляются по остальным данным и не сливаются
+    derived_tables = ('standings', 'tournament_version', 'schema_version')
+
+    # Сколько примеров конфликтов показывать для таблицы
+    conflict_examples = 5
+
+    def __init__(self, source_db, target_db, output_db, create_backup=True, dry_run=False,
+                 batch_size=5000, memory_limit=100000, progress_interval=2.0):
         self.source_db = source_db
         self.target_db = target_db
         self.output_db = output_db
         self.create_backup = create_backup
-        
-        # Маппинг старых ID на новые ID для каждой таблицы
-        self.id_mappings = defaultdict(dict)
-        
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.memory_limit = memory_limit
+        self.progress_interval = progress_interval
+
+        # Маппинг старых ID на новые ID для каждой таблицы (IdMapping)
+        self.id_mappings = {}
+        # Итоги по таблицам: {таблица: {'rows', 'inserted', 'skipped', 'remapped', 'ignored'}}
+        self.stats = {}
+
         # Порядок таблиц для обработки (сначала независимые, потом зависимые)
         self.table_order = [
             # Независимые таблицы
             'user',
             'player',
             'settings',
-            'token',
+            'tokens',
             'notification',
-            'waiting_list',
             'user_activity',
             # Зависимые таблицы (в порядке зависимостей)
             'tournament',
+            'waiting_list',
             'participant',
             'match',
             'match_log',
             'rally'
         ]
-        
+
     def create_backup_file(self):
         """Создает бэкап целевой БД"""
         if not os.path.exists(self.target_db):
             print(f"⚠️  Целевая БД {self.target_db} не существует, пропускаем бэкап")
             return
-            
+
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_path = f"{self.target_db}.backup_{timestamp}"
-        shutil.copy2(self.target_db, backup_path)
+        copy_database_file(self.target_db, backup_path)
         print(f"✅ Создан бэкап: {backup_path}")
         return backup_path
-    
+
     def get_table_columns(self, conn, table_name):
-        """Получает список колонок таблицы"""
-        cursor = conn.execute(f"PRAGMA table_info({table_name})")
+        """Получает список колонок таблицы (пустой, если таблицы нет)"""
+        cursor = conn.execute(f'PRAGMA table_info({_quote(table_name)})')
         return [row[1] for row in cursor.fetchall()]
-    
-    def get_table_data(self, conn, table_name):
-        """Получает все данные из таблицы"""
-        try:
-            cursor = conn.execute(f"SELECT * FROM {table_name}")
-            columns = [description[0] for description in cursor.description]
-            rows = cursor.fetchall()
-            return columns, rows
-        except sqlite3.OperationalError as e:
-            print(f"⚠️  Таблица {table_name} не существует или недоступна: {e}")
-            return None, []
-    
-    def get_unique_key(self, table_name, row, columns):
-        """Определяет уникальный ключ для записи"""
-        # Для таблиц с уникальными полями используем их
-        unique_fields = {
-            'tournament': ['name'],
-            'user': ['username'],
-            'player': ['name'],
-            'token': ['token'],
-            'settings': ['key'],
-        }
-        
-        if table_name in unique_fields:
-            key_parts = []
-            for field in unique_fields[table_name]:
-                if field in columns:
-                    try:
-                        idx = columns.index(field)
-                        value = row[idx] if idx < len(row) else None
-                        key_parts.append(str(value) if value is not None else '')
-                    except (ValueError, IndexError):
-                        continue
-            if key_parts and any(key_parts):  # Проверяем, что есть хотя бы одно непустое значение
-                return tuple(key_parts)
-        
-        # По умолчанию используем ID
-        if 'id' in columns:
-            try:
-                idx = columns.index('id')
-                if idx < len(row):
-                    return row[idx]
-            except (ValueError, IndexError):
-                pass
-        
-        # Если ничего не подошло, используем всю строку как ключ
-        return tuple(str(v) if v is not None else '' for v in row)
-    
-    def merge_table(self, source_conn, target_conn, output_conn, table_name):
-        """Объединяет данные таблицы из двух БД"""
-        print(f"\n📊 Обработка таблицы: {table_name}")
-        
-        # Получаем данные из обеих БД
-        source_columns, source_rows = self.get_table_data(source_conn, table_name)
-        target_columns, target_rows = self.get_table_data(target_conn, table_name)
-        
-        if source_columns is None and target_columns is None:
-            print(f"  ⚠️  Таблица {table_name} отсутствует в обеих БД, пропускаем")
-            return
-        
-        # Определяем колонки (используем из той БД, где таблица есть)
-        columns = source_columns if source_columns else target_columns
-        if not columns:
-            print(f"  ⚠️  Не удалось определить колонки для {table_name}")
-            return
-        
-        # Получаем текущие записи из результирующей БД
-        output_columns, output_rows = self.get_table_data(output_conn, table_name)
-        if output_columns is None:
-            output_columns = columns
-            output_rows = []
-        
-        # Создаем словарь существующих записей в результирующей БД по уникальному ключу
-        existing_records = {}
-        existing_ids = set()
-        id_idx = columns.index('id') if 'id' in columns else None
-        
-        for row in output_rows:
-            if id_idx is not None:
-                existing_ids.add(row[id_idx])
-            key = self.get_unique_key(table_name, row, columns)
-            if key is not None:
-                existing_records[key] = row
-        
-        # Получаем максимальный ID в результирующей БД
-        max_id = max(existing_ids) if existing_ids else 0
-        
-        # Обрабатываем записи из исходной БД
-        new_records = []
-        updated_count = 0
-        inserted_count = 0
-        skipped_count = 0
-        
-        for source_row in source_rows:
-            key = self.get_unique_key(table_name, source_row, columns)
-            
-            if key in existing_records:
-                # Запись уже существует - пропускаем (используем данные из целевой БД)
-                skipped_count += 1
+
+    def get_foreign_keys(self, conn, table_name):
+        """Внешние ключи таблицы: {колонка: таблица, на которую она ссылается}"""
+        cursor = conn.execute(f'PRAGMA foreign_key_list({_quote(table_name)})')
+        return {row[3]: row[2] for row in cursor.fetchall()}
+
+    def get_tables(self, conn):
+        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+        return {row[0] for row in cursor.fetchall()}
+
+    def find_existing(self, conn, table_name, column, values, result_columns):
+        """Записи таблицы со значениями column из values: {значение: (result_columns записи)}"""
+        values = {value for value in values if value is not None}
+        selected = ','.join(_quote(name) for name in [column, *result_columns])
+        existing = {}
+        for chunk in _chunks(values):
+            cursor = conn.execute(
+                f'SELECT {selected} FROM {_quote(table_name)} '
+                f'WHERE {_quote(column)} IN ({",".join("?" * len(chunk))})',
+                chunk
+            )
+            existing.update((row[0], row[1:]) for row in cursor)
+        return existing
+
+    def row_exists(self, conn, table_name, columns, row):
+        """Есть ли в таблице такая же строка (для таблиц без id и уникальных полей)"""
+        condition = ' AND '.join(f'{_quote(column)} IS ?' for column in columns)
+        cursor = conn.execute(f'SELECT 1 FROM {_quote(table_name)} WHERE {condition} LIMIT 1', row)
+        return cursor.fetchone() is not None
+
+    def update_foreign_keys(self, rows, columns, foreign_keys):
+        """Обновляет foreign keys пачки строк согласно маппингу ID"""
+        for fk_column, ref_table in foreign_keys.items():
+            mapping = self.id_mappings.get(ref_table)
+            if fk_column not in columns or not mapping:
                 continue
-            else:
-                # Новая запись - добавляем с обновлением ID и foreign keys
-                new_row = list(source_row)
-                
-                # Обновляем ID, если нужно
-                if id_idx is not None:
-                    old_id = new_row[id_idx]
-                    if old_id is not None and old_id in existing_ids:
-                        # ID конфликтует - генерируем новый
-                        max_id += 1
-                        new_id = max_id
-                        # Сохраняем маппинг для обновления foreign keys
-                        self.id_mappings[table_name][old_id] = new_id
-                        new_row[id_idx] = new_id
-                    elif old_id is not None:
-                        # ID свободен - сохраняем маппинг
-                        self.id_mappings[table_name][old_id] = old_id
-                        existing_ids.add(old_id)
-                
-                # Обновляем foreign keys
-                new_row = list(self.update_foreign_keys(new_row, columns, table_name))
-                new_records.append(tuple(new_row))
-                inserted_count += 1
-        
-        # Добавляем записи, которые есть только в целевой БД (они уже в результирующей)
-        # Но проверяем, нет ли новых записей в целевой БД, которых нет в результирующей
-        target_keys = {self.get_unique_key(table_name, row, columns) for row in target_rows}
-        for target_row in target_rows:
-            key = self.get_unique_key(table_name, target_row, columns)
-            if key not in existing_records and key not in {self.get_unique_key(table_name, row, columns) for row in new_records}:
-                new_row = list(target_row)
-                # Обновляем foreign keys
-                new_row = list(self.update_foreign_keys(new_row, columns, table_name))
-                new_records.append(tuple(new_row))
-                inserted_count += 1
-        
-        # Вставляем новые записи в результирующую БД
-        if new_records:
-            self.insert_records(output_conn, table_name, columns, new_records)
-        
-        print(f"  ✅ Обработано: {len(existing_records) + len(new_records)} записей ({inserted_count} новых, {skipped_count} пропущено)")
-    
-    def merge_row(self, table_name, source_row, target_row, columns):
-        """Объединяет две строки одной таблицы"""
-        # По умолчанию используем данные из целевой БД (более свежие)
-        # Но можно настроить логику слияния для конкретных полей
-        return target_row
-    
-    def update_foreign_keys(self, row, columns, table_name):
-        """Обновляет foreign keys в строке согласно маппингу ID"""
-        updated_row = list(row)
-        
-        # Маппинг foreign keys для каждой таблицы
-        fk_mappings = {
-            'participant': {
-                'tournament_id': 'tournament',
-                'user_id': 'user'
-            },
-            'match': {
-                'tournament_id': 'tournament',
-                'participant1_id': 'participant',
-                'participant2_id': 'participant',
-                'winner_id': 'participant'
-            },
-            'rally': {
-                'match_id': 'match',
-                'tournament_id': 'tournament'
-            },
-            'match_log': {
-                'match_id': 'match',
-                'tournament_id': 'tournament'
-            }
-        }
-        
-        if table_name in fk_mappings:
-            for fk_column, ref_table in fk_mappings[table_name].items():
-                if fk_column in columns:
-                    idx = columns.index(fk_column)
-                    old_id = updated_row[idx]
-                    if old_id is not None and old_id in self.id_mappings[ref_table]:
-                        updated_row[idx] = self.id_mappings[ref_table][old_id]
-        
-        return tuple(updated_row)
-    
+            idx = columns.index(fk_column)
+            new_ids = mapping.resolve(row[idx] for row in rows)
+            if new_ids:
+                for row in rows:
+                    if row[idx] in new_ids:
+                        row[idx] = new_ids[row[idx]]
+
     def insert_records(self, conn, table_name, columns, rows):
-        """Вставляет записи в таблицу"""
+        """Вставляет пачку записей, возвращает число вставленных"""
         if not rows:
-            return
-        
-        # Создаем таблицу, если её нет
-        self.create_table_if_not_exists(conn, table_name, columns)
-        
-        # Подготавливаем данные для вставки
-        placeholders = ','.join(['?' for _ in columns])
-        
-        for row in rows:
-            # Вставляем запись
-            try:
-                conn.execute(
-                    f"INSERT OR IGNORE INTO {table_name} ({','.join(columns)}) VALUES ({placeholders})",
-                    row
-                )
-            except sqlite3.IntegrityError as e:
-                # Если ошибка уникальности, пробуем REPLACE
-                try:
-                    conn.execute(
-                        f"INSERT OR REPLACE INTO {table_name} ({','.join(columns)}) VALUES ({placeholders})",
-                        row
-                    )
-                except Exception as e2:
-                    print(f"  ⚠️  Ошибка вставки в {table_name}: {e2}")
-                    continue
-            except Exception as e:
-                print(f"  ⚠️  Ошибка вставки в {table_name}: {e}")
-                continue
-        
-        conn.commit()
-    
-    def create_table_if_not_exists(self, conn, table_name, columns):
-        """Создает таблицу, если её нет"""
-        # Получаем структуру таблицы из исходной БД
-        source_conn = sqlite3.connect(self.source_db)
-        cursor = source_conn.execute(f"SELECT sql FROM sqlite_master WHERE type='table' AND name='{table_name}'")
+            return 0
+        placeholders = ','.join('?' * len(columns))
+        column_list = ','.join(_quote(column) for column in columns)
+        before = conn.total_changes
+        # OR IGNORE: строки, нарушающие прочие ограничения уникальности, пропускаются
+        conn.executemany(f'INSERT OR IGNORE INTO {_quote(table_name)} ({column_list}) VALUES ({placeholders})', rows)
+        return conn.total_changes - before
+
+    def create_table_if_not_exists(self, source_conn, conn, table_name):
+        """Создает таблицу по схеме исходной БД, если её нет"""
+        cursor = source_conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
         result = cursor.fetchone()
-        source_conn.close()
-        
         if result:
-            create_sql = result[0]
-            # Заменяем CREATE TABLE на CREATE TABLE IF NOT EXISTS
-            create_sql = create_sql.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS')
-            try:
-                conn.execute(create_sql)
-                conn.commit()
-            except sqlite3.OperationalError:
-                pass  # Таблица уже существует
-    
+            create_sql = result[0].replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1)
+            conn.execute(create_sql)
+
+    def print_progress(self, table_name, done, total, started):
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed if elapsed > 0 else 0
+        percent = f" ({done * 100 // total}%)" if total else ''
+        print(f"  … {table_name}: {done}/{total}{percent}, {rate:.0f} строк/с")
+
+    def merge_table(self, source_conn, output_conn, table_name):
+        """Объединяет таблицу исходной БД с результирующей, возвращает итоги"""
+        print(f"\n📊 Обработка таблицы: {table_name}")
+
+        source_columns = self.get_table_columns(source_conn, table_name)
+        if not source_columns:
+            print(f"  ⚠️  Таблицы {table_name} нет в исходной БД, пропускаем")
+            return None
+
+        output_columns = self.get_table_columns(output_conn, table_name)
+        table_exists = bool(output_columns)
+        if table_exists:
+            columns = [column for column in source_columns if column in output_columns]
+            missing = [column for column in source_columns if column not in output_columns]
+            if missing:
+                print(f"  ⚠️  Колонок нет в целевой БД, не переносятся: {', '.join(missing)}")
+            foreign_keys = self.get_foreign_keys(output_conn, table_name)
+        else:
+            print(f"  ➕ Таблицы нет в целевой БД, будет создана по схеме исходной")
+            columns = source_columns
+            foreign_keys = self.get_foreign_keys(source_conn, table_name)
+
+        id_idx = columns.index('id') if 'id' in columns else None
+        # Запись с тем же id считается той же, только если совпадают и все остальные колонки
+        data_columns = [column for column in columns if column != 'id']
+        data_indexes = [columns.index(column) for column in data_columns]
+        key_field = self.unique_fields.get(table_name)
+        key_idx = columns.index(key_field) if key_field in columns else None
+
+        # Новые id выдаются после максимальных id обеих БД: они не совпадут
+        # ни с записями целевой БД, ни с еще не прочитанными строками исходной
+        max_id = 0
+        if id_idx is not None:
+            max_id = source_conn.execute(f'SELECT MAX(id) FROM {_quote(table_name)}').fetchone()[0] or 0
+            if table_exists:
+                max_id = max(max_id, output_conn.execute(f'SELECT MAX(id) FROM {_quote(table_name)}').fetchone()[0] or 0)
+
+        total = source_conn.execute(f'SELECT COUNT(*) FROM {_quote(table_name)}').fetchone()[0]
+        mapping = IdMapping(output_conn, table_name, self.memory_limit)
+        stats = {'rows': total, 'inserted': 0, 'skipped': 0, 'remapped': 0, 'ignored': 0}
+        conflicts = []
+        started = last_progress = time.perf_counter()
+        done = 0
+
+        if not self.dry_run:
+            output_conn.execute('BEGIN')
+        try:
+            if not table_exists and not self.dry_run:
+                self.create_table_if_not_exists(source_conn, output_conn, table_name)
+                table_exists = True
+
+            cursor = source_conn.execute(
+                f'SELECT {",".join(_quote(column) for column in columns)} FROM {_quote(table_name)}'
+            )
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    break
+
+                # Ссылки на записи, получившие новые id, - до сравнения с целевой БД
+                rows = [list(row) for row in rows]
+                self.update_foreign_keys(rows, columns, foreign_keys)
+
+                existing_keys, existing_ids = {}, {}
+                if table_exists and key_idx is not None:
+                    existing_keys = self.find_existing(
+                        output_conn, table_name, key_field,
+                        (row[key_idx] for row in rows if row[key_idx] not in (None, '')),
+                        ['id' if id_idx is not None else key_field]
+                    )
+                if table_exists and id_idx is not None:
+                    existing_ids = self.find_existing(output_conn, table_name, 'id',
+                                                      (row[id_idx] for row in rows), data_columns)
+
+                new_rows = []
+                for row in rows:
+                    old_id = row[id_idx] if id_idx is not None else None
+                    key = row[key_idx] if key_idx is not None else None
+                    if key not in (None, ''):
+                        if key in existing_keys:
+                            # Запись уже есть - используем запись целевой БД, ссылки переводим на нее
+                            existing_id = existing_keys[key][0]
+                            stats['skipped'] += 1
+                            if old_id is not None and existing_id != old_id:
+                                mapping.add(old_id, existing_id)
+                            if len(conflicts) < self.conflict_examples:
+                                conflicts.append(f"{key_field}={key!r} уже есть (id {old_id} → {existing_id})")
+                            continue
+                    elif id_idx is not None:
+                        # Та же запись (общая история баз): тот же id, те же данные и (пересчитанные) ссылки
+                        if old_id in existing_ids and existing_ids[old_id] == tuple(row[i] for i in data_indexes):
+                            stats['skipped'] += 1
+                            continue
+                    elif table_exists and self.row_exists(output_conn, table_name, columns, row):
+                        stats['skipped'] += 1
+                        continue
+
+                    if old_id is not None and old_id in existing_ids:
+                        # ID занят другой записью - генерируем новый
+                        max_id += 1
+                        mapping.add(old_id, max_id)
+                        row[id_idx] = max_id
+                        stats['remapped'] += 1
+                        if len(conflicts) < self.conflict_examples:
+                            conflicts.append(f"id {old_id} занят → {max_id}" + (f" ({key_field}={key!r})" if key else ''))
+                    new_rows.append(row)
+
+                if self.dry_run:
+                    stats['inserted'] += len(new_rows)
+                else:
+                    inserted = self.insert_records(output_conn, table_name, columns, new_rows)
+                    stats['inserted'] += inserted
+                    stats['ignored'] += len(new_rows) - inserted
+
+                done += len(rows)
+                now = time.perf_counter()
+                if done < total and now - last_progress >= self.progress_interval:
+                    self.print_progress(table_name, done, total, started)
+                    last_progress = now
+
+            if not self.dry_run:
+                output_conn.execute('COMMIT')
+        except Exception:
+            if output_conn.in_transaction:
+                output_conn.execute('ROLLBACK')
+            raise
+
+        # Маппинг доступен зависимым таблицам только после успешной обработки
+        self.id_mappings[table_name] = mapping
+        self.stats[table_name] = stats
+
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed > 0 else 0
+        action = "будет добавлено" if self.dry_run else "добавлено"
+        print(f"  ✅ {total} записей за {elapsed:.2f} с ({rate:.0f} строк/с): {action} {stats['inserted']}, "
+              f"уже есть {stats['skipped']}, с новым id {stats['remapped']}"
+              + (f", пропущено из-за ограничений уникальности {stats['ignored']}" if stats['ignored'] else ''))
+        if mapping.stored:
+            print(f"  💾 Соответствий id: {len(mapping)} (во временной таблице)")
+        if self.dry_run and conflicts:
+            print("  🔍 Конфликты:")
+            for conflict in conflicts:
+                print(f"     - {conflict}")
+            more = stats['skipped'] + stats['remapped'] - len(conflicts)
+            if more > 0:
+                print(f"     ... и еще {more}")
+        return stats
+
+    def rebuild_standings(self):
+        """Пересобирает standings всех турниров результирующей БД по матчам"""
+        from sqlalchemy import create_engine, inspect, select
+        from sqlalchemy.orm import Session
+        from models import Standing, Tournament
+        from services.standings import rebuild_standings
+
+        engine = create_engine(f'sqlite:///{Path(self.output_db).resolve()}')
+        try:
+            if not inspect(engine).has_table(Standing.__tablename__):
+                return True
+            with Session(engine) as session:
+                tournament_ids = set(session.scalars(select(Tournament.id)))
+                # Строки удаленных турниров тоже убираем
+                tournament_ids |= set(session.scalars(select(Standing.tournament_id).distinct()))
+                for tournament_id in sorted(tournament_ids):
+                    rebuild_standings(session, tournament_id)
+                session.commit()
+            print(f"\n📊 Турнирная таблица пересобрана для {len(tournament_ids)} турниров")
+            return True
+        except Exception as e:
+            print(f"\n❌ Ошибка пересборки standings: {e}")
+            print("   Выполните python migrate.py и python rebuild_standings.py для результирующей БД")
+            return False
+        finally:
+            engine.dispose()
+
     def merge(self):
-        """Выполняет слияние БД"""
+        """Выполняет слияние БД (в режиме dry_run - только отчет)"""
         print("=" * 60)
-        print("🔄 Слияние баз данных")
+        print("🔄 Слияние баз данных" + (" (пробный запуск, без записи)" if self.dry_run else ""))
         print("=" * 60)
-        
+
         # Проверяем существование исходных БД
         if not os.path.exists(self.source_db):
             print(f"❌ Исходная БД не найдена: {self.source_db}")
             return False
-        
+
         if not os.path.exists(self.target_db):
             print(f"⚠️  Целевая БД не найдена: {self.target_db}")
+            if self.dry_run:
+                print(f"   Результатом будет копия исходной БД {self.source_db}")
+                return True
             print("   Создаем новую БД на основе исходной...")
-            shutil.copy2(self.source_db, self.output_db)
+            copy_database_file(self.source_db, self.output_db)
             print(f"✅ Создана БД: {self.output_db}")
             return True
-        
-        # Создаем бэкап
-        if self.create_backup:
-            self.create_backup_file()
-        
-        # Копируем целевую БД как основу для результата
-        shutil.copy2(self.target_db, self.output_db)
-        print(f"\n✅ Создана результирующая БД: {self.output_db}")
-        
-        # Открываем соединения
-        source_conn = sqlite3.connect(self.source_db)
-        target_conn = sqlite3.connect(self.target_db)
-        output_conn = sqlite3.connect(self.output_db)
-        
+
+        source_conn = sqlite3.connect(_read_only_uri(self.source_db), uri=True)
+        if self.dry_run:
+            # Результат слияния начинается с копии целевой БД - сравниваем с ней самой
+            output_conn = sqlite3.connect(_read_only_uri(self.target_db), uri=True, isolation_level=None)
+        else:
+            # Создаем бэкап
+            if self.create_backup:
+                self.create_backup_file()
+
+            # Копируем целевую БД как основу для результата
+            copy_database_file(self.target_db, self.output_db)
+            print(f"\n✅ Создана результирующая БД: {self.output_db}")
+            output_conn = sqlite3.connect(self.output_db, isolation_level=None)
+            # Результат - новый файл: при сбое слияние запускается заново
+            output_conn.execute('PRAGMA synchronous = OFF')
+
+        started = time.perf_counter()
+        failed = []
         try:
-            # Обрабатываем таблицы в порядке зависимостей
-            for table_name in self.table_order:
-                try:
-                    self.merge_table(source_conn, target_conn, output_conn, table_name)
-                except Exception as e:
-                    print(f"  ❌ Ошибка при обработке {table_name}: {e}")
-                    continue
-            
-            # Обрабатываем остальные таблицы (если есть)
-            source_tables = set()
-            target_tables = set()
-            
-            cursor = source_conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            source_tables.update(row[0] for row in cursor.fetchall())
-            
-            cursor = target_conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            target_tables.update(row[0] for row in cursor.fetchall())
-            
-            all_tables = source_tables | target_tables
-            remaining_tables = all_tables - set(self.table_order)
-            
-            for table_name in remaining_tables:
+            # Обрабатываем таблицы в порядке зависимостей, затем остальные
+            all_tables = self.get_tables(source_conn) | self.get_tables(output_conn)
+            remaining_tables = sorted(all_tables - set(self.table_order) - set(self.derived_tables))
+            for table_name in self.table_order + remaining_tables:
                 try:
-                    self.merge_table(source_conn, target_conn, output_conn, table_name)
+                    self.merge_table(source_conn, output_conn, table_name)
                 except Exception as e:
-                    print(f"  ❌ Ошибка при обработке {table_name}: {e}")
+                    print(f"  ❌ Ошибка при обработке {table_name} (таблица не изменена): {e}")
+                    failed.append(table_name)
                     continue
-            
-            print("\n" + "=" * 60)
-            print("✅ Слияние завершено успешно!")
-            print("=" * 60)
-            print(f"\n📁 Результирующая БД: {self.output_db}")
-            print("\n⚠️  ВАЖНО: Проверьте результат перед использованием!")
-            print("   Рекомендуется протестировать приложение с новой БД.")
-            
-            return True
-            
         finally:
             source_conn.close()
-            target_conn.close()
             output_conn.close()
 
+        if self.dry_run:
+            print("\n📊 Турнирная таблица (standings) будет пересобрана по матчам")
+        elif not self.rebuild_standings():
+            failed.append('standings')
+
+        elapsed = time.perf_counter() - started
+        total_rows = sum(stats['rows'] for stats in self.stats.values())
+        total_inserted = sum(stats['inserted'] for stats in self.stats.values())
+        print("\n" + "=" * 60)
+        if self.dry_run:
+            print(f"🔍 Пробный запуск: {total_rows} записей, будет добавлено {total_inserted}")
+        else:
+            print("✅ Слияние завершено" + (" с ошибками" if failed else " успешно!"))
+            print(f"   {total_rows} записей, добавлено {total_inserted}")
+        print(f"   за {elapsed:.1f} с ({total_rows / elapsed if elapsed > 0 else 0:.0f} строк/с)")
+        if failed:
+            print(f"   ❌ Таблицы с ошибками: {', '.join(failed)}")
+        print("=" * 60)
+        if not self.dry_run:
+            print(f"\n📁 Результирующая БД: {self.output_db}")
+            print("\n⚠️  ВАЖНО: Проверьте результат перед использованием!")
+            print("   Рекомендуется протестировать приложение с новой БД.")
+
+        return True
+
 
 def main():
     parser = argparse.ArgumentParser(description='Слияние двух баз данных SQLite')
@@ -380,25 +516,31 @@ def main():
     parser.add_argument('--target', required=True, help='Путь к целевой БД (серверная)')
     parser.add_argument('--output', default='instance/tournament_merged.db', help='Путь к результирующей БД')
     parser.add_argument('--no-backup', action='store_true', help='Не создавать бэкап целевой БД')
-    
+    parser.add_argument('--dry-run', action='store_true', help='Только показать конфликты и число новых записей')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Строк в пачке')
+    parser.add_argument('--memory-ids', type=int, default=100000,
+                        help='Соответствий id одной таблицы в памяти (остальные - во временной таблице)')
+
     args = parser.parse_args()
-    
+
     # Создаем директорию для output, если её нет
     output_dir = os.path.dirname(args.output)
-    if output_dir and not os.path.exists(output_dir):
+    if output_dir and not os.path.exists(output_dir) and not args.dry_run:
         os.makedirs(output_dir)
-    
+
     merger = DatabaseMerger(
         source_db=args.source,
         target_db=args.target,
         output_db=args.output,
-        create_backup=not args.no_backup
+        create_backup=not args.no_backup,
+        dry_run=args.dry_run,
+        batch_size=args.batch_size,
+        memory_limit=args.memory_ids
     )
-    
+
     success = merger.merge()
     exit(0 if success else 1)
 
 
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Миграции схемы базы данных Quick Score Tournaments (services/migrations.py)
+
+Запускается один раз при деплое, до перезапуска приложения:
+    python migrate.py                          # применить недостающие миграции
+    python migrate.py --status                 # показать примененные и ожидающие миграции
+    python migrate.py --target 5               # обновить схему до миграции 5
+    python migrate.py --reset-admin-password   # задать пароль admin (по умолчанию adm555)
+
+Повторный запуск безопасен: примененные миграции пропускаются.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Миграции выполняет этот скрипт, а не импорт приложения
+os.environ['MIGRATE_ON_STARTUP'] = 'false'
+
+
+def print_status(db):
+    from services.migrations import MIGRATIONS, get_applied_versions
+
+    with db.engine.connect() as conn:
+        applied = get_applied_versions(conn)
+    for item in MIGRATIONS:
+        mark = '✅' if item.version in applied else '⏳'
+        print(f"  {mark} {item.version:>3}  {item.name}")
+    pending = [item for item in MIGRATIONS if item.version not in applied]
+    print(f"Ожидают применения: {len(pending)}")
+    return pending
+
+
+def reset_admin_password(db, password):
+    from werkzeug.security import generate_password_hash
+    from models import User
+
+    admin = User.query.filter_by(username='admin').first()
+    if not admin:
+        print("✗ Администратор admin не найден - выполните python migrate.py")
+        return False
+    admin.password_hash = generate_password_hash(password)
+    db.session.commit()
+    print("✓ Пароль администратора admin обновлен")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Миграции схемы базы данных")
+    parser.add_argument('--status', action='store_true', help="показать состояние миграций")
+    parser.add_argument('--target', type=int, help="номер миграции, до которой обновить схему")
+    parser.add_argument('--reset-admin-password', nargs='?', const='adm555', metavar='PASSWORD',
+                        help="задать пароль администратора admin")
+    args = parser.parse_args()
+
+    from app import app
+    from models import db
+    from services.migrations import run_migrations
+
+    with app.app_context():
+        print(f"База данных: {db.engine.url.render_as_string(hide_password=True)}")
+        if args.status:
+            print_status(db)
+            return
+        if args.reset_admin_password:
+            sys.exit(0 if reset_admin_password(db, args.reset_admin_password) else 1)
+
+        try:
+            applied = run_migrations(db, target=args.target)
+        except Exception as e:
+            print(f"✗ Ошибка миграции: {e}")
+            sys.exit(1)
+        for item in applied:
+            print(f"  ✓ {item.version:>3}  {item.name}")
+        print(f"✓ Применено миграций: {len(applied)}" if applied else "✓ Схема базы данных актуальна")
+
+
+if __name__ == '__main__':
+    main()
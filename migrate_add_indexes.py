@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+Миграция для добавления составных индексов на часто используемые колонки
+
+Изменение входит в миграцию 8 services/migrations.py. Скрипт оставлен
+для совместимости и применяет все недостающие миграции (как python migrate.py).
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from migrate import main
+
+if __name__ == "__main__":
+    main()
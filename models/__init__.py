@@ -3,8 +3,11 @@
 """
 from flask_sqlalchemy import SQLAlchemy
 
+from services.read_replica import RoutingSession
+
 # Глобальный экземпляр db для моделей
-db = SQLAlchemy()
+# (сессия направляет чтение зрительских маршрутов в привязку только для чтения)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Импортируем модели напрямую
 from .user import User
@@ -19,6 +22,10 @@ from .settings import Settings
 from .player import Player
 from .user_activity import UserActivity
 from .rally import Rally
+from .tournament_version import TournamentVersion
+from .standing import Standing
+from .outbound_message import OutboundMessage
+from .telegram_update import TelegramUpdate
 
 def create_models(db_instance):
     """Возвращает словарь с моделями (для обратной совместимости)"""
@@ -34,5 +41,9 @@ def create_models(db_instance):
         'Settings': Settings,
         'Player': Player,
         'UserActivity': UserActivity,
-        'Rally': Rally
+        'Rally': Rally,
+        'TournamentVersion': TournamentVersion,
+        'Standing': Standing,
+        'OutboundMessage': OutboundMessage,
+        'TelegramUpdate': TelegramUpdate
     }
\ No newline at end of file
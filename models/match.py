@@ -6,7 +6,13 @@ from . import db
 
 class Match(db.Model):
     __tablename__ = 'match'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Матчи турнира без удаленных, по расписанию (дата, время)
+        db.Index('ix_match_tournament_schedule', 'tournament_id', 'is_removed', 'match_date', 'match_time'),
+        # Очередь площадки: следующий матч по номеру (пересчет расписания)
+        db.Index('ix_match_court_queue', 'tournament_id', 'court_number', 'status', 'match_number'),
+        {'extend_existing': True}
+    )
     id = db.Column(db.Integer, primary_key=True)
     tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=True)  # Теперь nullable для свободных матчей
     participant1_id = db.Column(db.Integer, db.ForeignKey('participant.id'), nullable=True)  # Nullable для свободных матчей
@@ -6,7 +6,11 @@ from . import db
 
 class MatchLog(db.Model):
     __tablename__ = 'match_log'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_match_log_match', 'match_id'),
+        db.Index('ix_match_log_tournament', 'tournament_id'),
+        {'extend_existing': True}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False)
@@ -0,0 +1,30 @@
+"""
+Модель исходящего сообщения (очередь отправки уведомлений)
+"""
+from datetime import datetime
+from . import db
+
+class OutboundMessage(db.Model):
+    __tablename__ = 'outbound_message'
+    __table_args__ = (
+        db.Index('ix_outbound_message_due', 'channel', 'status', 'next_attempt_at'),
+        {'extend_existing': True}
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), default='telegram', nullable=False)  # Канал доставки: 'telegram'
+    recipient = db.Column(db.String(255), nullable=False)  # Chat ID или @username получателя
+    body = db.Column(db.Text, nullable=False)  # Текст сообщения
+    parse_mode = db.Column(db.String(20), nullable=True)  # Форматирование ('HTML')
+    # 'pending' - ждет отправки, 'sending' - забрано воркером, 'sent' - доставлено, 'failed' - не доставлено
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claim_token = db.Column(db.String(32), nullable=True)  # Метка воркера, забравшего сообщение
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<OutboundMessage {self.id} {self.channel}:{self.recipient} {self.status}>'
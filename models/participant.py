@@ -6,7 +6,11 @@ from . import db
 
 class Participant(db.Model):
     __tablename__ = 'participant'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Участники турнира (активные) по алфавиту
+        db.Index('ix_participant_tournament_active_name', 'tournament_id', 'is_active', 'name'),
+        {'extend_existing': True}
+    )
     id = db.Column(db.Integer, primary_key=True)
     tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
@@ -7,7 +7,11 @@ from . import db
 
 class Rally(db.Model):
     __tablename__ = 'rally'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Розыгрыши матча (журнал судьи)
+        db.Index('ix_rally_match', 'match_id', 'is_removed'),
+        {'extend_existing': True}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
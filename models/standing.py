@@ -0,0 +1,29 @@
+"""
+Модель строки турнирной таблицы (материализованные места участников)
+"""
+from datetime import datetime
+from . import db
+
+class Standing(db.Model):
+    __tablename__ = 'standings'
+    __table_args__ = (
+        db.Index('ix_standings_tournament_place', 'tournament_id', 'place'),
+        {'extend_existing': True}
+    )
+    
+    # Без внешних ключей: строки пересобираются вместе с изменениями турнира
+    # и не должны мешать удалению участников и турниров
+    tournament_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    participant_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    place = db.Column(db.Integer, nullable=False)
+    points = db.Column(db.Integer, default=0, nullable=False)
+    wins = db.Column(db.Integer, default=0, nullable=False)
+    losses = db.Column(db.Integer, default=0, nullable=False)
+    games = db.Column(db.Integer, default=0, nullable=False)
+    sets_won = db.Column(db.Integer, default=0, nullable=False)
+    sets_lost = db.Column(db.Integer, default=0, nullable=False)
+    set_difference = db.Column(db.Integer, default=0, nullable=False)  # разность очков в сетах
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Standing {self.tournament_id}/{self.participant_id}: {self.place}>'
@@ -0,0 +1,16 @@
+"""
+Модель принятого обновления Telegram (защита от повторной обработки webhook)
+"""
+from datetime import datetime
+from . import db
+
+class TelegramUpdate(db.Model):
+    __tablename__ = 'telegram_update'
+    __table_args__ = {'extend_existing': True}
+    
+    # update_id из Telegram; Telegram повторяет доставку, пока не получит 2xx
+    update_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<TelegramUpdate {self.update_id}>'
@@ -20,7 +20,12 @@ class Token(db.Model):
     used_at = db.Column(db.DateTime, nullable=True)
     email_sent = db.Column(db.Boolean, default=False, nullable=False)
     email_sent_at = db.Column(db.DateTime, nullable=True)
-    email_status = db.Column(db.String(50), default='pending', nullable=False)
+    # 'new' - письмо не запрошено (черновик), 'pending' - в очереди отправки (ставит только enqueue_token_email),
+    # 'sending' - отправляется, 'sent', 'failed', 'manual' (см. services/mail_dispatcher.py)
+    email_status = db.Column(db.String(50), default='new', nullable=False)
+    email_attempts = db.Column(db.Integer, default=0, nullable=False)  # Попыток отправки письма
+    email_next_attempt_at = db.Column(db.DateTime, nullable=True)  # Следующая попытка (для 'sending' - срок захвата)
+    email_error = db.Column(db.Text, nullable=True)  # Последняя ошибка отправки
 
     def __repr__(self):
         return f'<Token {self.token} for {self.email}>'
\ No newline at end of file
@@ -0,0 +1,17 @@
+"""
+Модель версии данных турнира (для ETag в API обновлений)
+"""
+from datetime import datetime
+from . import db
+
+class TournamentVersion(db.Model):
+    __tablename__ = 'tournament_version'
+    __table_args__ = {'extend_existing': True}
+    
+    # ID турнира; 0 - свободные матчи (без турнира)
+    tournament_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TournamentVersion {self.tournament_id}: {self.version}>'
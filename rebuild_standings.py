@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Проверка и восстановление таблицы standings (места участников турниров)
+
+Места пересчитываются по матчам турнира и сравниваются с сохранёнными
+строками standings; расхождения исправляются.
+
+Использование:
+    python rebuild_standings.py                  # проверить и исправить все турниры
+    python rebuild_standings.py --check          # только проверить (код выхода 1 при расхождениях)
+    python rebuild_standings.py --tournament 17  # только один турнир
+"""
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from models import db, Tournament, Standing
+from services.standings import STANDING_FIELDS, build_standings_store, rebuild_standings
+
+
+def standings_differences(tournament_id):
+    """Сравнивает строки standings с пересчетом по матчам; возвращает список расхождений"""
+    store = build_standings_store(db.session, tournament_id)
+    expected = {p_data['participant'].id: {field: p_data[field] for field in STANDING_FIELDS}
+                for p_data in (store.ranking() if store else [])}
+    actual = {row.participant_id: {field: getattr(row, field) for field in STANDING_FIELDS}
+              for row in Standing.query.filter_by(tournament_id=tournament_id).all()}
+
+    differences = []
+    for participant_id in sorted(set(expected) | set(actual)):
+        if expected.get(participant_id) != actual.get(participant_id):
+            differences.append((participant_id, actual.get(participant_id), expected.get(participant_id)))
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Проверка и восстановление таблицы standings')
+    parser.add_argument('--tournament', type=int, help='ID турнира (по умолчанию - все турниры)')
+    parser.add_argument('--check', action='store_true', help='только проверить, ничего не изменять')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.tournament:
+            tournament_ids = [args.tournament]
+        else:
+            tournament_ids = [tournament_id for (tournament_id,) in db.session.query(Tournament.id).order_by(Tournament.id)]
+            # Строки удалённых турниров тоже нужно убрать
+            standing_ids = {tournament_id for (tournament_id,) in db.session.query(Standing.tournament_id).distinct()}
+            tournament_ids += sorted(standing_ids - set(tournament_ids))
+
+        broken = 0
+        for tournament_id in tournament_ids:
+            differences = standings_differences(tournament_id)
+            if not differences:
+                print(f"✅ Турнир {tournament_id}: таблица совпадает с матчами")
+                continue
+
+            broken += 1
+            print(f"⚠️  Турнир {tournament_id}: расхождений - {len(differences)}")
+            for participant_id, actual, expected in differences[:10]:
+                print(f"   участник {participant_id}: в таблице {actual}, по матчам {expected}")
+
+            if not args.check:
+                rebuild_standings(db.session, tournament_id)
+                db.session.commit()
+                print(f"🔧 Турнир {tournament_id}: таблица пересобрана")
+
+        print("=" * 60)
+        print(f"Проверено турниров: {len(tournament_ids)}, с расхождениями: {broken}")
+
+    return 1 if broken and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
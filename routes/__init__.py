@@ -10,3 +10,8 @@ def register_routes(app, db, User, Tournament, Participant, Match, Notification,
     create_main_routes(app, db, User, Tournament, Participant, Match, Notification, MatchLog, Token, WaitingList, Settings, Player)
     create_auth_routes(app, db, User)
     create_api_routes(app, db, User, Tournament, Participant, Match, Notification, MatchLog, Token, WaitingList, Settings, Player, Rally)
+    
+    # Заглушка Telegram Bot API для локальной проверки очереди сообщений
+    if app.config.get('TELEGRAM_STUB_ENABLED'):
+        from .telegram_stub import create_telegram_stub_routes
+        create_telegram_stub_routes(app)
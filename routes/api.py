@@ -8,16 +8,45 @@ from datetime import datetime, timedelta, date, time
 import logging
 from flask_wtf.csrf import CSRFProtect
 from routes.main import update_tournament_status
-from utils.telegram_utils import send_telegram_message
+from services.telegram_outbox import enqueue_telegram_message
+from services.read_replica import read_only_route
 from utils.qr_generator import generate_telegram_token, generate_qr_code, get_bot_username
+from services.live_events import publish_match_update, event_stream_response
 
 logger = logging.getLogger(__name__)
 
+def _pick_next_court_match(completed_match, pending_matches):
+    """
+    Выбирает следующий матч площадки среди незавершенных (уже загруженных) матчей:
+    ближайший по match_number, иначе (для обратной совместимости) первый по дате и времени
+    """
+    if completed_match.match_number is not None:
+        by_number = [m for m in pending_matches
+                     if m.match_number is not None and m.match_number > completed_match.match_number]
+        if by_number:
+            return min(by_number, key=lambda m: m.match_number)
+    
+    if not pending_matches:
+        return None
+    
+    logger.info(f"[ПЕРЕСЧЕТ] Не найден следующий матч по match_number, берем первый по дате/времени")
+    # Порядок как у ORDER BY match_date, match_time, match_number в SQLite (NULL - первыми)
+    return min(pending_matches, key=lambda m: (
+        m.match_date is not None, m.match_date or date.min,
+        m.match_time is not None, m.match_time or time.min,
+        m.match_number is not None, m.match_number or 0,
+        m.id
+    ))
+
 def recalculate_schedule_after_match_completion(match_id, Tournament, Match, db):
     """
     Пересчитывает время начала следующих матчей на той же площадке после завершения матча.
     Учитывает реальное время окончания матча.
     
+    Незавершенные матчи площадки загружаются одним запросом, новое время считается
+    в памяти, изменения сохраняются одним commit (пакетный UPDATE), поэтому
+    стоимость не зависит от длины очереди площадки.
+    
     Args:
         match_id: ID завершенного матча
         Tournament: Модель турнира
@@ -28,7 +57,7 @@ def recalculate_schedule_after_match_completion(match_id, Tournament, Match, db)
     
     try:
         logger.info(f"[ПЕРЕСЧЕТ] >>> ВХОД В ФУНКЦИЮ для матча {match_id}")
-        completed_match = Match.query.get(match_id)
+        completed_match = db.session.get(Match, match_id)
         if not completed_match:
             logger.warning(f"[ПЕРЕСЧЕТ] Матч {match_id} не найден для пересчета расписания")
             return
@@ -48,160 +77,121 @@ def recalculate_schedule_after_match_completion(match_id, Tournament, Match, db)
         logger.info(f"[ПЕРЕСЧЕТ] Начало пересчета для матча {match_id} (площадка: {completed_match.court_number}, match_number: {completed_match.match_number})")
         logger.info(f"[ПЕРЕСЧЕТ] Локальное время окончания матча: {match_end_time}")
         
-        # Сохраняем текущее время в actual_end_time, если оно еще не установлено
-        if not completed_match.actual_end_time:
-            completed_match.actual_end_time = match_end_time
-            db.session.commit()
-        
         # Получаем турнир для параметров
-        tournament = Tournament.query.get(completed_match.tournament_id)
+        tournament = db.session.get(Tournament, completed_match.tournament_id) if completed_match.tournament_id else None
         if not tournament:
             logger.warning(f"Турнир {completed_match.tournament_id} не найден")
             return
         
         match_duration = tournament.match_duration or 15  # длительность матча в минутах
         break_duration = tournament.break_duration or 2   # перерыв между матчами в минутах
-        end_time = tournament.end_time or None  # конец рабочего дня
+        court_number = completed_match.court_number
         
         logger.info(f"[ПЕРЕСЧЕТ] Параметры турнира: длительность={match_duration} мин, перерыв={break_duration} мин")
         
-        # Находим следующий матч на той же площадке после этого матча
-        # Используем match_number для правильного определения порядка
-        # Ищем следующий матч с большим match_number на той же площадке
-        next_match = Match.query.filter(
+        # Все незавершенные матчи площадки - одним запросом (индекс ix_match_court_queue)
+        pending_matches = Match.query.filter(
             Match.tournament_id == completed_match.tournament_id,
-            Match.court_number == completed_match.court_number,
+            Match.court_number == court_number,
             Match.id != match_id,
-            Match.status != 'завершен',
-            Match.match_number > completed_match.match_number
-        ).order_by(
-            Match.match_number.asc()
-        ).first()
-        
-        # Если не нашли по match_number, пробуем найти по дате и времени (для обратной совместимости)
-        if not next_match:
-            logger.info(f"[ПЕРЕСЧЕТ] Не найден следующий матч по match_number, пробуем по дате/времени")
-            next_match = Match.query.filter(
-                Match.tournament_id == completed_match.tournament_id,
-                Match.court_number == completed_match.court_number,
-                Match.id != match_id,
-                Match.status != 'завершен'
-            ).order_by(
-                Match.match_date.asc(),
-                Match.match_time.asc(),
-                Match.match_number.asc()
-            ).first()
+            Match.status != 'завершен'
+        ).all()
         
-        # Если всё ещё не нашли, пробуем найти любой незавершенный матч на той же площадке
-        if not next_match:
-            logger.info(f"[ПЕРЕСЧЕТ] Не найден следующий матч по дате/времени, пробуем любой незавершенный на площадке")
-            all_court_matches = Match.query.filter(
-                Match.tournament_id == completed_match.tournament_id,
-                Match.court_number == completed_match.court_number,
-                Match.id != match_id,
-                Match.status != 'завершен'
-            ).all()
-            logger.info(f"[ПЕРЕСЧЕТ] Найдено незавершенных матчей на площадке {completed_match.court_number}: {len(all_court_matches)}")
-            for m in all_court_matches:
-                logger.info(f"[ПЕРЕСЧЕТ]   - Матч ID={m.id}, match_number={m.match_number}, статус={m.status}, время={m.match_date} {m.match_time}")
-            
-            # Берём первый незавершенный матч на площадке после текущего по match_number или ID
-            next_match = Match.query.filter(
-                Match.tournament_id == completed_match.tournament_id,
-                Match.court_number == completed_match.court_number,
-                Match.id != match_id,
-                Match.status != 'завершен'
-            ).order_by(
-                Match.id.asc()
-            ).first()
+        # Сохраняем текущее время в actual_end_time, если оно еще не установлено
+        # (записывается в той же транзакции, что и новое расписание)
+        if not completed_match.actual_end_time:
+            completed_match.actual_end_time = match_end_time
         
+        next_match = _pick_next_court_match(completed_match, pending_matches)
         if not next_match:
-            logger.info(f"[ПЕРЕСЧЕТ] Нет следующих матчей на площадке {completed_match.court_number} после матча {match_id}")
+            logger.info(f"[ПЕРЕСЧЕТ] Нет следующих матчей на площадке {court_number} после матча {match_id}")
+            db.session.commit()
             return
         
         logger.info(f"[ПЕРЕСЧЕТ] Найден следующий матч: ID={next_match.id}, match_number={next_match.match_number}, текущее время={next_match.match_date} {next_match.match_time}")
         
-        # Вычисляем новое время начала следующего матча
-        # Время окончания предыдущего матча + перерыв
-        # При динамическом пересчете используем реальное время окончания без ограничений рабочего дня
-        new_start_time = match_end_time + timedelta(minutes=break_duration)
+        # КАСКАДНЫЙ ПЕРЕСЧЕТ: следующий матч и ВСЕ последующие матчи на этой площадке по цепочке
+        # (по возрастанию match_number; матчи с тем же номером пропускаются, как и раньше)
+        chain = [next_match]
+        if next_match.match_number is not None:
+            last_number = next_match.match_number
+            for following in sorted((m for m in pending_matches if m.match_number is not None and m is not next_match),
+                                    key=lambda m: (m.match_number, m.id)):
+                if following.match_number > last_number:
+                    chain.append(following)
+                    last_number = following.match_number
         
-        # Берем дату и время напрямую из вычисленного времени
-        # При динамическом пересчете не ограничиваемся рабочим временем,
+        # Время окончания предыдущего матча + перерыв
+        # При динамическом пересчете используем реальное время окончания без ограничений рабочего дня,
         # так как матч уже начался и должен быть завершен независимо от расписания
-        new_start_date = new_start_time.date()
-        new_start_time_only = new_start_time.time()
-        
-        logger.info(f"[ПЕРЕСЧЕТ] Вычислено новое время начала: {new_start_date} {new_start_time_only} (от {match_end_time})")
-        
-        # Обновляем запланированное время следующего матча
-        old_time = next_match.match_time
-        old_date = next_match.match_date
-        
-        next_match.match_time = new_start_time_only
-        next_match.match_date = new_start_date
-        
-        # Устанавливаем реальное время начала, если матч еще не начался
-        if not next_match.actual_start_time and next_match.status == 'запланирован':
-            # Реальное время начала = запланированное (будет обновлено при фактическом начале)
-            next_match.actual_start_time = datetime.combine(new_start_date, new_start_time_only)
-        
-        logger.info(
-            f"[ПЕРЕСЧЕТ] Матч {next_match.id} на площадке {completed_match.court_number}: "
-            f"{old_date} {old_time} -> {new_start_date} {new_start_time_only}"
-        )
+        new_start = match_end_time + timedelta(minutes=break_duration)
+        for position, match in enumerate(chain):
+            old_date = match.match_date
+            old_time = match.match_time
+            match.match_date = new_start.date()
+            match.match_time = new_start.time()
+            
+            if position == 0:
+                # Устанавливаем реальное время начала, если матч еще не начался
+                if not match.actual_start_time and match.status == 'запланирован':
+                    # Реальное время начала = запланированное (будет обновлено при фактическом начале)
+                    match.actual_start_time = datetime.combine(match.match_date, match.match_time)
+                logger.info(
+                    f"[ПЕРЕСЧЕТ] Матч {match.id} на площадке {court_number}: "
+                    f"{old_date} {old_time} -> {match.match_date} {match.match_time}"
+                )
+            else:
+                logger.info(
+                    f"[ПЕРЕСЧЕТ КАСКАДНЫЙ] Матч {match.id}: {old_date} {old_time} -> {match.match_date} {match.match_time}"
+                )
+            
+            # следующий шаг рассчитываем от конца только что сдвинутого матча
+            new_start = datetime.combine(match.match_date, match.match_time) + timedelta(minutes=match_duration + break_duration)
         
-        # Проверяем, что изменения сохранились
+        # Один commit: UPDATE матчей с одинаковым набором полей выполняется пакетно (executemany)
         db.session.commit()
-        db.session.refresh(next_match)
-        
-        # Убеждаемся, что дата и время правильно сохранены
-        logger.info(f"[ПЕРЕСЧЕТ] После commit: матч {next_match.id} теперь имеет время {next_match.match_date} {next_match.match_time}")
-        logger.info(f"[ПЕРЕСЧЕТ] Проверка: match_date type={type(next_match.match_date)}, match_time type={type(next_match.match_time)}")
-        
-        # Дополнительная проверка через прямой запрос из базы
-        verify_match = Match.query.get(next_match.id)
-        if verify_match:
-            logger.info(f"[ПЕРЕСЧЕТ] Прямой запрос из БД: match_date={verify_match.match_date}, match_time={verify_match.match_time}")
-        
-        # КАСКАДНЫЙ ПЕРЕСЧЕТ: обновляем ВСЕ последующие матчи на этой площадке по цепочке
-        current_planned_end = datetime.combine(new_start_date, new_start_time_only) + timedelta(minutes=match_duration)
-        cursor_match = next_match
-        while True:
-            following = Match.query.filter(
-                Match.tournament_id == completed_match.tournament_id,
-                Match.court_number == completed_match.court_number,
-                Match.id != match_id,
-                Match.id != cursor_match.id,
-                Match.status != 'завершен',
-                Match.match_number > cursor_match.match_number
-            ).order_by(Match.match_number.asc()).first()
-            if not following:
-                break
-            new_start = current_planned_end + timedelta(minutes=break_duration)
-            new_date = new_start.date()
-            new_time_only = new_start.time()
-            old_date = following.match_date
-            old_time = following.match_time
-            following.match_date = new_date
-            following.match_time = new_time_only
-            logger.info(
-                f"[ПЕРЕСЧЕТ КАСКАДНЫЙ] Матч {following.id}: {old_date} {old_time} -> {new_date} {new_time_only}"
-            )
-            db.session.commit()
-            # следующий шаг рассчитываем от конца только что сдвинутого following
-            current_planned_end = datetime.combine(new_date, new_time_only) + timedelta(minutes=match_duration)
-            cursor_match = following
+        logger.info(f"[ПЕРЕСЧЕТ] Сдвинуто матчей на площадке {court_number}: {len(chain)}")
     
     except Exception as e:
         logger.error(f"[ОШИБКА ПЕРЕСЧЕТА] Матч {match_id}: {e}")
         db.session.rollback()
 
 
-def create_smart_schedule(tournament, participants, Match, db, preserve_results=True):
+def build_slot_times(first_date, first_time, day_start_time, day_end_time, step_minutes, count):
+    """
+    Дата и время начала слотов расписания
+
+    Шаг - матч + перерыв; если время выходит за пределы рабочего дня,
+    переходим на следующий день к day_start_time.
+    """
+    from datetime import timedelta
+    
+    slot_times = []
+    current_date, current_time = first_date, first_time
+    for _ in range(count):
+        if current_time > day_end_time:
+            current_date += timedelta(days=1)
+            current_time = day_start_time
+        slot_times.append((current_date, current_time))
+        current_time = add_minutes_to_time(current_time, step_minutes)
+    return slot_times
+
+
+def create_smart_schedule(tournament, participants, Match, db, preserve_results=True, bulk=False, reconcile=False):
     """
     Создает расписание матчей для кругового турнира по правильному алгоритму
     с возможностью сохранения результатов существующих матчей
+    
+    Матчи раскладываются по площадкам и времени services.scheduler.pack_matches:
+    все площадки заняты, участник не играет два матча одновременно и отдыхает
+    не меньше SCHEDULE_MIN_REST_MINUTES между матчами.
+    
+    bulk=True - расписание рассчитывается как набор строк и записывается одной
+    пакетной вставкой (executemany) в одной транзакции с удалением старых матчей,
+    без создания ORM-объектов и журнала по каждому матчу.
+    
+    reconcile=True - расписание не пересоздается, а сверяется с текущим
+    (см. reconcile_smart_schedule): меняются только отличающиеся матчи.
     """
     from datetime import date, time, timedelta
     import random
@@ -220,6 +210,9 @@ def create_smart_schedule(tournament, participants, Match, db, preserve_results=
     
     logger.info(f"Создание расписания для {n} участников: {[p.name for p in participants]}")
     
+    if reconcile:
+        return reconcile_smart_schedule(tournament, participants, Match, db)
+    
     # Сохраняем результаты существующих матчей, если нужно
     existing_results = {}
     if preserve_results:
@@ -278,9 +271,17 @@ def create_smart_schedule(tournament, participants, Match, db, preserve_results=
         placeholders = ','.join([f':id_{i}' for i in range(len(match_ids))])
         db.session.execute(text(f"DELETE FROM match WHERE id IN ({placeholders})"), params)
         logger.info(f"Удалено {len(match_ids)} существующих матчей через raw SQL")
+        # raw SQL не проходит через ORM - версию турнира увеличиваем явно
+        from services.change_version import bump_tournament_versions
+        bump_tournament_versions(db.session, [tournament.id])
+        # Удаленные строки убираем из сессии: их id могут достаться новым матчам
+        for match in existing_matches:
+            db.session.expunge(match)
     
     # Коммитим удаление, чтобы избежать проблем с autoflush
-    db.session.commit()
+    # (при пакетной вставке ORM-объектов нет - удаление и вставка в одной транзакции)
+    if not bulk:
+        db.session.commit()
     
     # Создаем круговое расписание по правильному алгоритму
     try:
@@ -304,129 +305,91 @@ def create_smart_schedule(tournament, participants, Match, db, preserve_results=
                 all_matches.append(key)
     logger.info(f"Всего уникальных матчей: {len(all_matches)}")
     
-    # Распределяем матчи по времени и площадкам
-    scheduled_matches = []
-    global_match_number = 1  # Глобальная нумерация матчей
-    current_time = start_time
-    current_date = start_date
+    # Раскладываем матчи по площадкам и времени так, чтобы день закончился как можно раньше:
+    # сначала уже сыгранные матчи, затем остальные в порядке туров
+    from flask import current_app, has_app_context
+    from services.scheduler import pack_matches, rest_slots_for
     
-    # Сначала размещаем завершенные матчи в начале расписания
-    completed_matches = []
-    pending_matches = []
-    
-    for round_num, round_matches in enumerate(rounds, 1):
-        for match in round_matches:
-            participant1, participant2 = match
+    completed_pairs = []
+    pending_pairs = []
+    for round_matches in rounds:
+        for participant1, participant2 in round_matches:
             key = tuple(sorted([participant1.id, participant2.id]))
-            
             if key in existing_results:
-                completed_matches.append((match, existing_results[key]))
+                completed_pairs.append((participant1, participant2))
             else:
-                pending_matches.append(match)
+                pending_pairs.append((participant1, participant2))
+    ordered_pairs = completed_pairs + pending_pairs
     
-    # Размещаем завершенные матчи в начале
-    for match, result_data in completed_matches:
-        participant1, participant2 = match
-        p1_id, p2_id = participant1.id, participant2.id
-        
-        logger.info(f"Восстановление завершенного матча: {participant1.name} vs {participant2.name} (номер {global_match_number})")
-        
-        # Создаем матч с сохраненными результатами
-        match_obj = Match(
-            tournament_id=tournament.id,
-            participant1_id=p1_id,
-            participant2_id=p2_id,
-            status=result_data['status'],
-            match_date=current_date,
-            match_time=current_time,
-            court_number=1,  # Завершенные матчи на первой площадке
-            match_number=global_match_number,
-            sets_won_1=result_data['sets_won_1'],
-            sets_won_2=result_data['sets_won_2'],
-            set1_score1=result_data['set1_score1'],
-            set1_score2=result_data['set1_score2'],
-            set2_score1=result_data['set2_score1'],
-            set2_score2=result_data['set2_score2'],
-            set3_score1=result_data['set3_score1'],
-            set3_score2=result_data['set3_score2'],
-            winner_id=result_data['winner_id'],
-            score1=result_data['score1'],
-            score2=result_data['score2']
-        )
-        db.session.add(match_obj)
-        scheduled_matches.append(match_obj)
-        global_match_number += 1
-        
-        # Переходим к следующему времени
-        current_time = add_minutes_to_time(current_time, time_match + time_break)
-        if current_time > end_time:
-            current_date += timedelta(days=1)
-            current_time = start_time
+    min_rest_minutes = current_app.config.get('SCHEDULE_MIN_REST_MINUTES', 0) if has_app_context() else 0
+    rest_slots = rest_slots_for(min_rest_minutes, time_match, time_break)
+    placement = pack_matches([(p1.id, p2.id) for p1, p2 in ordered_pairs], k,
+                             rest_slots=rest_slots, priority_count=len(completed_pairs))
     
-    # Теперь размещаем оставшиеся матчи
-    rounds_remaining = []
-    completed_match_keys = set()
-    for match, _ in completed_matches:
-        participant1, participant2 = match
-        key = tuple(sorted([participant1.id, participant2.id]))
-        completed_match_keys.add(key)
+    slots_count = max((slot for _, slot, _ in placement), default=-1) + 1
+    slot_times = build_slot_times(start_date, start_time, start_time, end_time, time_match + time_break, slots_count)
     
-    for round_num, round_matches in enumerate(rounds, 1):
-        remaining_in_round = []
-        for match in round_matches:
-            participant1, participant2 = match
-            key = tuple(sorted([participant1.id, participant2.id]))
-            if key not in completed_match_keys:
-                remaining_in_round.append(match)
-        if remaining_in_round:
-            rounds_remaining.append(remaining_in_round)
+    logger.info(f"Расписание: {len(ordered_pairs)} матчей на {k} площадках за {slots_count} слотов "
+                f"(отдых между матчами участника - {rest_slots} слотов)")
     
-    for round_num, round_matches in enumerate(rounds_remaining, 1):
-        logger.info(f"Тур {round_num}: {len(round_matches)} матчей")
-        
-        # Распределяем матчи тура по площадкам
-        court_assignments = distribute_matches_to_courts(round_matches, k)
-        
-        # Создаем матчи для текущего тура
-        round_matches_created = []
-        for court_num, court_matches in court_assignments.items():
-            for match in court_matches:
-                participant1, participant2 = match
-                p1_id, p2_id = participant1.id, participant2.id
-                
-                logger.info(f"Создание нового матча: {participant1.name} vs {participant2.name} (площадка {court_num}, номер {global_match_number})")
-                
-                # Создаем матч
-                match_obj = Match(
-                    tournament_id=tournament.id,
-                    participant1_id=p1_id,
-                    participant2_id=p2_id,
-                    status='запланирован',
-                    match_date=current_date,
-                    match_time=current_time,
-                    court_number=court_num,
-                    match_number=global_match_number
-                )
-                db.session.add(match_obj)
-                scheduled_matches.append(match_obj)
-                round_matches_created.append(match_obj)
-                global_match_number += 1
-        
-        # Сортируем матчи тура по номеру площадки для правильной нумерации
-        round_matches_created.sort(key=lambda m: m.court_number)
-        
-        # Переназначаем номера матчей в туре (используем правильную нумерацию)
-        for i, match in enumerate(round_matches_created):
-            match.match_number = global_match_number - len(round_matches_created) + i
-            logger.info(f"Матч {match.participant1_id} vs {match.participant2_id} получил номер {match.match_number}")
+    # Строки матчей; номера идут по порядку слотов и площадок
+    result_fields = ('sets_won_1', 'sets_won_2', 'set1_score1', 'set1_score2', 'set2_score1', 'set2_score2',
+                     'set3_score1', 'set3_score2', 'winner_id', 'score1', 'score2')
+    schedule_rows = []
+    for match_number, (index, slot, court_num) in enumerate(placement, start=1):
+        participant1, participant2 = ordered_pairs[index]
+        match_date, match_time = slot_times[slot]
+        row = {
+            'tournament_id': tournament.id,
+            'participant1_id': participant1.id,
+            'participant2_id': participant2.id,
+            'status': 'запланирован',
+            'match_date': match_date,
+            'match_time': match_time,
+            'court_number': court_num,
+            'match_number': match_number,
+            # Значения по умолчанию модели - у всех строк одинаковый набор полей
+            **dict.fromkeys(result_fields),
+            'sets_won_1': 0,
+            'sets_won_2': 0
+        }
+        if index < len(completed_pairs):
+            result_data = existing_results[tuple(sorted([participant1.id, participant2.id]))]
+            row['status'] = result_data['status']
+            row.update((field, result_data[field]) for field in result_fields)
+        schedule_rows.append(row)
+    
+    if bulk:
+        from sqlalchemy import insert
+        from services.change_version import bump_tournament_versions
+        from services.standings import mark_tournaments_changed
         
-        # Переходим к следующему времени
-        current_time = add_minutes_to_time(current_time, time_match + time_break)
+        try:
+            db.session.execute(insert(Match), schedule_rows)
+            # Пакетная вставка не проходит через flush - версию и таблицу мест обновляем явно
+            bump_tournament_versions(db.session, [tournament.id])
+            mark_tournaments_changed(db.session, [tournament.id])
+            db.session.commit()
+            logger.info(f"Пакетно создано и сохранено {len(schedule_rows)} матчей "
+                        f"(восстановлено результатов: {len(completed_pairs)})")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Ошибка при пакетном сохранении матчей в БД: {e}", exc_info=True)
+            raise
+        return len(schedule_rows)
+    
+    # Создаем матчи
+    scheduled_matches = []
+    for (index, _, _), row in zip(placement, schedule_rows):
+        participant1, participant2 = ordered_pairs[index]
+        if index < len(completed_pairs):
+            logger.info(f"Восстановление завершенного матча: {participant1.name} vs {participant2.name} (номер {row['match_number']})")
+        else:
+            logger.info(f"Создание нового матча: {participant1.name} vs {participant2.name} (площадка {row['court_number']}, номер {row['match_number']})")
         
-        # Если время выходит за пределы рабочего дня, переходим на следующий день
-        if current_time > end_time:
-            current_date += timedelta(days=1)
-            current_time = start_time
+        match_obj = Match(**row)
+        db.session.add(match_obj)
+        scheduled_matches.append(match_obj)
     
     # Коммитим все созданные матчи
     try:
@@ -440,6 +403,97 @@ def create_smart_schedule(tournament, participants, Match, db, preserve_results=
     return len(scheduled_matches)
 
 
+def reconcile_smart_schedule(tournament, participants, Match, db):
+    """
+    Приводит расписание турнира к полному круговому без пересоздания матчей
+    
+    - матчи пар, которые остаются в турнире, не меняются (время, площадка,
+      результаты, розыгрыши и журнал сохраняются);
+    - матчи выбывших участников и повторные матчи одной пары помечаются
+      удаленными (is_removed);
+    - недостающие пары добавляются после последнего матча расписания
+      (раскладка services.scheduler.pack_matches).
+    
+    Returns:
+        int: количество матчей в расписании после сверки
+    """
+    from datetime import datetime, date, time, timedelta
+    from itertools import combinations
+    from flask import current_app, has_app_context
+    from services.scheduler import pack_matches, rest_slots_for
+    
+    k = tournament.court_count or 4
+    time_match = tournament.match_duration or 15
+    time_break = tournament.break_duration or 2
+    start_time = tournament.start_time or time(9, 0)
+    end_time = tournament.end_time or time(18, 0)
+    
+    target_pairs = {tuple(sorted([p1.id, p2.id])) for p1, p2 in combinations(participants, 2)}
+    existing_matches = Match.query.filter_by(tournament_id=tournament.id, is_removed=False).order_by(
+        Match.match_number, Match.id).all()
+    
+    # Сохраняем по одному матчу на пару; сыгранный матч важнее запланированного
+    kept = {}
+    for match in sorted(existing_matches, key=lambda m: m.status == 'запланирован'):
+        key = tuple(sorted([match.participant1_id or 0, match.participant2_id or 0]))
+        if key in target_pairs and key not in kept:
+            kept[key] = match
+    
+    kept_ids = {match.id for match in kept.values()}
+    removed_matches = [match for match in existing_matches if match.id not in kept_ids]
+    now = datetime.now()
+    for match in removed_matches:
+        match.is_removed = True
+        match.deleted_at = now
+        match.deleted_by = 'reschedule'
+    
+    # Недостающие пары - в порядке туров кругового расписания
+    new_pairs = [(p1, p2) for round_matches in create_round_robin_schedule(participants)
+                 for p1, p2 in round_matches if tuple(sorted([p1.id, p2.id])) not in kept]
+    
+    if new_pairs:
+        min_rest_minutes = current_app.config.get('SCHEDULE_MIN_REST_MINUTES', 0) if has_app_context() else 0
+        placement = pack_matches([(p1.id, p2.id) for p1, p2 in new_pairs], k,
+                                 rest_slots=rest_slots_for(min_rest_minutes, time_match, time_break))
+        
+        # Новые матчи начинаются со слота после последнего матча расписания
+        kept_starts = [datetime.combine(m.match_date, m.match_time) for m in kept.values()
+                       if m.match_date and m.match_time]
+        if kept_starts:
+            first_start = max(kept_starts) + timedelta(minutes=time_match + time_break)
+            first_date, first_time = first_start.date(), first_start.time()
+        else:
+            first_date, first_time = tournament.start_date or date.today(), start_time
+        slots_count = max(slot for _, slot, _ in placement) + 1
+        slot_times = build_slot_times(first_date, first_time, start_time, end_time, time_match + time_break, slots_count)
+        
+        next_number = max((m.match_number or 0 for m in kept.values()), default=0) + 1
+        for offset, (index, slot, court_num) in enumerate(placement):
+            participant1, participant2 = new_pairs[index]
+            match_date, match_time = slot_times[slot]
+            db.session.add(Match(
+                tournament_id=tournament.id,
+                participant1_id=participant1.id,
+                participant2_id=participant2.id,
+                status='запланирован',
+                match_date=match_date,
+                match_time=match_time,
+                court_number=court_num,
+                match_number=next_number + offset
+            ))
+    
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Ошибка при сверке расписания турнира {tournament.id}: {e}", exc_info=True)
+        raise
+    
+    logger.info(f"Сверка расписания турнира {tournament.id}: сохранено {len(kept)}, "
+                f"добавлено {len(new_pairs)}, удалено {len(removed_matches)} матчей")
+    return len(kept) + len(new_pairs)
+
+
 def create_round_robin_schedule(participants):
     """
     Создает круговое расписание по правильному алгоритму
@@ -487,19 +541,6 @@ def create_round_robin_schedule(participants):
     return rounds
 
 
-def distribute_matches_to_courts(round_matches, num_courts):
-    """
-    Распределяет матчи тура по площадкам
-    """
-    court_assignments = {i: [] for i in range(1, num_courts + 1)}
-    
-    for i, match in enumerate(round_matches):
-        court_num = (i % num_courts) + 1
-        court_assignments[court_num].append(match)
-    
-    return court_assignments
-
-
 def add_minutes_to_time(time_obj, minutes):
     """Добавляет минуты к времени"""
     from datetime import datetime, timedelta, date
@@ -507,6 +548,41 @@ def add_minutes_to_time(time_obj, minutes):
     new_dt = dt + timedelta(minutes=minutes)
     return new_dt.time()
 
+def link_telegram_chat(db, WaitingList, Token, token, chat_id):
+    """
+    Связывает Telegram Chat ID с токеном заявки или токеном привязки администратора
+    
+    Используется API привязки (/api/telegram/link-token) и webhook бота.
+    Изменения не фиксируются - commit выполняет вызывающий код.
+    
+    Returns:
+        tuple: (успех, данные ответа, HTTP-статус)
+    """
+    # Ищем заявку с таким токеном (подача заявки)
+    waiting_entry = WaitingList.query.filter_by(telegram_token=token).first()
+    if waiting_entry:
+        # Проверяем, не привязан ли уже токен к другому Chat ID
+        if waiting_entry.telegram and waiting_entry.telegram != chat_id:
+            logger.warning(f"Токен {token[:8]}... уже привязан к Chat ID {waiting_entry.telegram}")
+            return False, {'success': False, 'error': 'Токен уже привязан к другому аккаунту'}, 400
+        waiting_entry.telegram = chat_id
+        logger.info(f"✅ Chat ID {chat_id} успешно привязан к заявке участника {waiting_entry.name} (токен: {token[:8]}...)")
+        return True, {'success': True, 'message': 'Telegram успешно подключен', 'participant_name': waiting_entry.name, 'tournament_id': waiting_entry.tournament_id}, 200
+
+    # Если это не токен заявки, проверяем токен привязки админа (страница 2)
+    admin_token_row = Token.query.filter_by(telegram_link_token=token).first()
+    if admin_token_row:
+        admin_token_row.telegram_chat_id = str(chat_id)
+        # Сохраняем и как универсальное поле для совместимости с уведомлениями
+        admin_token_row.telegram = str(chat_id)
+        # Одноразовый токен можно обнулить, чтобы не использовать повторно
+        admin_token_row.telegram_link_token = None
+        logger.info(f"✅ Chat ID {chat_id} привязан к администратору (email={admin_token_row.email}) через deep link")
+        return True, {'success': True, 'message': 'Telegram администратора подключён'}, 200
+
+    logger.warning(f"Попытка привязать несуществующий токен: {token[:8]}...")
+    return False, {'success': False, 'error': 'Токен не найден или уже использован'}, 404
+
 def create_api_routes(app, db, User, Tournament, Participant, Match, Notification, MatchLog, Token, WaitingList, Settings, Player, Rally):
     """Создает API маршруты приложения"""
     
@@ -822,16 +898,10 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             # Автоматически создаем расписание после добавления участника
             participants = Participant.query.filter_by(tournament_id=tournament_id).all()
             if len(participants) >= 2:  # Минимум 2 участника для создания расписания
-                # Удаляем существующие матчи перед созданием новых
-                existing_matches = Match.query.filter_by(tournament_id=tournament_id).all()
-                for match in existing_matches:
-                    db.session.delete(match)
+                # Добавляем матчи нового участника; сыгранные и запланированные матчи не трогаем
+                matches_created = create_smart_schedule(tournament, participants, Match, db, reconcile=True)
                 
-                # Создаем новое расписание с сохранением результатов
-                matches_created = create_smart_schedule(tournament, participants, Match, db, preserve_results=True)
-                db.session.commit()
-                
-                logger.info(f"Автоматически пересоздано {matches_created} матчей для турнира {tournament_id} (удалено {len(existing_matches)} старых матчей)")
+                logger.info(f"Автоматически пересчитано расписание турнира {tournament_id}: {matches_created} матчей")
             
             return jsonify({
                 'success': True,
@@ -1537,6 +1607,7 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
                     logger.info(f"Турнир {tournament.id} '{tournament.name}' автоматически завершен после обновления матча {match_id}")
             
             logger.info(f"Матч {match_id} обновлен")
+            publish_match_update(db, match, 'update_match')
             return jsonify({'success': True, 'message': 'Матч успешно обновлен'})
             
         except Exception as e:
@@ -1615,11 +1686,14 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             return jsonify({'success': False, 'error': f'Ошибка при получении списка: {str(e)}'}), 500
 
     @app.route('/api/free-matches/updates', methods=['GET'])
+    @read_only_route
     def free_matches_updates():
         """API для частичного обновления данных свободных матчей (только счёт и статус)"""
         from sqlalchemy import or_
+        from services.change_version import versioned_json_response, FREE_MATCHES_KEY
+        from services.tournament_updates import serialize_free_match_update
         
-        try:
+        def build_payload(version):
             # Получаем все свободные матчи (tournament_id = None или 0)
             free_matches = Match.query.filter(
                 or_(Match.tournament_id.is_(None), Match.tournament_id == 0),
@@ -1627,35 +1701,26 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             ).order_by(Match.created_at.desc()).all()
             
             # Подготавливаем данные матчей для отправки
-            matches_data = []
-            for match in free_matches:
-                # Для свободных матчей используем счет сета 1 (set1_score1:set1_score2)
-                score = match.score
-                if not score and match.set1_score1 is not None and match.set1_score2 is not None:
-                    score = f"{match.set1_score1}:{match.set1_score2}"
-                elif not score and (match.sets_won_1 or match.sets_won_2):
-                    score = f"{match.sets_won_1 or 0}:{match.sets_won_2 or 0}"
-                
-                matches_data.append({
-                    'id': match.id,
-                    'player1_name': match.player1_name or (match.player1.name if match.player1 else 'Неизвестно'),
-                    'player2_name': match.player2_name or (match.player2.name if match.player2 else 'Неизвестно'),
-                    'score': score,
-                    'set1_score1': match.set1_score1,
-                    'set1_score2': match.set1_score2,
-                    'sets_won_1': match.sets_won_1 or 0,
-                    'sets_won_2': match.sets_won_2 or 0,
-                    'status': match.status or 'неизвестно'
-                })
+            matches_data = [serialize_free_match_update(match) for match in free_matches]
             
-            return jsonify({
+            return {
                 'success': True,
                 'matches': matches_data
-            })
+            }
+        
+        try:
+            # Если свободные матчи не менялись с прошлого опроса - отвечаем 304
+            return versioned_json_response(db, FREE_MATCHES_KEY, build_payload)
         except Exception as e:
             logger.error(f'Ошибка при получении обновлений свободных матчей: {str(e)}')
             return jsonify({'success': False, 'error': f'Ошибка при получении обновлений: {str(e)}'}), 500
 
+    @app.route('/api/free-matches/events', methods=['GET'])
+    def free_matches_events():
+        """Поток Server-Sent Events с изменениями свободных матчей"""
+        from services.change_version import FREE_MATCHES_KEY
+        return event_stream_response(db, FREE_MATCHES_KEY)
+
     @app.route('/api/matches/<int:match_id>', methods=['DELETE'])
     def delete_match(match_id):
         """Удаление матча"""
@@ -1741,12 +1806,10 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             return jsonify({'error': 'Недостаточно участников для создания расписания'}), 400
         
         try:
-            # Создаем умное расписание с сохранением результатов
-            matches_created = create_smart_schedule(tournament, participants, Match, db, preserve_results=True)
-            
-            db.session.commit()
+            # Сверяем расписание с составом участников: существующие матчи не пересоздаются
+            matches_created = create_smart_schedule(tournament, participants, Match, db, reconcile=True)
             
-            logger.info(f"Пересоздано расписание для турнира {tournament.name}: {matches_created} матчей")
+            logger.info(f"Пересчитано расписание для турнира {tournament.name}: {matches_created} матчей")
             return jsonify({
                 'message': f'Расписание пересоздано с сохранением результатов: {matches_created} матчей',
                 'matches_count': matches_created
@@ -2731,7 +2794,6 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             # Уведомление администратору турнира в TG, если он ранее указывал Telegram при получении пароля
             try:
                 import hashlib
-                from utils.telegram_utils import send_telegram_message
                 # Ищем токен администратора по соответствию admin_id = hash(email) % 1_000_000
                 admin_telegram = None
                 from models.token import Token
@@ -2751,7 +2813,7 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
                         f"Игрок: {participant_name if participant_name else 'Игрок (Telegram)'}\n"
                         f"Уровень: {skill_level}"
                     )
-                    send_telegram_message(msg, telegram_contact=admin_telegram)
+                    enqueue_telegram_message(msg, telegram_contact=admin_telegram)
             except Exception as notify_e:
                 logger.warning(f"Не удалось отправить уведомление админу турнира в TG: {notify_e}")
             
@@ -2793,38 +2855,49 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             if not token or not chat_id:
                 return jsonify({'success': False, 'error': 'Необходимо указать токен и Chat ID'}), 400
             
-            # Ищем заявку с таким токеном (подача заявки)
-            waiting_entry = WaitingList.query.filter_by(telegram_token=token).first()
-            if waiting_entry:
-                # Проверяем, не привязан ли уже токен к другому Chat ID
-                if waiting_entry.telegram and waiting_entry.telegram != chat_id:
-                    logger.warning(f"Токен {token[:8]}... уже привязан к Chat ID {waiting_entry.telegram}")
-                    return jsonify({'success': False, 'error': 'Токен уже привязан к другому аккаунту'}), 400
-                waiting_entry.telegram = chat_id
-                db.session.commit()
-                logger.info(f"✅ Chat ID {chat_id} успешно привязан к заявке участника {waiting_entry.name} (токен: {token[:8]}...)")
-                return jsonify({'success': True, 'message': 'Telegram успешно подключен', 'participant_name': waiting_entry.name, 'tournament_id': waiting_entry.tournament_id})
-
-            # Если это не токен заявки, проверяем токен привязки админа (страница 2)
-            admin_token_row = Token.query.filter_by(telegram_link_token=token).first()
-            if admin_token_row:
-                admin_token_row.telegram_chat_id = str(chat_id)
-                # Сохраняем и как универсальное поле для совместимости с уведомлениями
-                admin_token_row.telegram = str(chat_id)
-                # Одноразовый токен можно обнулить, чтобы не использовать повторно
-                admin_token_row.telegram_link_token = None
+            success, result, status_code = link_telegram_chat(db, WaitingList, Token, token, chat_id)
+            if success:
                 db.session.commit()
-                logger.info(f"✅ Chat ID {chat_id} привязан к администратору (email={admin_token_row.email}) через deep link")
-                return jsonify({'success': True, 'message': 'Telegram администратора подключён'})
-
-            logger.warning(f"Попытка привязать несуществующий токен: {token[:8]}...")
-            return jsonify({'success': False, 'error': 'Токен не найден или уже использован'}), 404
+            return jsonify(result), status_code
             
         except Exception as e:
             db.session.rollback()
             logger.error(f"Ошибка при связывании Telegram токена: {e}")
             return jsonify({'success': False, 'error': 'Ошибка при подключении Telegram'}), 500
 
+    @app.route('/api/telegram/webhook', methods=['POST'])
+    @csrf.exempt  # Обновления приходят от Telegram, проверяется секрет webhook
+    def telegram_webhook():
+        """Прием обновлений бота от Telegram (альтернатива long polling в telegram_bot_handler.py)"""
+        if not app.config.get('TELEGRAM_WEBHOOK_ENABLED'):
+            return jsonify({'ok': False, 'error': 'Webhook отключен'}), 404
+        
+        import hmac
+        secret = app.config.get('TELEGRAM_WEBHOOK_SECRET')
+        if not secret:
+            # Без секрета любой мог бы прислать поддельное обновление и разослать ответы ботом
+            logger.error("Webhook Telegram включен без TELEGRAM_WEBHOOK_SECRET - обновления не принимаются")
+            return jsonify({'ok': False}), 403
+        received_secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(received_secret, secret):
+            logger.warning("Webhook Telegram: неверный секрет")
+            return jsonify({'ok': False}), 403
+        
+        update = request.get_json(silent=True)
+        if not update or 'update_id' not in update:
+            return jsonify({'ok': False, 'error': 'Некорректное обновление'}), 400
+        
+        try:
+            from services.telegram_webhook import process_webhook_update
+            status = process_webhook_update(
+                update, lambda token, chat_id: link_telegram_chat(db, WaitingList, Token, token, chat_id)[0])
+            return jsonify({'ok': True, 'status': status})
+        except Exception as e:
+            db.session.rollback()
+            # Не 2xx - Telegram повторит доставку обновления
+            logger.error(f"Ошибка обработки обновления Telegram {update.get('update_id')}: {e}")
+            return jsonify({'ok': False}), 500
+
     @app.route('/api/admin/telegram/generate-link', methods=['POST'])
     def generate_admin_telegram_link():
         """Сгенерировать deep link токен для админа, чтобы привязать chat_id без ручного ввода.
@@ -2938,10 +3011,11 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             if waiting_entry.telegram and message:
                 try:
                     telegram_message = f"📋 <b>Уведомление от администратора турнира</b>\n\n{message}"
-                    send_ok = send_telegram_message(telegram_message, telegram_contact=waiting_entry.telegram)
+                    # Сообщение уходит в очередь вместе с изменением статуса заявки
+                    send_ok = enqueue_telegram_message(telegram_message, telegram_contact=waiting_entry.telegram, commit=False)
                     if send_ok:
                         message_sent = True
-                        logger.info(f"Сообщение об отклонении отправлено участнику {waiting_entry.name} (telegram: {waiting_entry.telegram})")
+                        logger.info(f"Сообщение об отклонении поставлено в очередь для участника {waiting_entry.name} (telegram: {waiting_entry.telegram})")
                     else:
                         logger.warning(f"Не удалось отправить сообщение об отклонении участнику {waiting_entry.name} (telegram: {waiting_entry.telegram})")
                 except Exception as e:
@@ -3052,10 +3126,10 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
 """
                         
                         logger.info(f"Попытка отправки уведомления участнику {waiting_entry.name} (Telegram: {waiting_entry.telegram})")
-                        success = send_telegram_message(notification_message, telegram_contact=waiting_entry.telegram)
+                        success = enqueue_telegram_message(notification_message, telegram_contact=waiting_entry.telegram, commit=False)
                         
                         if success:
-                            logger.info(f"✅ Уведомление успешно отправлено участнику {waiting_entry.name}")
+                            logger.info(f"✅ Уведомление поставлено в очередь для участника {waiting_entry.name}")
                         else:
                             logger.warning(f"⚠️ Не удалось отправить уведомление участнику {waiting_entry.name}. Проверьте настройки Telegram")
                     except Exception as e:
@@ -3067,15 +3141,13 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             
             # Автоматически пересоставляем расписание для новых участников
             if accepted_count > 0:
-                # Используем create_smart_schedule для полного пересчета расписания
-                # с сохранением результатов существующих матчей
+                # Добавляем матчи новых участников; сыгранные и запланированные матчи не трогаем
                 try:
                     # Получаем всех участников турнира
                     all_participants = Participant.query.filter_by(tournament_id=tournament_id).all()
                     logger.info(f"Пересоставление расписания: добавлено {accepted_count} участников, всего участников: {len(all_participants)}")
                     
-                    # Вызываем create_smart_schedule с правильными параметрами
-                    matches_created = create_smart_schedule(tournament, all_participants, Match, db, preserve_results=True)
+                    matches_created = create_smart_schedule(tournament, all_participants, Match, db, reconcile=True)
                     db.session.commit()
                     
                     logger.info(f"Расписание автоматически пересоставлено: создано/обновлено {matches_created} матчей для {accepted_count} новых участников из листа ожидания")
@@ -3173,7 +3245,7 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             
             # Создаем новое расписание с сохранением результатов
             try:
-                matches_created = create_smart_schedule(tournament, participants, Match, db, preserve_results=True)
+                matches_created = create_smart_schedule(tournament, participants, Match, db, preserve_results=True, bulk=True)
                 logger.info(f"create_smart_schedule вернула: {matches_created} матчей")
                 
                 if matches_created > 0:
@@ -3224,16 +3296,16 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
         if admin_id != tournament.admin_id and admin_email != 'admin@system':
             return jsonify({'success': False, 'error': 'Недостаточно прав для добавления участника'}), 403
         
-            data = request.get_json()
+        data = request.get_json()
         
         if not data or not data.get('name'):
             return jsonify({'success': False, 'error': 'Необходимо имя участника'}), 400
         
-            name = data.get('name', '').strip()
-            
-            if not name:
-                return jsonify({'success': False, 'error': 'Имя участника обязательно'}), 400
-            
+        name = data.get('name', '').strip()
+        
+        if not name:
+            return jsonify({'success': False, 'error': 'Имя участника обязательно'}), 400
+        
         try:
             # Проверяем, не существует ли уже активный участник с таким именем
             existing_participant = Participant.query.filter_by(
@@ -3307,25 +3379,6 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             end_time = tournament.end_time or time(18, 0)
             start_date = tournament.start_date or date.today()
             
-            # Находим последний матч по времени
-            last_match = Match.query.filter_by(
-                tournament_id=tournament.id,
-                is_removed=False
-            ).order_by(Match.match_date.desc(), Match.match_time.desc()).first()
-            
-            if last_match:
-                current_date = last_match.match_date
-                # Добавляем минуты к времени последнего матча
-                dt = dt_module.combine(date.today(), last_match.match_time)
-                new_dt = dt + timedelta(minutes=time_match + time_break)
-                current_time = new_dt.time()
-                if current_time > end_time:
-                    current_date += timedelta(days=1)
-                    current_time = start_time
-            else:
-                current_date = start_date
-                current_time = start_time
-            
             # Создаем матчи только для нового участника со всеми остальными
             matches_to_create = []
             other_participants = [p for p in all_participants if p.id != participant.id]
@@ -3354,608 +3407,54 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
                 tournament_id=tournament.id
             ).scalar() or 0
             
-            # Получаем все существующие матчи, отсортированные по времени (только запланированные)
-            existing_scheduled_matches = [
-                m for m in existing_matches 
-                if m.status in ['запланирован', 'в_процессе', 'играют']
-            ]
-            existing_scheduled_matches.sort(key=lambda m: (m.match_date, m.match_time, m.court_number))
-            
-            logger.info(f"[add_late_participant] Найдено {len(existing_scheduled_matches)} запланированных матчей для равномерного распределения")
-            
-            # Создаем матчи используя стандартный круговой алгоритм
-            matches_created = 0
-            new_matches_list = []  # Список новых матчей для вставки
+            # Раскладываем новые матчи по свободным местам расписания: существующие матчи
+            # не двигаются, занятость площадок и участников проверяется в памяти
+            from services.slot_assignment import SlotAssigner, truncate_to_grid
+            
+            scheduled_starts = [dt_module.combine(m.match_date, m.match_time) for m in existing_matches
+                                if m.match_date and m.match_time]
+            pending_starts = [dt_module.combine(m.match_date, m.match_time) for m in existing_matches
+                              if m.match_date and m.match_time and m.status == 'запланирован']
+            if pending_starts:
+                # Свободные места среди еще не сыгранных матчей, но не в прошедших слотах
+                earliest = truncate_to_grid(max(min(pending_starts), dt_module.now()), start_time,
+                                            timedelta(minutes=time_match + time_break))
+            elif scheduled_starts:
+                earliest = max(scheduled_starts) + timedelta(minutes=time_match + time_break)
+            else:
+                earliest = dt_module.combine(start_date, start_time)
             
-            # Если есть существующие матчи, распределяем новые используя круговой алгоритм
-            if len(existing_scheduled_matches) > 0 and len(matches_to_create) > 0:
-                # Шаг 1: Используем круговой алгоритм для распределения новых матчей по "турам"
-                # Создаем список участников для кругового алгоритма (новый участник + все остальные)
-                participants_for_schedule = [participant] + other_participants
-                
-                # Создаем круговое расписание для всех участников
-                from routes.api import create_round_robin_schedule
-                all_rounds = create_round_robin_schedule(participants_for_schedule)
-                
-                # Извлекаем только матчи с новым участником
-                new_participant_rounds = []
-                for round_matches in all_rounds:
-                    round_with_new = [m for m in round_matches if m[0].id == participant.id or m[1].id == participant.id]
-                    if round_with_new:
-                        new_participant_rounds.append(round_with_new)
-                
-                logger.info(f"[add_late_participant] Круговой алгоритм создал {len(new_participant_rounds)} туров для нового участника")
-                
-                # Шаг 2: Распределяем матчи из туров равномерно по времени существующего расписания
-                # Вычисляем временные интервалы между существующими матчами
-                time_intervals = []
-                
-                # Интервал до первого матча
-                if existing_scheduled_matches:
-                    first_match = existing_scheduled_matches[0]
-                    first_match_start = dt_module.combine(first_match.match_date, first_match.match_time)
-                    first_day_start = dt_module.combine(first_match.match_date, start_time)
-                    if first_match_start > first_day_start:
-                        time_intervals.append({
-                            'start': first_day_start,
-                            'end': first_match_start,
-                            'duration': (first_match_start - first_day_start).total_seconds() / 60
-                        })
-                
-                # Интервалы между матчами
-                for i in range(len(existing_scheduled_matches) - 1):
-                    prev_match = existing_scheduled_matches[i]
-                    next_match = existing_scheduled_matches[i + 1]
-                    
-                    prev_end = dt_module.combine(prev_match.match_date, prev_match.match_time) + timedelta(minutes=time_match)
-                    next_start = dt_module.combine(next_match.match_date, next_match.match_time)
-                    
-                    time_diff = (next_start - prev_end).total_seconds() / 60
-                    if time_diff >= time_match + time_break:
-                        time_intervals.append({
-                            'start': prev_end,
-                            'end': next_start,
-                            'duration': time_diff
-                        })
-                
-                # Интервал после последнего матча
-                if existing_scheduled_matches:
-                    last_match = existing_scheduled_matches[-1]
-                    last_match_end = dt_module.combine(last_match.match_date, last_match.match_time) + timedelta(minutes=time_match)
-                    last_day_end = dt_module.combine(last_match.match_date, end_time)
-                    if last_day_end > last_match_end:
-                        time_intervals.append({
-                            'start': last_match_end,
-                            'end': last_day_end,
-                            'duration': (last_day_end - last_match_end).total_seconds() / 60
-                        })
-                
-                # Если интервалов недостаточно, создаем дополнительные после последнего матча
-                while len(time_intervals) < len(new_participant_rounds):
-                    if time_intervals:
-                        last_interval = time_intervals[-1]
-                        next_start = last_interval['end'] + timedelta(minutes=time_match + time_break)
-                        if next_start.time() > end_time:
-                            next_start = dt_module.combine(next_start.date() + timedelta(days=1), start_time)
-                        next_end = next_start + timedelta(minutes=time_match)
-                        time_intervals.append({
-                            'start': next_start,
-                            'end': next_end,
-                            'duration': time_match
-                        })
-                    else:
-                        # Если нет интервалов, создаем первый
-                        if existing_scheduled_matches:
-                            last_match = existing_scheduled_matches[-1]
-                            interval_start = dt_module.combine(last_match.match_date, last_match.match_time) + timedelta(minutes=time_match)
-                        else:
-                            interval_start = dt_module.combine(start_date, start_time)
-                        time_intervals.append({
-                            'start': interval_start,
-                            'end': interval_start + timedelta(minutes=time_match),
-                            'duration': time_match
-                        })
-                
-                logger.info(f"[add_late_participant] Создано {len(time_intervals)} временных интервалов для распределения {len(new_participant_rounds)} туров")
-                
-                # Шаг 3: Распределяем туры по интервалам равномерно
-                # Используем распределение по площадкам из кругового алгоритма
-                from routes.api import distribute_matches_to_courts
-                
-                match_index = 0
-                for round_idx, round_matches in enumerate(new_participant_rounds):
-                    if round_idx >= len(time_intervals):
-                        break
-                    
-                    interval = time_intervals[round_idx]
-                    
-                    # Распределяем матчи тура по площадкам
-                    court_assignments = distribute_matches_to_courts(round_matches, k)
-                    
-                    # Вычисляем время для матчей в этом интервале
-                    interval_start = interval['start']
-                    interval_duration = interval['duration']
-                    num_matches_in_round = len(round_matches)
-                    
-                    if num_matches_in_round > 1:
-                        # Распределяем матчи равномерно внутри интервала
-                        time_step = interval_duration / (num_matches_in_round + 1)
-                    else:
-                        time_step = interval_duration / 2
-                    
-                    court_match_index = 0
-                    for court_num, court_matches in court_assignments.items():
-                        for match_pair in court_matches:
-                            if match_index >= len(matches_to_create):
-                                break
-                            
-                            # Находим соответствующий match_data
-                            p1, p2 = match_pair
-                            match_data = None
-                            for md in matches_to_create:
-                                if ((md['participant1_id'] == p1.id and md['participant2_id'] == p2.id) or
-                                    (md['participant1_id'] == p2.id and md['participant2_id'] == p1.id)):
-                                    match_data = md
-                                    break
-                            
-                            if not match_data:
-                                continue
-                            
-                            # Вычисляем время для матча
-                            position_in_interval = (court_match_index + 1) * time_step
-                            new_match_datetime = interval_start + timedelta(minutes=position_in_interval)
-                            
-                            # Корректируем время, если выходит за границы интервала
-                            if new_match_datetime < interval['start']:
-                                new_match_datetime = interval['start'] + timedelta(minutes=time_break)
-                            elif new_match_datetime > interval['end']:
-                                new_match_datetime = interval['end'] - timedelta(minutes=time_match + time_break)
-                                if new_match_datetime < interval['start']:
-                                    new_match_datetime = interval['start'] + timedelta(minutes=time_break)
-                            
-                            # Корректируем время, если выходит за границы рабочего дня
-                            if new_match_datetime.time() < start_time:
-                                new_match_datetime = dt_module.combine(new_match_datetime.date(), start_time)
-                            elif new_match_datetime.time() > end_time:
-                                new_match_datetime = dt_module.combine(new_match_datetime.date() + timedelta(days=1), start_time)
-                            
-                            new_match_date = new_match_datetime.date()
-                            new_match_time = new_match_datetime.time()
-                            
-                            # Проверяем конфликты и корректируем время/площадку
-                            attempts = 0
-                            max_attempts = 100
-                            while attempts < max_attempts:
-                                conflicting_match = Match.query.filter_by(
-                                    tournament_id=tournament.id,
-                                    match_date=new_match_date,
-                                    match_time=new_match_time,
-                                    court_number=court_num,
-                                    is_removed=False
-                                ).first()
-                                
-                                if not conflicting_match:
-                                    break
-                                
-                                # Сдвигаем время на один слот
-                                new_match_datetime = dt_module.combine(new_match_date, new_match_time) + timedelta(minutes=time_match + time_break)
-                                new_match_date = new_match_datetime.date()
-                                new_match_time = new_match_datetime.time()
-                                
-                                # Если выходит за границы дня, переходим на следующую площадку
-                                if new_match_time > end_time:
-                                    new_court = (court_num % k) + 1
-                                    new_match_datetime = dt_module.combine(new_match_date, start_time)
-                                    new_match_date = new_match_datetime.date()
-                                    new_match_time = new_match_datetime.time()
-                                    court_num = new_court
-                                
-                                attempts += 1
-                            
-                            # Создаем матч
-                            match_obj = Match(
-                                tournament_id=tournament.id,
-                                participant1_id=match_data['participant1_id'],
-                                participant2_id=match_data['participant2_id'],
-                                status='запланирован',
-                                match_date=new_match_date,
-                                match_time=new_match_time,
-                                court_number=court_num,
-                                match_number=max_match_number + matches_created + 1,
-                                is_removed=False
-                            )
-                            db.session.add(match_obj)
-                            new_matches_list.append(match_obj)
-                            matches_created += 1
-                            match_index += 1
-                            court_match_index += 1
-                            
-                            logger.info(f"[add_late_participant] Создан матч (тур {round_idx + 1}): {participant.name} vs {match_data['participant_name']} (площадка {court_num}, {new_match_date} {new_match_time}, номер {match_obj.match_number})")
-            
-            # Если нет существующих матчей, создаем матчи последовательно
-            elif len(matches_to_create) > 0:
-                # Шаг 1: Вычисляем загрузку каждого участника (количество запланированных матчей)
-                participant_load = {}
-                for match in existing_scheduled_matches:
-                    participant_load[match.participant1_id] = participant_load.get(match.participant1_id, 0) + 1
-                    participant_load[match.participant2_id] = participant_load.get(match.participant2_id, 0) + 1
-                
-                # Добавляем нового участника с нулевой загрузкой, если его еще нет
-                participant_load[participant.id] = participant_load.get(participant.id, 0)
-                
-                logger.info(f"[add_late_participant] Текущая загрузка участников: {participant_load}")
-                
-                # Шаг 2: Создаем временные слоты для вставки новых матчей
-                time_slots = []
-                
-                # Слот до первого матча
-                first_match = existing_scheduled_matches[0]
-                first_match_start = dt_module.combine(first_match.match_date, first_match.match_time)
-                first_day_start = dt_module.combine(first_match.match_date, start_time)
-                if first_match_start > first_day_start:
-                    time_slots.append({
-                        'start': first_day_start,
-                        'end': first_match_start,
-                        'datetime': first_day_start + timedelta(minutes=(first_match_start - first_day_start).total_seconds() / 2 / 60)
-                    })
-                
-                # Слоты между матчами
-                for i in range(len(existing_scheduled_matches) - 1):
-                    prev_match = existing_scheduled_matches[i]
-                    next_match = existing_scheduled_matches[i + 1]
-                    
-                    prev_end = dt_module.combine(prev_match.match_date, prev_match.match_time) + timedelta(minutes=time_match)
-                    next_start = dt_module.combine(next_match.match_date, next_match.match_time)
-                    
-                    time_diff = (next_start - prev_end).total_seconds() / 60
-                    if time_diff >= time_match + time_break:
-                        # Есть место для вставки матча
-                        slot_datetime = prev_end + timedelta(minutes=time_diff / 2)
-                        time_slots.append({
-                            'start': prev_end,
-                            'end': next_start,
-                            'datetime': slot_datetime
-                        })
-                
-                # Слот после последнего матча
-                last_match = existing_scheduled_matches[-1]
-                last_match_end = dt_module.combine(last_match.match_date, last_match.match_time) + timedelta(minutes=time_match)
-                last_day_end = dt_module.combine(last_match.match_date, end_time)
-                if last_day_end > last_match_end:
-                    slot_datetime = last_match_end + timedelta(minutes=(last_day_end - last_match_end).total_seconds() / 2 / 60)
-                    time_slots.append({
-                        'start': last_match_end,
-                        'end': last_day_end,
-                        'datetime': slot_datetime
-                    })
-                
-                # Если слотов недостаточно, добавляем слоты после последнего матча
-                while len(time_slots) < len(matches_to_create):
-                    last_slot = time_slots[-1] if time_slots else {
-                        'start': dt_module.combine(last_match.match_date, last_match.match_time) + timedelta(minutes=time_match),
-                        'end': dt_module.combine(last_match.match_date, end_time),
-                        'datetime': dt_module.combine(last_match.match_date, end_time)
-                    }
-                    next_slot_start = last_slot['end'] + timedelta(minutes=time_match + time_break)
-                    if next_slot_start.time() > end_time:
-                        next_slot_start = dt_module.combine(next_slot_start.date() + timedelta(days=1), start_time)
-                    next_slot_end = next_slot_start + timedelta(minutes=time_match)
-                    time_slots.append({
-                        'start': next_slot_start,
-                        'end': next_slot_end,
-                        'datetime': next_slot_start
-                    })
-                
-                logger.info(f"[add_late_participant] Создано {len(time_slots)} временных слотов для распределения {len(matches_to_create)} новых матчей")
-                
-                # Шаг 3: Распределяем новые матчи по слотам с учетом загрузки участников
-                for match_data in matches_to_create:
-                    best_slot = None
-                    min_max_load = float('inf')
-                    best_slot_idx = -1
-                    
-                    # Ищем слот, который минимизирует максимальную загрузку
-                    for slot_idx, slot in enumerate(time_slots):
-                        # Вычисляем загрузку после вставки этого матча
-                        temp_load = participant_load.copy()
-                        temp_load[match_data['participant1_id']] = temp_load.get(match_data['participant1_id'], 0) + 1
-                        temp_load[match_data['participant2_id']] = temp_load.get(match_data['participant2_id'], 0) + 1
-                        
-                        # Находим максимальную загрузку среди всех участников
-                        max_load = max(temp_load.values()) if temp_load else 0
-                        
-                        # Также учитываем стандартное отклонение для более равномерного распределения
-                        if temp_load:
-                            avg_load = sum(temp_load.values()) / len(temp_load)
-                            variance = sum((load - avg_load) ** 2 for load in temp_load.values()) / len(temp_load)
-                            std_dev = variance ** 0.5
-                            # Комбинируем максимальную загрузку и стандартное отклонение
-                            score = max_load * 1000 + std_dev  # Приоритет максимальной загрузке
-                        else:
-                            score = max_load * 1000
-                        
-                        if score < min_max_load:
-                            min_max_load = score
-                            best_slot = slot
-                            best_slot_idx = slot_idx
-                    
-                    if best_slot is None:
-                        # Если не нашли подходящий слот, используем последний
-                        if time_slots:
-                            best_slot = time_slots[-1]
-                            best_slot_idx = len(time_slots) - 1
-                        else:
-                            # Создаем новый слот
-                            if existing_scheduled_matches:
-                                last_match = existing_scheduled_matches[-1]
-                                last_match_end = dt_module.combine(last_match.match_date, last_match.match_time) + timedelta(minutes=time_match)
-                            else:
-                                last_match_end = dt_module.combine(start_date, start_time)
-                            best_slot = {
-                                'start': last_match_end,
-                                'end': last_match_end + timedelta(minutes=time_match),
-                                'datetime': last_match_end
-                            }
-                            time_slots.append(best_slot)
-                            best_slot_idx = len(time_slots) - 1
-                    
-                    # Определяем время и дату для матча
-                    new_match_datetime = best_slot['datetime']
-                    
-                    # Корректируем время, если выходит за границы рабочего дня
-                    if new_match_datetime.time() < start_time:
-                        new_match_datetime = dt_module.combine(new_match_datetime.date(), start_time)
-                    elif new_match_datetime.time() > end_time:
-                        new_match_datetime = dt_module.combine(new_match_datetime.date() + timedelta(days=1), start_time)
-                    
-                    new_match_date = new_match_datetime.date()
-                    new_match_time = new_match_datetime.time()
-                    
-                    # Назначаем площадку (циклически)
-                    court_number = (matches_created % k) + 1
-                    
-                    # Проверяем конфликты и корректируем время/площадку
-                    attempts = 0
-                    max_attempts = 100
-                    original_datetime = new_match_datetime
-                    while attempts < max_attempts:
-                        conflicting_match = Match.query.filter_by(
-                            tournament_id=tournament.id,
-                            match_date=new_match_date,
-                            match_time=new_match_time,
-                            court_number=court_number,
-                            is_removed=False
-                        ).first()
-                        
-                        if not conflicting_match:
-                            break
-                        
-                        # Сдвигаем время на один слот
-                        new_match_datetime = dt_module.combine(new_match_date, new_match_time) + timedelta(minutes=time_match + time_break)
-                        new_match_date = new_match_datetime.date()
-                        new_match_time = new_match_datetime.time()
-                        
-                        # Если выходит за границы дня, переходим на следующую площадку
-                        if new_match_time > end_time:
-                            court_number = (court_number % k) + 1
-                            new_match_datetime = dt_module.combine(new_match_date, start_time)
-                            new_match_date = new_match_datetime.date()
-                            new_match_time = new_match_datetime.time()
-                        
-                        attempts += 1
-                    
-                    # Создаем матч
-                    match_obj = Match(
-                        tournament_id=tournament.id,
-                        participant1_id=match_data['participant1_id'],
-                        participant2_id=match_data['participant2_id'],
-                        status='запланирован',
-                        match_date=new_match_date,
-                        match_time=new_match_time,
-                        court_number=court_number,
-                        match_number=max_match_number + matches_created + 1,
-                        is_removed=False
-                    )
-                    db.session.add(match_obj)
-                    new_matches_list.append(match_obj)
-                    matches_created += 1
-                    
-                    # Обновляем загрузку участников
-                    participant_load[match_data['participant1_id']] = participant_load.get(match_data['participant1_id'], 0) + 1
-                    participant_load[match_data['participant2_id']] = participant_load.get(match_data['participant2_id'], 0) + 1
-                    
-                    # Удаляем использованный слот из списка (чтобы не использовать его повторно)
-                    if best_slot_idx >= 0 and best_slot_idx < len(time_slots):
-                        time_slots.pop(best_slot_idx)
-                    
-                    logger.info(f"[add_late_participant] Создан матч: {participant.name} vs {match_data['participant_name']} (площадка {court_number}, {new_match_date} {new_match_time}, номер {match_obj.match_number}, загрузка: {participant_load})")
-                
-                logger.info(f"[add_late_participant] Финальная загрузка участников: {participant_load}")
+            assigner = SlotAssigner(k, time_match, time_break, start_time, end_time, earliest,
+                                    min_rest_minutes=app.config.get('SCHEDULE_MIN_REST_MINUTES', 0))
+            for match in existing_matches:
+                if match.match_date and match.match_time:
+                    assigner.occupy(match.participant1_id, match.participant2_id, match.court_number,
+                                    dt_module.combine(match.match_date, match.match_time))
             
-            # Если нет существующих матчей, создаем матчи последовательно
-            elif len(matches_to_create) > 0:
-                # Вычисляем временные интервалы между существующими матчами
-                intervals = []
-                
-                # Интервал до первого матча
-                first_match = existing_scheduled_matches[0]
-                first_match_start = dt_module.combine(first_match.match_date, first_match.match_time)
-                first_day_start = dt_module.combine(first_match.match_date, start_time)
-                intervals.append({
-                    'start': first_day_start,
-                    'end': first_match_start,
-                    'duration_minutes': (first_match_start - first_day_start).total_seconds() / 60
-                })
-                
-                # Интервалы между матчами
-                for i in range(len(existing_scheduled_matches) - 1):
-                    prev_match = existing_scheduled_matches[i]
-                    next_match = existing_scheduled_matches[i + 1]
-                    
-                    prev_end = dt_module.combine(prev_match.match_date, prev_match.match_time) + timedelta(minutes=time_match)
-                    next_start = dt_module.combine(next_match.match_date, next_match.match_time)
-                    
-                    intervals.append({
-                        'start': prev_end,
-                        'end': next_start,
-                        'duration_minutes': (next_start - prev_end).total_seconds() / 60
-                    })
-                
-                # Интервал после последнего матча
-                last_match = existing_scheduled_matches[-1]
-                last_match_end = dt_module.combine(last_match.match_date, last_match.match_time) + timedelta(minutes=time_match)
-                last_day_end = dt_module.combine(last_match.match_date, end_time)
-                intervals.append({
-                    'start': last_match_end,
-                    'end': last_day_end,
-                    'duration_minutes': (last_day_end - last_match_end).total_seconds() / 60
-                })
-                
-                # Распределяем новые матчи пропорционально длине интервалов
-                total_duration = sum(interval['duration_minutes'] for interval in intervals)
-                matches_per_interval = []
-                
-                for interval in intervals:
-                    if total_duration > 0:
-                        # Количество матчей пропорционально длине интервала
-                        num_matches = int((interval['duration_minutes'] / total_duration) * len(matches_to_create))
-                        matches_per_interval.append(num_matches)
-                    else:
-                        matches_per_interval.append(0)
-                
-                # Распределяем оставшиеся матчи равномерно
-                total_assigned = sum(matches_per_interval)
-                remaining_matches = len(matches_to_create) - total_assigned
-                if remaining_matches > 0:
-                    # Добавляем по одному матчу в интервалы с наибольшей длительностью
-                    sorted_intervals = sorted(enumerate(intervals), key=lambda x: x[1]['duration_minutes'], reverse=True)
-                    for i in range(min(remaining_matches, len(sorted_intervals))):
-                        idx = sorted_intervals[i][0]
-                        matches_per_interval[idx] += 1
-                
-                # Создаем матчи в каждом интервале
-                match_index = 0
-                for interval_idx, (interval, num_matches_in_interval) in enumerate(zip(intervals, matches_per_interval)):
-                    if num_matches_in_interval == 0:
-                        continue
-                    
-                    # Распределяем матчи равномерно внутри интервала
-                    interval_duration = interval['duration_minutes']
-                    if num_matches_in_interval > 1:
-                        step = interval_duration / (num_matches_in_interval + 1)
-                    else:
-                        step = interval_duration / 2
-                    
-                    for j in range(num_matches_in_interval):
-                        if match_index >= len(matches_to_create):
-                            break
-                        
-                        match_data = matches_to_create[match_index]
-                        
-                        # Вычисляем время для матча внутри интервала
-                        position_in_interval = (j + 1) * step
-                        new_match_datetime = interval['start'] + timedelta(minutes=position_in_interval)
-                        
-                        # Корректируем время, если выходит за границы интервала
-                        if new_match_datetime < interval['start']:
-                            new_match_datetime = interval['start'] + timedelta(minutes=time_break)
-                        elif new_match_datetime > interval['end']:
-                            new_match_datetime = interval['end'] - timedelta(minutes=time_match + time_break)
-                            if new_match_datetime < interval['start']:
-                                new_match_datetime = interval['start'] + timedelta(minutes=time_break)
-                        
-                        # Корректируем время, если выходит за границы рабочего дня
-                        if new_match_datetime.time() < start_time:
-                            new_match_datetime = dt_module.combine(new_match_datetime.date(), start_time)
-                        elif new_match_datetime.time() > end_time:
-                            new_match_datetime = dt_module.combine(new_match_datetime.date() + timedelta(days=1), start_time)
-                        
-                        new_match_date = new_match_datetime.date()
-                        new_match_time = new_match_datetime.time()
-                        
-                        # Назначаем площадку (циклически)
-                        court_number = (matches_created % k) + 1
-                        
-                        # Проверяем конфликты и корректируем время/площадку
-                        attempts = 0
-                        max_attempts = 100
-                        while attempts < max_attempts:
-                            conflicting_match = Match.query.filter_by(
-                                tournament_id=tournament.id,
-                                match_date=new_match_date,
-                                match_time=new_match_time,
-                                court_number=court_number,
-                                is_removed=False
-                            ).first()
-                            
-                            if not conflicting_match:
-                                break
-                            
-                            # Сдвигаем время на один слот
-                            new_match_datetime = dt_module.combine(new_match_date, new_match_time) + timedelta(minutes=time_match + time_break)
-                            new_match_date = new_match_datetime.date()
-                            new_match_time = new_match_datetime.time()
-                            
-                            # Если выходит за границы дня, переходим на следующую площадку
-                            if new_match_time > end_time:
-                                court_number = (court_number % k) + 1
-                                new_match_datetime = dt_module.combine(new_match_date, start_time)
-                                new_match_date = new_match_datetime.date()
-                                new_match_time = new_match_datetime.time()
-                            
-                            attempts += 1
-                        
-                        # Создаем матч
-                        match_obj = Match(
-                            tournament_id=tournament.id,
-                            participant1_id=match_data['participant1_id'],
-                            participant2_id=match_data['participant2_id'],
-                            status='запланирован',
-                            match_date=new_match_date,
-                            match_time=new_match_time,
-                            court_number=court_number,
-                            match_number=max_match_number + matches_created + 1,
-                            is_removed=False
-                        )
-                        db.session.add(match_obj)
-                        new_matches_list.append(match_obj)
-                        matches_created += 1
-                        match_index += 1
-                        
-                        logger.info(f"[add_late_participant] Создан матч: {participant.name} vs {match_data['participant_name']} (площадка {court_number}, {new_match_date} {new_match_time}, номер {match_obj.match_number})")
+            # Первыми ставим матчи с самыми загруженными соперниками - для них меньше свободных мест
+            matches_to_create.sort(key=lambda md: -assigner.participant_load.get(md['participant2_id'], 0))
             
-            # Если нет существующих матчей, создаем матчи последовательно
-            elif len(matches_to_create) > 0:
-                working_date = start_date
-                working_time = start_time
+            matches_created = 0
+            new_matches_list = []
+            for match_data in matches_to_create:
+                new_match_datetime, court_number = assigner.assign(match_data['participant1_id'],
+                                                                   match_data['participant2_id'])
+                match_obj = Match(
+                    tournament_id=tournament.id,
+                    participant1_id=match_data['participant1_id'],
+                    participant2_id=match_data['participant2_id'],
+                    status='запланирован',
+                    match_date=new_match_datetime.date(),
+                    match_time=new_match_datetime.time(),
+                    court_number=court_number,
+                    match_number=max_match_number + matches_created + 1,
+                    is_removed=False
+                )
+                db.session.add(match_obj)
+                new_matches_list.append(match_obj)
+                matches_created += 1
                 
-                for i, match_data in enumerate(matches_to_create):
-                    court_number = (i % k) + 1
-                    
-                    match_obj = Match(
-                        tournament_id=tournament.id,
-                        participant1_id=match_data['participant1_id'],
-                        participant2_id=match_data['participant2_id'],
-                        status='запланирован',
-                        match_date=working_date,
-                        match_time=working_time,
-                        court_number=court_number,
-                        match_number=max_match_number + matches_created + 1,
-                        is_removed=False
-                    )
-                    db.session.add(match_obj)
-                    new_matches_list.append(match_obj)
-                    matches_created += 1
-                    
-                    logger.info(f"[add_late_participant] Создан матч: {participant.name} vs {match_data['participant_name']} (площадка {court_number}, {working_date} {working_time}, номер {match_obj.match_number})")
-                    
-                    # Добавляем минуты к времени для следующего матча
-                    dt = dt_module.combine(date.today(), working_time)
-                    new_dt = dt + timedelta(minutes=time_match + time_break)
-                    working_time = new_dt.time()
-                    if working_time > end_time:
-                        working_date += timedelta(days=1)
-                        working_time = start_time
+                logger.info(f"[add_late_participant] Создан матч: {participant.name} vs {match_data['participant_name']} (площадка {court_number}, {new_match_datetime}, номер {match_obj.match_number})")
             
             if matches_created > 0:
                 db.session.commit()
@@ -5083,6 +4582,7 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             db.session.commit()
             
             logger.info(f"Автоматически сохранен счет для матча {match_id}, сет {set_number}: {score1}:{score2}, sets_won: {match.sets_won_1}:{match.sets_won_2}")
+            publish_match_update(db, match, 'auto_save')
             return jsonify({'success': True, 'message': f'Счет сохранен: {score1}:{score2}', 'sets_won': {'sets_won_1': match.sets_won_1, 'sets_won_2': match.sets_won_2}})
             
         except Exception as e:
@@ -5314,6 +4814,7 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             logger.info(f"[save-referee-result] Финальная проверка: set1=({match_final.set1_score1}:{match_final.set1_score2}), set2=({match_final.set2_score1}:{match_final.set2_score2}), set3=({match_final.set3_score1}:{match_final.set3_score2})")
             
             logger.info(f"Результат матча {match_id} сохранен из судейства: {match.score}")
+            publish_match_update(db, match, 'referee_result')
             return jsonify({'success': True, 'message': 'Результат сохранен'}), 200
             
         except Exception as e:
@@ -5392,10 +4893,10 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
 Удачи в матче! 🏆"""
                     
                     try:
-                        success = send_telegram_message(message, telegram_contact=participant1.telegram)
+                        success = enqueue_telegram_message(message, telegram_contact=participant1.telegram, commit=False)
                         if success:
                             sent.append(participant1_name)
-                            logger.info(f"✅ Приглашение отправлено участнику {participant1_name} (Telegram: {participant1.telegram})")
+                            logger.info(f"✅ Приглашение поставлено в очередь для участника {participant1_name} (Telegram: {participant1.telegram})")
                         else:
                             failed.append(participant1_name)
                             logger.warning(f"⚠️ Не удалось отправить приглашение участнику {participant1_name}")
@@ -5423,10 +4924,10 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
 Удачи в матче! 🏆"""
                     
                     try:
-                        success = send_telegram_message(message, telegram_contact=participant2.telegram)
+                        success = enqueue_telegram_message(message, telegram_contact=participant2.telegram, commit=False)
                         if success:
                             sent.append(participant2_name)
-                            logger.info(f"✅ Приглашение отправлено участнику {participant2_name} (Telegram: {participant2.telegram})")
+                            logger.info(f"✅ Приглашение поставлено в очередь для участника {participant2_name} (Telegram: {participant2.telegram})")
                         else:
                             failed.append(participant2_name)
                             logger.warning(f"⚠️ Не удалось отправить приглашение участнику {participant2_name}")
@@ -5440,6 +4941,10 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
                 not_found.append(participant2_name)
                 logger.warning(f"⚠️  Участник {participant2_name} не найден в турнире")
             
+            # Приглашения отправляются фоновым потоком после коммита очереди
+            if sent:
+                db.session.commit()
+            
             return jsonify({
                 'success': True,
                 'sent': sent,
@@ -5453,145 +4958,33 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             return jsonify({'success': False, 'error': f'Ошибка при отправке приглашений: {str(e)}'}), 500
     
     @app.route('/api/tournaments/<int:tournament_id>/updates', methods=['GET'])
+    @read_only_route
     def tournament_updates(tournament_id):
         """API для частичного обновления данных турнира (только счёт матчей и статистика)"""
         try:
-            tournament = Tournament.query.get_or_404(tournament_id)
+            from services.change_version import versioned_json_response
+            from services.tournament_updates import build_tournament_updates_payload
             
-            # Получаем участников турнира
-            participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(Participant.name).all()
-            
-            # Получаем матчи турнира
-            matches = Match.query.filter_by(tournament_id=tournament_id).order_by(Match.match_date, Match.match_time).all()
+            def build_payload(version):
+                tournament = Tournament.query.get_or_404(tournament_id)
+                # Участники и матчи загружаются одним запросом на таблицу (без N+1 по матчам),
+                # таблица мест берётся из памяти, если версия турнира не изменилась
+                return build_tournament_updates_payload(db, tournament, Participant, Match, version)
             
-            # Дедупликация матчей
-            seen_matches = set()
-            unique_matches = []
-            for match in matches:
-                match_key = (match.participant1_id, match.participant2_id, match.match_date, match.match_time)
-                if match_key not in seen_matches:
-                    seen_matches.add(match_key)
-                    unique_matches.append(match)
-            matches = unique_matches
-            
-            # Подготавливаем данные матчей для отправки
-            matches_data = []
-            for match in matches:
-                participant1 = Participant.query.get(match.participant1_id)
-                participant2 = Participant.query.get(match.participant2_id)
-                
-                # Формируем счёт
-                score = None
-                sets_details = None
-                
-                # Проверяем, есть ли счёт по сетам (sets_won_1, sets_won_2) или по текущим сетам
-                if match.status in ['завершен', 'в_процессе', 'играют']:
-                    # Сначала проверяем sets_won_1 и sets_won_2 (основной счёт)
-                    if match.sets_won_1 is not None and match.sets_won_2 is not None:
-                        score = f"{match.sets_won_1}:{match.sets_won_2}"
-                    # Если основного счёта нет, но есть счёт в текущем сете, формируем временный счёт
-                    elif match.status in ['в_процессе', 'играют']:
-                        # Подсчитываем выигранные сеты на основе завершенных сетов
-                        sets_won_1 = 0
-                        sets_won_2 = 0
-                        points_to_win = tournament.points_to_win or 21
-                        
-                        # Проверяем каждый сет
-                        if match.set1_score1 is not None and match.set1_score2 is not None:
-                            if match.set1_score1 >= points_to_win and match.set1_score1 > match.set1_score2:
-                                sets_won_1 += 1
-                            elif match.set1_score2 >= points_to_win and match.set1_score2 > match.set1_score1:
-                                sets_won_2 += 1
-                        
-                        if match.set2_score1 is not None and match.set2_score2 is not None:
-                            if match.set2_score1 >= points_to_win and match.set2_score1 > match.set2_score2:
-                                sets_won_1 += 1
-                            elif match.set2_score2 >= points_to_win and match.set2_score2 > match.set2_score1:
-                                sets_won_2 += 1
-                        
-                        if match.set3_score1 is not None and match.set3_score2 is not None:
-                            if match.set3_score1 >= points_to_win and match.set3_score1 > match.set3_score2:
-                                sets_won_1 += 1
-                            elif match.set3_score2 >= points_to_win and match.set3_score2 > match.set3_score1:
-                                sets_won_2 += 1
-                        
-                        # Если есть хотя бы один завершенный сет, показываем счёт
-                        if sets_won_1 > 0 or sets_won_2 > 0:
-                            score = f"{sets_won_1}:{sets_won_2}"
-                    
-                    # Детали сетов (показываем все сеты, которые начались)
-                    if score:
-                        sets_list = []
-                        points_to_win = tournament.points_to_win or 21
-                        if match.set1_score1 is not None and match.set1_score2 is not None and (match.set1_score1 > 0 or match.set1_score2 > 0) and not (match.set1_score1 == 0 and match.set1_score2 == 0) and not (match.set1_score1 == points_to_win and match.set1_score2 == points_to_win):
-                            sets_list.append(f"{match.set1_score1}:{match.set1_score2}")
-                        if match.set2_score1 is not None and match.set2_score2 is not None and (match.set2_score1 > 0 or match.set2_score2 > 0) and not (match.set2_score1 == 0 and match.set2_score2 == 0) and not (match.set2_score1 == points_to_win and match.set2_score2 == points_to_win):
-                            sets_list.append(f"{match.set2_score1}:{match.set2_score2}")
-                        if match.set3_score1 is not None and match.set3_score2 is not None and (match.set3_score1 > 0 or match.set3_score2 > 0) and not (match.set3_score1 == 0 and match.set3_score2 == 0) and not (match.set3_score1 == points_to_win and match.set3_score2 == points_to_win):
-                            sets_list.append(f"{match.set3_score1}:{match.set3_score2}")
-                        if sets_list:
-                            sets_details = ", ".join(sets_list)
-                
-                matches_data.append({
-                    'id': match.id,
-                    'participant1_id': match.participant1_id,
-                    'participant2_id': match.participant2_id,
-                    'participant1_name': participant1.name if participant1 else '',
-                    'participant2_name': participant2.name if participant2 else '',
-                    'score': score,
-                    'sets_details': sets_details,
-                    'status': match.status,
-                    'match_date': match.match_date.strftime('%Y-%m-%d') if match.match_date else None,
-                    'match_time': match.match_time.strftime('%H:%M') if match.match_time else None,
-                    'set1_score1': match.set1_score1,
-                    'set1_score2': match.set1_score2,
-                    'set2_score1': match.set2_score1,
-                    'set2_score2': match.set2_score2,
-                    'set3_score1': match.set3_score1,
-                    'set3_score2': match.set3_score2,
-                    'sets_won_1': match.sets_won_1,
-                    'sets_won_2': match.sets_won_2
-                })
-            
-            # Подсчитываем статистику участников (используем логику из tournament_spectator)
-            from routes.main import calculate_participant_ranking
-            final_ranking = calculate_participant_ranking(participants, matches, tournament)
-            
-            # Создаем словарь для быстрого поиска
-            ranking_data_by_id = {}
-            for p_data in final_ranking:
-                ranking_data_by_id[p_data['participant'].id] = p_data
-            
-            # Формируем статистику участников
-            participants_stats = []
-            for participant in participants:
-                ranking_data = ranking_data_by_id.get(participant.id, {})
-                participants_stats.append({
-                    'id': participant.id,
-                    'name': participant.name,
-                    'position': ranking_data.get('place', 999),
-                    'points': ranking_data.get('points', 0),
-                    'wins': ranking_data.get('wins', 0),
-                    'losses': ranking_data.get('losses', 0),
-                    'draws': ranking_data.get('draws', 0),
-                    'games': ranking_data.get('games', 0),
-                    'sets_difference': ranking_data.get('sets_won', 0) - ranking_data.get('sets_lost', 0),
-                    'goal_difference': ranking_data.get('set_difference', 0)
-                })
-            
-            # Сортируем по позиции
-            participants_stats.sort(key=lambda x: x['position'])
-            
-            return jsonify({
-                'success': True,
-                'matches': matches_data,
-                'participants_stats': participants_stats
-            })
+            # Если данные турнира не менялись с прошлого опроса - отвечаем 304
+            return versioned_json_response(db, tournament_id, build_payload)
             
         except Exception as e:
             logger.error(f"Ошибка при получении обновлений турнира {tournament_id}: {e}")
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    @app.route('/api/tournaments/<int:tournament_id>/events', methods=['GET'])
+    def tournament_events(tournament_id):
+        """Поток Server-Sent Events с изменениями матчей турнира"""
+        if not db.session.get(Tournament, tournament_id):
+            return jsonify({'success': False, 'error': 'Турнир не найден'}), 404
+        return event_stream_response(db, tournament_id)
+
     # ===== РОЗЫГРЫШИ БАДМИНТОНА =====
     
     @app.route('/api/rallies', methods=['POST'])
@@ -5737,6 +5130,7 @@ def create_api_routes(app, db, User, Tournament, Participant, Match, Notificatio
             
             logger.info(f"✅ Создан розыгрыш {rally.id} для матча {data['match_id']}, сет {data['set_number']}, tournament_id={final_tournament_id}, is_free_match={is_free_match}")
             logger.info(f"   Розыгрыш: {rally.server_name} vs {rally.receiver_name}, счет: {rally.score}, server_won: {rally.server_won}")
+            publish_match_update(db, match, 'rally')
             
             return jsonify({'success': True, 'rally': rally.to_dict()}), 201
             
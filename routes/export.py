@@ -1,13 +1,36 @@
 import os
+import tempfile
+from copy import copy
 from datetime import datetime
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
-from flask import send_file, flash
+from flask import Response, send_file, flash
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Размер блока при отдаче файла клиенту
+EXPORT_CHUNK_SIZE = 64 * 1024
+# До этого размера книга собирается в памяти, больше - во временном файле (удаляется после отдачи)
+EXPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Стили создаются один раз и разделяются ячейками
+BOLD_FONT = Font(bold=True)
+TITLE_FONT = Font(size=16, bold=True)
+CENTER = Alignment(horizontal="center")
+HEADER_FILL = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+LEADER_FILL = PatternFill(start_color="FFD700", end_color="FFD700", fill_type="solid")
+WIN_FILL = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
+LOSS_FILL = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")
+STATUS_FILLS = {
+    'завершен': PatternFill(start_color='90EE90', end_color='90EE90', fill_type="solid"),
+    'играют': PatternFill(start_color='FFFF99', end_color='FFFF99', fill_type="solid"),
+    'запланирован': PatternFill(start_color='E6E6FA', end_color='E6E6FA', fill_type="solid"),
+}
+
 def get_downloads_folder():
     """Определяет папку Загрузки/Downloads пользователя"""
     try:
@@ -37,20 +60,24 @@ def get_downloads_folder():
         # Fallback на текущую директорию
         return os.getcwd()
 
+def build_excel_workbook(tournament, participants, matches, statistics, positions):
+    """
+    Создает книгу Excel с данными турнира
+    
+    Листы создаются в режиме write_only: строки записываются по одной и не
+    хранятся в памяти, поэтому память не растет с размером турнира.
+    """
+    wb = Workbook(write_only=True)
+    create_tournament_info_sheet(wb, tournament)
+    create_standings_sheet(wb, participants, statistics, positions)
+    create_chessboard_sheet(wb, tournament, participants, matches)
+    create_schedule_sheet(wb, matches, participants)
+    return wb
+
 def create_excel_export(tournament, participants, matches, statistics, positions):
-    """Создает Excel файл с данными турнира"""
+    """Создает Excel файл с данными турнира в папке загрузок (для отдачи по HTTP - stream_excel_export)"""
     try:
-        # Создаем рабочую книгу
-        wb = Workbook()
-        
-        # Удаляем стандартный лист
-        wb.remove(wb.active)
-        
-        # Создаем листы
-        create_tournament_info_sheet(wb, tournament)
-        create_standings_sheet(wb, participants, statistics, positions)
-        create_chessboard_sheet(wb, tournament, participants, matches)
-        create_schedule_sheet(wb, matches, participants)
+        wb = build_excel_workbook(tournament, participants, matches, statistics, positions)
         
         # Создаем имя файла
         tournament_name = tournament.name.replace(' ', '_').replace('/', '_')
@@ -71,23 +98,172 @@ def create_excel_export(tournament, participants, matches, statistics, positions
         logger.error(f"Ошибка при создании Excel файла: {e}")
         raise e
 
+def build_excel_buffer(tournament, participants, matches, statistics, positions,
+                       spool_max_size=EXPORT_SPOOL_MAX_SIZE):
+    """
+    Записывает книгу Excel во временный буфер
+    
+    Буфер (SpooledTemporaryFile) держит файл в памяти, а для больших турниров -
+    во временном файле, который удаляется при закрытии буфера.
+    
+    Returns:
+        tuple: (буфер в начале файла, размер файла в байтах)
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+    try:
+        build_excel_workbook(tournament, participants, matches, statistics, positions).save(buffer)
+        size = buffer.tell()
+        buffer.seek(0)
+    except Exception as e:
+        buffer.close()
+        logger.error(f"Ошибка при создании Excel файла: {e}")
+        raise
+    return buffer, size
+
+def excel_file_response(source, size, filename):
+    """
+    Ответ с файлом Excel для скачивания
+    
+    Args:
+        source: Содержимое файла (bytes) или буфер; буфер отдается блоками
+                и закрывается после отдачи последнего блока
+        size: Размер файла в байтах
+        filename: Имя файла для сохранения
+    """
+    if isinstance(source, bytes):
+        body = source
+    else:
+        def body():
+            try:
+                while True:
+                    chunk = source.read(EXPORT_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                source.close()
+        body = body()
+    
+    return Response(body, mimetype=XLSX_MIMETYPE, direct_passthrough=True, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Content-Length': str(size),
+    })
+
+def export_filename(tournament_id):
+    return f'tournament_{tournament_id}_{datetime.now().strftime("%Y%m%d_%H%M")}.xlsx'
+
+def stream_excel_export(tournament, participants, matches, statistics, positions, filename=None,
+                        spool_max_size=EXPORT_SPOOL_MAX_SIZE):
+    """
+    Отдает Excel файл с данными турнира, ничего не сохраняя на диске сервера
+    
+    Книга записывается во временный буфер и отдается клиенту блоками.
+    
+    Returns:
+        Response: Ответ с файлом для скачивания
+    """
+    buffer, size = build_excel_buffer(tournament, participants, matches, statistics, positions, spool_max_size)
+    logger.info(f"Excel файл турнира {tournament.id} отдан клиенту ({size} байт)")
+    return excel_file_response(buffer, size, filename or export_filename(tournament.id))
+
+def cached_excel_export(db, tournament, load_export_data):
+    """
+    Отдает Excel файл турнира из кэша выгрузок (services/export_cache.py)
+    
+    Файл кэшируется по версии данных турнира. При совпадении ETag с версией
+    у клиента - 304 без построения файла; при попадании в кэш данные турнира
+    не читаются.
+    
+    Args:
+        db: Экземпляр базы данных
+        tournament: Турнир
+        load_export_data: Функция без аргументов, возвращающая
+                          (participants, matches, statistics, positions)
+    """
+    from flask import current_app, request
+    from services.change_version import get_tournament_version, make_etag
+    from services.export_cache import export_cache
+    
+    version = get_tournament_version(db, tournament.id)
+    etag = make_etag(tournament.id, version)
+    
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        data = export_cache.get(tournament.id, version)
+        if data is not None:
+            logger.info(f"Excel файл турнира {tournament.id} (версия {version}) отдан из кэша")
+            response = excel_file_response(data, len(data), export_filename(tournament.id))
+        else:
+            buffer, size = build_excel_buffer(tournament, *load_export_data())
+            if export_cache.accepts(size):
+                with buffer:
+                    data = buffer.read()
+                export_cache.put(tournament.id, version, data)
+                response = excel_file_response(data, size, export_filename(tournament.id))
+            else:
+                # Слишком большой для кэша файл отдается потоком
+                response = excel_file_response(buffer, size, export_filename(tournament.id))
+            logger.info(f"Excel файл турнира {tournament.id} (версия {version}) собран: {size} байт")
+    
+    response.set_etag(etag)
+    # Браузер должен каждый раз сверять версию с сервером
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+class _StyledCells:
+    """
+    Ячейки со стилем для листа в режиме write_only
+    
+    Стиль регистрируется в книге один раз на сочетание шрифта, заливки и
+    выравнивания; следующие ячейки получают копию готового стиля.
+    """
+    
+    def __init__(self, ws):
+        self.ws = ws
+        self.styles = {}
+    
+    def __call__(self, value, font=None, fill=None, alignment=None):
+        cell = WriteOnlyCell(self.ws, value=value)
+        key = (id(font), id(fill), id(alignment))
+        style = self.styles.get(key)
+        if style is not None:
+            cell._style = copy(style)
+            return cell
+        if font:
+            cell.font = font
+        if fill:
+            cell.fill = fill
+        if alignment:
+            cell.alignment = alignment
+        self.styles[key] = copy(cell._style)
+        return cell
+
+def _format_date(value, fmt):
+    return value.strftime(fmt) if value else "Не указано"
+
 def create_tournament_info_sheet(wb, tournament):
     """Создает лист с информацией о турнире"""
     ws = wb.create_sheet("Информация о турнире")
+    cell = _StyledCells(ws)
+    
+    # Ширина колонок задается до записи строк
+    ws.column_dimensions['A'].width = 25
+    ws.column_dimensions['B'].width = 30
     
     # Заголовок
-    ws['A1'] = "ИНФОРМАЦИЯ О ТУРНИРЕ"
-    ws['A1'].font = Font(size=16, bold=True)
-    ws.merge_cells('A1:D1')
+    ws.append([cell("ИНФОРМАЦИЯ О ТУРНИРЕ", font=TITLE_FONT)])
+    ws.merged_cells.add('A1:D1')
+    ws.append([])
     
     # Информация о турнире
     info_data = [
         ("Название турнира:", tournament.name),
         ("Тип спорта:", getattr(tournament, 'sport_type', 'Не указано')),
-        ("Дата начала:", tournament.start_date.strftime('%d.%m.%Y')),
-        ("Дата окончания:", tournament.end_date.strftime('%d.%m.%Y')),
-        ("Время начала:", tournament.start_time.strftime('%H:%M') if tournament.start_time else "Не указано"),
-        ("Время окончания:", tournament.end_time.strftime('%H:%M') if tournament.end_time else "Не указано"),
+        ("Дата начала:", _format_date(tournament.start_date, '%d.%m.%Y')),
+        ("Дата окончания:", _format_date(tournament.end_date, '%d.%m.%Y')),
+        ("Время начала:", _format_date(tournament.start_time, '%H:%M')),
+        ("Время окончания:", _format_date(tournament.end_time, '%H:%M')),
         ("Максимум участников:", tournament.max_participants),
         ("Количество площадок:", tournament.court_count),
         ("Длительность матча (мин):", tournament.match_duration),
@@ -98,138 +274,125 @@ def create_tournament_info_sheet(wb, tournament):
         ("Очки за ничью:", tournament.points_draw),
         ("Очки за поражение:", tournament.points_loss),
         ("Статус:", getattr(tournament, 'status', 'Не указано')),
-        ("Дата создания:", tournament.created_at.strftime('%d.%m.%Y %H:%M') if tournament.created_at else "Не указано"),
+        ("Дата создания:", _format_date(tournament.created_at, '%d.%m.%Y %H:%M')),
     ]
     
-    row = 3
     for label, value in info_data:
-        ws[f'A{row}'] = label
-        ws[f'B{row}'] = value
-        ws[f'A{row}'].font = Font(bold=True)
-        row += 1
-    
-    # Настройка ширины колонок
-    ws.column_dimensions['A'].width = 25
-    ws.column_dimensions['B'].width = 30
+        ws.append([cell(label, font=BOLD_FONT), value])
 
 def create_standings_sheet(wb, participants, statistics, positions):
     """Создает лист с турнирной таблицей"""
     ws = wb.create_sheet("Турнирная таблица")
+    cell = _StyledCells(ws)
+    
+    # Настройка ширины колонок
+    for col in range(1, 9):
+        ws.column_dimensions[get_column_letter(col)].width = 15
     
     # Заголовки
     headers = ["Место", "Участник", "Игры", "Победы", "Поражения", "Ничьи", "Очки", "Разность мячей"]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
+    ws.append([cell(header, font=BOLD_FONT, fill=HEADER_FILL, alignment=CENTER) for header in headers])
     
     # Данные участников
-    row = 2
     for participant in participants:
         stats = statistics.get(participant.id, {})
         position = positions.get(participant.id, 1)
-        
-        ws.cell(row=row, column=1, value=position)
-        ws.cell(row=row, column=2, value=participant.name)
-        ws.cell(row=row, column=3, value=stats.get('games', 0))
-        ws.cell(row=row, column=4, value=stats.get('wins', 0))
-        ws.cell(row=row, column=5, value=stats.get('losses', 0))
-        ws.cell(row=row, column=6, value=stats.get('draws', 0))
-        ws.cell(row=row, column=7, value=stats.get('points', 0))
-        ws.cell(row=row, column=8, value=stats.get('goal_difference', 0))
-        
+        values = [
+            position,
+            participant.name,
+            stats.get('games', 0),
+            stats.get('wins', 0),
+            stats.get('losses', 0),
+            stats.get('draws', 0),
+            stats.get('points', 0),
+            stats.get('goal_difference', 0),
+        ]
         # Выделяем лидера
         if position == 1:
-            for col in range(1, 9):
-                ws.cell(row=row, column=col).fill = PatternFill(start_color="FFD700", end_color="FFD700", fill_type="solid")
-        
-        row += 1
+            values = [cell(value, fill=LEADER_FILL) for value in values]
+        ws.append(values)
+
+def build_match_grid(participants, matches):
+    """
+    Матрица матчей турнира: grid[i][j] - матч участников participants[i] и participants[j]
     
-    # Настройка ширины колонок
-    for col in range(1, 9):
-        ws.column_dimensions[get_column_letter(col)].width = 15
+    Индексы участников берутся из словаря id -> индекс, матрица заполняется
+    за один проход по матчам (O(матчей), без поиска участника для каждого матча).
+    Матчи с участниками не из списка пропускаются.
+    """
+    index_by_id = {participant.id: index for index, participant in enumerate(participants)}
+    grid = [[None] * len(participants) for _ in participants]
+    for match in matches:
+        i = index_by_id.get(match.participant1_id)
+        j = index_by_id.get(match.participant2_id)
+        if i is not None and j is not None:
+            grid[i][j] = grid[j][i] = match
+    return grid
 
 def create_chessboard_sheet(wb, tournament, participants, matches):
     """Создает лист с турнирной таблицей (шахматка)"""
     ws = wb.create_sheet("Турнирная таблица (шахматка)")
+    cell = _StyledCells(ws)
     
     # Сортируем участников по имени
     sorted_participants = sorted(participants, key=lambda p: p.name)
     
-    # Создаем словарь матчей для быстрого поиска
-    matches_dict = {}
-    for match in matches:
-        key = tuple(sorted([match.participant1_id, match.participant2_id]))
-        matches_dict[key] = match
-    
-    # Заголовки
-    ws.cell(row=1, column=1, value="Участник")
-    ws.cell(row=1, column=1).font = Font(bold=True)
-    
-    for col, participant in enumerate(sorted_participants, 2):
-        ws.cell(row=1, column=col, value=participant.name[:15])
-        ws.cell(row=1, column=col).font = Font(bold=True)
-    
-    # Заполняем таблицу
-    for row, p1 in enumerate(sorted_participants, 2):
-        ws.cell(row=row, column=1, value=p1.name)
-        ws.cell(row=row, column=1).font = Font(bold=True)
-        
-        for col, p2 in enumerate(sorted_participants, 2):
-            if p1.id == p2.id:
-                ws.cell(row=row, column=col, value="—")
-            else:
-                # Ищем матч между участниками
-                key = tuple(sorted([p1.id, p2.id]))
-                match = matches_dict.get(key)
-                
-                if match and match.status == 'завершен':
-                    # Определяем счёт с точки зрения p1
-                    if match.participant1_id == p1.id:
-                        score = f"{getattr(match, 'sets_won_1', 0)}:{getattr(match, 'sets_won_2', 0)}"
-                        is_winner = getattr(match, 'sets_won_1', 0) > getattr(match, 'sets_won_2', 0)
-                    else:
-                        score = f"{getattr(match, 'sets_won_2', 0)}:{getattr(match, 'sets_won_1', 0)}"
-                        is_winner = getattr(match, 'sets_won_2', 0) > getattr(match, 'sets_won_1', 0)
-                    
-                    cell = ws.cell(row=row, column=col, value=score)
-                    cell.alignment = Alignment(horizontal="center")
-                    
-                    # Цветовое выделение
-                    if is_winner:
-                        cell.fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
-                    else:
-                        cell.fill = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")
-                elif match:
-                    # Матч запланирован или в процессе
-                    time_str = ""
-                    if match.match_time:
-                        time_str = match.match_time.strftime('%H:%M')
-                    if match.court_number:
-                        time_str += f" Пл.{match.court_number}"
-                    ws.cell(row=row, column=col, value=time_str or "Запланирован")
-                else:
-                    ws.cell(row=row, column=col, value="")
+    # Матрица матчей заполняется за один проход по матчам (индекс участника - по словарю id)
+    grid = build_match_grid(sorted_participants, matches)
     
     # Настройка ширины колонок
     ws.column_dimensions['A'].width = 20
     for col in range(2, len(sorted_participants) + 2):
         ws.column_dimensions[get_column_letter(col)].width = 12
+    
+    # Заголовки
+    ws.append([cell("Участник", font=BOLD_FONT)] +
+              [cell(participant.name[:15], font=BOLD_FONT) for participant in sorted_participants])
+    
+    # Заполняем таблицу (строка записывается сразу и не хранится)
+    for row_index, (p1, grid_row) in enumerate(zip(sorted_participants, grid)):
+        row = [cell(p1.name, font=BOLD_FONT)]
+        
+        for col_index, match in enumerate(grid_row):
+            if col_index == row_index:
+                row.append("—")
+            elif match and match.status == 'завершен':
+                # Определяем счёт с точки зрения p1
+                if match.participant1_id == p1.id:
+                    score = f"{getattr(match, 'sets_won_1', 0)}:{getattr(match, 'sets_won_2', 0)}"
+                    is_winner = getattr(match, 'sets_won_1', 0) > getattr(match, 'sets_won_2', 0)
+                else:
+                    score = f"{getattr(match, 'sets_won_2', 0)}:{getattr(match, 'sets_won_1', 0)}"
+                    is_winner = getattr(match, 'sets_won_2', 0) > getattr(match, 'sets_won_1', 0)
+                
+                # Цветовое выделение
+                row.append(cell(score, fill=WIN_FILL if is_winner else LOSS_FILL, alignment=CENTER))
+            elif match:
+                # Матч запланирован или в процессе
+                time_str = ""
+                if match.match_time:
+                    time_str = match.match_time.strftime('%H:%M')
+                if match.court_number:
+                    time_str += f" Пл.{match.court_number}"
+                row.append(time_str or "Запланирован")
+            else:
+                row.append("")
+        
+        ws.append(row)
 
 def create_schedule_sheet(wb, matches, participants):
     """Создает лист с расписанием матчей"""
     ws = wb.create_sheet("Расписание матчей")
+    cell = _StyledCells(ws)
+    
+    # Настройка ширины колонок
+    column_widths = [5, 12, 10, 10, 20, 20, 10, 15]
+    for col, width in enumerate(column_widths, 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
     
     # Заголовки
     headers = ["№", "Дата", "Время", "Площадка", "Участник 1", "Участник 2", "Счёт", "Статус"]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
+    ws.append([cell(header, font=BOLD_FONT, fill=HEADER_FILL, alignment=CENTER) for header in headers])
     
     # Создаем словарь участников для быстрого поиска
     participants_dict = {p.id: p for p in participants}
@@ -238,38 +401,24 @@ def create_schedule_sheet(wb, matches, participants):
     sorted_matches = sorted(matches, key=lambda m: (m.match_date or datetime.min.date(), m.match_time or datetime.min.time()))
     
     # Данные матчей
-    row = 2
     for i, match in enumerate(sorted_matches, 1):
         participant1 = participants_dict.get(match.participant1_id)
         participant2 = participants_dict.get(match.participant2_id)
         
-        ws.cell(row=row, column=1, value=i)
-        ws.cell(row=row, column=2, value=match.match_date.strftime('%d.%m.%Y') if match.match_date else "")
-        ws.cell(row=row, column=3, value=match.match_time.strftime('%H:%M') if match.match_time else "")
-        ws.cell(row=row, column=4, value=match.court_number or "")
-        ws.cell(row=row, column=5, value=participant1.name if participant1 else f"ID:{match.participant1_id}")
-        ws.cell(row=row, column=6, value=participant2.name if participant2 else f"ID:{match.participant2_id}")
-        
         # Счёт
         if match.status == 'завершен':
             score = f"{getattr(match, 'sets_won_1', 0)}:{getattr(match, 'sets_won_2', 0)}"
-            ws.cell(row=row, column=7, value=score)
         else:
-            ws.cell(row=row, column=7, value="—")
-        
-        # Статус
-        status_colors = {
-            'завершен': '90EE90',
-            'играют': 'FFFF99',
-            'запланирован': 'E6E6FA'
-        }
-        cell = ws.cell(row=row, column=8, value=match.status)
-        if match.status in status_colors:
-            cell.fill = PatternFill(start_color=status_colors[match.status], end_color=status_colors[match.status], fill_type="solid")
+            score = "—"
         
-        row += 1
-    
-    # Настройка ширины колонок
-    column_widths = [5, 12, 10, 10, 20, 20, 10, 15]
-    for col, width in enumerate(column_widths, 1):
-        ws.column_dimensions[get_column_letter(col)].width = width
+        ws.append([
+            i,
+            match.match_date.strftime('%d.%m.%Y') if match.match_date else "",
+            match.match_time.strftime('%H:%M') if match.match_time else "",
+            match.court_number or "",
+            participant1.name if participant1 else f"ID:{match.participant1_id}",
+            participant2.name if participant2 else f"ID:{match.participant2_id}",
+            score,
+            # Статус
+            cell(match.status, fill=STATUS_FILLS.get(match.status)),
+        ])
@@ -8,7 +8,8 @@ import logging
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from utils.telegram_utils import send_telegram_message
+from services.telegram_outbox import enqueue_telegram_message
+from services.read_replica import read_only_route
 from config import Config
 # Tournament передается как параметр в функции
 
@@ -73,6 +74,132 @@ def update_tournament_status(tournament, participants, matches, db):
     
     return False
 
+# Статусы матчей, результаты которых учитываются в таблице
+RANKED_MATCH_STATUSES = ['завершен', 'в_процессе', 'играют']
+
+def new_participant_stats(participant):
+    """Создает пустую статистику участника для расчета мест"""
+    return {
+        'participant': participant,
+        'points': 0,
+        'wins': 0,
+        'losses': 0,
+        'draws': 0,
+        'games': 0,
+        'sets_won': 0,        # Количество выигранных сетов
+        'sets_lost': 0,       # Количество проигранных сетов
+        'set_difference': 0,  # разность очков в сетах
+        'head_to_head': {}    # результаты личных встреч с другими участниками
+    }
+
+def match_result_contribution(match, tournament):
+    """
+    Вычисляет вклад матча в статистику обоих участников.
+    
+    Возвращает None, если матч не учитывается, иначе кортеж
+    (p1_id, p2_id, delta1, delta2, h2h1, h2h2), где delta - изменения числовых
+    полей статистики, h2h - результат личной встречи ('win'/'loss') или None.
+    """
+    if match.status not in RANKED_MATCH_STATUSES or match.sets_won_1 is None or match.sets_won_2 is None:
+        return None
+    
+    delta1 = {'games': 1, 'sets_won': match.sets_won_1, 'sets_lost': match.sets_won_2,
+              'wins': 0, 'losses': 0, 'points': 0}
+    delta2 = {'games': 1, 'sets_won': match.sets_won_2, 'sets_lost': match.sets_won_1,
+              'wins': 0, 'losses': 0, 'points': 0}
+    h2h1 = h2h2 = None
+    
+    # Определяем победителя матча (нужно выиграть 2 сета)
+    sets_to_win = tournament.sets_to_win or 2
+    
+    if match.sets_won_1 >= sets_to_win:
+        # Участник 1 победил матч
+        delta1['wins'] = 1
+        delta2['losses'] = 1
+        delta1['points'] = tournament.points_win or 1
+        delta2['points'] = tournament.points_loss or 0
+        h2h1, h2h2 = 'win', 'loss'
+    elif match.sets_won_2 >= sets_to_win:
+        # Участник 2 победил матч
+        delta2['wins'] = 1
+        delta1['losses'] = 1
+        delta2['points'] = tournament.points_win or 1
+        delta1['points'] = tournament.points_loss or 0
+        h2h1, h2h2 = 'loss', 'win'
+    
+    # Если матч не завершен (никто не выиграл 2 сета), очки не начисляются
+    # Но статистика сетов все равно учитывается для отображения
+    
+    # Рассчитываем разность очков в сетах (по реальным очкам, а не по количеству сетов)
+    p1_total_score = sum(score for score in (match.set1_score1, match.set2_score1, match.set3_score1) if score is not None)
+    p2_total_score = sum(score for score in (match.set1_score2, match.set2_score2, match.set3_score2) if score is not None)
+    delta1['set_difference'] = p1_total_score - p2_total_score
+    delta2['set_difference'] = p2_total_score - p1_total_score
+    
+    return match.participant1_id, match.participant2_id, delta1, delta2, h2h1, h2h2
+
+def apply_match_contribution(participant_stats, contribution, sign=1):
+    """Добавляет (sign=1) или отменяет (sign=-1) вклад матча в статистику"""
+    p1_id, p2_id, delta1, delta2, h2h1, h2h2 = contribution
+    stats1 = participant_stats[p1_id]
+    stats2 = participant_stats[p2_id]
+    
+    for field, value in delta1.items():
+        stats1[field] += sign * value
+    for field, value in delta2.items():
+        stats2[field] += sign * value
+    
+    # Записываем (или убираем) результат личной встречи
+    if h2h1:
+        if sign > 0:
+            stats1['head_to_head'][p2_id] = h2h1
+            stats2['head_to_head'][p1_id] = h2h2
+        else:
+            stats1['head_to_head'].pop(p2_id, None)
+            stats2['head_to_head'].pop(p1_id, None)
+
+def resolve_points_group(points, group, participant_stats):
+    """
+    Упорядочивает участников с одинаковыми очками:
+    личные встречи, при закольцованных результатах - разность сетов, затем разность очков
+    """
+    if len(group) == 1:
+        return list(group)
+    
+    # Сортируем по личным встречам
+    group_sorted = sort_by_head_to_head(group, participant_stats)
+    
+    # Проверяем, есть ли "закольцованные" результаты
+    is_circular = is_circular_head_to_head(group_sorted, participant_stats)
+    logger.info(f"Группа с очками {points}: закольцованные результаты = {is_circular}")
+    
+    if is_circular:
+        # Если есть закольцованные результаты, сортируем по разности выигранных и проигранных сетов
+        logger.info(f"Сортировка по разности сетов: {[(p['participant'].id, p['sets_won'] - p['sets_lost']) for p in group_sorted]}")
+        group_sorted.sort(key=lambda x: x['sets_won'] - x['sets_lost'], reverse=True)
+        
+        # Проверяем, есть ли участники с одинаковой разностью сетов
+        sets_diff_groups = {}
+        for p_data in group_sorted:
+            sets_diff = p_data['sets_won'] - p_data['sets_lost']
+            if sets_diff not in sets_diff_groups:
+                sets_diff_groups[sets_diff] = []
+            sets_diff_groups[sets_diff].append(p_data)
+        
+        # Если есть участники с одинаковой разностью сетов, сортируем по разности очков
+        final_group_sorted = []
+        for sets_diff in sorted(sets_diff_groups.keys(), reverse=True):
+            sub_group = sets_diff_groups[sets_diff]
+            if len(sub_group) > 1:
+                logger.info(f"Участники с разностью сетов {sets_diff}: сортировка по разности очков")
+                sub_group.sort(key=lambda x: x['set_difference'], reverse=True)
+            final_group_sorted.extend(sub_group)
+        
+        group_sorted = final_group_sorted
+        logger.info(f"После сортировки: {[(p['participant'].id, p['sets_won'] - p['sets_lost'], p['set_difference']) for p in group_sorted]}")
+    
+    return group_sorted
+
 def calculate_participant_ranking(participants, matches, tournament):
     """
     Определяет места участников согласно правилам:
@@ -86,172 +213,39 @@ def calculate_participant_ranking(participants, matches, tournament):
     participant_stats = {}
     
     for participant in participants:
-        participant_stats[participant.id] = {
-            'participant': participant,
-            'points': 0,
-            'wins': 0,
-            'losses': 0,
-            'draws': 0,
-            'games': 0,
-            'sets_won': 0,        # Количество выигранных сетов
-            'sets_lost': 0,       # Количество проигранных сетов
-            'set_difference': 0,  # разность очков в сетах
-            'head_to_head': {}    # результаты личных встреч с другими участниками
-        }
+        participant_stats[participant.id] = new_participant_stats(participant)
     
     # Обрабатываем все завершенные матчи и матчи в процессе
     for match in matches:
-        if match.status in ['завершен', 'в_процессе', 'играют'] and match.sets_won_1 is not None and match.sets_won_2 is not None:
-            p1_id = match.participant1_id
-            p2_id = match.participant2_id
-            
-            if p1_id not in participant_stats or p2_id not in participant_stats:
-                continue
-                
-            stats1 = participant_stats[p1_id]
-            stats2 = participant_stats[p2_id]
-            
-            # Обновляем количество игр
-            stats1['games'] += 1
-            stats2['games'] += 1
-            
-            # Обновляем количество выигранных/проигранных сетов
-            stats1['sets_won'] += match.sets_won_1
-            stats1['sets_lost'] += match.sets_won_2
-            stats2['sets_won'] += match.sets_won_2
-            stats2['sets_lost'] += match.sets_won_1
-            
-            # Определяем победителя матча (нужно выиграть 2 сета)
-            sets_to_win = tournament.sets_to_win or 2
-            
-            # Проверяем, завершен ли матч (кто-то выиграл 2 сета)
-            match_completed = False
-            if match.sets_won_1 >= sets_to_win:
-                # Участник 1 победил матч
-                match_completed = True
-                stats1['wins'] += 1
-                stats2['losses'] += 1
-                stats1['points'] += (tournament.points_win or 1)
-                stats2['points'] += (tournament.points_loss or 0)
-                
-                # Записываем результат личной встречи
-                stats1['head_to_head'][p2_id] = 'win'
-                stats2['head_to_head'][p1_id] = 'loss'
-                
-            elif match.sets_won_2 >= sets_to_win:
-                # Участник 2 победил матч
-                match_completed = True
-                stats2['wins'] += 1
-                stats1['losses'] += 1
-                stats2['points'] += (tournament.points_win or 1)
-                stats1['points'] += (tournament.points_loss or 0)
-                
-                # Записываем результат личной встречи
-                stats2['head_to_head'][p1_id] = 'win'
-                stats1['head_to_head'][p2_id] = 'loss'
-            
-            # Если матч не завершен (никто не выиграл 2 сета), очки не начисляются
-            # Но статистика сетов все равно учитывается для отображения
-            
-            # Рассчитываем разность очков в сетах (по реальным очкам, а не по количеству сетов)
-            # Суммируем все очки участника во всех сетах
-            p1_total_score = 0
-            p2_total_score = 0
-            
-            # Подсчитываем очки участника 1
-            if match.set1_score1 is not None:
-                p1_total_score += match.set1_score1
-            if match.set2_score1 is not None:
-                p1_total_score += match.set2_score1
-            if match.set3_score1 is not None:
-                p1_total_score += match.set3_score1
-            
-            # Подсчитываем очки участника 2
-            if match.set1_score2 is not None:
-                p2_total_score += match.set1_score2
-            if match.set2_score2 is not None:
-                p2_total_score += match.set2_score2
-            if match.set3_score2 is not None:
-                p2_total_score += match.set3_score2
-            
-            # Рассчитываем разность очков
-            set_diff1 = p1_total_score - p2_total_score
-            set_diff2 = p2_total_score - p1_total_score
-            
-            stats1['set_difference'] += set_diff1
-            stats2['set_difference'] += set_diff2
-    
-    # Теперь определяем места
-    participants_list = list(participant_stats.values())
-    
-    # Сортируем участников по правилам
-    def ranking_key(participant_data):
-        p_id = participant_data['participant'].id
-        points = participant_data['points']
+        contribution = match_result_contribution(match, tournament)
+        if contribution is None:
+            continue
         
-        # Основной критерий - очки (убывание)
-        return (-points, p_id)
+        if match.participant1_id not in participant_stats or match.participant2_id not in participant_stats:
+            continue
+        
+        apply_match_contribution(participant_stats, contribution)
     
     # Группируем участников по очкам
     points_groups = {}
-    for p_data in participants_list:
+    for p_data in participant_stats.values():
         points = p_data['points']
         if points not in points_groups:
             points_groups[points] = []
         points_groups[points].append(p_data)
     
-    # Обрабатываем каждую группу с одинаковыми очками
+    # Обрабатываем каждую группу с одинаковыми очками и назначаем места
     final_ranking = []
     current_place = 1
     
     for points in sorted(points_groups.keys(), reverse=True):
-        group = points_groups[points]
+        group_sorted = resolve_points_group(points, points_groups[points], participant_stats)
         
-        if len(group) == 1:
-            # Один участник в группе - просто добавляем
-            group[0]['place'] = current_place
-            final_ranking.append(group[0])
-            current_place += 1
-        else:
-            # Несколько участников с одинаковыми очками
-            # Сортируем по личным встречам
-            group_sorted = sort_by_head_to_head(group, participant_stats)
-            
-            # Проверяем, есть ли "закольцованные" результаты
-            is_circular = is_circular_head_to_head(group_sorted, participant_stats)
-            logger.info(f"Группа с очками {points}: закольцованные результаты = {is_circular}")
-            
-            if is_circular:
-                # Если есть закольцованные результаты, сортируем по разности выигранных и проигранных сетов
-                logger.info(f"Сортировка по разности сетов: {[(p['participant'].id, p['sets_won'] - p['sets_lost']) for p in group_sorted]}")
-                group_sorted.sort(key=lambda x: x['sets_won'] - x['sets_lost'], reverse=True)
-                
-                # Проверяем, есть ли участники с одинаковой разностью сетов
-                sets_diff_groups = {}
-                for p_data in group_sorted:
-                    sets_diff = p_data['sets_won'] - p_data['sets_lost']
-                    if sets_diff not in sets_diff_groups:
-                        sets_diff_groups[sets_diff] = []
-                    sets_diff_groups[sets_diff].append(p_data)
-                
-                # Если есть участники с одинаковой разностью сетов, сортируем по разности очков
-                final_group_sorted = []
-                for sets_diff in sorted(sets_diff_groups.keys(), reverse=True):
-                    sub_group = sets_diff_groups[sets_diff]
-                    if len(sub_group) > 1:
-                        logger.info(f"Участники с разностью сетов {sets_diff}: сортировка по разности очков")
-                        sub_group.sort(key=lambda x: x['set_difference'], reverse=True)
-                    final_group_sorted.extend(sub_group)
-                
-                group_sorted = final_group_sorted
-                logger.info(f"После сортировки: {[(p['participant'].id, p['sets_won'] - p['sets_lost'], p['set_difference']) for p in group_sorted]}")
-            
-            # Назначаем места
-            for i, p_data in enumerate(group_sorted):
-                p_data['place'] = current_place + i
-                final_ranking.append(p_data)
-            
-            current_place += len(group_sorted)
+        for i, p_data in enumerate(group_sorted):
+            p_data['place'] = current_place + i
+            final_ranking.append(p_data)
+        
+        current_place += len(group_sorted)
     
     logger.info(f"calculate_participant_ranking: итоговый рейтинг: {[(p['participant'].id, p['place'], p['points'], p['sets_won'] - p['sets_lost'], p['set_difference']) for p in final_ranking]}")
     return final_ranking
@@ -433,6 +427,45 @@ def send_token_email_railway_fallback(email, name, token):
         logger.error(f"Ошибка в Railway fallback: {e}")
         return False
 
+def get_smtp_settings():
+    """Настройки SMTP: (сервер, порт, пользователь, пароль, отправитель)"""
+    from flask import current_app
+    import os
+    
+    # Проверяем переменные окружения (для Railway)
+    smtp_server = os.environ.get('MAIL_SERVER') or current_app.config.get('MAIL_SERVER', 'smtp.gmail.com')
+    smtp_port = int(os.environ.get('MAIL_PORT', current_app.config.get('MAIL_PORT', 587)))
+    smtp_username = os.environ.get('MAIL_USERNAME') or current_app.config.get('MAIL_USERNAME')
+    smtp_password = os.environ.get('MAIL_PASSWORD') or current_app.config.get('MAIL_PASSWORD')
+    from_email = os.environ.get('MAIL_DEFAULT_SENDER') or current_app.config.get('MAIL_DEFAULT_SENDER', smtp_username)
+    return smtp_server, smtp_port, smtp_username, smtp_password, from_email
+
+def build_token_email(from_email, email, name, token):
+    """Письмо с паролем для создания турниров"""
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    
+    msg = MIMEMultipart()
+    msg['From'] = from_email
+    msg['To'] = email
+    msg['Subject'] = "Ваш пароль для создания турниров"
+    
+    # Текст сообщения
+    body = f"""
+Здравствуйте, {name}!
+
+Ваш пароль для создания турниров: {token}
+
+Этот пароль действителен в течение 30 дней.
+Используйте его для входа в систему как администратор турнира.
+
+С уважением,
+Команда турнирной системы
+    """
+    
+    msg.attach(MIMEText(body, 'plain', 'utf-8'))
+    return msg
+
 def send_token_email(email, name, token):
     """Отправляет email с токеном пользователю"""
     try:
@@ -443,16 +476,9 @@ def send_token_email(email, name, token):
         except Exception as e:
             logger.warning(f"Не удалось сохранить токен в файл: {e}")
         
-        # Получаем настройки email из конфигурации Flask
-        from flask import current_app
         import os
         
-        # Проверяем переменные окружения (для Railway)
-        smtp_server = os.environ.get('MAIL_SERVER') or current_app.config.get('MAIL_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.environ.get('MAIL_PORT', current_app.config.get('MAIL_PORT', 587)))
-        smtp_username = os.environ.get('MAIL_USERNAME') or current_app.config.get('MAIL_USERNAME')
-        smtp_password = os.environ.get('MAIL_PASSWORD') or current_app.config.get('MAIL_PASSWORD')
-        from_email = os.environ.get('MAIL_DEFAULT_SENDER') or current_app.config.get('MAIL_DEFAULT_SENDER', smtp_username)
+        smtp_server, smtp_port, smtp_username, smtp_password, from_email = get_smtp_settings()
         
         logger.info(f"Email настройки: server={smtp_server}, port={smtp_port}, username={smtp_username}")
         logger.info(f"Переменные окружения: MAIL_SERVER={os.environ.get('MAIL_SERVER')}, MAIL_USERNAME={os.environ.get('MAIL_USERNAME')}")
@@ -479,28 +505,7 @@ def send_token_email(email, name, token):
             return result
         
         # Создаем сообщение
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
-        
-        msg = MIMEMultipart()
-        msg['From'] = from_email
-        msg['To'] = email
-        msg['Subject'] = "Ваш пароль для создания турниров"
-        
-        # Текст сообщения
-        body = f"""
-Здравствуйте, {name}!
-
-Ваш пароль для создания турниров: {token}
-
-Этот пароль действителен в течение 30 дней.
-Используйте его для входа в систему как администратор турнира.
-
-С уважением,
-Команда турнирной системы
-        """
-        
-        msg.attach(MIMEText(body, 'plain', 'utf-8'))
+        msg = build_token_email(from_email, email, name, token)
         
         # Отправляем email
         import smtplib
@@ -576,33 +581,17 @@ def update_token_email_status(token_value, status):
         logger.error(f"Ошибка обновления статуса токена {token_value}: {e}")
 
 def send_token_email_async(email, name, token, app=None):
-    """Асинхронная отправка email (не блокирует основной поток)"""
-    import threading
-    import time
+    """
+    Ставит письмо с токеном в очередь отправки (не блокирует запрос)
     
-    def send_email_thread():
-        try:
-            logger.info(f"Запуск асинхронной отправки email на {email}")
-            time.sleep(1)  # Небольшая задержка
-            
-            # Создаем контекст приложения для асинхронного потока
-            if app:
-                with app.app_context():
-                    result = send_token_email(email, name, token)
-                    logger.info(f"Асинхронная отправка завершена: {result}")
-            else:
-                # Если приложение не передано, отправляем синхронно
-                result = send_token_email(email, name, token)
-                logger.info(f"Синхронная отправка завершена: {result}")
-        except Exception as e:
-            logger.error(f"Ошибка асинхронной отправки: {e}")
-    
-    # Запускаем в отдельном потоке
-    thread = threading.Thread(target=send_email_thread)
-    thread.daemon = True
-    thread.start()
-    logger.info(f"Асинхронная отправка email запущена для {email}")
-    return True  # Возвращаем True сразу, не ждем завершения
+    Очередь - сами записи tokens со статусом 'pending'; письма отправляет
+    ограниченный пул потоков (services/mail_dispatcher.py).
+    """
+    from services.mail_dispatcher import enqueue_token_email
+    
+    queued = enqueue_token_email(token)
+    logger.info(f"Письмо с паролем для {email} поставлено в очередь: {queued}")
+    return queued
 
 def create_main_routes(app, db, User, Tournament, Participant, Match, Notification, MatchLog, Token, WaitingList, Settings, Player):
     """Создает основные маршруты приложения"""
@@ -764,22 +753,6 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
         try:
             logger.info("Начало загрузки страницы 'Все турниры'")
             
-            # Проверяем и добавляем недостающие колонки, если их нет (на случай, если миграция не сработала)
-            try:
-                from sqlalchemy import text
-                conn = db.engine.connect()
-                # Проверяем waiting_list
-                cols_waiting = conn.execute(text("PRAGMA table_info('waiting_list')")).fetchall()
-                col_names_waiting = {c[1] for c in cols_waiting}
-                if 'status' not in col_names_waiting:
-                    logger.warning("Колонка 'status' отсутствует в waiting_list, добавляем...")
-                    conn.execute(text("ALTER TABLE waiting_list ADD COLUMN status VARCHAR(20) DEFAULT 'ожидает'"))
-                    conn.commit()
-                    logger.info("Добавлен столбец 'status' в таблицу waiting_list")
-                conn.close()
-            except Exception as mig_e:
-                logger.warning(f"Ошибка при проверке миграции waiting_list: {mig_e}")
-            
             tournaments = Tournament.query.all()
             logger.info(f"Загружено турниров: {len(tournaments)}")
             
@@ -947,8 +920,7 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
                     name=name,
                     created_at=datetime.utcnow(),
                     is_used=False,
-                    email_sent=False,
-                    email_status='pending'
+                    email_sent=False
                 )
                 db.session.add(new_token)
                 db.session.commit()
@@ -1507,8 +1479,18 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
                 'message': 'Неверный логин или пароль'
             }), 401
     
-    def check_session_status(admin_email):
-        """Проверяет, активна ли сессия администратора в UserActivity"""
+    def check_session_status(admin_email, session_token=None):
+        """
+        Проверяет, активна ли сессия администратора в UserActivity
+        
+        Результат кэшируется на SESSION_CACHE_TTL_SECONDS (utils/session_manager.py)
+        только если активна запись именно этого токена: кэш читает и validate_session.
+        Завершение сессии сбрасывает кэш.
+        """
+        from utils.session_manager import get_cached_session, cache_valid_session
+        
+        if session_token and get_cached_session(session_token, admin_email):
+            return True
         try:
             from models import create_models
             from datetime import datetime
@@ -1518,7 +1500,7 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
             UserActivity = models['UserActivity']
             
             # Проверяем, есть ли активная сессия
-            active_session = UserActivity.query.filter(
+            active_sessions = UserActivity.query.filter(
                 UserActivity.email == admin_email,
                 UserActivity.is_active == True,
                 UserActivity.is_terminated == False,
@@ -1526,9 +1508,16 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
                     UserActivity.expires_at.is_(None),
                     UserActivity.expires_at > datetime.utcnow()
                 )
-            ).first()
+            )
+            
+            if session_token:
+                token_session = active_sessions.filter(UserActivity.login_token == session_token).first()
+                if token_session is not None:
+                    cache_valid_session(session_token, admin_email, token_session.expires_at)
+                    return True
             
-            return active_session is not None
+            # Активна другая сессия того же email - доступ разрешен, но токен не кэшируется
+            return active_sessions.first() is not None
         except Exception as e:
             app.logger.error(f'Ошибка проверки статуса сессии: {e}')
             return True  # В случае ошибки считаем сессию активной
@@ -1541,11 +1530,11 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
         @wraps(f)
         def decorated_function(*args, **kwargs):
             admin_email = session.get('admin_email', '')
-            app.logger.info(f'Декоратор require_active_session: проверяем сессию для {admin_email}')
+            app.logger.debug(f'Декоратор require_active_session: проверяем сессию для {admin_email}')
             
             if admin_email:
-                is_active = check_session_status(admin_email)
-                app.logger.info(f'Статус сессии для {admin_email}: {is_active}')
+                is_active = check_session_status(admin_email, session.get('session_token'))
+                app.logger.debug(f'Статус сессии для {admin_email}: {is_active}')
                 
                 if not is_active:
                     app.logger.info(f'Сессия для {admin_email} неактивна, очищаем Flask-сессию')
@@ -1557,7 +1546,7 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
                         flash('Ваша сессия была завершена администратором. Необходима повторная авторизация.', 'warning')
                         return redirect(url_for('admin_tournament'))
             
-            app.logger.info(f'Сессия для {admin_email} активна, разрешаем доступ')
+            app.logger.debug(f'Сессия для {admin_email} активна, разрешаем доступ')
             return f(*args, **kwargs)
         return decorated_function
     
@@ -1931,7 +1920,7 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
                 participants = Participant.query.filter_by(tournament_id=tournament.id).all()
                 if len(participants) >= 2:
                     from routes.api import create_smart_schedule
-                    matches_created = create_smart_schedule(tournament, participants, Match, db)
+                    matches_created = create_smart_schedule(tournament, participants, Match, db, bulk=True)
                     db.session.commit()
                     logger.info(f"Автоматически создано {matches_created} матчей для нового турнира {tournament.id}")
                 
@@ -1996,7 +1985,7 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
             logger.info(f"[tournament_detail] Турнир {tournament_id}: {len(participants)} участников, но 0 матчей. Создаем расписание.")
             try:
                 from routes.api import create_smart_schedule
-                matches_created = create_smart_schedule(tournament, participants, Match, db)
+                matches_created = create_smart_schedule(tournament, participants, Match, db, bulk=True)
                 db.session.commit()
                 logger.info(f"Автоматически создано {matches_created} матчей для турнира {tournament_id}")
                 # Обновляем список матчей
@@ -2607,6 +2596,7 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
         return redirect(url_for('index'))
     
     @app.route('/tournament-view/<int:tournament_id>')
+    @read_only_route
     def tournament_view(tournament_id):
         """Просмотр турнира для участников (только чтение)"""
         from flask import session, flash, redirect, url_for
@@ -2767,7 +2757,9 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
             })
         
         # Используем новую логику определения мест
-        participants_ranking = calculate_participant_ranking(participants, matches, tournament)
+        # Места читаются из таблицы standings (одним запросом)
+        from services.standings import load_standings
+        participants_ranking = load_standings(db, tournament, participants, Match)
         
         # Создаем словарь для быстрого поиска данных по ID участника
         ranking_data_by_id = {}
@@ -2999,6 +2991,7 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
                              has_unfinished=has_unfinished)
 
     @app.route('/tournament-spectator/<int:tournament_id>')
+    @read_only_route
     def tournament_spectator(tournament_id):
         """Просмотр турнира для зрителей (без авторизации)"""
         tournament = Tournament.query.get_or_404(tournament_id)
@@ -3034,127 +3027,69 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
         participants_with_stats = []
         participants_with_stats_chessboard = []
         
-        # Создаем словарь для подсчета статистики каждого участника
-        participant_stats_dict = {}
+        # Места и статистика берутся из таблицы standings (одним запросом)
+        from services.standings import load_standings
+        final_ranking = load_standings(db, tournament, participants, Match)
+        
+        # Создаем словарь для быстрого поиска данных по ID участника
+        ranking_data_by_id = {}
+        for p_data in final_ranking:
+            ranking_data_by_id[p_data['participant'].id] = p_data
+        
+        # Игры, победы, поражения и очки на странице зрителя - только по завершенным матчам
+        # (в standings учитываются и матчи в процессе)
+        completed_stats = {participant.id: {'games': 0, 'wins': 0, 'losses': 0, 'points': 0,
+                                            'sets_won': 0, 'sets_lost': 0}
+                           for participant in participants}
+        for match in matches:
+            if match.status != 'завершен':
+                continue
+            contribution = match_result_contribution(match, tournament)
+            if contribution is None or contribution[0] not in completed_stats or contribution[1] not in completed_stats:
+                continue
+            p1_id, p2_id, delta1, delta2, _, _ = contribution
+            for participant_id, delta in ((p1_id, delta1), (p2_id, delta2)):
+                for field, total in completed_stats[participant_id].items():
+                    completed_stats[participant_id][field] = total + delta[field]
+        
+        # Создаем списки участников с статистикой
         for participant in participants:
-            participant_stats_dict[participant.id] = {
+            ranking_data = ranking_data_by_id.get(participant.id, {})
+            completed = completed_stats[participant.id]
+            participant_stats = {
                 'id': participant.id,
                 'name': participant.name,
-                'points': 0,
-                'matches_played': 0,
-                'matches_won': 0,
-                'matches_lost': 0,
+                'points': completed['points'],
+                'matches_played': completed['games'],
+                'matches_won': completed['wins'],
+                'matches_lost': completed['losses'],
                 'matches_drawn': 0,
-                'games': 0,
-                'wins': 0,
-                'losses': 0,
+                'games': completed['games'],
+                'wins': completed['wins'],
+                'losses': completed['losses'],
                 'draws': 0,
-                'goal_difference': 0,
-                'set_difference': 0
+                'sets_won': ranking_data.get('sets_won', 0),
+                'sets_lost': ranking_data.get('sets_lost', 0),
+                'sets_difference': ranking_data.get('sets_won', 0) - ranking_data.get('sets_lost', 0),
+                'set_difference': completed['sets_won'] - completed['sets_lost'],
+                'goal_difference': ranking_data.get('set_difference', 0)
             }
-        
-        # Подсчитываем статистику на основе матчей
-        for match in matches:
-            if match.status == 'завершен' and match.sets_won_1 is not None and match.sets_won_2 is not None:
-                participant1_id = match.participant1_id
-                participant2_id = match.participant2_id
-                
-                if participant1_id in participant_stats_dict and participant2_id in participant_stats_dict:
-                    # Обновляем статистику для участника 1
-                    participant_stats_dict[participant1_id]['games'] += 1
-                    participant_stats_dict[participant1_id]['matches_played'] += 1
-                    
-                    # Обновляем статистику для участника 2
-                    participant_stats_dict[participant2_id]['games'] += 1
-                    participant_stats_dict[participant2_id]['matches_played'] += 1
-                    
-                    # Определяем победителя матча (нужно выиграть 2 сета)
-                    sets_to_win = tournament.sets_to_win or 2
-                    
-                    if match.sets_won_1 >= sets_to_win:
-                        # Участник 1 выиграл матч
-                        participant_stats_dict[participant1_id]['wins'] += 1
-                        participant_stats_dict[participant1_id]['matches_won'] += 1
-                        participant_stats_dict[participant1_id]['points'] += tournament.points_win
-                        participant_stats_dict[participant2_id]['losses'] += 1
-                        participant_stats_dict[participant2_id]['matches_lost'] += 1
-                        participant_stats_dict[participant2_id]['points'] += tournament.points_loss
-                    elif match.sets_won_2 >= sets_to_win:
-                        # Участник 2 выиграл матч
-                        participant_stats_dict[participant2_id]['wins'] += 1
-                        participant_stats_dict[participant2_id]['matches_won'] += 1
-                        participant_stats_dict[participant2_id]['points'] += tournament.points_win
-                        participant_stats_dict[participant1_id]['losses'] += 1
-                        participant_stats_dict[participant1_id]['matches_lost'] += 1
-                        participant_stats_dict[participant1_id]['points'] += tournament.points_loss
-                    # Если никто не выиграл 2 сета, очки не начисляются
-                    
-                    # Обновляем разницу очков в сетах
-                    # Считаем разницу в очках внутри сетов, а не количество выигранных сетов
-                    set1_score1 = match.set1_score1 or 0
-                    set1_score2 = match.set1_score2 or 0
-                    set2_score1 = match.set2_score1 or 0
-                    set2_score2 = match.set2_score2 or 0
-                    set3_score1 = match.set3_score1 or 0
-                    set3_score2 = match.set3_score2 or 0
-                    
-                    # Общая разница в очках для участника 1
-                    participant1_score_diff = (set1_score1 - set1_score2) + (set2_score1 - set2_score2) + (set3_score1 - set3_score2)
-                    participant2_score_diff = (set1_score2 - set1_score1) + (set2_score2 - set2_score1) + (set3_score2 - set3_score1)
-                    
-                    participant_stats_dict[participant1_id]['goal_difference'] += participant1_score_diff
-                    participant_stats_dict[participant2_id]['goal_difference'] += participant2_score_diff
-                    
-                    # Обновляем разность выигранных сетов
-                    participant_stats_dict[participant1_id]['set_difference'] += match.sets_won_1 - match.sets_won_2
-                    participant_stats_dict[participant2_id]['set_difference'] += match.sets_won_2 - match.sets_won_1
-        
-        # Создаем списки участников с статистикой
-        for i, participant in enumerate(participants):
-            participant_stats = participant_stats_dict[participant.id]
+            position = ranking_data.get('place', 999)
             
             participants_with_stats_chessboard.append({
                 'participant': participant,
                 'stats': participant_stats,
-                'position': i + 1,
+                'position': position,
                 'is_late_participant': False
             })
             
             participants_with_stats.append({
                 'participant': participant,
                 'stats': participant_stats,
-                'position': i + 1,
+                'position': position,
                 'is_late_participant': False
             })
         
-        # Используем правильную функцию расчета рейтинга с учетом личных встреч
-        final_ranking = calculate_participant_ranking(participants, matches, tournament)
-        
-        # Создаем словарь для быстрого поиска данных по ID участника
-        ranking_data_by_id = {}
-        for p_data in final_ranking:
-            ranking_data_by_id[p_data['participant'].id] = p_data
-        
-        # Обновляем позиции и статистику в списках участников
-        for participant_data in participants_with_stats:
-            participant_id = participant_data['participant'].id
-            ranking_data = ranking_data_by_id.get(participant_id, {})
-            
-            # Обновляем позицию
-            participant_data['position'] = ranking_data.get('place', 999)
-            
-            # Обновляем статистику из новой логики
-            if ranking_data:
-                participant_data['stats']['sets_difference'] = ranking_data.get('sets_won', 0) - ranking_data.get('sets_lost', 0)
-                participant_data['stats']['goal_difference'] = ranking_data.get('set_difference', 0)
-                participant_data['stats']['sets_won'] = ranking_data.get('sets_won', 0)
-                participant_data['stats']['sets_lost'] = ranking_data.get('sets_lost', 0)
-        
-        for participant_data in participants_with_stats_chessboard:
-            participant_id = participant_data['participant'].id
-            ranking_data = ranking_data_by_id.get(participant_id, {})
-            participant_data['position'] = ranking_data.get('place', 999)
-        
         # Сортируем участников: таблицу статистики по местам, турнирную таблицу по именам
         participants_with_stats.sort(key=lambda x: x['position'])
         participants_with_stats_chessboard.sort(key=lambda x: x['participant'].name)
@@ -3517,8 +3452,29 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
             if not tournament:
                 return jsonify({'success': False, 'error': 'Турнир не найден'}), 404
             
+            if request.args.get('format') == 'xlsx':
+                # Книга Excel кэшируется по версии данных турнира и собирается заново только после изменений
+                from routes.export import cached_excel_export
+                
+                def load_export_data():
+                    from services.standings import load_standings
+                    participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(Participant.name).all()
+                    matches = Match.query.filter_by(tournament_id=tournament_id, is_removed=False).all()
+                    ranking = load_standings(db, tournament, participants, Match, matches=matches)
+                    statistics = {}
+                    for p_data in ranking:
+                        statistics[p_data['participant'].id] = {
+                            'games': p_data['games'], 'wins': p_data['wins'], 'losses': p_data['losses'],
+                            'draws': p_data['draws'], 'points': p_data['points'],
+                            'goal_difference': p_data['set_difference'],
+                        }
+                    positions = {p_data['participant'].id: p_data['place'] for p_data in ranking}
+                    return [p_data['participant'] for p_data in ranking], matches, statistics, positions
+                
+                return cached_excel_export(db, tournament, load_export_data)
+            
             # Получаем участников турнира
-            participants = Participant.query.filter_by(tournament_id=tournament_id).all()
+            participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(Participant.name).all()
             
             # Получаем матчи турнира
             matches = Match.query.filter_by(tournament_id=tournament_id, is_removed=False).all()
@@ -3543,7 +3499,9 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
             writer.writerow(['Место', 'Участник', 'Игр', 'Побед', 'Поражений', 'Ничьих', 'Очки', 'Разность очков в сетах'])
             
             # Используем нашу функцию для правильного ранжирования
-            participants_ranking = calculate_participant_ranking(participants, matches, tournament)
+            # Места читаются из таблицы standings (одним запросом)
+            from services.standings import load_standings
+            participants_ranking = load_standings(db, tournament, participants, Match)
             
             for participant_data in participants_ranking:
                 participant = participant_data['participant']
@@ -3563,10 +3521,14 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
             writer.writerow(['МАТЧИ'])
             writer.writerow(['Дата', 'Время', 'Корт', 'Участник 1', 'Участник 2', 'Счет', 'Статус', 'Сет 1', 'Сет 2', 'Сет 3'])
             
+            # Участник по ID и его номер в шахматке - словарями, а не перебором для каждого матча
+            participants_by_id = {p.id: p for p in participants}
+            index_by_id = {p.id: i for i, p in enumerate(participants)}
+            
             for match in matches:
                 # Находим участников по ID
-                participant1 = next((p for p in participants if p.id == match.participant1_id), None)
-                participant2 = next((p for p in participants if p.id == match.participant2_id), None)
+                participant1 = participants_by_id.get(match.participant1_id)
+                participant2 = participants_by_id.get(match.participant2_id)
                 
                 writer.writerow([
                     match.match_date.strftime('%d.%m.%Y') if match.match_date else 'Не указана',
@@ -3592,10 +3554,10 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
             
             for match in matches:
                 if match.status == 'завершен' and match.sets_won_1 is not None and match.sets_won_2 is not None:
-                    p1_idx = next((i for i, p in enumerate(participants) if p.id == match.participant1_id), -1)
-                    p2_idx = next((i for i, p in enumerate(participants) if p.id == match.participant2_id), -1)
+                    p1_idx = index_by_id.get(match.participant1_id)
+                    p2_idx = index_by_id.get(match.participant2_id)
                     
-                    if p1_idx != -1 and p2_idx != -1:
+                    if p1_idx is not None and p2_idx is not None:
                         # Формируем результат в формате "2:0" (сеты:сеты)
                         result_p1 = f"{match.sets_won_1}:{match.sets_won_2}"
                         result_p2 = f"{match.sets_won_2}:{match.sets_won_1}"
@@ -3733,12 +3695,12 @@ def create_main_routes(app, db, User, Tournament, Participant, Match, Notificati
 ⏰ <b>Время:</b> {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}
 """
             
-            # Отправляем в Telegram
+            # Ставим в очередь отправки в Telegram
             app.logger.info(f"Попытка отправки сообщения обратной связи от {name} ({email})")
-            success = send_telegram_message(telegram_message)
+            success = enqueue_telegram_message(telegram_message)
             
             if success:
-                app.logger.info(f"✅ Сообщение обратной связи успешно отправлено от {name} ({email})")
+                app.logger.info(f"✅ Сообщение обратной связи поставлено в очередь от {name} ({email})")
                 return jsonify({'success': True, 'message': 'Сообщение отправлено'})
             else:
                 app.logger.error(f"❌ Не удалось отправить сообщение в Telegram от {name}. Проверьте логи utils.telegram_utils")
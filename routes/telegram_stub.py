@@ -0,0 +1,130 @@
+"""
+Заглушка Telegram Bot API для локальной проверки отправки сообщений
+
+Включается настройкой TELEGRAM_STUB_ENABLED; очередь направляется на нее
+через TELEGRAM_API_URL=http://<хост>/telegram-stub. Сообщения не уходят
+в Telegram, а сохраняются в памяти процесса и доступны через
+GET /telegram-stub/messages.
+
+Для проверки повторов chat_id вида 'stub-429' отвечает 429 с retry_after=1,
+'stub-403' - 403 (бот заблокирован), 'stub-500' - 500.
+
+Для обработчика бота (telegram_bot_handler.py) заглушка отдает обновления
+через getUpdates: они добавляются POST /telegram-stub/updates. Задержка
+ответа (TELEGRAM_STUB_LATENCY_MS) имитирует сетевую задержку Bot API.
+Отдельный сервер без приложения (для замеров) - serve_telegram_stub().
+"""
+import threading
+import time
+
+from flask import jsonify, request
+
+
+class TelegramStubState:
+    """Принятые сообщения и ожидающие обновления заглушки"""
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000.0
+        self.lock = threading.Lock()
+        self.messages = []
+        self.updates = []
+        self.next_update_id = 1
+        self.has_updates = threading.Condition(self.lock)
+
+    def add_updates(self, messages):
+        """Добавляет входящие сообщения (dict с chat_id и text) как обновления"""
+        with self.has_updates:
+            for message in messages:
+                chat_id = message['chat_id']
+                self.updates.append({
+                    'update_id': self.next_update_id,
+                    'message': {'message_id': self.next_update_id, 'chat': {'id': chat_id},
+                                'from': {'id': chat_id, 'first_name': message.get('first_name', 'Тест')},
+                                'text': message['text']}
+                })
+                self.next_update_id += 1
+            self.has_updates.notify_all()
+
+    def get_updates(self, offset, timeout, limit=100):
+        """Обновления с update_id >= offset; подтвержденные (меньше offset) удаляются"""
+        deadline = time.monotonic() + timeout
+        with self.has_updates:
+            self.updates = [update for update in self.updates if update['update_id'] >= offset]
+            while not self.updates and time.monotonic() < deadline:
+                self.has_updates.wait(deadline - time.monotonic())
+            return list(self.updates[:limit])
+
+
+def create_telegram_stub_routes(app, latency_ms=None):
+    """Регистрирует маршруты заглушки Bot API"""
+    if latency_ms is None:
+        latency_ms = app.config.get('TELEGRAM_STUB_LATENCY_MS', 0)
+    state = TelegramStubState(latency_ms)
+    messages = state.messages
+    app.extensions['telegram_stub'] = messages
+    app.extensions['telegram_stub_state'] = state
+
+    @app.route('/telegram-stub/bot<token>/sendMessage', methods=['POST'])
+    def telegram_stub_send_message(token):
+        if state.latency:
+            time.sleep(state.latency)
+        data = request.form if request.form else (request.get_json(silent=True) or {})
+        chat_id = str(data.get('chat_id', ''))
+        if not chat_id or not data.get('text'):
+            return jsonify({'ok': False, 'error_code': 400, 'description': 'Bad Request: message text is empty'}), 400
+        if chat_id == 'stub-429':
+            return jsonify({'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1',
+                            'parameters': {'retry_after': 1}}), 429
+        if chat_id == 'stub-403':
+            return jsonify({'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'}), 403
+        if chat_id == 'stub-500':
+            return jsonify({'ok': False, 'error_code': 500, 'description': 'Internal Server Error'}), 500
+
+        with state.lock:
+            messages.append({'chat_id': chat_id, 'text': data.get('text'), 'parse_mode': data.get('parse_mode')})
+            message_id = len(messages)
+        return jsonify({'ok': True, 'result': {'message_id': message_id, 'chat': {'id': chat_id}}})
+
+    @app.route('/telegram-stub/bot<token>/getUpdates', methods=['GET', 'POST'])
+    def telegram_stub_get_updates(token):
+        params = request.values
+        # Long polling в заглушке ограничен секундой, чтобы не задерживать остановку
+        timeout = min(float(params.get('timeout', 0)), 1.0)
+        updates = state.get_updates(int(params.get('offset', 0)), timeout, int(params.get('limit', 100)))
+        return jsonify({'ok': True, 'result': updates})
+
+    @app.route('/telegram-stub/bot<token>/deleteWebhook', methods=['GET', 'POST'])
+    def telegram_stub_delete_webhook(token):
+        return jsonify({'ok': True, 'result': True})
+
+    @app.route('/telegram-stub/updates', methods=['POST'])
+    def telegram_stub_add_updates():
+        state.add_updates((request.get_json(silent=True) or {}).get('messages', []))
+        return jsonify({'ok': True})
+
+    @app.route('/telegram-stub/messages', methods=['GET'])
+    def telegram_stub_messages():
+        with state.lock:
+            return jsonify({'messages': list(messages)})
+
+
+def serve_telegram_stub(host='127.0.0.1', port=0, latency_ms=0, app=None):
+    """
+    Запускает заглушку Bot API отдельным сервером в фоновом потоке
+
+    Сервер поддерживает keep-alive (HTTP/1.1), как и настоящий Bot API.
+
+    Returns:
+        tuple: (сервер, адрес для TELEGRAM_API_URL, TelegramStubState)
+    """
+    from flask import Flask
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveRequestHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+    app = app or Flask('telegram_stub')
+    create_telegram_stub_routes(app, latency_ms)
+    server = make_server(host, port, app, threaded=True, request_handler=KeepAliveRequestHandler)
+    threading.Thread(target=server.serve_forever, name='telegram-stub', daemon=True).start()
+    return server, f'http://{host}:{server.server_port}/telegram-stub', app.extensions['telegram_stub_state']
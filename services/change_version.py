@@ -0,0 +1,117 @@
+"""
+Версии данных турниров для условных запросов (ETag / If-None-Match)
+
+Версия турнира увеличивается при каждой записи строк match, participant,
+rally или tournament этого турнира (в той же транзакции, что и сама запись).
+Свободные матчи (без турнира) используют ключ FREE_MATCHES_KEY.
+"""
+import logging
+from datetime import datetime
+
+from flask import current_app, request, jsonify
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Ключ версии для свободных матчей (tournament_id = None или 0)
+FREE_MATCHES_KEY = 0
+
+# Таблицы, изменения которых влияют на данные API обновлений
+TRACKED_TABLES = ('match', 'participant', 'rally', 'tournament')
+
+BUMP_VERSION_SQL = text(
+    "INSERT INTO tournament_version (tournament_id, version, updated_at) "
+    "VALUES (:tournament_id, 1, :updated_at) "
+    "ON CONFLICT (tournament_id) DO UPDATE SET "
+    "version = tournament_version.version + 1, updated_at = :updated_at"
+)
+
+
+def _version_keys(obj):
+    """Возвращает ключи версий, затронутые изменением объекта"""
+    table = getattr(obj, '__tablename__', None)
+    if table not in TRACKED_TABLES:
+        return set()
+
+    if table == 'tournament':
+        return {obj.id} if obj.id is not None else set()
+
+    keys = {obj.tournament_id or FREE_MATCHES_KEY}
+    # Если объект перенесли в другой турнир - меняется и старый турнир
+    history = inspect(obj).attrs.tournament_id.history
+    for old_tournament_id in history.deleted or ():
+        keys.add(old_tournament_id or FREE_MATCHES_KEY)
+    return keys
+
+
+def _after_flush(session, flush_context):
+    """Увеличивает версии турниров, строки которых были записаны во flush"""
+    keys = set()
+    for obj in session.new:
+        keys |= _version_keys(obj)
+    for obj in session.deleted:
+        keys |= _version_keys(obj)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            keys |= _version_keys(obj)
+
+    if keys:
+        bump_tournament_versions(session, keys)
+
+
+def bump_tournament_versions(session, tournament_ids):
+    """
+    Увеличивает версии указанных турниров в текущей транзакции
+
+    Вызывается автоматически после flush; вручную - после raw SQL изменений.
+    """
+    now = datetime.utcnow()
+    params = [{'tournament_id': tournament_id or FREE_MATCHES_KEY, 'updated_at': now}
+              for tournament_id in set(tournament_ids)]
+    session.connection().execute(BUMP_VERSION_SQL, params)
+
+
+def init_change_tracking():
+    """Подключает отслеживание изменений (достаточно вызвать один раз на процесс)"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        logger.info("Отслеживание версий турниров включено")
+
+
+def get_tournament_version(db, tournament_id):
+    """Возвращает текущую версию данных турнира (0, если изменений ещё не было)"""
+    from models.tournament_version import TournamentVersion
+
+    version = db.session.query(TournamentVersion.version).filter_by(
+        tournament_id=tournament_id or FREE_MATCHES_KEY
+    ).scalar()
+    return version or 0
+
+
+def make_etag(tournament_id, version):
+    """Формирует значение ETag для версии турнира"""
+    return f"t{tournament_id or FREE_MATCHES_KEY}-v{version}"
+
+
+def versioned_json_response(db, tournament_id, build_payload):
+    """
+    Отдаёт JSON с ETag; если у клиента актуальная версия - 304 без построения данных
+
+    Args:
+        db: Экземпляр базы данных
+        tournament_id: ID турнира (None/0 - свободные матчи)
+        build_payload: Функция, принимающая прочитанную версию и возвращающая словарь ответа
+    """
+    version = get_tournament_version(db, tournament_id)
+    etag = make_etag(tournament_id, version)
+
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build_payload(version))
+
+    response.set_etag(etag)
+    # Браузер должен каждый раз сверять версию с сервером
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
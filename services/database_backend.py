@@ -0,0 +1,94 @@
+"""
+Выбор базы данных приложения: SQLite локально, PostgreSQL на сервере
+
+Адрес берется из DATABASE_URL (без нее - локальный sqlite:///tournament.db
+в папке instance). Для PostgreSQL настраивается пул соединений
+SQLAlchemy: размер пула на воркер gunicorn, проверка соединения перед
+выдачей из пула (pool_pre_ping - после перезапуска PostgreSQL или разрыва
+простаивающего соединения запрос не падает) и пересоздание соединений
+старше DB_POOL_RECYCLE секунд. Для SQLite пул не меняется - соединения
+настраивает services/sqlite_tuning.py.
+
+Перенос данных из SQLite в PostgreSQL - migrate_to_postgresql.py.
+"""
+import logging
+
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_URL = 'sqlite:///tournament.db'
+
+# Значения по умолчанию (переопределяются одноименными настройками в config.py)
+DEFAULTS = {
+    'DB_POOL_SIZE': 5,
+    'DB_MAX_OVERFLOW': 5,
+    'DB_POOL_TIMEOUT': 10,
+    'DB_POOL_RECYCLE': 1800,
+    'DB_POOL_PRE_PING': True,
+    'DB_STATEMENT_TIMEOUT_MS': 30000,
+}
+
+
+def normalize_database_url(url, instance_relative=True):
+    """
+    Приводит DATABASE_URL к виду, который понимает SQLAlchemy 2
+
+    - postgres:// (Railway, Heroku) и postgresql:// -> postgresql+psycopg://:
+      драйвер psycopg 3 из requirements.txt независимо от версии SQLAlchemy;
+    - sqlite:///instance/<файл> -> sqlite:///<файл> (если instance_relative):
+      Flask-SQLAlchemy 3 сам считает относительный путь от папки instance,
+      а в .env серверов путь записан от корня проекта.
+    """
+    if not url:
+        return DEFAULT_DATABASE_URL
+    for scheme in ('postgres://', 'postgresql://'):
+        if url.startswith(scheme):
+            url = 'postgresql+psycopg://' + url[len(scheme):]
+    if instance_relative and url.startswith('sqlite:///instance/'):
+        url = 'sqlite:///' + url[len('sqlite:///instance/'):]
+    return url
+
+
+def is_postgresql(url):
+    return make_url(url).get_backend_name() == 'postgresql'
+
+
+def engine_options(config, url):
+    """Параметры create_engine для адреса url (пул соединений PostgreSQL)"""
+    if not is_postgresql(url):
+        return {}
+    settings = {key: config.get(key, default) for key, default in DEFAULTS.items()}
+    options = {
+        'pool_size': int(settings['DB_POOL_SIZE']),
+        'max_overflow': int(settings['DB_MAX_OVERFLOW']),
+        'pool_timeout': int(settings['DB_POOL_TIMEOUT']),
+        'pool_recycle': int(settings['DB_POOL_RECYCLE']),
+        'pool_pre_ping': bool(settings['DB_POOL_PRE_PING']),
+    }
+    if make_url(url).get_driver_name() in ('psycopg', 'psycopg2'):
+        connect_args = {'application_name': 'quick-score'}
+        if settings['DB_STATEMENT_TIMEOUT_MS']:
+            # Зависший запрос не держит соединение пула бесконечно
+            connect_args['options'] = f"-c statement_timeout={int(settings['DB_STATEMENT_TIMEOUT_MS'])}"
+        options['connect_args'] = connect_args
+    return options
+
+
+def init_database_backend(app):
+    """
+    Нормализует SQLALCHEMY_DATABASE_URI и задает SQLALCHEMY_ENGINE_OPTIONS
+
+    Вызывается до db.init_app(app). Параметры, уже заданные в
+    SQLALCHEMY_ENGINE_OPTIONS, не перезаписываются.
+    """
+    url = normalize_database_url(app.config.get('SQLALCHEMY_DATABASE_URI'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    options = engine_options(app.config, url)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    logger.info(f"База данных: {make_url(url).render_as_string(hide_password=True)}"
+                + (f" (пул {options['pool_size']}+{options['max_overflow']}, "
+                   f"recycle {options['pool_recycle']} с, pre_ping={options['pool_pre_ping']})"
+                   if 'pool_size' in options else ''))
+    return url
@@ -0,0 +1,104 @@
+"""
+Кэш готовых файлов выгрузки турниров (Excel)
+
+Файл хранится по ключу (tournament_id, версия данных турнира). Версия
+увеличивается в той же транзакции, что и любое изменение матча, участника
+или турнира (services/change_version.py), поэтому после изменения файл
+старой версии больше не выдается - выгрузка собирается заново. Завершенный
+турнир не меняется и отдается из кэша без чтения матчей и расчета таблицы.
+
+Кэш свой у каждого процесса; размер ограничен по объему (вытесняются давно
+не запрошенные файлы) и по количеству турниров.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Значения по умолчанию (переопределяются одноименными настройками в config.py)
+DEFAULTS = {
+    'EXPORT_CACHE_MAX_BYTES': 32 * 1024 * 1024,
+    'EXPORT_CACHE_MAX_ENTRIES': 64,
+}
+
+
+class ExportCache:
+    """LRU-кэш файлов выгрузки: не больше max_entries турниров и max_bytes байт"""
+
+    def __init__(self, max_bytes=DEFAULTS['EXPORT_CACHE_MAX_BYTES'],
+                 max_entries=DEFAULTS['EXPORT_CACHE_MAX_ENTRIES']):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # tournament_id -> (version, data)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get('EXPORT_CACHE_MAX_BYTES', DEFAULTS['EXPORT_CACHE_MAX_BYTES'])
+        self.max_entries = app.config.get('EXPORT_CACHE_MAX_ENTRIES', DEFAULTS['EXPORT_CACHE_MAX_ENTRIES'])
+
+    def accepts(self, size):
+        """Поместится ли файл такого размера в кэш"""
+        return 0 < size <= self.max_bytes and self.max_entries > 0
+
+    def get(self, tournament_id, version):
+        """Файл выгрузки версии version или None"""
+        with self._lock:
+            entry = self._entries.get(tournament_id)
+            if entry is None:
+                return None
+            if entry[0] != version:
+                if entry[0] < version:
+                    # Данные турнира изменились - файл устарел
+                    self._remove(tournament_id)
+                return None
+            self._entries.move_to_end(tournament_id)
+            return entry[1]
+
+    def put(self, tournament_id, version, data):
+        """Сохраняет файл выгрузки (заменяет файл прежней версии турнира)"""
+        if not self.accepts(len(data)):
+            return
+        with self._lock:
+            current = self._entries.get(tournament_id)
+            if current is not None and current[0] > version:
+                # Пока файл собирался, другой запрос уже сохранил более новую версию
+                return
+            self._remove(tournament_id)
+            self._entries[tournament_id] = (version, data)
+            self._size += len(data)
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                evicted_id = next(iter(self._entries))
+                self._remove(evicted_id)
+                logger.debug(f"Выгрузка турнира {evicted_id} вытеснена из кэша")
+
+    def invalidate(self, tournament_id):
+        with self._lock:
+            self._remove(tournament_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size(self):
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, tournament_id):
+        entry = self._entries.pop(tournament_id, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+
+# Единый кэш на процесс
+export_cache = ExportCache()
+
+
+def init_export_cache(app):
+    """Применяет ограничения кэша выгрузок из настроек приложения"""
+    export_cache.init_app(app)
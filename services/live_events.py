@@ -0,0 +1,192 @@
+"""
+Server-Sent Events: рассылка изменений матчей зрителям в реальном времени
+
+Внутри процесса изменения раздаются подписчикам через очереди (LiveEventBroker).
+Записи, сделанные другими воркерами gunicorn, обнаруживаются по версии турнира
+(services.change_version): при её изменении клиенту отправляется событие
+'refresh', и он перезапрашивает снимок через API обновлений (с ETag).
+
+Поток держит соединение открытым, поэтому воркер должен уметь обслуживать
+несколько соединений одновременно (worker_class = 'gthread' или 'gevent').
+"""
+import json
+import logging
+import queue
+import threading
+import time
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Максимальное количество событий в очереди одного подписчика
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class LiveEventBroker:
+    """Раздача событий подписчикам внутри процесса (по ключу версии турнира)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, key):
+        """Регистрирует подписчика и возвращает его очередь событий"""
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, key, subscriber):
+        """Удаляет подписчика"""
+        with self._lock:
+            subscribers = self._subscribers.get(key)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[key]
+
+    def publish(self, key, event, data):
+        """Отправляет событие всем подписчикам ключа; возвращает число получателей"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                # Медленный клиент: вместо потерянных событий он получит полный снимок
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                subscriber.put_nowait(('refresh', {'reason': 'overflow'}))
+        return len(subscribers)
+
+    def subscribers_count(self, key=None):
+        """Количество подписчиков (для диагностики)"""
+        with self._lock:
+            if key is not None:
+                return len(self._subscribers.get(key, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+# Единый брокер на процесс
+broker = LiveEventBroker()
+
+
+def format_sse(event, data):
+    """Форматирует событие в формате text/event-stream"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def publish_match_update(db, match, source):
+    """
+    Рассылает изменение матча подписчикам его турнира (или свободных матчей)
+
+    Вызывается после commit; ошибки рассылки не влияют на сохранение данных.
+
+    Args:
+        db: Экземпляр базы данных
+        match: Изменённый матч
+        source: Источник изменения (auto_save, referee_result, update_match, rally)
+    """
+    from models import Tournament, Participant
+    from services.change_version import FREE_MATCHES_KEY, get_tournament_version
+    from services.tournament_updates import serialize_match_update, serialize_free_match_update
+
+    try:
+        key = match.tournament_id or FREE_MATCHES_KEY
+        if not broker.subscribers_count(key):
+            return 0
+
+        if key == FREE_MATCHES_KEY:
+            match_data = serialize_free_match_update(match)
+        else:
+            tournament = db.session.get(Tournament, match.tournament_id)
+            if not tournament:
+                return 0
+            participant_ids = [pid for pid in (match.participant1_id, match.participant2_id) if pid]
+            participants = Participant.query.filter(Participant.id.in_(participant_ids)).all() if participant_ids else []
+            match_data = serialize_match_update(match, tournament, {p.id: p for p in participants})
+
+        return broker.publish(key, 'match', {
+            'match': match_data,
+            'source': source,
+            'version': get_tournament_version(db, key)
+        })
+    except Exception as e:
+        logger.error(f"Ошибка при рассылке изменения матча {getattr(match, 'id', None)}: {e}")
+        return 0
+
+
+def stream_events(db, key):
+    """
+    Генератор потока событий для одного клиента
+
+    Отдаёт события брокера, раз в секунду сверяет версию турнира (изменения
+    из других процессов) и периодически шлёт heartbeat. Через
+    LIVE_EVENTS_STREAM_SECONDS поток закрывается, и браузер переподключается сам,
+    чтобы соединение не упиралось в timeout воркера.
+    """
+    from services.change_version import get_tournament_version
+
+    config = current_app.config
+    stream_seconds = config.get('LIVE_EVENTS_STREAM_SECONDS', 55)
+    heartbeat_seconds = config.get('LIVE_EVENTS_HEARTBEAT_SECONDS', 15)
+    check_seconds = config.get('LIVE_EVENTS_VERSION_CHECK_SECONDS', 1)
+
+    subscriber = broker.subscribe(key)
+    try:
+        last_version = get_tournament_version(db, key)
+        # Не держим транзакцию/соединение открытыми во время ожидания
+        db.session.rollback()
+
+        yield "retry: 3000\n"
+        yield format_sse('hello', {'version': last_version})
+
+        started = last_sent = last_check = time.monotonic()
+        while time.monotonic() - started < stream_seconds:
+            try:
+                event, data = subscriber.get(timeout=check_seconds)
+                if event == 'match':
+                    last_version = max(last_version, data.get('version') or 0)
+                yield format_sse(event, data)
+                last_sent = time.monotonic()
+            except queue.Empty:
+                pass
+
+            if time.monotonic() - last_check < check_seconds:
+                continue
+            last_check = time.monotonic()
+
+            # Изменения, сделанные другими процессами, видны только по версии
+            current_version = get_tournament_version(db, key)
+            db.session.rollback()
+            if current_version > last_version:
+                last_version = current_version
+                yield format_sse('refresh', {'version': current_version})
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= heartbeat_seconds:
+                yield ": heartbeat\n\n"
+                last_sent = time.monotonic()
+    finally:
+        broker.unsubscribe(key, subscriber)
+
+
+def event_stream_response(db, key):
+    """Создаёт ответ text/event-stream для ключа (ID турнира или FREE_MATCHES_KEY)"""
+    from flask import Response, stream_with_context
+
+    if not current_app.config.get('LIVE_EVENTS_ENABLED', True):
+        # 204 - браузер не переподключается, страница остаётся на периодическом опросе
+        return Response(status=204)
+
+    return Response(
+        stream_with_context(stream_events(db, key)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Nginx не должен буферизовать поток
+        }
+    )
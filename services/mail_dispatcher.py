@@ -0,0 +1,294 @@
+"""
+Отправка писем с паролями (tokens) ограниченным пулом потоков
+
+Очередь хранится в самой таблице tokens: запись со статусом 'pending' ждет
+отправки, поэтому письма не теряются при перезапуске воркера gunicorn
+(max_requests) - их отправит следующий процесс. Состояние отражается
+в Token.email_status:
+
+    new      - письмо не запрошено (например, черновик администратора для
+               привязки Telegram с token=0); пул такие записи не берет
+    pending  - в очереди: ставит только enqueue_token_email
+               (email_attempts > 0 - ждет повтора после ошибки)
+    sending  - забрано потоком; email_next_attempt_at - срок захвата, после
+               которого письмо возвращается в очередь (поток упал)
+    sent     - отправлено
+    failed   - не отправлено после MAIL_MAX_ATTEMPTS попыток или адрес отклонен
+    manual   - SMTP не настроен или недоступен (Railway), нужна ручная отправка
+
+Каждый поток пула забирает пачку писем и отправляет ее через одно
+SMTP-соединение.
+"""
+import atexit
+import logging
+import os
+import smtplib
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+logger = logging.getLogger(__name__)
+
+# Значения по умолчанию (переопределяются одноименными настройками в config.py)
+DEFAULTS = {
+    'MAIL_WORKERS': 2,
+    'MAIL_BATCH_SIZE': 10,
+    'MAIL_POLL_SECONDS': 30.0,
+    'MAIL_MAX_ATTEMPTS': 5,
+    'MAIL_RETRY_BACKOFF_SECONDS': 30.0,
+    'MAIL_CLAIM_SECONDS': 300.0,
+    'MAIL_QUEUE_MAX_AGE_HOURS': 24,
+    'MAIL_SMTP_TIMEOUT': 30,
+}
+
+
+class MailDispatcher:
+    """Пул потоков отправки писем из очереди tokens"""
+
+    def __init__(self):
+        self._app = None
+        self._db = None
+        self._Token = None
+        self._settings = dict(DEFAULTS)
+        # Фабрика SMTP-соединений (подменяется в тестах)
+        self.smtp_factory = smtplib.SMTP
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending_wakeups = 0
+        self._stopping = False
+        self._threads = []
+        self._threads_pid = None
+
+    def init_app(self, app, db, Token):
+        """Подключает пул к приложению (потоки стартуют при первом письме или запросе в процессе)"""
+        self._app = app
+        self._db = db
+        self._Token = Token
+        self._settings = {name: app.config.get(name, default) for name, default in DEFAULTS.items()}
+
+    def wake(self):
+        """Будит один свободный поток пула"""
+        if self._app is None:
+            return
+        self.ensure_started()
+        with self._wakeup:
+            self._pending_wakeups += 1
+            self._wakeup.notify()
+
+    def ensure_started(self):
+        # После fork воркера gunicorn потоков родителя не существует - запускаем свои
+        if self._threads_pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+            return
+        with self._lock:
+            if self._threads_pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+                return
+            if self._threads_pid != os.getpid():
+                self._threads = []
+            self._threads_pid = os.getpid()
+            self._stopping = False
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for index in range(len(self._threads), max(1, self._settings['MAIL_WORKERS'])):
+                thread = threading.Thread(target=self._run, name=f'mail-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            try:
+                with self._app.app_context():
+                    processed = self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Ошибка фоновой отправки писем: {e}")
+                processed = 0
+            with self._wakeup:
+                if self._stopping:
+                    return
+                # Полная пачка - в очереди, скорее всего, есть еще письма
+                if processed < self._settings['MAIL_BATCH_SIZE'] and not self._pending_wakeups:
+                    self._wakeup.wait(self._settings['MAIL_POLL_SECONDS'])
+                self._pending_wakeups = max(0, self._pending_wakeups - 1)
+                if self._stopping:
+                    return
+
+    def shutdown(self, timeout=10):
+        """Дожидается отправки текущих пачек при остановке процесса (остальное останется в очереди)"""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        if self._threads_pid != os.getpid():
+            return
+        for thread in self._threads:
+            thread.join(timeout)
+
+    # ----- обработка пачки -----
+
+    def dispatch_once(self):
+        """
+        Забирает пачку писем и отправляет ее через одно SMTP-соединение
+
+        Returns:
+            int: количество обработанных писем
+        """
+        tokens = self._claim_batch()
+        if not tokens:
+            return 0
+
+        from routes.main import get_smtp_settings, build_token_email, send_token_email_railway_fallback
+
+        smtp_server, smtp_port, smtp_username, smtp_password, from_email = get_smtp_settings()
+        if os.environ.get('RAILWAY_ENVIRONMENT') == 'production':
+            # SMTP на Railway заблокирован - внешние сервисы, иначе ручная отправка
+            for token in tokens:
+                sent = send_token_email_railway_fallback(token.email, token.name, token.token)
+                self._save_result(token, 'sent' if sent else 'manual')
+            return len(tokens)
+        if not smtp_username or not smtp_password:
+            logger.warning("Email настройки не настроены. Письма с паролями требуют ручной отправки.")
+            for token in tokens:
+                self._save_result(token, 'manual', error='SMTP не настроен')
+            return len(tokens)
+
+        server = None
+        for index, token in enumerate(tokens):
+            if server is None:
+                try:
+                    server = self._connect(smtp_server, smtp_port, smtp_username, smtp_password)
+                except (smtplib.SMTPException, OSError) as e:
+                    # Сервер недоступен - остаток пачки ждет повтора
+                    logger.error(f"[ERROR] Не удалось подключиться к SMTP {smtp_server}:{smtp_port}: {e}")
+                    for waiting in tokens[index:]:
+                        self._save_retry(waiting, str(e))
+                    return len(tokens)
+            try:
+                msg = build_token_email(from_email, token.email, token.name, token.token)
+                server.sendmail(from_email, token.email, msg.as_string().encode('utf-8'))
+                logger.info(f"[SUCCESS] Токен {token.token} отправлен на {token.email} ({token.name})")
+                self._save_result(token, 'sent')
+            except smtplib.SMTPRecipientsRefused as e:
+                logger.error(f"[ERROR] Получатель {token.email} отклонен: {e}")
+                self._save_result(token, 'failed', error=str(e))
+            except (smtplib.SMTPException, OSError) as e:
+                logger.error(f"[ERROR] Ошибка SMTP при отправке на {token.email}: {e}")
+                self._save_retry(token, str(e))
+                # Соединение могло оборваться - для следующего письма подключаемся заново
+                server = self._close(server)
+        self._close(server)
+        return len(tokens)
+
+    def _connect(self, smtp_server, smtp_port, smtp_username, smtp_password):
+        server = self.smtp_factory(smtp_server, smtp_port, timeout=self._settings['MAIL_SMTP_TIMEOUT'])
+        server.starttls()
+        server.login(smtp_username, smtp_password)
+        return server
+
+    @staticmethod
+    def _close(server):
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+        return None
+
+    def _due_condition(self, now):
+        Token = self._Token
+        return and_(
+            Token.created_at >= now - timedelta(hours=self._settings['MAIL_QUEUE_MAX_AGE_HOURS']),
+            or_(and_(Token.email_status == 'pending',
+                     or_(Token.email_next_attempt_at.is_(None), Token.email_next_attempt_at <= now)),
+                and_(Token.email_status == 'sending', Token.email_next_attempt_at <= now))
+        )
+
+    def _claim_batch(self):
+        """Забирает пачку писем (условный UPDATE - письмо не достанется двум потокам)"""
+        Token = self._Token
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=self._settings['MAIL_CLAIM_SECONDS'])
+        due = self._due_condition(now)
+
+        with self._db.engine.begin() as connection:
+            rows = connection.execute(
+                Token.__table__.select().where(due).order_by(Token.id).limit(self._settings['MAIL_BATCH_SIZE'])
+            ).all()
+            claimed = []
+            for row in rows:
+                result = connection.execute(
+                    Token.__table__.update().where(Token.id == row.id, due)
+                    .values(email_status='sending', email_next_attempt_at=lease_until)
+                )
+                if result.rowcount:
+                    claimed.append(row)
+        return claimed
+
+    def _save_result(self, token, status, error=None):
+        values = {'email_status': status, 'email_attempts': token.email_attempts + 1,
+                  'email_next_attempt_at': None, 'email_error': error}
+        if status == 'sent':
+            values.update(email_sent=True, email_sent_at=datetime.utcnow())
+        else:
+            _save_for_manual_sending(token, error or status)
+        self._update(token, values)
+        logger.info(f"Статус токена {token.token} обновлен на: {status}")
+
+    def _save_retry(self, token, error):
+        attempts = token.email_attempts + 1
+        if attempts >= self._settings['MAIL_MAX_ATTEMPTS']:
+            logger.warning(f"Письмо с токеном {token.token} не отправлено после {attempts} попыток")
+            _save_for_manual_sending(token, error)
+            self._update(token, {'email_status': 'failed', 'email_attempts': attempts,
+                                 'email_next_attempt_at': None, 'email_error': error})
+            return
+        delay = self._settings['MAIL_RETRY_BACKOFF_SECONDS'] * 2 ** (attempts - 1)
+        self._update(token, {'email_status': 'pending', 'email_attempts': attempts,
+                             'email_next_attempt_at': datetime.utcnow() + timedelta(seconds=delay),
+                             'email_error': error})
+
+    def _update(self, token, values):
+        # Результат пишется сразу после отправки: упавший поток не отправит письмо повторно
+        with self._db.engine.begin() as connection:
+            connection.execute(self._Token.__table__.update().where(self._Token.id == token.id).values(**values))
+
+
+def _save_for_manual_sending(token, reason):
+    """Сохраняет неотправленный пароль в tokens.txt для ручной отправки"""
+    try:
+        with open('tokens.txt', 'a', encoding='utf-8') as f:
+            f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {token.email} - {token.name} - "
+                    f"Токен: {token.token} (EMAIL НЕ ОТПРАВЛЕН: {reason})\n")
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить токен в файл: {e}")
+
+
+# Единый пул на процесс
+mail_dispatcher = MailDispatcher()
+
+
+def enqueue_token_email(token_value):
+    """
+    Ставит письмо с паролем в очередь отправки
+
+    Args:
+        token_value: Пароль (Token.token) уже сохраненной записи
+
+    Returns:
+        bool: True если письмо поставлено в очередь
+    """
+    from models import db, Token
+
+    updated = Token.query.filter_by(token=token_value).update(
+        {'email_status': 'pending', 'email_next_attempt_at': None}, synchronize_session=False)
+    db.session.commit()
+    if not updated:
+        logger.warning(f"Токен {token_value} не найден в базе данных")
+        return False
+    mail_dispatcher.wake()
+    return True
+
+
+def init_mail_dispatcher(app, db, Token):
+    """Подключает пул отправки писем для приложения"""
+    mail_dispatcher.init_app(app, db, Token)
+    # Письма, оставшиеся в очереди от перезапущенного воркера, отправляются и без новых запросов пароля
+    app.before_request(mail_dispatcher.ensure_started)
+    atexit.register(mail_dispatcher.shutdown)
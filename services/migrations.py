@@ -0,0 +1,357 @@
+"""
+Версионные миграции схемы базы данных
+
+Миграции выполняются один раз при деплое (python migrate.py); номера
+примененных миграций хранятся в таблице schema_version. Воркер gunicorn при
+старте только сверяет версию схемы одним запросом (ensure_schema) и не
+выполняет create_all, проверок PRAGMA и ALTER TABLE.
+
+Миграции собраны из скриптов migrate_*.py и бывшей функции init_db в app.py.
+Каждая миграция идемпотентна (добавляет только недостающие столбцы и
+индексы), поэтому база любого возраста, в которой часть изменений уже
+сделана вручную, доводится до текущей схемы без ошибок. Типы и значения по
+умолчанию новых столбцов берутся из моделей - миграции работают и с SQLite,
+и с PostgreSQL.
+
+Новая миграция - функция с декоратором @migration(<следующий номер>, <описание>)
+в конце файла.
+"""
+import logging
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import (Column, DateTime, Integer, MetaData, String, Table, func, inspect, literal,
+                        select, text)
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+
+logger = logging.getLogger(__name__)
+
+Migration = namedtuple('Migration', 'version name apply')
+
+MIGRATIONS = []
+
+# Таблица служебная и не входит в модели приложения (не создается db.create_all)
+schema_version_table = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def migration(version, name):
+    """Регистрирует функцию миграции fn(connection) под номером version"""
+    def decorator(apply):
+        MIGRATIONS.append(Migration(version, name, apply))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return apply
+    return decorator
+
+
+def latest_version():
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+# ----- версия схемы -----
+
+def get_schema_version(engine):
+    """Номер последней примененной миграции (0 - база еще не переведена на миграции)"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(func.max(schema_version_table.c.version))).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        # Таблицы schema_version еще нет
+        return 0
+
+
+def get_applied_versions(conn):
+    if not inspect(conn).has_table(schema_version_table.name):
+        return set()
+    return set(conn.execute(select(schema_version_table.c.version)).scalars())
+
+
+def run_migrations(db, target=None):
+    """
+    Применяет недостающие миграции по порядку
+
+    Каждая миграция выполняется в своей транзакции вместе с записью в
+    schema_version. Если миграцию одновременно применил другой процесс,
+    она пропускается.
+
+    Args:
+        db: Экземпляр базы данных (нужен контекст приложения)
+        target: Номер миграции, до которой обновить схему (по умолчанию - последняя)
+
+    Returns:
+        list: Примененные миграции
+    """
+    return migrate_engine(db.engine, target)
+
+
+def migrate_engine(engine, target=None):
+    """Как run_migrations, но для произвольного движка (перенос данных в другую базу)"""
+    schema_version_table.create(engine, checkfirst=True)
+    target = latest_version() if target is None else target
+
+    applied = []
+    for item in MIGRATIONS:
+        if item.version > target:
+            break
+        try:
+            with engine.begin() as conn:
+                if item.version in get_applied_versions(conn):
+                    continue
+                logger.info(f"Миграция {item.version}: {item.name}...")
+                item.apply(conn)
+                conn.execute(schema_version_table.insert().values(
+                    version=item.version, name=item.name, applied_at=datetime.utcnow()))
+        except IntegrityError:
+            logger.info(f"Миграция {item.version} уже применена другим процессом")
+            continue
+        applied.append(item)
+        logger.info(f"✅ Миграция {item.version} применена: {item.name}")
+    return applied
+
+
+def ensure_schema(app, db):
+    """
+    Проверка схемы при старте воркера: один запрос к schema_version
+
+    Если база отстает (деплой без python migrate.py, новая база при
+    разработке) и включен MIGRATE_ON_STARTUP - недостающие миграции
+    применяются сразу.
+    """
+    with app.app_context():
+        try:
+            current = get_schema_version(db.engine)
+        except Exception as e:
+            logger.error(f"Не удалось прочитать версию схемы базы данных: {e}")
+            return
+        latest = latest_version()
+        if current >= latest:
+            return
+        if not app.config.get('MIGRATE_ON_STARTUP', True):
+            logger.warning(f"Схема базы данных устарела (версия {current}, нужна {latest}): "
+                           f"выполните python migrate.py")
+            return
+        logger.info(f"Схема базы данных устарела (версия {current}, нужна {latest}), применяем миграции")
+        run_migrations(db)
+
+
+# ----- вспомогательные функции миграций -----
+
+def _column_names(conn, table_name):
+    return {column['name'] for column in inspect(conn).get_columns(table_name)}
+
+
+def add_missing_columns(conn, model, *names):
+    """
+    Добавляет столбцы модели, которых нет в таблице
+
+    Тип, NOT NULL и значение по умолчанию берутся из описания столбца в модели.
+
+    Returns:
+        set: Имена добавленных столбцов
+    """
+    table = model.__table__
+    if not inspect(conn).has_table(table.name):
+        return set()
+    existing = _column_names(conn, table.name)
+    preparer = conn.dialect.identifier_preparer
+
+    added = set()
+    for name in names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        ddl = (f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} "
+               f"{column.type.compile(dialect=conn.dialect)}")
+        default = column.default.arg if column.default is not None and column.default.is_scalar else None
+        if default is not None:
+            ddl += " DEFAULT " + str(literal(default, type_=column.type).compile(
+                dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+            if not column.nullable:
+                ddl += " NOT NULL"
+        conn.execute(text(ddl))
+        added.add(name)
+        logger.info(f"Добавлен столбец '{name}' в таблицу {table.name}")
+    return added
+
+
+def has_unique_index(conn, table_name, column_name):
+    """Есть ли уникальный индекс или ограничение ровно по одному столбцу"""
+    inspector = inspect(conn)
+    for index in inspector.get_indexes(table_name):
+        if index.get('unique') and index['column_names'] == [column_name]:
+            return True
+    return any(constraint['column_names'] == [column_name]
+               for constraint in inspector.get_unique_constraints(table_name))
+
+
+def create_missing_indexes(conn, models):
+    """Создает индексы, объявленные в моделях, которых нет в базе"""
+    inspector = inspect(conn)
+    for model in models:
+        table = model.__table__
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name in existing:
+                continue
+            if index.unique and len(index.columns) == 1 and \
+                    has_unique_index(conn, table.name, next(iter(index.columns)).name):
+                # Уникальность уже обеспечена индексом, созданным старым скриптом миграции
+                continue
+            index.create(bind=conn)
+            logger.info(f"Создан индекс {index.name} ({table.name}: "
+                        f"{', '.join(column.name for column in index.columns)})")
+
+
+# ----- миграции -----
+
+@migration(1, "Таблицы моделей")
+def create_tables(conn):
+    """Создает отсутствующие таблицы (бывший db.create_all() в init_db)"""
+    from models import db
+    db.metadata.create_all(bind=conn)
+
+
+@migration(2, "tokens: Telegram администратора и статус отправки писем")
+def add_token_fields(conn):
+    """migrate_add_token_email_fields.py и лёгкая миграция tokens из init_db"""
+    from models import Token
+    added = add_missing_columns(conn, Token, 'telegram', 'telegram_chat_id', 'telegram_link_token',
+                                'email_sent', 'email_sent_at', 'email_status',
+                                'email_attempts', 'email_next_attempt_at', 'email_error')
+    if 'email_status' in added:
+        # Записи старше столбца - не письма в очереди
+        conn.execute(text("UPDATE tokens SET email_status = 'new' WHERE email_status IS NULL"))
+
+
+@migration(3, "Telegram участников и лист ожидания")
+def add_participant_and_waiting_list_fields(conn):
+    """migrate_add_telegram_field.py, migrate_add_telegram_token.py, migrate_railway_db.py (points)"""
+    from models import Participant, WaitingList
+    add_missing_columns(conn, Participant, 'telegram', 'points')
+    add_missing_columns(conn, WaitingList, 'telegram', 'telegram_token', 'status', 'created_at')
+    if inspect(conn).has_table('waiting_list') and not has_unique_index(conn, 'waiting_list', 'telegram_token'):
+        conn.execute(text("CREATE UNIQUE INDEX idx_waiting_list_telegram_token ON waiting_list (telegram_token)"))
+
+
+@migration(4, "Время турниров, счёт сетов и фактическое время матчей")
+def add_match_time_fields(conn):
+    """migrate_add_time_fields.py, migrate_add_actual_times.py, migrate_railway_db.py (сеты)"""
+    from models import Match, Tournament
+    added = add_missing_columns(conn, Tournament, 'start_time', 'end_time')
+    if 'start_time' in added:
+        conn.execute(text("UPDATE tournament SET start_time = '09:00' WHERE start_time IS NULL"))
+    if 'end_time' in added:
+        conn.execute(text("UPDATE tournament SET end_time = '17:00' WHERE end_time IS NULL"))
+    add_missing_columns(conn, Match, 'set1_score1', 'set1_score2', 'set2_score1', 'set2_score2',
+                        'set3_score1', 'set3_score2', 'actual_start_time', 'actual_end_time')
+
+
+@migration(5, "Счетчик смен сторон в розыгрышах")
+def add_rally_swap_count(conn):
+    """migrate_add_swap_count_to_rally.py"""
+    from models import Rally
+    add_missing_columns(conn, Rally, 'swap_count')
+
+
+@migration(6, "Поля сессий пользователей")
+def add_session_fields(conn):
+    """migrate_add_session_fields.py"""
+    from models import UserActivity
+    if not inspect(conn).has_table('user_activity'):
+        return
+    add_missing_columns(conn, UserActivity, 'login_token', 'email', 'expires_at', 'is_terminated',
+                        'terminated_by', 'terminated_at', 'session_duration', 'logout_reason',
+                        'pages_visited_count', 'last_page')
+    for column in ('email', 'login_token', 'is_active', 'last_activity', 'expires_at'):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_user_activity_{column} ON user_activity ({column})"))
+
+
+@migration(7, "Уникальные пароли tokens")
+def add_unique_token_index(conn):
+    """migrate_add_unique_token_constraint.py: повторяющиеся пароли заменяются новыми"""
+    import random
+
+    if not inspect(conn).has_table('tokens') or has_unique_index(conn, 'tokens', 'token'):
+        return
+    duplicates = conn.execute(text(
+        "SELECT token FROM tokens GROUP BY token HAVING COUNT(*) > 1")).scalars().all()
+    for token_value in duplicates:
+        token_ids = conn.execute(text("SELECT id FROM tokens WHERE token = :token ORDER BY created_at, id"),
+                                 {'token': token_value}).scalars().all()
+        # Первый пароль остается, остальные заменяются
+        for token_id in token_ids[1:]:
+            while True:
+                new_token = random.randint(100000, 999999)
+                if not conn.execute(text("SELECT 1 FROM tokens WHERE token = :token"),
+                                    {'token': new_token}).first():
+                    break
+            conn.execute(text("UPDATE tokens SET token = :token WHERE id = :id"), {'token': new_token, 'id': token_id})
+            logger.warning(f"Пароль tokens.id={token_id} повторялся и заменен")
+    conn.execute(text("CREATE UNIQUE INDEX idx_tokens_token_unique ON tokens (token)"))
+
+
+@migration(8, "Индексы моделей")
+def add_model_indexes(conn):
+    """migrate_add_indexes.py: индексы, объявленные в моделях, для таблиц, созданных до них"""
+    from models import db
+    models = [mapper.class_ for mapper in db.Model.registry.mappers]
+    create_missing_indexes(conn, models)
+    # Статистика планировщика, чтобы новые индексы использовались сразу
+    conn.execute(text("ANALYZE"))
+
+
+@migration(9, "Администратор и настройки по умолчанию")
+def create_default_admin_and_settings(conn):
+    """Бывшая часть init_db: создается только то, чего нет (пароль существующего администратора не меняется)"""
+    from werkzeug.security import generate_password_hash
+    from models import User, Settings
+
+    users = User.__table__
+    if not conn.execute(select(users.c.id).where(users.c.username == 'admin')).first():
+        conn.execute(users.insert().values(username='admin', password_hash=generate_password_hash('adm555'),
+                                           role='администратор', created_at=datetime.utcnow()))
+        logger.info("Администратор создан: admin/adm555")
+
+    settings = Settings.__table__
+    if not conn.execute(select(settings.c.id).where(settings.c.key == 'max_tokens')).first():
+        conn.execute(settings.insert().values(
+            key='max_tokens', value='10', description='Максимальное количество паролей для создания турниров',
+            created_at=datetime.utcnow(), updated_at=datetime.utcnow()))
+        logger.info("Настройки по умолчанию инициализированы")
+
+
+@migration(10, "tokens: черновики без пароля не стоят в очереди писем")
+def unqueue_token_drafts(conn):
+    """Черновики привязки Telegram (token=0) создавались со статусом 'pending' по умолчанию"""
+    conn.execute(text("UPDATE tokens SET email_status = 'new' WHERE token = 0 AND email_status = 'pending'"))
+
+
+@migration(11, "standings: места участников существующих турниров")
+def fill_standings(conn):
+    """Строки standings пишутся только при изменении турнира - заполняем их для турниров из базы до таблицы"""
+    from sqlalchemy.orm import Session
+    from models import Tournament, Participant, Match
+    from services.standings import rebuild_standings
+
+    # Таблицы, созданные вручную без части столбцов моделей, ORM не прочитает
+    for model in (Tournament, Participant, Match):
+        missing = {column.name for column in model.__table__.columns} - _column_names(conn, model.__tablename__)
+        if missing:
+            logger.warning(f"{model.__tablename__}: нет столбцов {sorted(missing)}, standings не заполнена - "
+                           f"после исправления схемы выполните python rebuild_standings.py")
+            return
+
+    session = Session(bind=conn)
+    try:
+        tournament_ids = conn.execute(select(Tournament.__table__.c.id)).scalars().all()
+        for tournament_id in tournament_ids:
+            rebuild_standings(session, tournament_id)
+        logger.info(f"Турнирная таблица заполнена для {len(tournament_ids)} турниров")
+    finally:
+        session.close()
@@ -0,0 +1,137 @@
+"""
+Чтение зрительских страниц через отдельное соединение только для чтения
+
+Зрители (страница турнира, опрос /updates) только читают, но раньше шли
+через те же соединения, что и сохранение счета судьями. Маршруты с
+декоратором read_only_route читают через отдельный движок
+app.extensions[READ_ENGINE_KEY]:
+- READ_DATABASE_URL - реплика PostgreSQL;
+- иначе для SQLite - тот же файл базы, открытый с mode=ro: отдельный пул
+  соединений, которые не могут взять блокировку записи.
+
+Движок не регистрируется в SQLALCHEMY_BINDS: привязка Flask-SQLAlchemy
+осталась бы в метаданных общего объекта db, и db.create_all() других
+приложений (тестов) искал бы ее движок.
+
+Запись всегда идет в основную базу: в движок только для чтения
+направляются только SELECT вне flush. После первой записи в транзакции
+сессия до ее конца читает из основной базы (реплика не видит
+незафиксированные изменения). Без движка (тесты, PostgreSQL без реплики)
+все запросы идут в основную базу, как раньше.
+"""
+import logging
+from functools import wraps
+
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+READ_ENGINE_KEY = 'read_replica'
+
+# Значения по умолчанию (переопределяются одноименными настройками в config.py)
+DEFAULTS = {
+    'READ_REPLICA_ENABLED': True,
+    'READ_DATABASE_URL': None,
+}
+
+
+def sqlite_read_only_url(database_uri):
+    """Адрес того же файла SQLite с mode=ro или None (база в памяти, не SQLite)"""
+    url = make_url(database_uri)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    if url.query.get('uri'):
+        # Уже адрес вида sqlite:///file:path?uri=true - добавляем только mode=ro
+        return str(url.update_query_dict({'mode': 'ro'}))
+    return f'{url.drivername}:///file:{url.database}?mode=ro&uri=true'
+
+
+def get_read_database_url(config, database_uri=None):
+    """
+    Адрес базы только для чтения по настройкам приложения (None - без отдельного движка)
+
+    database_uri - адрес основной базы (по умолчанию SQLALCHEMY_DATABASE_URI)
+    """
+    if not config.get('READ_REPLICA_ENABLED', DEFAULTS['READ_REPLICA_ENABLED']):
+        return None
+    from services.database_backend import normalize_database_url
+
+    replica_url = config.get('READ_DATABASE_URL') or DEFAULTS['READ_DATABASE_URL']
+    if replica_url:
+        return normalize_database_url(replica_url)
+    return sqlite_read_only_url(database_uri or config.get('SQLALCHEMY_DATABASE_URI') or 'sqlite://')
+
+
+def init_read_replica(app, db):
+    """
+    Создает движок только для чтения и сохраняет его в app.extensions[READ_ENGINE_KEY]
+
+    Вызывается после db.init_app(app): адрес файла SQLite берется у основного
+    движка, где Flask-SQLAlchemy уже привел путь к папке instance.
+    """
+    app.extensions.pop(READ_ENGINE_KEY, None)
+    with app.app_context():
+        database_uri = db.engine.url.render_as_string(hide_password=False)
+    url = get_read_database_url(app.config, database_uri)
+    if url is None:
+        logger.info("Движок только для чтения не настроен: зрительские страницы читают основную базу")
+        return None
+
+    from services.database_backend import engine_options
+    engine = create_engine(url, **engine_options(app.config, url))
+    if engine.dialect.name == 'sqlite':
+        from services.sqlite_tuning import get_sqlite_settings, install_sqlite_tuning
+
+        settings = get_sqlite_settings(app.config)
+        if settings['SQLITE_TUNING_ENABLED']:
+            install_sqlite_tuning(engine, settings)
+    app.extensions[READ_ENGINE_KEY] = engine
+    logger.info(f"Зрительские страницы читают через {make_url(url).render_as_string(hide_password=True)}")
+    return engine
+
+
+def get_read_engine():
+    """Движок только для чтения текущего приложения (None - не настроен)"""
+    return current_app.extensions.get(READ_ENGINE_KEY) if has_app_context() else None
+
+
+def read_only_route(f):
+    """Декоратор маршрута: SELECT запроса идут в движок только для чтения"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.read_replica = True
+        try:
+            return f(*args, **kwargs)
+        finally:
+            g.read_replica = False
+    return decorated_function
+
+
+def _is_replica_read(clause):
+    if not (has_app_context() and g.get('read_replica')):
+        return False
+    # SELECT ... FOR UPDATE - подготовка к записи
+    return getattr(clause, 'is_select', False) and getattr(clause, '_for_update_arg', None) is None
+
+
+class RoutingSession(Session):
+    """Сессия Flask-SQLAlchemy, направляющая чтение маршрутов read_only_route в движок только для чтения"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not self.info.get('wrote') and _is_replica_read(clause):
+            engine = get_read_engine()
+            if engine is not None:
+                return engine
+        if bind is None and has_app_context() and g.get('read_replica'):
+            # Запись (flush, DML, session.connection()) - дальше в этой транзакции читаем основную базу
+            self.info['wrote'] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('wrote', None)
@@ -0,0 +1,112 @@
+"""
+Планировщик матчей по площадкам и времени
+
+Матчи раскладываются по слотам (длительность матча + перерыв) так, чтобы
+турнирный день закончился как можно раньше: в каждом слоте заняты все площадки,
+для которых есть матч со свободными и отдохнувшими участниками.
+
+Ограничения:
+- участник не играет два матча в одном слоте;
+- между матчами участника проходит не меньше rest_slots свободных слотов.
+
+Жадная списочная раскладка: в каждом слоте первыми берутся матчи участников,
+у которых осталось больше всего игр (они определяют нижнюю границу длительности).
+"""
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+
+def rest_slots_for(min_rest_minutes, match_duration, break_duration):
+    """
+    Сколько слотов участник должен пропустить между матчами
+
+    Между соседними слотами уже есть перерыв break_duration; если требуемый отдых
+    больше, участник пропускает нужное число слотов целиком.
+    """
+    extra_rest = (min_rest_minutes or 0) - (break_duration or 0)
+    if extra_rest <= 0:
+        return 0
+    return math.ceil(extra_rest / (match_duration + break_duration))
+
+
+def makespan_lower_bound(pairs, court_count, rest_slots=0):
+    """Нижняя граница числа слотов: по площадкам и по самому загруженному участнику"""
+    if not pairs:
+        return 0
+    games = {}
+    for p1_id, p2_id in pairs:
+        games[p1_id] = games.get(p1_id, 0) + 1
+        games[p2_id] = games.get(p2_id, 0) + 1
+    busiest = max(games.values())
+    # В одном слоте не больше матчей, чем площадок и непересекающихся пар участников
+    matches_per_slot = min(court_count, len(games) // 2)
+    return max(math.ceil(len(pairs) / matches_per_slot), busiest + (busiest - 1) * rest_slots)
+
+
+def pack_matches(pairs, court_count, rest_slots=0, priority_count=0):
+    """
+    Раскладывает матчи по слотам и площадкам
+
+    Args:
+        pairs: Список пар (p1_id, p2_id) в предпочтительном порядке (например, по турам)
+        court_count: Количество площадок
+        rest_slots: Минимум свободных слотов между матчами одного участника
+        priority_count: Первые priority_count пар ставятся раньше остальных
+            (например, уже сыгранные матчи при пересоздании расписания)
+
+    Returns:
+        list: [(индекс пары, номер слота с 0, номер площадки с 1)] по порядку слотов и площадок
+    """
+    court_count = max(1, court_count or 1)
+    remaining = {}
+    for p1_id, p2_id in pairs:
+        remaining[p1_id] = remaining.get(p1_id, 0) + 1
+        remaining[p2_id] = remaining.get(p2_id, 0) + 1
+
+    last_slot = {}
+    unscheduled = list(range(len(pairs)))
+    placement = []
+    slot = 0
+
+    while unscheduled:
+        def is_rested(participant_id):
+            return participant_id not in last_slot or slot - last_slot[participant_id] > rest_slots
+
+        def priority(index):
+            p1_id, p2_id = pairs[index]
+            return (index >= priority_count,
+                    -max(remaining[p1_id], remaining[p2_id]),
+                    -(remaining[p1_id] + remaining[p2_id]),
+                    index)
+
+        candidates = sorted((index for index in unscheduled
+                             if is_rested(pairs[index][0]) and is_rested(pairs[index][1])), key=priority)
+
+        busy = set()
+        chosen = []
+        for index in candidates:
+            p1_id, p2_id = pairs[index]
+            if p1_id in busy or p2_id in busy:
+                continue
+            chosen.append(index)
+            busy.update((p1_id, p2_id))
+            if len(chosen) == court_count:
+                break
+
+        for court_number, index in enumerate(chosen, start=1):
+            p1_id, p2_id = pairs[index]
+            placement.append((index, slot, court_number))
+            last_slot[p1_id] = last_slot[p2_id] = slot
+            remaining[p1_id] -= 1
+            remaining[p2_id] -= 1
+
+        if chosen:
+            chosen_set = set(chosen)
+            unscheduled = [index for index in unscheduled if index not in chosen_set]
+        slot += 1
+
+    logger.info(f"Раскладка {len(pairs)} матчей на {court_count} площадок: {slot} слотов "
+                f"(нижняя граница {makespan_lower_bound(pairs, court_count, rest_slots)})")
+    return placement
@@ -0,0 +1,110 @@
+"""
+Подбор времени и площадки для новых матчей в уже идущем турнире
+
+Используется при добавлении опоздавшего участника: существующие матчи не
+двигаются, новые ставятся в свободные места расписания.
+
+Занятость хранится в памяти - отсортированные времена начала матчей по каждой
+площадке и по каждому участнику, - поэтому проверка слота стоит O(log n)
+и не требует запросов к базе. Загрузка площадок и участников считается
+инкрементально при каждом назначении.
+"""
+import bisect
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def truncate_to_grid(moment, day_start, slot):
+    """Начало слота сетки игрового дня (day_start + n * slot), в который попадает moment"""
+    day_begin = datetime.combine(moment.date(), day_start)
+    if moment <= day_begin:
+        return moment
+    return day_begin + (moment - day_begin) // slot * slot
+
+
+class SlotAssigner:
+    """
+    Индекс занятости (площадка, время) и (участник, время)
+
+    Args:
+        court_count: Количество площадок
+        match_duration: Длительность матча (минуты)
+        break_duration: Перерыв между матчами (минуты)
+        day_start: Время начала игрового дня
+        day_end: Время, после которого матчи не начинаются
+        earliest: Время, раньше которого новые матчи не ставятся
+        min_rest_minutes: Минимальный отдых участника между матчами (SCHEDULE_MIN_REST_MINUTES)
+    """
+
+    def __init__(self, court_count, match_duration, break_duration, day_start, day_end, earliest,
+                 min_rest_minutes=0):
+        self.court_count = max(1, court_count or 1)
+        self.slot = timedelta(minutes=match_duration + break_duration)
+        # Матчи одной площадки - не ближе чем матч + перерыв,
+        # матчи одного участника - еще и с учетом минимального отдыха
+        self.court_gap = self.slot
+        self.participant_gap = timedelta(minutes=match_duration + max(break_duration, min_rest_minutes or 0))
+        self.day_start = day_start
+        self.day_end = day_end
+        self.earliest = earliest
+
+        self._court_starts = {court: [] for court in range(1, self.court_count + 1)}
+        self._participant_starts = {}
+        # Матчи начиная с earliest: по площадкам и по участникам
+        self.court_load = dict.fromkeys(self._court_starts, 0)
+        self.participant_load = {}
+
+    def occupy(self, participant1_id, participant2_id, court_number, start):
+        """Отмечает занятое место (существующий или назначенный матч)"""
+        bisect.insort(self._court_starts.setdefault(court_number, []), start)
+        for participant_id in (participant1_id, participant2_id):
+            bisect.insort(self._participant_starts.setdefault(participant_id, []), start)
+
+        if start >= self.earliest:
+            self.court_load[court_number] = self.court_load.get(court_number, 0) + 1
+            for participant_id in (participant1_id, participant2_id):
+                self.participant_load[participant_id] = self.participant_load.get(participant_id, 0) + 1
+
+    @staticmethod
+    def _is_free(starts, start, gap):
+        """Нет ни одного начала матча ближе gap к start"""
+        index = bisect.bisect_left(starts, start)
+        if index < len(starts) and starts[index] - start < gap:
+            return False
+        return index == 0 or start - starts[index - 1] >= gap
+
+    def _candidate_times(self):
+        """Времена начала от earliest с шагом матч + перерыв в пределах игрового дня"""
+        current = self.earliest
+        while True:
+            if current.time() < self.day_start:
+                current = datetime.combine(current.date(), self.day_start)
+            elif current.time() > self.day_end:
+                current = datetime.combine(current.date() + timedelta(days=1), self.day_start)
+            yield current
+            current += self.slot
+
+    def assign(self, participant1_id, participant2_id):
+        """
+        Ставит матч в самое раннее место, где свободны площадка и оба участника
+
+        Из свободных площадок выбирается наименее загруженная.
+
+        Returns:
+            tuple: (datetime начала, номер площадки)
+        """
+        participant1_starts = self._participant_starts.get(participant1_id, [])
+        participant2_starts = self._participant_starts.get(participant2_id, [])
+
+        for start in self._candidate_times():
+            if not (self._is_free(participant1_starts, start, self.participant_gap)
+                    and self._is_free(participant2_starts, start, self.participant_gap)):
+                continue
+            free_courts = [court for court in range(1, self.court_count + 1)
+                           if self._is_free(self._court_starts.get(court, []), start, self.court_gap)]
+            if free_courts:
+                court_number = min(free_courts, key=lambda court: (self.court_load.get(court, 0), court))
+                self.occupy(participant1_id, participant2_id, court_number, start)
+                return start, court_number
@@ -0,0 +1,108 @@
+"""
+Настройка соединений SQLite (PRAGMA при открытии каждого соединения)
+
+По умолчанию SQLite работает в режиме журнала отката: пишущая транзакция
+(автосохранение счета судьей) блокирует чтение всей базы, а читатели
+(зрители, опрос /updates) не дают писателю зафиксировать изменения -
+отсюда "database is locked". В режиме WAL читатели не блокируют писателя
+и видят последнюю зафиксированную версию, писатели ждут друг друга
+busy_timeout миллисекунд вместо немедленной ошибки.
+
+Настройки берутся из config.py (SQLITE_*), у каждого окружения свои;
+SQLITE_TUNING_ENABLED=false оставляет параметры SQLite по умолчанию.
+Для других СУБД (DATABASE_URL с PostgreSQL) ничего не делается.
+"""
+import logging
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Значения по умолчанию (переопределяются одноименными настройками в config.py)
+DEFAULTS = {
+    'SQLITE_TUNING_ENABLED': True,
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_CACHE_SIZE_KB': 16 * 1024,
+    'SQLITE_MMAP_SIZE': 128 * 1024 * 1024,
+}
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+
+def get_sqlite_settings(config):
+    """Настройки PRAGMA из конфигурации приложения (с проверкой значений)"""
+    settings = {key: config.get(key, default) for key, default in DEFAULTS.items()}
+    settings['SQLITE_JOURNAL_MODE'] = str(settings['SQLITE_JOURNAL_MODE']).upper()
+    settings['SQLITE_SYNCHRONOUS'] = str(settings['SQLITE_SYNCHRONOUS']).upper()
+    if settings['SQLITE_JOURNAL_MODE'] not in JOURNAL_MODES:
+        raise ValueError(f"Неизвестный SQLITE_JOURNAL_MODE: {settings['SQLITE_JOURNAL_MODE']}")
+    if settings['SQLITE_SYNCHRONOUS'] not in SYNCHRONOUS_MODES:
+        raise ValueError(f"Неизвестный SQLITE_SYNCHRONOUS: {settings['SQLITE_SYNCHRONOUS']}")
+    for key in ('SQLITE_BUSY_TIMEOUT_MS', 'SQLITE_CACHE_SIZE_KB', 'SQLITE_MMAP_SIZE'):
+        settings[key] = int(settings[key])
+    return settings
+
+
+def apply_sqlite_pragmas(dbapi_connection, settings, set_journal_mode=True):
+    """Выполняет PRAGMA на новом соединении sqlite3"""
+    cursor = dbapi_connection.cursor()
+    try:
+        # Сначала ожидание блокировки: смена режима журнала сама может ждать другие соединения
+        cursor.execute(f"PRAGMA busy_timeout = {settings['SQLITE_BUSY_TIMEOUT_MS']}")
+        if set_journal_mode:
+            cursor.execute(f"PRAGMA journal_mode = {settings['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA synchronous = {settings['SQLITE_SYNCHRONOUS']}")
+        # Отрицательное значение - размер кэша страниц в КиБ, а не в страницах
+        cursor.execute(f"PRAGMA cache_size = -{settings['SQLITE_CACHE_SIZE_KB']}")
+        cursor.execute(f"PRAGMA mmap_size = {settings['SQLITE_MMAP_SIZE']}")
+    finally:
+        cursor.close()
+
+
+def read_sqlite_pragmas(connection):
+    """Текущие значения PRAGMA соединения (для проверки и замеров)"""
+    from sqlalchemy import text
+    return {name: connection.execute(text(f'PRAGMA {name}')).scalar()
+            for name in ('journal_mode', 'busy_timeout', 'synchronous', 'cache_size', 'mmap_size')}
+
+
+def install_sqlite_tuning(engine, settings):
+    """
+    Подключает настройку к событию 'connect' движка
+
+    Returns:
+        bool: True, если движок SQLite и настройка подключена
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+    # Режим журнала хранится в файле базы: у базы в памяти WAL не бывает,
+    # соединение только для чтения (mode=ro) его не меняет
+    set_journal_mode = (engine.url.database not in (None, '', ':memory:')
+                        and engine.url.query.get('mode') != 'ro')
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, settings, set_journal_mode)
+
+    # Соединения, открытые до подключения обработчика, открываются заново
+    engine.dispose()
+    return True
+
+
+def init_sqlite_tuning(app, db):
+    """Настраивает соединения SQLite приложения (и привязок SQLALCHEMY_BINDS) по SQLITE_* из config.py"""
+    settings = get_sqlite_settings(app.config)
+    if not settings['SQLITE_TUNING_ENABLED']:
+        logger.info("Настройка SQLite отключена (SQLITE_TUNING_ENABLED=false)")
+        return False
+    with app.app_context():
+        installed = any([install_sqlite_tuning(engine, settings) for engine in db.engines.values()])
+    if installed:
+        logger.info(f"SQLite: journal_mode={settings['SQLITE_JOURNAL_MODE']}, "
+                    f"busy_timeout={settings['SQLITE_BUSY_TIMEOUT_MS']} мс, "
+                    f"synchronous={settings['SQLITE_SYNCHRONOUS']}, "
+                    f"cache_size={settings['SQLITE_CACHE_SIZE_KB']} КиБ, mmap_size={settings['SQLITE_MMAP_SIZE']}")
+    return installed
@@ -0,0 +1,502 @@
+"""
+Турнирная таблица: инкрементальный расчёт и хранение в таблице standings
+
+Для каждого турнира в памяти процесса хранится StandingsStore: суммарная
+статистика участников, вклад каждого матча и группы участников по очкам.
+Изменение результата матча (новый счёт, исправление, отмена) применяется
+как разница вкладов за O(1), а личные встречи пересчитываются только в тех
+группах по очкам, которых коснулось изменение.
+
+Правила расчёта мест те же, что в routes.main.calculate_participant_ranking
+(используются общие функции match_result_contribution и resolve_points_group).
+
+Места сохраняются в таблицу standings в той же транзакции, что и изменения
+матчей (перед commit), поэтому страницы читают таблицу одним SELECT.
+Таблица в памяти используется как ускоритель записи: она проверяется по
+версии турнира (services.change_version) и пересобирается из матчей при
+структурных изменениях (участники, настройки, новые и удалённые матчи) или
+записях из других процессов. Проверка и восстановление: rebuild_standings.py.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Максимальное количество турниров, таблицы которых держим в памяти
+MAX_STORES = 64
+
+# Поля матча, от которых зависит его вклад в таблицу
+MATCH_RESULT_FIELDS = ('status', 'sets_won_1', 'sets_won_2',
+                       'set1_score1', 'set1_score2', 'set2_score1', 'set2_score2',
+                       'set3_score1', 'set3_score2')
+
+# Поля матча, изменение которых требует пересборки таблицы
+# (другие участники, удаление из турнира). Перенос матча по времени (пересчет
+# расписания) таблицу не пересобирает; дубли по дате/времени исправляет rebuild_standings.py
+MATCH_STRUCTURAL_FIELDS = ('tournament_id', 'participant1_id', 'participant2_id', 'is_removed')
+
+# Поля строки standings (кроме ключа)
+STANDING_FIELDS = ('place', 'points', 'wins', 'losses', 'games', 'sets_won', 'sets_lost', 'set_difference')
+
+_stores = OrderedDict()
+_stores_lock = threading.Lock()
+
+# Турниры, о расчете которых в памяти (строки standings не совпали) уже предупредили
+_fallback_reported = set()
+
+
+def _tournament_settings(tournament):
+    """Настройки турнира, влияющие на подсчёт очков"""
+    return SimpleNamespace(
+        points_win=tournament.points_win,
+        points_loss=tournament.points_loss,
+        sets_to_win=tournament.sets_to_win
+    )
+
+
+def _pair_key(p1_id, p2_id):
+    return (p1_id, p2_id) if p1_id <= p2_id else (p2_id, p1_id)
+
+
+class StandingsStore:
+    """Турнирная таблица одного турнира с инкрементальным обновлением"""
+
+    def __init__(self, tournament, participants, matches, version):
+        from routes.main import new_participant_stats, match_result_contribution
+
+        self.tournament_id = tournament.id
+        self.settings = _tournament_settings(tournament)
+        self.participant_ids = tuple(participant.id for participant in participants)
+        self.version = version
+        self.lock = threading.RLock()
+
+        # Таблица живёт дольше сессии, поэтому хранит не ORM-объекты, а только id
+        self._order = {participant.id: index for index, participant in enumerate(participants)}
+        self.stats = {participant.id: new_participant_stats(SimpleNamespace(id=participant.id))
+                      for participant in participants}
+        self._contributions = {}   # match_id -> вклад матча
+        self._match_order = {}     # match_id -> порядок матча (для личных встреч)
+        self._pair_matches = {}    # пара участников -> id учтённых матчей
+        self._buckets = {}         # очки -> id участников
+        self._resolved = {}        # очки -> упорядоченные id участников
+        self._dirty = set()        # группы по очкам, требующие пересчёта
+
+        for participant_id in self.participant_ids:
+            self._buckets.setdefault(0, set()).add(participant_id)
+        self._dirty.add(0)
+
+        for match in matches:
+            self._match_order[match.id] = len(self._match_order)
+            self.apply_match(match.id, match_result_contribution(match, self.settings))
+
+    def fork(self):
+        """Копия таблицы для изменения внутри транзакции (без обращения к базе)"""
+        store = object.__new__(StandingsStore)
+        store.__dict__.update(self.__dict__)
+        store.lock = threading.RLock()
+        store.stats = {participant_id: dict(p_data, head_to_head=dict(p_data['head_to_head']))
+                       for participant_id, p_data in self.stats.items()}
+        store._contributions = dict(self._contributions)
+        store._match_order = dict(self._match_order)
+        store._pair_matches = {pair: set(match_ids) for pair, match_ids in self._pair_matches.items()}
+        store._buckets = {points: set(members) for points, members in self._buckets.items()}
+        store._resolved = dict(self._resolved)
+        store._dirty = set(self._dirty)
+        return store
+
+    def counts_match(self, match_id):
+        """Учитывается ли матч таблицей (удалённые и дубли не учитываются)"""
+        return match_id in self._match_order
+
+    def apply_match(self, match_id, contribution):
+        """
+        Применяет (новый) вклад матча: старый вклад вычитается, новый добавляется
+
+        contribution=None - матч больше не учитывается (результат отменён).
+        Повторное применение того же вклада ничего не меняет.
+
+        Returns:
+            bool: изменилась ли таблица
+        """
+        from routes.main import apply_match_contribution
+
+        if contribution is not None and (contribution[0] not in self.stats or contribution[1] not in self.stats):
+            contribution = None
+
+        old = self._contributions.pop(match_id, None)
+        if old == contribution:
+            # Результат матча не изменился (например, матч перенесли по времени)
+            if old is not None:
+                self._contributions[match_id] = old
+            return False
+
+        affected = {c[i] for c in (old, contribution) if c is not None for i in (0, 1)}
+        old_points = {participant_id: self.stats[participant_id]['points'] for participant_id in affected}
+
+        if old is not None:
+            apply_match_contribution(self.stats, old, -1)
+            self._pair_matches.get(_pair_key(old[0], old[1]), set()).discard(match_id)
+            self._refresh_head_to_head(old[0], old[1])
+
+        if contribution is not None:
+            self._match_order.setdefault(match_id, len(self._match_order))
+            self._contributions[match_id] = contribution
+            apply_match_contribution(self.stats, contribution)
+            self._pair_matches.setdefault(_pair_key(contribution[0], contribution[1]), set()).add(match_id)
+            self._refresh_head_to_head(contribution[0], contribution[1])
+
+        for participant_id in affected:
+            new_points = self.stats[participant_id]['points']
+            if new_points != old_points[participant_id]:
+                bucket = self._buckets[old_points[participant_id]]
+                bucket.discard(participant_id)
+                if not bucket:
+                    del self._buckets[old_points[participant_id]]
+                    self._resolved.pop(old_points[participant_id], None)
+                self._buckets.setdefault(new_points, set()).add(participant_id)
+                self._dirty.add(old_points[participant_id])
+            # Разность сетов и личные встречи влияют на порядок внутри группы
+            self._dirty.add(new_points)
+        return True
+
+    def _refresh_head_to_head(self, p1_id, p2_id):
+        """Личная встреча пары - результат последнего учтённого матча между ними"""
+        result = None
+        match_ids = sorted(self._pair_matches.get(_pair_key(p1_id, p2_id), ()), key=self._match_order.get)
+        for match_id in match_ids:
+            contribution = self._contributions[match_id]
+            if contribution[4]:
+                result = contribution
+
+        if result is None:
+            self.stats[p1_id]['head_to_head'].pop(p2_id, None)
+            self.stats[p2_id]['head_to_head'].pop(p1_id, None)
+        else:
+            c1_id, c2_id, _, _, h2h1, h2h2 = result
+            self.stats[c1_id]['head_to_head'][c2_id] = h2h1
+            self.stats[c2_id]['head_to_head'][c1_id] = h2h2
+
+    def ranking(self, participants=None):
+        """
+        Возвращает рейтинг в формате calculate_participant_ranking
+
+        Группы по очкам, не изменившиеся с прошлого вызова, не пересчитываются.
+        Если переданы participants, в результат подставляются их ORM-объекты.
+        """
+        from routes.main import resolve_points_group
+
+        for points in self._dirty:
+            if points not in self._buckets:
+                continue
+            group = [self.stats[participant_id]
+                     for participant_id in sorted(self._buckets[points], key=self._order.get)]
+            self._resolved[points] = [p_data['participant'].id
+                                      for p_data in resolve_points_group(points, group, self.stats)]
+        self._dirty.clear()
+
+        participants_by_id = {participant.id: participant for participant in participants or ()}
+        final_ranking = []
+        for points in sorted(self._buckets, reverse=True):
+            for participant_id in self._resolved[points]:
+                p_data = dict(self.stats[participant_id])
+                p_data['head_to_head'] = dict(p_data['head_to_head'])
+                p_data['participant'] = participants_by_id.get(participant_id, p_data['participant'])
+                p_data['place'] = len(final_ranking) + 1
+                final_ranking.append(p_data)
+        return final_ranking
+
+
+def _load_ranked_matches(session, tournament_id, Match):
+    """Матчи турнира, учитываемые в таблице (без удалённых и дублей)"""
+    from services.tournament_updates import deduplicate_matches
+
+    matches = session.query(Match).filter_by(tournament_id=tournament_id, is_removed=False).order_by(
+        Match.match_date, Match.match_time).all()
+    return deduplicate_matches(matches)
+
+
+def _install_store(store):
+    """Сохраняет таблицу в памяти процесса (не более MAX_STORES турниров)"""
+    with _stores_lock:
+        current = _stores.get(store.tournament_id)
+        if current is not None and current.version is not None and current.version > store.version:
+            # Другой поток уже положил более новую таблицу
+            return
+        _stores[store.tournament_id] = store
+        _stores.move_to_end(store.tournament_id)
+        while len(_stores) > MAX_STORES:
+            _stores.popitem(last=False)
+
+
+def get_tournament_ranking(db, tournament, participants, Match, version=None, matches=None):
+    """
+    Рассчитывает рейтинг участников турнира (как calculate_participant_ranking)
+
+    Таблица берётся из памяти, если её версия совпадает с версией турнира в базе;
+    иначе пересобирается по матчам турнира.
+
+    Args:
+        db: Экземпляр базы данных
+        tournament: Турнир
+        participants: Участники турнира (порядок задаёт порядок при равенстве)
+        Match: Модель Match
+        version: Версия турнира, если уже прочитана вызывающим кодом
+        matches: Матчи без удалённых и дублей, загруженные ПОСЛЕ чтения version
+    """
+    from services.change_version import get_tournament_version
+
+    if version is None:
+        version = get_tournament_version(db, tournament.id)
+    participant_ids = tuple(participant.id for participant in participants)
+
+    with _stores_lock:
+        store = _stores.get(tournament.id)
+
+    if (store is None or store.version != version or store.participant_ids != participant_ids
+            or store.settings != _tournament_settings(tournament)):
+        if matches is None:
+            matches = _load_ranked_matches(db.session, tournament.id, Match)
+        store = StandingsStore(tournament, participants, matches, version)
+        logger.info(f"Турнирная таблица турнира {tournament.id} пересобрана (версия {version})")
+        _install_store(store)
+
+    with store.lock:
+        return store.ranking(participants)
+
+
+def load_standings(db, tournament, participants, Match, version=None, matches=None):
+    """
+    Читает рейтинг из таблицы standings одним запросом (по индексу tournament_id, place)
+
+    Формат результата - как у calculate_participant_ranking. Если строки таблицы
+    не соответствуют участникам (таблица ещё не заполнена), рейтинг
+    рассчитывается в памяти. Строки существующих турниров заполняет миграция 11
+    (python migrate.py), исправляет - скрипт rebuild_standings.py.
+    """
+    from models.standing import Standing
+
+    rows = db.session.query(Standing).filter_by(tournament_id=tournament.id).order_by(Standing.place).all()
+    participants_by_id = {participant.id: participant for participant in participants}
+
+    if len(rows) != len(participants_by_id) or any(row.participant_id not in participants_by_id for row in rows):
+        # Страницы зрителей опрашивают таблицу постоянно - предупреждаем один раз на турнир
+        if tournament.id in _fallback_reported:
+            logger.debug(f"Таблица standings турнира {tournament.id} не совпадает с участниками, расчет в памяти")
+        else:
+            _fallback_reported.add(tournament.id)
+            logger.warning(f"Таблица standings турнира {tournament.id} не заполнена или устарела, расчет в памяти "
+                           f"(исправление: python rebuild_standings.py --tournament {tournament.id})")
+        return get_tournament_ranking(db, tournament, participants, Match, version=version, matches=matches)
+
+    final_ranking = []
+    for row in rows:
+        p_data = {field: getattr(row, field) for field in STANDING_FIELDS}
+        p_data.update(participant=participants_by_id[row.participant_id], draws=0, head_to_head={})
+        final_ranking.append(p_data)
+    return final_ranking
+
+
+def write_standings(connection, tournament_id, ranking):
+    """Перезаписывает строки standings турнира (в текущей транзакции)"""
+    from models.standing import Standing
+
+    table = Standing.__table__
+    connection.execute(table.delete().where(table.c.tournament_id == tournament_id))
+    if ranking:
+        now = datetime.utcnow()
+        connection.execute(table.insert(), [
+            dict({field: p_data[field] for field in STANDING_FIELDS},
+                 tournament_id=tournament_id, participant_id=p_data['participant'].id, updated_at=now)
+            for p_data in ranking
+        ])
+
+
+def build_standings_store(session, tournament_id, version=None):
+    """
+    Строит таблицу турнира по матчам в базе (в рамках сессии)
+
+    Returns:
+        StandingsStore или None, если турнира нет
+    """
+    from models import Tournament, Participant, Match
+
+    tournament = session.get(Tournament, tournament_id)
+    if tournament is None:
+        return None
+    participants = session.query(Participant).filter_by(tournament_id=tournament_id).order_by(Participant.name).all()
+    return StandingsStore(tournament, participants, _load_ranked_matches(session, tournament_id, Match), version)
+
+
+def rebuild_standings(session, tournament_id):
+    """
+    Пересчитывает места турнира по матчам и перезаписывает строки standings
+
+    Returns:
+        list: рейтинг турнира (пустой, если турнира нет)
+    """
+    store = build_standings_store(session, tournament_id)
+    ranking = store.ranking() if store else []
+    write_standings(session.connection(), tournament_id, ranking)
+    drop_standings(tournament_id)
+    return ranking
+
+
+def drop_standings(tournament_id=None):
+    """Сбрасывает таблицы из памяти (все или одного турнира)"""
+    with _stores_lock:
+        if tournament_id is None:
+            _stores.clear()
+        else:
+            _stores.pop(tournament_id, None)
+
+
+def _after_flush(session, flush_context):
+    """Запоминает изменения матчей, участников и турниров для пересчета мест"""
+    changes = {}
+
+    def change_for(tournament_id):
+        return changes.setdefault(tournament_id, {'matches': {}, 'structural': False})
+
+    for obj in list(session.new) + list(session.deleted) + list(session.dirty):
+        table = getattr(obj, '__tablename__', None)
+        if table not in ('match', 'participant', 'tournament'):
+            continue
+
+        state = inspect(obj)
+        if table == 'tournament':
+            if obj.id is not None:
+                change_for(obj.id)['structural'] = True
+            continue
+
+        is_new_or_deleted = obj in session.new or obj in session.deleted
+        if not is_new_or_deleted and not session.is_modified(obj, include_collections=False):
+            continue
+
+        tournament_ids = {obj.tournament_id}
+        tournament_ids.update(state.attrs.tournament_id.history.deleted or ())
+        tournament_ids.discard(None)
+        tournament_ids.discard(0)  # свободные матчи не входят в турниры
+
+        if (table == 'participant' or is_new_or_deleted
+                or any(state.attrs[field].history.has_changes() for field in MATCH_STRUCTURAL_FIELDS)):
+            for tournament_id in tournament_ids:
+                change_for(tournament_id)['structural'] = True
+            continue
+
+        if tournament_ids:
+            snapshot = SimpleNamespace(**{field: getattr(obj, field) for field in MATCH_RESULT_FIELDS},
+                                       participant1_id=obj.participant1_id,
+                                       participant2_id=obj.participant2_id)
+            change_for(obj.tournament_id)['matches'][obj.id] = snapshot
+
+    if changes:
+        _record_changes(session, changes)
+
+
+def _record_changes(session, changes):
+    """Добавляет изменения турниров в standings_changes текущей транзакции"""
+    # Версии после увеличения (services.change_version выполняется раньше)
+    from models.tournament_version import TournamentVersion
+    rows = session.connection().execute(
+        select(TournamentVersion.tournament_id, TournamentVersion.version)
+        .where(TournamentVersion.tournament_id.in_(list(changes)))
+    ).all()
+    versions = dict(rows)
+
+    pending = session.info.setdefault('standings_changes', {})
+    for tournament_id, change in changes.items():
+        entry = pending.setdefault(tournament_id, {
+            'matches': {},
+            'structural': False,
+            # Версия до первого изменения в этой транзакции
+            'base_version': versions.get(tournament_id, 1) - 1
+        })
+        entry['matches'].update(change['matches'])
+        entry['structural'] = entry['structural'] or change['structural']
+        entry['final_version'] = versions.get(tournament_id, 0)
+
+
+def mark_tournaments_changed(session, tournament_ids):
+    """
+    Отмечает турниры, матчи которых изменены в обход ORM (raw SQL, пакетная вставка)
+
+    Вызывается после bump_tournament_versions; при commit таблица этих турниров
+    пересчитывается по базе.
+    """
+    _record_changes(session, {tournament_id: {'matches': {}, 'structural': True}
+                              for tournament_id in set(tournament_ids)})
+
+
+def _transaction_store(session, tournament_id, change):
+    """Таблица турнира с учетом изменений текущей транзакции"""
+    from routes.main import match_result_contribution
+
+    with _stores_lock:
+        cached = _stores.get(tournament_id)
+
+    if cached is not None and not change['structural'] and cached.version == change['base_version']:
+        with cached.lock:
+            store = cached.fork()
+        change['changed'] = False
+        for match_id, snapshot in change['matches'].items():
+            if store.counts_match(match_id):
+                if store.apply_match(match_id, match_result_contribution(snapshot, store.settings)):
+                    change['changed'] = True
+        return store
+
+    # Нет актуальной таблицы в памяти или изменился состав турнира - строим по базе
+    return build_standings_store(session, tournament_id)
+
+
+def _before_commit(session):
+    """Пересчитывает места затронутых турниров и пишет их в standings в той же транзакции"""
+    # Оставшиеся изменения должны попасть в standings_changes до расчета
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    if not session.info.get('standings_changes'):
+        return
+
+    for tournament_id, change in session.info['standings_changes'].items():
+        store = _transaction_store(session, tournament_id, change)
+        if change.get('changed', True):
+            write_standings(session.connection(), tournament_id, store.ranking() if store else [])
+        change['store'] = store
+
+
+def _after_commit(session):
+    """Кладёт пересчитанные таблицы в память процесса"""
+    pending = session.info.pop('standings_changes', None)
+    if not pending:
+        return
+
+    for tournament_id, change in pending.items():
+        store = change.get('store')
+        if store is None:
+            drop_standings(tournament_id)
+            continue
+        store.version = change['final_version']
+        _install_store(store)
+
+
+def _after_rollback(session):
+    session.info.pop('standings_changes', None)
+
+
+def init_standings_tracking():
+    """Подключает пересчет standings при сохранении (после init_change_tracking)"""
+    from services.change_version import init_change_tracking
+
+    # Версии должны увеличиваться до того, как мы их прочитаем в after_flush
+    init_change_tracking()
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'before_commit', _before_commit)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
+        logger.info("Пересчет турнирной таблицы при сохранении включен")
@@ -0,0 +1,308 @@
+"""
+Очередь исходящих сообщений Telegram (таблица outbound_message)
+
+Обработчики запросов только добавляют сообщение в очередь
+(enqueue_telegram_message) - в той же транзакции, что и остальные изменения.
+Фоновый поток процесса забирает пачку готовых к отправке сообщений,
+отправляет их через общий requests.Session с соблюдением ограничений
+Telegram (общий поток сообщений в секунду и интервал сообщений в один чат)
+и записывает результаты одной транзакцией. Неудачные попытки повторяются
+с экспоненциальной паузой (при 429 - с паузой, которую указал Telegram).
+
+Сообщения забираются условным UPDATE, поэтому несколько воркеров gunicorn
+не отправляют одно сообщение дважды; сообщения, забранные упавшим воркером,
+возвращаются в очередь через TELEGRAM_OUTBOX_STALE_SECONDS.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, bindparam, event, or_, select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'telegram'
+
+# Значения по умолчанию (переопределяются одноименными настройками в config.py)
+DEFAULTS = {
+    'TELEGRAM_OUTBOX_BATCH_SIZE': 20,
+    'TELEGRAM_OUTBOX_POLL_SECONDS': 5.0,
+    'TELEGRAM_OUTBOX_MAX_ATTEMPTS': 5,
+    'TELEGRAM_OUTBOX_BACKOFF_SECONDS': 5.0,
+    'TELEGRAM_OUTBOX_MAX_BACKOFF_SECONDS': 600.0,
+    'TELEGRAM_OUTBOX_STALE_SECONDS': 300.0,
+    'TELEGRAM_RATE_PER_SECOND': 25,
+    'TELEGRAM_CHAT_INTERVAL_SECONDS': 1.0,
+}
+
+
+class RateLimiter:
+    """
+    Ограничение скорости отправки внутри процесса
+
+    Не больше per_second сообщений за скользящую секунду и не чаще
+    одного сообщения в chat_interval секунд в один чат.
+    """
+
+    def __init__(self, per_second, chat_interval):
+        self.per_second = per_second
+        self.chat_interval = chat_interval
+        self._sent = deque()
+        self._chat_sent_at = {}
+
+    def chat_delay(self, chat_id, now=None):
+        """Сколько секунд ждать до следующего сообщения в чат"""
+        now = time.monotonic() if now is None else now
+        last = self._chat_sent_at.get(chat_id)
+        return 0.0 if last is None else max(0.0, last + self.chat_interval - now)
+
+    def global_delay(self, now=None):
+        """Сколько секунд ждать до следующего сообщения с учетом общего ограничения"""
+        now = time.monotonic() if now is None else now
+        while self._sent and now - self._sent[0] >= 1.0:
+            self._sent.popleft()
+        if len(self._sent) < self.per_second:
+            return 0.0
+        return self._sent[0] + 1.0 - now
+
+    def record(self, chat_id, now=None):
+        now = time.monotonic() if now is None else now
+        self._sent.append(now)
+        self._chat_sent_at[chat_id] = now
+        # Старые отметки чатов не нужны: через chat_interval они ничего не ограничивают
+        if len(self._chat_sent_at) > 10000:
+            self._chat_sent_at = {chat: sent_at for chat, sent_at in self._chat_sent_at.items()
+                                  if now - sent_at < self.chat_interval}
+
+
+class TelegramOutbox:
+    """Фоновая отправка сообщений из очереди outbound_message"""
+
+    def __init__(self):
+        self._app = None
+        self._db = None
+        self._OutboundMessage = None
+        self._settings = dict(DEFAULTS)
+        self._limiter = RateLimiter(DEFAULTS['TELEGRAM_RATE_PER_SECOND'], DEFAULTS['TELEGRAM_CHAT_INTERVAL_SECONDS'])
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        # Через сколько секунд подойдет ближайшее отложенное в последней пачке сообщение
+        self._retry_in = None
+
+    def init_app(self, app, db, OutboundMessage):
+        """Подключает очередь к приложению (поток стартует при первом сообщении в процессе)"""
+        self._app = app
+        self._db = db
+        self._OutboundMessage = OutboundMessage
+        self._settings = {name: app.config.get(name, default) for name, default in DEFAULTS.items()}
+        self._limiter = RateLimiter(self._settings['TELEGRAM_RATE_PER_SECOND'],
+                                    self._settings['TELEGRAM_CHAT_INTERVAL_SECONDS'])
+
+    def wake(self):
+        """Будит фоновый поток (после коммита новых сообщений)"""
+        if self._app is None:
+            return
+        self.ensure_started()
+        self._wakeup.set()
+
+    def ensure_started(self):
+        # После fork воркера gunicorn поток родителя не существует - запускаем свой
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='telegram-outbox', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                with self._app.app_context():
+                    processed = self.drain_once()
+            except Exception as e:
+                logger.error(f"Ошибка фоновой отправки Telegram: {e}")
+                processed = 0
+            # Полная пачка - в очереди, скорее всего, есть еще сообщения
+            if processed < self._settings['TELEGRAM_OUTBOX_BATCH_SIZE']:
+                timeout = self._settings['TELEGRAM_OUTBOX_POLL_SECONDS']
+                if self._retry_in is not None:
+                    timeout = min(timeout, self._retry_in)
+                self._wakeup.wait(timeout)
+                self._wakeup.clear()
+
+    # ----- обработка пачки -----
+
+    def drain_once(self):
+        """
+        Забирает и отправляет одну пачку сообщений
+
+        Returns:
+            int: количество обработанных сообщений
+        """
+        self._retry_in = None
+        messages = self._claim_batch()
+        if not messages:
+            return 0
+
+        from flask import current_app
+        from utils.telegram_utils import deliver_telegram_message, log_delivery_error
+
+        bot_token = current_app.config.get('TELEGRAM_BOT_TOKEN')
+        api_url = current_app.config.get('TELEGRAM_API_URL')
+        results = []
+        for message in messages:
+            delay = self._limiter.chat_delay(message.recipient)
+            if delay > 0:
+                # Чат недавно получал сообщение - откладываем, не тратя попытку
+                results.append(self._result(message, 'pending', message.attempts, delay, message.last_error))
+                continue
+            pause = self._limiter.global_delay()
+            if pause > 0:
+                time.sleep(pause)
+
+            result = deliver_telegram_message(message.recipient, message.body, message.parse_mode,
+                                              bot_token=bot_token, api_url=api_url)
+            self._limiter.record(message.recipient)
+            attempts = message.attempts + 1
+            if result.ok:
+                results.append(self._result(message, 'sent', attempts, 0, None, sent=True))
+                continue
+
+            log_delivery_error(message.recipient, result)
+            if result.permanent or attempts >= self._settings['TELEGRAM_OUTBOX_MAX_ATTEMPTS']:
+                logger.warning(f"Сообщение {message.id} в Telegram не доставлено после {attempts} попыток: {result.error}")
+                results.append(self._result(message, 'failed', attempts, 0, result.error))
+            else:
+                results.append(self._result(message, 'pending', attempts,
+                                            self._retry_delay(attempts, result.retry_after), result.error))
+
+        self._save_results(results)
+        now = datetime.utcnow()
+        retries = [(result['next_attempt_at'] - now).total_seconds() for result in results if result['status'] == 'pending']
+        if retries:
+            self._retry_in = max(0.0, min(retries))
+        return len(messages)
+
+    def _retry_delay(self, attempts, retry_after=None):
+        if retry_after:
+            return float(retry_after)
+        delay = self._settings['TELEGRAM_OUTBOX_BACKOFF_SECONDS'] * 2 ** (attempts - 1)
+        return min(delay, self._settings['TELEGRAM_OUTBOX_MAX_BACKOFF_SECONDS'])
+
+    @staticmethod
+    def _result(message, status, attempts, delay, error, sent=False):
+        now = datetime.utcnow()
+        return {'message_id': message.id, 'status': status, 'attempts': attempts,
+                'next_attempt_at': now + timedelta(seconds=delay), 'last_error': error,
+                'sent_at': now if sent else None}
+
+    def _claim_batch(self):
+        """Помечает пачку готовых сообщений меткой этого воркера и возвращает их"""
+        table = self._OutboundMessage.__table__
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=self._settings['TELEGRAM_OUTBOX_STALE_SECONDS'])
+        due = and_(
+            table.c.channel == CHANNEL,
+            or_(and_(table.c.status == 'pending', table.c.next_attempt_at <= now),
+                and_(table.c.status == 'sending', table.c.claimed_at < stale_before))
+        )
+        claim_token = uuid.uuid4().hex
+
+        with self._db.engine.begin() as connection:
+            ids = connection.execute(
+                select(table.c.id).where(due).order_by(table.c.id)
+                .limit(self._settings['TELEGRAM_OUTBOX_BATCH_SIZE'])
+            ).scalars().all()
+            if not ids:
+                return []
+            # Повторное условие due: сообщение, уже забранное другим воркером, не забирается
+            connection.execute(
+                table.update().where(table.c.id.in_(ids), due)
+                .values(status='sending', claim_token=claim_token, claimed_at=now)
+            )
+            return connection.execute(
+                select(table.c.id, table.c.recipient, table.c.body, table.c.parse_mode,
+                       table.c.attempts, table.c.last_error)
+                .where(table.c.claim_token == claim_token).order_by(table.c.id)
+            ).all()
+
+    def _save_results(self, results):
+        """Результаты пачки - одним UPDATE"""
+        table = self._OutboundMessage.__table__
+        statement = table.update().where(table.c.id == bindparam('message_id')).values(
+            status=bindparam('status'),
+            attempts=bindparam('attempts'),
+            next_attempt_at=bindparam('next_attempt_at'),
+            last_error=bindparam('last_error'),
+            sent_at=bindparam('sent_at'),
+            claim_token=None,
+            claimed_at=None
+        )
+        with self._db.engine.begin() as connection:
+            connection.execute(statement, results)
+
+
+# Единая очередь на процесс
+telegram_outbox = TelegramOutbox()
+
+
+def enqueue_telegram_message(message, telegram_contact=None, parse_mode='HTML', commit=True):
+    """
+    Добавляет сообщение в очередь отправки
+
+    Args:
+        message: Текст сообщения (поддерживает HTML форматирование)
+        telegram_contact: Chat ID или @username получателя. Если не указан,
+                         сообщение отправляется автору (TELEGRAM_CHAT_ID)
+        parse_mode: Форматирование текста
+        commit: Зафиксировать транзакцию сразу (False - сообщение уйдет
+                вместе с ближайшим commit вызывающего кода)
+
+    Returns:
+        bool: True если сообщение поставлено в очередь
+    """
+    from flask import current_app
+    from models import db, OutboundMessage
+
+    chat_id = telegram_contact or current_app.config.get('TELEGRAM_CHAT_ID')
+    if not current_app.config.get('TELEGRAM_BOT_TOKEN'):
+        logger.warning("❌ Telegram bot token не задан")
+        return False
+    if not chat_id:
+        logger.warning("❌ Telegram chat ID не указан")
+        return False
+
+    db.session.add(OutboundMessage(channel=CHANNEL, recipient=str(chat_id), body=message, parse_mode=parse_mode))
+    db.session.info['telegram_outbox_wake'] = True
+    if commit:
+        db.session.commit()
+    logger.info(f"Сообщение в Telegram поставлено в очередь (chat_id: {chat_id})")
+    return True
+
+
+def _after_commit(session):
+    if session.info.pop('telegram_outbox_wake', False):
+        telegram_outbox.wake()
+
+
+def _after_rollback(session):
+    session.info.pop('telegram_outbox_wake', None)
+
+
+def init_telegram_outbox(app, db, OutboundMessage):
+    """Подключает фоновую отправку очереди Telegram для приложения"""
+    telegram_outbox.init_app(app, db, OutboundMessage)
+    # Сообщения, поставленные другими процессами, отправляются и без новых сообщений в этом
+    app.before_request(telegram_outbox.ensure_started)
+    if not event.contains(Session, 'after_commit', _after_commit):
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
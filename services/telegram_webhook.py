@@ -0,0 +1,90 @@
+"""
+Прием обновлений Telegram бота через webhook (альтернатива long polling)
+
+В режиме webhook (TELEGRAM_WEBHOOK_ENABLED) Telegram сам присылает обновления
+на POST /api/telegram/webhook, и отдельный процесс telegram_bot_handler.py
+с getUpdates не нужен. Команды обрабатываются тем же кодом, что и при
+long polling (TelegramBotHandler.handle_command), но:
+- привязка токена выполняется напрямую, без HTTP-запроса к API приложения;
+- ответы ставятся в очередь отправки (services/telegram_outbox.py) и
+  фиксируются в той же транзакции, что и привязка.
+
+Telegram повторяет доставку, пока не получит ответ 2xx, поэтому принятые
+update_id сохраняются в telegram_update и повторное обновление пропускается.
+"""
+import logging
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+# Сколько хранить принятые update_id (Telegram повторяет доставку не дольше суток)
+DEDUP_RETENTION = timedelta(days=1)
+# Доля запросов, после которых удаляются устаревшие update_id
+DEDUP_CLEANUP_PROBABILITY = 0.01
+
+
+def create_webhook_handler(link_chat):
+    """
+    Создает обработчик команд бота для режима webhook
+
+    Args:
+        link_chat: Функция (token, chat_id) -> bool, привязывающая Chat ID к токену
+    """
+    # Импорт здесь: модуль бота при загрузке настраивает логирование своего процесса
+    from telegram_bot_handler import TelegramBotHandler
+
+    class WebhookBotHandler(TelegramBotHandler):
+        """Команды бота внутри приложения: без getUpdates, пула потоков и HTTP-запросов"""
+
+        def __init__(self):
+            self.last_update_id = 0
+
+        def send_message(self, chat_id, text):
+            from services.telegram_outbox import enqueue_telegram_message
+            return enqueue_telegram_message(text, telegram_contact=str(chat_id), commit=False)
+
+        def link_token_to_chat(self, token, chat_id):
+            return link_chat(token, str(chat_id))
+
+    return WebhookBotHandler()
+
+
+def process_webhook_update(update, link_chat):
+    """
+    Обрабатывает одно обновление от Telegram
+
+    Args:
+        update: Обновление (JSON из запроса Telegram)
+        link_chat: Функция (token, chat_id) -> bool для привязки токена
+
+    Returns:
+        str: 'processed', 'duplicate' или 'ignored' (не текстовое сообщение)
+    """
+    from models import db, TelegramUpdate
+
+    update_id = int(update['update_id'])
+    db.session.add(TelegramUpdate(update_id=update_id))
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        logger.info(f"Обновление Telegram {update_id} уже обработано")
+        return 'duplicate'
+
+    status = 'ignored'
+    message = update.get('message')
+    if message and 'text' in message:
+        create_webhook_handler(link_chat).handle_command(message)
+        status = 'processed'
+
+    if random.random() < DEDUP_CLEANUP_PROBABILITY:
+        TelegramUpdate.query.filter(
+            TelegramUpdate.received_at < datetime.utcnow() - DEDUP_RETENTION
+        ).delete(synchronize_session=False)
+
+    # update_id, привязка токена и ответы бота фиксируются вместе
+    db.session.commit()
+    return status
@@ -0,0 +1,194 @@
+"""
+Построение данных для API частичного обновления турнира (/api/tournaments/<id>/updates)
+
+Участники и матчи загружаются двумя запросами, словарь id -> участник строится
+один раз, поэтому количество запросов не зависит от размера турнира.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Статусы, при которых показываем счёт матча
+SCORED_STATUSES = ['завершен', 'в_процессе', 'играют']
+LIVE_STATUSES = ['в_процессе', 'играют']
+
+
+def load_tournament_data(tournament_id, Participant, Match):
+    """
+    Загружает участников и матчи турнира (по одному запросу на таблицу)
+
+    Returns:
+        tuple: (participants, matches, participants_by_id) - матчи уже без дублей
+    """
+    participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(Participant.name).all()
+    matches = Match.query.filter_by(tournament_id=tournament_id).order_by(Match.match_date, Match.match_time).all()
+
+    participants_by_id = {participant.id: participant for participant in participants}
+
+    return participants, deduplicate_matches(matches), participants_by_id
+
+
+def deduplicate_matches(matches):
+    """Убирает дубли матчей (одинаковые пара участников, дата и время)"""
+    seen_matches = set()
+    unique_matches = []
+    for match in matches:
+        match_key = (match.participant1_id, match.participant2_id, match.match_date, match.match_time)
+        if match_key not in seen_matches:
+            seen_matches.add(match_key)
+            unique_matches.append(match)
+    return unique_matches
+
+
+def _count_finished_sets(match, points_to_win):
+    """Подсчитывает выигранные сеты по завершенным сетам (для матчей в процессе)"""
+    sets_won_1 = 0
+    sets_won_2 = 0
+    for score1, score2 in ((match.set1_score1, match.set1_score2),
+                           (match.set2_score1, match.set2_score2),
+                           (match.set3_score1, match.set3_score2)):
+        if score1 is None or score2 is None:
+            continue
+        if score1 >= points_to_win and score1 > score2:
+            sets_won_1 += 1
+        elif score2 >= points_to_win and score2 > score1:
+            sets_won_2 += 1
+    return sets_won_1, sets_won_2
+
+
+def _format_sets_details(match, points_to_win):
+    """Формирует строку с деталями начатых сетов, например '21:15, 18:21'"""
+    sets_list = []
+    for score1, score2 in ((match.set1_score1, match.set1_score2),
+                           (match.set2_score1, match.set2_score2),
+                           (match.set3_score1, match.set3_score2)):
+        if score1 is None or score2 is None:
+            continue
+        if not (score1 > 0 or score2 > 0):
+            continue
+        if score1 == points_to_win and score2 == points_to_win:
+            continue
+        sets_list.append(f"{score1}:{score2}")
+    return ", ".join(sets_list) if sets_list else None
+
+
+def serialize_match_update(match, tournament, participants_by_id):
+    """Формирует словарь с данными матча для API обновлений"""
+    participant1 = participants_by_id.get(match.participant1_id)
+    participant2 = participants_by_id.get(match.participant2_id)
+
+    score = None
+    sets_details = None
+    points_to_win = tournament.points_to_win or 21
+
+    if match.status in SCORED_STATUSES:
+        # Сначала проверяем sets_won_1 и sets_won_2 (основной счёт)
+        if match.sets_won_1 is not None and match.sets_won_2 is not None:
+            score = f"{match.sets_won_1}:{match.sets_won_2}"
+        # Если основного счёта нет, но есть счёт в текущем сете, формируем временный счёт
+        elif match.status in LIVE_STATUSES:
+            sets_won_1, sets_won_2 = _count_finished_sets(match, points_to_win)
+            if sets_won_1 > 0 or sets_won_2 > 0:
+                score = f"{sets_won_1}:{sets_won_2}"
+
+        if score:
+            sets_details = _format_sets_details(match, points_to_win)
+
+    return {
+        'id': match.id,
+        'participant1_id': match.participant1_id,
+        'participant2_id': match.participant2_id,
+        'participant1_name': participant1.name if participant1 else '',
+        'participant2_name': participant2.name if participant2 else '',
+        'score': score,
+        'sets_details': sets_details,
+        'status': match.status,
+        'match_date': match.match_date.strftime('%Y-%m-%d') if match.match_date else None,
+        'match_time': match.match_time.strftime('%H:%M') if match.match_time else None,
+        'set1_score1': match.set1_score1,
+        'set1_score2': match.set1_score2,
+        'set2_score1': match.set2_score1,
+        'set2_score2': match.set2_score2,
+        'set3_score1': match.set3_score1,
+        'set3_score2': match.set3_score2,
+        'sets_won_1': match.sets_won_1,
+        'sets_won_2': match.sets_won_2
+    }
+
+
+def serialize_free_match_update(match):
+    """Формирует словарь с данными свободного матча для API обновлений"""
+    # Для свободных матчей используем счет сета 1 (set1_score1:set1_score2)
+    score = match.score
+    if not score and match.set1_score1 is not None and match.set1_score2 is not None:
+        score = f"{match.set1_score1}:{match.set1_score2}"
+    elif not score and (match.sets_won_1 or match.sets_won_2):
+        score = f"{match.sets_won_1 or 0}:{match.sets_won_2 or 0}"
+
+    return {
+        'id': match.id,
+        'player1_name': match.player1_name or (match.player1.name if match.player1 else 'Неизвестно'),
+        'player2_name': match.player2_name or (match.player2.name if match.player2 else 'Неизвестно'),
+        'score': score,
+        'set1_score1': match.set1_score1,
+        'set1_score2': match.set1_score2,
+        'sets_won_1': match.sets_won_1 or 0,
+        'sets_won_2': match.sets_won_2 or 0,
+        'status': match.status or 'неизвестно'
+    }
+
+
+def build_participants_stats(participants, final_ranking):
+    """Формирует статистику участников, отсортированную по местам"""
+    ranking_data_by_id = {p_data['participant'].id: p_data for p_data in final_ranking}
+
+    participants_stats = []
+    for participant in participants:
+        ranking_data = ranking_data_by_id.get(participant.id, {})
+        participants_stats.append({
+            'id': participant.id,
+            'name': participant.name,
+            'position': ranking_data.get('place', 999),
+            'points': ranking_data.get('points', 0),
+            'wins': ranking_data.get('wins', 0),
+            'losses': ranking_data.get('losses', 0),
+            'draws': ranking_data.get('draws', 0),
+            'games': ranking_data.get('games', 0),
+            'sets_difference': ranking_data.get('sets_won', 0) - ranking_data.get('sets_lost', 0),
+            'goal_difference': ranking_data.get('set_difference', 0)
+        })
+
+    participants_stats.sort(key=lambda x: x['position'])
+    return participants_stats
+
+
+def build_tournament_updates_payload(db, tournament, Participant, Match, version=None):
+    """
+    Собирает полный ответ API /api/tournaments/<id>/updates
+
+    Args:
+        db: Экземпляр базы данных
+        tournament: Турнир
+        Participant: Модель Participant
+        Match: Модель Match
+        version: Версия турнира, прочитанная до загрузки матчей
+
+    Returns:
+        dict: {'success': True, 'matches': [...], 'participants_stats': [...]}
+    """
+    from services.standings import load_standings
+
+    participants, matches, participants_by_id = load_tournament_data(tournament.id, Participant, Match)
+
+    matches_data = [serialize_match_update(match, tournament, participants_by_id) for match in matches]
+
+    # Места читаются из таблицы standings (services.standings)
+    ranked_matches = [match for match in matches if not match.is_removed]
+    final_ranking = load_standings(db, tournament, participants, Match,
+                                   version=version, matches=ranked_matches)
+
+    return {
+        'success': True,
+        'matches': matches_data,
+        'participants_stats': build_participants_stats(participants, final_ranking)
+    }
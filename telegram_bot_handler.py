@@ -3,8 +3,12 @@
 Запускайте этот скрипт на сервере для обработки команд от пользователей
 """
 import requests
+import sys
 import time
 import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from config import Config
 
 # Настройка логирования
@@ -14,30 +18,62 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Потоков обработки одной пачки getUpdates (сообщения одного чата обрабатываются по порядку)
+BOT_WORKERS = 8
+
+
+def create_http_session(pool_size):
+    """requests.Session с пулом keep-alive соединений (Bot API и API приложения)"""
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+    http.mount('https://', adapter)
+    http.mount('http://', adapter)
+    return http
+
 
 class TelegramBotHandler:
     """Обработчик команд Telegram бота"""
     
-    def __init__(self, bot_token, app_api_url='http://127.0.0.1:5000'):
+    def __init__(self, bot_token, app_api_url='http://127.0.0.1:5000', telegram_api_url=None, workers=None,
+                 delete_webhook=True):
         self.bot_token = bot_token
-        self.api_url = f"https://api.telegram.org/bot{bot_token}"
+        telegram_api_url = telegram_api_url or getattr(Config, 'TELEGRAM_API_URL', None) or 'https://api.telegram.org'
+        self.api_url = f"{telegram_api_url.rstrip('/')}/bot{bot_token}"
         self.app_api_url = app_api_url  # URL нашего Flask приложения
         self.last_update_id = 0
+        self.workers = workers or getattr(Config, 'TELEGRAM_BOT_WORKERS', BOT_WORKERS)
+        # Соединения переиспользуются между запросами; +1 для long polling getUpdates
+        self.http = create_http_session(self.workers + 1)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='telegram-bot')
         # На всякий случай отключаем webhook, чтобы polling работал без конфликта
-        try:
-            self.delete_webhook()
-        except Exception as e:
-            logger.warning(f"Не удалось удалить webhook при старте: {e}")
+        if delete_webhook:
+            try:
+                self.delete_webhook()
+            except Exception as e:
+                logger.warning(f"Не удалось удалить webhook при старте: {e}")
 
     def delete_webhook(self):
         """Удаляет webhook, чтобы избежать конфликта с getUpdates (409)."""
         url = f"{self.api_url}/deleteWebhook"
-        resp = requests.get(url, params={"drop_pending_updates": False}, timeout=10)
+        resp = self.http.get(url, params={"drop_pending_updates": False}, timeout=10)
         if resp.status_code == 200:
             logger.info("🔧 Webhook удалён (если был установлен)")
         else:
             logger.warning(f"Не удалось удалить webhook: {resp.status_code} - {resp.text}")
         
+    def set_webhook(self, url, secret):
+        """Включает доставку обновлений на webhook приложения (/api/telegram/webhook)"""
+        if not secret:
+            logger.error("❌ TELEGRAM_WEBHOOK_SECRET не задан: приложение не принимает webhook без секрета")
+            return False
+        payload = {'url': url, 'allowed_updates': '["message"]', 'secret_token': secret}
+        resp = self.http.post(f"{self.api_url}/setWebhook", data=payload, timeout=10)
+        if resp.status_code == 200 and resp.json().get('ok'):
+            logger.info(f"🔧 Webhook установлен: {url}")
+            return True
+        logger.error(f"Не удалось установить webhook: {resp.status_code} - {resp.text}")
+        return False
+
     def get_updates(self):
         """Получает новые сообщения от пользователей"""
         try:
@@ -46,7 +82,7 @@ class TelegramBotHandler:
                 'offset': self.last_update_id + 1,
                 'timeout': 30  # Long polling
             }
-            response = requests.get(url, params=params, timeout=35)
+            response = self.http.get(url, params=params, timeout=35)
             
             if response.status_code == 200:
                 data = response.json()
@@ -70,7 +106,7 @@ class TelegramBotHandler:
                 'parse_mode': 'HTML'
             }
             logger.info(f"Отправка сообщения пользователю (chat_id={chat_id})...")
-            response = requests.post(url, data=payload, timeout=10)
+            response = self.http.post(url, data=payload, timeout=10)
             
             if response.status_code == 200:
                 logger.info(f"✅ Сообщение успешно отправлено пользователю (chat_id={chat_id})")
@@ -93,7 +129,7 @@ class TelegramBotHandler:
             }
             
             logger.info(f"🔗 Попытка связать токен {token[:8]}... с Chat ID {chat_id}")
-            response = requests.post(url, json=payload, timeout=10)
+            response = self.http.post(url, json=payload, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -272,6 +308,38 @@ class TelegramBotHandler:
 """
             self.send_message(chat_id, unknown_message)
     
+    def process_updates(self, updates):
+        """
+        Обрабатывает пачку обновлений пулом потоков
+        
+        Чаты обрабатываются параллельно, сообщения одного чата - по порядку.
+        Смещение getUpdates сдвигается после обработки всей пачки.
+        """
+        by_chat = OrderedDict()
+        for update in updates:
+            message = update.get('message')
+            if message and 'text' in message:
+                by_chat.setdefault(message['chat']['id'], []).append(message)
+        
+        futures = [self.executor.submit(self._handle_chat_messages, messages) for messages in by_chat.values()]
+        for future in futures:
+            future.result()
+        
+        if updates:
+            self.last_update_id = max(self.last_update_id, max(update['update_id'] for update in updates))
+    
+    def _handle_chat_messages(self, messages):
+        for message in messages:
+            try:
+                self.handle_command(message)
+            except Exception as e:
+                logger.error(f"Ошибка обработки сообщения (chat_id={message['chat']['id']}): {e}")
+    
+    def close(self):
+        """Останавливает пул потоков и закрывает соединения"""
+        self.executor.shutdown(wait=True)
+        self.http.close()
+    
     def run(self):
         """Запускает бота в режиме постоянной работы"""
         logger.info("🤖 Бот Quick Score запущен и готов к работе!")
@@ -280,14 +348,7 @@ class TelegramBotHandler:
         while True:
             try:
                 updates = self.get_updates()
-                
-                for update in updates:
-                    self.last_update_id = update['update_id']
-                    
-                    if 'message' in update:
-                        message = update['message']
-                        if 'text' in message:
-                            self.handle_command(message)
+                self.process_updates(updates)
                 
                 # Небольшая задержка между запросами если нет обновлений
                 if not updates:
@@ -311,6 +372,20 @@ def main():
         logger.error("Добавьте токен вашего бота в файл config.py")
         return
     
+    # Режим webhook: python telegram_bot_handler.py --set-webhook https://<домен>/api/telegram/webhook
+    if len(sys.argv) > 2 and sys.argv[1] == '--set-webhook':
+        handler = TelegramBotHandler(bot_token, workers=1, delete_webhook=False)
+        try:
+            installed = handler.set_webhook(sys.argv[2], getattr(Config, 'TELEGRAM_WEBHOOK_SECRET', None))
+        finally:
+            handler.close()
+        sys.exit(0 if installed else 1)
+    
+    if getattr(Config, 'TELEGRAM_WEBHOOK_ENABLED', False):
+        logger.error("❌ Включен режим webhook (TELEGRAM_WEBHOOK_ENABLED): обновления принимает приложение")
+        logger.error("Long polling удалил бы webhook - отключите TELEGRAM_WEBHOOK_ENABLED для запуска бота")
+        return
+    
     # Создаем и запускаем обработчик
     handler = TelegramBotHandler(bot_token)
     
@@ -318,6 +393,8 @@ def main():
         handler.run()
     except Exception as e:
         logger.error(f"Критическая ошибка: {e}")
+    finally:
+        handler.close()
 
 
 if __name__ == '__main__':
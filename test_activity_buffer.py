@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Проверка отложенной записи активности пользователей (utils/activity_buffer.py)
+
+- track_user_activity ничего не пишет в базу во время запроса;
+- накопленная активность и посещения сессий записываются одной транзакцией
+  (пакетные UPDATE существующих записей и INSERT новых);
+- фоновая запись срабатывает после ACTIVITY_FLUSH_EVENTS событий
+  и при остановке процесса.
+
+Запуск: python test_activity_buffer.py  (или через pytest)
+"""
+import time
+from datetime import datetime, timedelta
+
+from models import db, UserActivity
+from utils.activity_buffer import ActivityBuffer, activity_buffer
+from utils.user_activity import track_user_activity
+from testing_support import StatementCounter, create_test_app
+
+VIEWERS = 50
+
+
+def track(app, session_id, user_type='viewer', user_id=None, page='tournament_view'):
+    with app.test_request_context(f'/{page}', headers={'User-Agent': 'test'}):
+        from flask import session
+        session['session_id'] = session_id
+        track_user_activity(db, UserActivity, user_type, user_id, page)
+
+
+def test_activity_is_written_in_one_batch():
+    """Запросы ничего не пишут, запись - одна транзакция на весь буфер"""
+    app = create_test_app()
+    with app.app_context():
+        db.create_all()
+        activity_buffer.flush(db, UserActivity)
+        # Существующие записи: зритель без user_id и сессия администратора
+        db.session.add(UserActivity(user_type='viewer', user_id=None, session_id='viewer-0',
+                                    page_visited='index', last_activity=datetime.utcnow() - timedelta(hours=1)))
+        db.session.add(UserActivity(user_type='admin', user_id='admin@test', email='admin@test', login_token='token-1',
+                                    pages_visited_count=1, expires_at=datetime.utcnow() + timedelta(hours=2)))
+        db.session.commit()
+
+        with StatementCounter(app) as statements:
+            for i in range(VIEWERS):
+                track(app, f'viewer-{i}')
+                track(app, f'viewer-{i}', page='tournament_live')
+            track(app, 'admin-session', 'admin', 'admin@test', 'admin_dashboard')
+            for _ in range(3):
+                activity_buffer.add_visit('token-1', 'admin_dashboard')
+        assert statements == [], f"Отслеживание активности выполнило {len(statements)} запросов"
+
+        with StatementCounter(app) as statements:
+            assert activity_buffer.flush(db, UserActivity) == VIEWERS + 2
+        writes = [statement.split()[0] for statement in statements]
+        assert writes == ['UPDATE', 'SELECT', 'UPDATE', 'INSERT'], writes
+
+        assert UserActivity.query.filter_by(user_type='viewer').count() == VIEWERS
+        viewer = UserActivity.query.filter_by(session_id='viewer-0').one()
+        assert viewer.page_visited == 'tournament_live' and viewer.user_agent == 'test'
+        assert viewer.last_activity > datetime.utcnow() - timedelta(minutes=1)
+        assert UserActivity.query.filter_by(session_id='admin-session', user_id='admin@test').count() == 1
+        admin = UserActivity.query.filter_by(login_token='token-1').one()
+        assert admin.pages_visited_count == 4 and admin.last_page == 'admin_dashboard'
+        assert activity_buffer.pending_count() == 0
+
+    print(f"✅ {2 * VIEWERS + 4} событий активности: 0 запросов во время запросов, запись одной транзакцией")
+
+
+def test_background_flush_by_events_and_on_shutdown():
+    """Фоновый поток пишет после ACTIVITY_FLUSH_EVENTS событий, остаток - при остановке"""
+    app = create_test_app()
+    app.config.update(ACTIVITY_FLUSH_SECONDS=60, ACTIVITY_FLUSH_EVENTS=10)
+    buffer = ActivityBuffer()
+    with app.app_context():
+        db.create_all()
+    buffer.init_app(app, db, UserActivity)
+
+    for i in range(10):
+        buffer.add_activity('viewer', None, f'viewer-{i}', 'index', '127.0.0.1', 'test')
+    deadline = time.monotonic() + 5
+    while buffer.pending_count() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert buffer.pending_count() == 0
+
+    buffer.add_activity('participant', 'Игрок', 'participant-1', 'participant_view', '127.0.0.1', 'test')
+    time.sleep(0.1)
+    assert buffer.pending_count() == 1
+    buffer.shutdown()
+
+    with app.app_context():
+        assert UserActivity.query.filter_by(user_type='viewer').count() == 10
+        assert UserActivity.query.filter_by(user_type='participant', user_id='Игрок').count() == 1
+
+    print("✅ Буфер активности записан по числу событий и при остановке")
+
+
+if __name__ == "__main__":
+    test_activity_is_written_in_one_batch()
+    test_background_flush_by_events_and_on_shutdown()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Проверка выгрузки турнира в Excel (/export-tournament/<id>?format=xlsx)
+
+- книга собирается листами write_only во временном буфере и отдается
+  потоком, в папке загрузок сервера ничего не остается;
+- листы содержат турнирную таблицу, шахматку и расписание;
+- память при выгрузке большого турнира не растет вместе с числом ячеек;
+- повторная выгрузка отдается из кэша, пока не изменится матч турнира.
+
+Запуск: python test_excel_export.py  (или через pytest)
+"""
+import io
+import os
+import tempfile
+import tracemalloc
+from datetime import date, datetime, time as dt_time
+from itertools import combinations
+from types import SimpleNamespace
+from unittest import mock
+
+from openpyxl import load_workbook
+
+from sqlalchemy import event
+
+from models import db, Match
+from routes.export import build_match_grid, stream_excel_export
+from services.export_cache import ExportCache, export_cache
+from testing_support import create_test_app, fill_tournament
+
+PARTICIPANTS_COUNT = 8
+LARGE_PARTICIPANTS_COUNT = 64
+MAX_PEAK_BYTES = 2 * 1024 * 1024  # Обычные листы openpyxl для 64 участников - около 6,5 МБ
+
+
+def test_export_streams_workbook_without_files():
+    """Выгрузка возвращает корректную книгу и не создает файлов на сервере"""
+    app = create_test_app()
+    export_cache.clear()
+    with app.app_context():
+        db.create_all()
+        tournament_id = fill_tournament(PARTICIPANTS_COUNT)
+
+    home = tempfile.mkdtemp()
+    with mock.patch.dict(os.environ, {'HOME': home}):
+        response = app.test_client().get(f'/export-tournament/{tournament_id}?format=xlsx')
+        data = response.get_data()
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    assert int(response.headers['Content-Length']) == len(data)
+    assert '.xlsx' in response.headers['Content-Disposition']
+    assert os.listdir(home) == []
+    os.rmdir(home)
+
+    wb = load_workbook(io.BytesIO(data))
+    assert wb.sheetnames == ["Информация о турнире", "Турнирная таблица",
+                             "Турнирная таблица (шахматка)", "Расписание матчей"]
+    standings = list(wb["Турнирная таблица"].values)
+    assert len(standings) == PARTICIPANTS_COUNT + 1 and standings[1][0] == 1
+    chessboard = list(wb["Турнирная таблица (шахматка)"].values)
+    assert len(chessboard) == PARTICIPANTS_COUNT + 1
+    assert all(chessboard[i][i] == "—" for i in range(1, PARTICIPANTS_COUNT + 1))
+    # Матч 1-2 (номер 1) запланирован, матч 1-3 (номер 2) завершен 2:0
+    assert chessboard[1][2] == "09:01 Пл.2"
+    assert chessboard[1][3] == "2:0" and chessboard[3][1] == "0:2"
+    schedule = list(wb["Расписание матчей"].values)
+    assert len(schedule) == PARTICIPANTS_COUNT * (PARTICIPANTS_COUNT - 1) // 2 + 1
+    print(f"✅ Выгрузка {len(data)} байт отдана потоком, файлов на сервере нет")
+
+
+def test_cached_export_until_match_changes():
+    """Повторная выгрузка - из кэша без чтения матчей; после изменения матча - новый файл"""
+    app = create_test_app()
+    export_cache.clear()
+    with app.app_context():
+        db.create_all()
+        tournament_id = fill_tournament(PARTICIPANTS_COUNT)
+        engine = db.engine
+    client = app.test_client()
+    url = f'/export-tournament/{tournament_id}?format=xlsx'
+
+    first = client.get(url)
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        cached = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert cached.get_data() == first.get_data() and cached.headers['ETag'] == first.headers['ETag']
+    # Только турнир и его версия: ни участников, ни матчей, ни таблицы
+    assert not any('FROM match' in statement or 'FROM participant' in statement for statement in statements), statements
+    assert len(export_cache) == 1
+
+    # Браузер с актуальной версией получает 304 без файла
+    not_modified = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert not_modified.status_code == 304 and not not_modified.get_data()
+
+    # Результат матча 1-2 (запланирован) внесен - кэш этой версии больше не выдается
+    with app.app_context():
+        match = Match.query.filter_by(tournament_id=tournament_id, match_number=1).one()
+        match.status = 'завершен'
+        match.sets_won_1, match.sets_won_2 = 0, 2
+        db.session.commit()
+    changed = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200 and changed.headers['ETag'] != first.headers['ETag']
+    chessboard = list(load_workbook(io.BytesIO(changed.get_data()))["Турнирная таблица (шахматка)"].values)
+    assert chessboard[1][2] == "0:2" and chessboard[2][1] == "2:0"
+    assert len(export_cache) == 1
+    print("✅ Выгрузка отдается из кэша до изменения матча, затем собирается заново")
+
+
+def test_export_cache_lru_limits():
+    """Вытесняется давно не запрошенный файл; файл больше лимита не кэшируется"""
+    cache = ExportCache(max_bytes=100, max_entries=3)
+    cache.put(1, 1, b'a' * 40)
+    cache.put(2, 1, b'b' * 40)
+    assert cache.get(1, 1) == b'a' * 40
+    cache.put(3, 1, b'c' * 40)
+    assert cache.get(2, 1) is None and cache.get(1, 1) and cache.get(3, 1)
+    assert cache.size == 80
+
+    # Новая версия турнира заменяет старую, старая версия не выдается
+    cache.put(1, 2, b'A' * 10)
+    assert cache.get(1, 1) is None and cache.get(1, 2) == b'A' * 10
+    assert cache.get(3, 1) and cache.size == 50
+    # Более старая версия не заменяет более новую
+    cache.put(1, 1, b'a' * 10)
+    assert cache.get(1, 2) == b'A' * 10
+
+    cache.put(4, 1, b'd' * 101)
+    assert cache.get(4, 1) is None and len(cache) == 2
+    cache.put(4, 1, b'd')
+    cache.put(5, 1, b'e')
+    assert len(cache) == 3 and cache.get(3, 1) is None and cache.get(1, 2)
+    print("✅ Кэш выгрузок ограничен по объему и количеству, вытесняет давно не запрошенные")
+
+
+def fake_tournament(participants_count):
+    tournament = SimpleNamespace(
+        id=1, name='Большой турнир', sport_type='Бадминтон', start_date=date(2025, 1, 1), end_date=None,
+        start_time=dt_time(9, 0), end_time=None, max_participants=participants_count, court_count=4,
+        match_duration=15, break_duration=2, sets_to_win=2, points_to_win=21, points_win=1, points_draw=0,
+        points_loss=0, status='активен', created_at=datetime(2025, 1, 1))
+    participants = [SimpleNamespace(id=i, name=f'Игрок {i:03d}') for i in range(participants_count)]
+    matches = [SimpleNamespace(participant1_id=p1.id, participant2_id=p2.id, match_date=date(2025, 1, 1),
+                               match_time=dt_time(9, 0), court_number=1, sets_won_1=2, sets_won_2=0,
+                               status='завершен' if number % 2 else 'запланирован')
+               for number, (p1, p2) in enumerate(combinations(participants, 2))]
+    statistics = {p.id: {'games': participants_count - 1} for p in participants}
+    positions = {p.id: place for place, p in enumerate(participants, 1)}
+    return tournament, participants, matches, statistics, positions
+
+
+def test_match_grid_uses_participant_index():
+    """Матрица матчей симметрична, матчи с участниками не из списка пропускаются"""
+    tournament, participants, matches, statistics, positions = fake_tournament(5)
+    matches.append(SimpleNamespace(participant1_id=0, participant2_id=999))
+    grid = build_match_grid(participants, matches)
+    assert all(grid[i][i] is None for i in range(5))
+    for match in matches[:-1]:
+        i, j = match.participant1_id, match.participant2_id
+        assert grid[i][j] is match and grid[j][i] is match
+    assert sum(cell is not None for row in grid for cell in row) == 2 * (len(matches) - 1)
+    print("✅ Матрица матчей заполнена по словарю id -> индекс")
+
+
+def test_large_export_memory_stays_flat():
+    """64 участника (4096 ячеек шахматки): пик памяти при сборке книги ограничен"""
+    export_data = fake_tournament(LARGE_PARTICIPANTS_COUNT)
+    app = create_test_app()
+    with app.test_request_context():
+        tracemalloc.start()
+        try:
+            response = stream_excel_export(*export_data)
+            size = sum(len(chunk) for chunk in response.response)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    assert size == int(response.headers['Content-Length'])
+    assert peak < MAX_PEAK_BYTES, peak
+    print(f"✅ {LARGE_PARTICIPANTS_COUNT} участников: {size} байт, пик памяти {peak // 1024} КБ")
+
+
+if __name__ == "__main__":
+    test_export_streams_workbook_without_files()
+    test_match_grid_uses_participant_index()
+    test_cached_export_until_match_changes()
+    test_export_cache_lru_limits()
+    test_large_export_memory_stays_flat()
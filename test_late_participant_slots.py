@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Проверка добавления опоздавшего участника (/api/tournaments/<id>/participants/late)
+
+В идущем турнире новые матчи ставятся в свободные места расписания
+(services/slot_assignment.py):
+- существующие матчи не меняются;
+- новые матчи не ставятся в слоты, которые уже прошли;
+- площадка и участник не заняты двумя матчами одновременно;
+- число SQL-запросов, кроме вставки самих матчей, не зависит от размера
+  турнира (нет запросов на каждый проверяемый слот).
+
+Запуск: python test_late_participant_slots.py  (или через pytest)
+"""
+import time
+from datetime import date, datetime, timedelta, time as dt_time
+
+from sqlalchemy import event
+
+from models import db, Tournament, Participant, Match
+from routes.api import create_smart_schedule
+from testing_support import create_test_app, csrf_headers
+
+ADMIN_ID = 1
+SLOT = timedelta(minutes=17)  # match_duration + break_duration
+
+
+def create_running_tournament(participants_count, played_count):
+    """Турнир с расписанием, первые played_count матчей сыграны"""
+    tournament = Tournament(name=f'Опоздавший {participants_count}', admin_id=ADMIN_ID, court_count=4,
+                            match_duration=15, break_duration=2, start_date=date(2025, 1, 1),
+                            start_time=dt_time(9, 0), end_time=dt_time(21, 0))
+    db.session.add(tournament)
+    db.session.flush()
+    participants = [Participant(tournament_id=tournament.id, name=f'Игрок {i:02d}') for i in range(participants_count)]
+    db.session.add_all(participants)
+    db.session.commit()
+    create_smart_schedule(tournament, participants, Match, db, bulk=True)
+
+    Match.query.filter(Match.tournament_id == tournament.id, Match.match_number <= played_count).update(
+        {'status': 'завершен', 'sets_won_1': 2, 'sets_won_2': 0}, synchronize_session=False)
+    db.session.commit()
+    return tournament.id
+
+
+def add_late_participant(app, client, tournament_id, name):
+    """Вызывает API; возвращает (ответ, число SQL-запросов без вставок матчей, число вставок, секунды)"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        started = time.perf_counter()
+        response = client.post(f'/api/tournaments/{tournament_id}/participants/late', json={'name': name},
+                               headers=csrf_headers(client))
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    inserts = sum(statement.startswith('INSERT INTO "match"') for statement in statements)
+    return response, len(statements) - inserts, inserts, elapsed
+
+
+def assert_no_conflicts(tournament_id):
+    """Площадка и участник не заняты двумя матчами ближе, чем матч + перерыв"""
+    matches = Match.query.filter_by(tournament_id=tournament_id, is_removed=False).all()
+    by_court, by_participant = {}, {}
+    for match in matches:
+        start = datetime.combine(match.match_date, match.match_time)
+        by_court.setdefault(match.court_number, []).append(start)
+        by_participant.setdefault(match.participant1_id, []).append(start)
+        by_participant.setdefault(match.participant2_id, []).append(start)
+    for starts in list(by_court.values()) + list(by_participant.values()):
+        starts.sort()
+        assert all(b - a >= SLOT for a, b in zip(starts, starts[1:])), starts
+
+
+def test_late_participant_fills_free_slots_without_per_slot_queries():
+    """Матчи опоздавшего ставятся без конфликтов за фиксированное число запросов"""
+    app = create_test_app()
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['admin_id'] = ADMIN_ID
+
+    with app.app_context():
+        db.create_all()
+        small_id = create_running_tournament(10, 20)
+        large_id = create_running_tournament(40, 300)
+        before = {m.id: (m.match_date, m.match_time, m.court_number, m.status)
+                  for m in Match.query.filter_by(tournament_id=large_id)}
+
+    called_at = datetime.now()
+    _, small_queries, _, _ = add_late_participant(app, client, small_id, 'Опоздавший')
+    response, large_queries, large_inserts, elapsed = add_late_participant(app, client, large_id, 'Опоздавший')
+    assert response.status_code == 201, response.get_json()
+    assert response.get_json()['matches_created'] == 40
+
+    with app.app_context():
+        late = Participant.query.filter_by(tournament_id=large_id, name='Опоздавший').one()
+        matches = Match.query.filter_by(tournament_id=large_id).all()
+        assert {m.id: (m.match_date, m.match_time, m.court_number, m.status)
+                for m in matches if m.id in before} == before
+
+        new_matches = [m for m in matches if m.id not in before]
+        assert len(new_matches) == 40
+        assert all(late.id in (m.participant1_id, m.participant2_id) for m in new_matches)
+        first_pending = min(datetime.combine(m.match_date, m.match_time)
+                            for m in matches if m.id in before and m.status == 'запланирован')
+        assert all(datetime.combine(m.match_date, m.match_time) >= first_pending for m in new_matches)
+        # Турнир начался 01.01.2025: свободные места до текущего слота уже прошли
+        assert all(datetime.combine(m.match_date, m.match_time) > called_at - SLOT for m in new_matches)
+        assert_no_conflicts(large_id)
+        assert_no_conflicts(small_id)
+
+    assert large_queries == small_queries, f"{small_queries} запросов для 10 участников, {large_queries} для 40"
+    assert large_inserts == 40
+    print(f"✅ Опоздавший в турнире из 40 участников: 40 матчей, {large_queries} SQL-запросов "
+          f"(+ {large_inserts} вставок), {elapsed * 1000:.0f} мс")
+
+
+if __name__ == "__main__":
+    test_late_participant_fills_free_slots_without_per_slot_queries()
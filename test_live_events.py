@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Проверка живых обновлений через Server-Sent Events (services/live_events.py)
+
+- сохранение матча после commit рассылается подписчикам его турнира;
+- поток шлет heartbeat и закрывается через LIVE_EVENTS_STREAM_SECONDS;
+- изменения из других процессов (без брокера этого процесса) приходят
+  событием 'refresh' по версии турнира;
+- медленный подписчик при переполнении очереди получает 'refresh'.
+
+Запуск: python test_live_events.py  (или через pytest)
+"""
+import json
+import os
+import sqlite3
+import time
+
+from models import db, Match
+from services.live_events import SUBSCRIBER_QUEUE_SIZE, broker, stream_events
+from testing_support import close_file_app, create_file_app, create_test_app, csrf_headers, fill_tournament
+
+
+def parse_sse(chunk):
+    """(событие, данные) из фрагмента потока; heartbeat - ('heartbeat', None)"""
+    if isinstance(chunk, bytes):
+        chunk = chunk.decode('utf-8')
+    if chunk.startswith(': heartbeat'):
+        return 'heartbeat', None
+    if chunk.startswith('retry:'):
+        return 'retry', None
+    lines = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+    return lines['event'], json.loads(lines['data'])
+
+
+def fill_live_tournaments(app):
+    """Два турнира в базе приложения; возвращает (турнир, другой турнир, первый матч турнира)"""
+    with app.app_context():
+        db.create_all()
+        tournament_id = fill_tournament(4)
+        other_tournament_id = fill_tournament(5)
+        match_id = Match.query.filter_by(tournament_id=tournament_id).order_by(Match.id).first().id
+    return tournament_id, other_tournament_id, match_id
+
+
+def test_committed_match_change_is_published():
+    """PUT /api/matches/<id>: подписчик турнира получает событие 'match', подписчик другого - нет"""
+    app = create_test_app()
+    tournament_id, other_tournament_id, match_id = fill_live_tournaments(app)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_id'] = 1
+        session['admin_email'] = 'admin@system'
+
+    other = broker.subscribe(other_tournament_id)
+    response = client.get(f'/api/tournaments/{tournament_id}/events')
+    try:
+        assert response.mimetype == 'text/event-stream'
+        stream = iter(response.response)
+        assert parse_sse(next(stream))[0] == 'retry'
+        event, hello = parse_sse(next(stream))
+        assert event == 'hello' and broker.subscribers_count(tournament_id) == 1
+
+        result = client.put(f'/api/matches/{match_id}', json={'sets': [{'score1': 21, 'score2': 15}]},
+                            headers=csrf_headers(client))
+        assert result.status_code == 200, result.get_json()
+
+        event, data = parse_sse(next(stream))
+        assert event == 'match' and data['source'] == 'update_match'
+        assert data['match']['id'] == match_id and data['match']['sets_details'].startswith('21:15')
+        assert data['version'] > hello['version']
+        assert other.empty()
+    finally:
+        response.close()
+        broker.unsubscribe(other_tournament_id, other)
+    assert broker.subscribers_count() == 0
+    print("✅ Сохраненный матч рассылается подписчикам своего турнира")
+
+
+def test_heartbeat_and_stream_timeout():
+    """Без изменений поток шлет heartbeat и закрывается через LIVE_EVENTS_STREAM_SECONDS"""
+    app = create_test_app(LIVE_EVENTS_STREAM_SECONDS=0.6, LIVE_EVENTS_HEARTBEAT_SECONDS=0.15,
+                          LIVE_EVENTS_VERSION_CHECK_SECONDS=0.05)
+    tournament_id, _, _ = fill_live_tournaments(app)
+    with app.test_request_context():
+        started = time.monotonic()
+        events = [parse_sse(chunk)[0] for chunk in stream_events(db, tournament_id)]
+        elapsed = time.monotonic() - started
+
+    assert events[:2] == ['retry', 'hello']
+    assert set(events[2:]) == {'heartbeat'} and len(events[2:]) >= 2, events
+    assert 0.6 <= elapsed < 2, elapsed
+    assert broker.subscribers_count() == 0
+
+    # Живые обновления выключены - 204, страница остается на периодическом опросе
+    app.config['LIVE_EVENTS_ENABLED'] = False
+    assert app.test_client().get(f'/api/tournaments/{tournament_id}/events').status_code == 204
+    print(f"✅ Heartbeat каждые 0.15 с, поток закрыт через {elapsed:.2f} с")
+
+
+def test_other_process_change_triggers_refresh():
+    """Запись другого процесса (только версия в базе) приходит событием 'refresh'"""
+    app, database_dir = create_file_app('live.db', LIVE_EVENTS_STREAM_SECONDS=5, LIVE_EVENTS_HEARTBEAT_SECONDS=60,
+                                        LIVE_EVENTS_VERSION_CHECK_SECONDS=0.05)
+    path = os.path.join(database_dir, 'live.db')
+    try:
+        tournament_id, _, _ = fill_live_tournaments(app)
+        with app.test_request_context():
+            stream = stream_events(db, tournament_id)
+            assert parse_sse(next(stream))[0] == 'retry'
+            event, hello = parse_sse(next(stream))
+
+            # Другой воркер gunicorn сохранил счет: брокер этого процесса о нем не знает
+            conn = sqlite3.connect(path)
+            conn.execute('UPDATE tournament_version SET version = version + 1 WHERE tournament_id = ?',
+                         (tournament_id,))
+            conn.commit()
+            conn.close()
+
+            started = time.monotonic()
+            event, data = parse_sse(next(stream))
+            assert event == 'refresh' and data['version'] == hello['version'] + 1
+            assert time.monotonic() - started < 1
+            stream.close()
+            db.session.remove()
+        assert broker.subscribers_count() == 0
+    finally:
+        close_file_app(app, database_dir)
+    print("✅ Изменение из другого процесса обнаружено по версии турнира")
+
+
+def test_slow_subscriber_gets_refresh_on_overflow():
+    """Переполненная очередь подписчика: последнее событие - 'refresh' вместо потерянных"""
+    subscriber = broker.subscribe('overflow')
+    try:
+        for number in range(SUBSCRIBER_QUEUE_SIZE + 1):
+            assert broker.publish('overflow', 'match', {'number': number}) == 1
+        events = [subscriber.get_nowait() for _ in range(subscriber.qsize())]
+        assert len(events) == SUBSCRIBER_QUEUE_SIZE
+        assert events[-1] == ('refresh', {'reason': 'overflow'})
+    finally:
+        broker.unsubscribe('overflow', subscriber)
+    print("✅ Медленный подписчик получает 'refresh' при переполнении очереди")
+
+
+if __name__ == "__main__":
+    test_committed_match_change_is_published()
+    test_heartbeat_and_stream_timeout()
+    test_other_process_change_triggers_refresh()
+    test_slow_subscriber_gets_refresh_on_overflow()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Проверка отправки писем с паролями (services/mail_dispatcher.py)
+
+- письма копятся в очереди tokens (email_status='pending'), а не в потоках;
+- пачка писем отправляется через одно SMTP-соединение;
+- число потоков отправки ограничено MAIL_WORKERS при любом числе писем;
+- ошибки SMTP повторяются с паузой, отклоненный адрес - 'failed',
+  письмо упавшего потока возвращается в очередь по сроку захвата.
+
+Запуск: python test_mail_dispatcher.py  (или через pytest)
+"""
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+
+from models import db, Token
+from services.mail_dispatcher import MailDispatcher, enqueue_token_email
+from testing_support import close_file_app, create_file_app, create_test_app
+
+
+class FakeSMTP:
+    """SMTP-сервер в памяти: считает соединения и письма"""
+    connections = 0
+    sent = []
+    refused = set()
+    fail_once = set()
+    lock = threading.Lock()
+
+    def __init__(self, host, port, timeout=None):
+        with FakeSMTP.lock:
+            FakeSMTP.connections += 1
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def sendmail(self, from_email, to_email, message):
+        if to_email in FakeSMTP.refused:
+            raise smtplib.SMTPRecipientsRefused({to_email: (550, b'No such user')})
+        with FakeSMTP.lock:
+            if to_email in FakeSMTP.fail_once:
+                FakeSMTP.fail_once.discard(to_email)
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+            FakeSMTP.sent.append(to_email)
+
+    def quit(self):
+        pass
+
+    @classmethod
+    def reset(cls):
+        cls.connections, cls.sent, cls.refused, cls.fail_once = 0, [], set(), set()
+
+
+MAIL_SETTINGS = dict(MAIL_USERNAME='robot@test', MAIL_PASSWORD='secret', MAIL_DEFAULT_SENDER='robot@test',
+                     MAIL_BATCH_SIZE=10, MAIL_RETRY_BACKOFF_SECONDS=60)
+
+
+def create_dispatcher(app):
+    """Диспетчер приложения, отправляющий письма через FakeSMTP"""
+    dispatcher = MailDispatcher()
+    dispatcher.init_app(app, db, Token)
+    dispatcher.smtp_factory = FakeSMTP
+    FakeSMTP.reset()
+    return dispatcher
+
+
+def add_tokens(count, start=1000):
+    """Пароли с письмами в очереди (как после enqueue_token_email)"""
+    db.session.add_all(Token(email=f'user{i}@test', token=start + i, name=f'Пользователь {i}', email_status='pending')
+                       for i in range(count))
+    db.session.commit()
+
+
+def statuses():
+    return {t.email: t for t in Token.query.all()}
+
+
+def test_batches_share_one_connection():
+    """12 писем: две пачки, два SMTP-соединения, статусы 'sent'"""
+    app = create_test_app(**MAIL_SETTINGS)
+    dispatcher = create_dispatcher(app)
+    with app.app_context():
+        db.create_all()
+        add_tokens(12)
+        assert all(t.email_status == 'pending' for t in Token.query)
+
+        assert dispatcher.dispatch_once() == 10
+        assert FakeSMTP.connections == 1 and len(FakeSMTP.sent) == 10
+        assert dispatcher.dispatch_once() == 2
+        assert dispatcher.dispatch_once() == 0
+        assert FakeSMTP.connections == 2 and len(FakeSMTP.sent) == 12
+
+        tokens = Token.query.all()
+        assert all(t.email_status == 'sent' and t.email_sent and t.email_sent_at and t.email_attempts == 1
+                   for t in tokens)
+    print("✅ 12 писем отправлены двумя пачками через 2 SMTP-соединения")
+
+
+def test_retries_refused_and_stale_claims():
+    """Обрыв соединения - повтор с паузой, отклоненный адрес - 'failed', зависшее письмо - снова в очереди"""
+    # Неотправленные пароли дописываются в tokens.txt - после теста файл восстанавливается
+    original = open('tokens.txt', 'rb').read() if os.path.exists('tokens.txt') else None
+    app = create_test_app(**MAIL_SETTINGS)
+    dispatcher = create_dispatcher(app)
+    try:
+        with app.app_context():
+            db.create_all()
+            add_tokens(4)
+            FakeSMTP.fail_once.add('user1@test')
+            FakeSMTP.refused.add('user2@test')
+            # user3: забрано потоком, который упал (срок захвата истек)
+            Token.query.filter_by(email='user3@test').update(
+                {'email_status': 'sending', 'email_next_attempt_at': datetime.utcnow() - timedelta(seconds=1)})
+            db.session.commit()
+
+            assert dispatcher.dispatch_once() == 4
+            result = statuses()
+            assert result['user0@test'].email_status == 'sent'
+            assert result['user3@test'].email_status == 'sent'
+            assert result['user2@test'].email_status == 'failed' and result['user2@test'].email_error
+            retry = result['user1@test']
+            assert retry.email_status == 'pending' and retry.email_attempts == 1 and retry.email_error
+            assert 50 < (retry.email_next_attempt_at - datetime.utcnow()).total_seconds() <= 60
+            # После обрыва соединения следующее письмо ушло через новое соединение
+            assert FakeSMTP.connections == 2
+
+            # До истечения паузы письмо не отправляется, после - отправляется
+            assert dispatcher.dispatch_once() == 0
+            Token.query.filter_by(email='user1@test').update({'email_next_attempt_at': datetime.utcnow()})
+            db.session.commit()
+            assert dispatcher.dispatch_once() == 1
+            assert statuses()['user1@test'].email_status == 'sent'
+            assert statuses()['user1@test'].email_attempts == 2
+
+            # Письмо, которое прямо сейчас отправляет другой поток, не забирается
+            add_tokens(1, start=2000)
+            Token.query.filter_by(token=2000).update(
+                {'email_status': 'sending', 'email_next_attempt_at': datetime.utcnow() + timedelta(minutes=5)})
+            db.session.commit()
+            assert dispatcher.dispatch_once() == 0
+    finally:
+        if original is None:
+            if os.path.exists('tokens.txt'):
+                os.remove('tokens.txt')
+        else:
+            with open('tokens.txt', 'wb') as f:
+                f.write(original)
+    print("✅ Повтор после обрыва, 'failed' для отклоненного адреса, возврат зависших писем в очередь")
+
+
+def test_burst_uses_bounded_pool():
+    """Поток запросов пароля не создает поток на каждое письмо"""
+    # Потокам нужны свои соединения: база в памяти (sqlite://) - одно соединение на процесс
+    app, database_dir = create_file_app('mail.db', MAIL_WORKERS=2, MAIL_POLL_SECONDS=0.2, **MAIL_SETTINGS)
+    dispatcher = create_dispatcher(app)
+    with app.app_context():
+        db.create_all()
+        add_tokens(40)
+        threads_before = threading.active_count()
+        for token in Token.query.all():
+            dispatcher.wake()
+        assert len(dispatcher._threads) == 2
+        assert threading.active_count() - threads_before == 2
+
+        deadline = time.monotonic() + 10
+        while Token.query.filter(Token.email_status != 'sent').count() and time.monotonic() < deadline:
+            db.session.expire_all()
+            time.sleep(0.05)
+        assert Token.query.filter_by(email_status='sent').count() == 40
+        assert len(FakeSMTP.sent) == 40 and FakeSMTP.connections <= 6
+        dispatcher.shutdown(timeout=5)
+        assert not any(thread.is_alive() for thread in dispatcher._threads)
+    close_file_app(app, database_dir)
+    print(f"✅ 40 писем: 2 потока отправки, {FakeSMTP.connections} SMTP-соединений")
+
+
+def test_enqueue_keeps_mail_in_database():
+    """Постановка в очередь только меняет статус записи: письмо переживет перезапуск процесса"""
+    app = create_test_app(**MAIL_SETTINGS)
+    dispatcher = create_dispatcher(app)
+    with app.app_context():
+        db.create_all()
+        add_tokens(1)
+        Token.query.update({'email_status': 'failed'})
+        db.session.commit()
+        assert enqueue_token_email(1000)
+        assert Token.query.one().email_status == 'pending'
+        assert not enqueue_token_email(999999)
+        # Новый процесс (новый пул) отправляет письмо из очереди
+        assert dispatcher.dispatch_once() == 1
+        assert Token.query.one().email_status == 'sent'
+    print("✅ Письмо хранится в очереди tokens и отправляется новым пулом")
+
+
+def test_token_without_enqueue_is_never_sent():
+    """Черновик администратора для привязки Telegram (token=0) не попадает в рассылку"""
+    app = create_test_app(**MAIL_SETTINGS)
+    dispatcher = create_dispatcher(app)
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        response = client.post('/api/admin/telegram/generate-link', json={'email': 'admin@test', 'name': 'Админ'})
+        assert response.status_code == 200, response.get_json()
+        db.session.add(Token(email='user@test', token=1001, name='Пользователь'))
+        db.session.commit()
+        assert {t.email_status for t in Token.query} == {'new'}
+
+        assert dispatcher.dispatch_once() == 0
+        assert not FakeSMTP.sent
+        assert enqueue_token_email(1001)
+        assert dispatcher.dispatch_once() == 1
+        assert FakeSMTP.sent == ['user@test']
+        assert Token.query.filter_by(token=0).one().email_status == 'new'
+    print("✅ Пароль без постановки в очередь не отправляется")
+
+
+if __name__ == "__main__":
+    test_batches_share_one_connection()
+    test_retries_refused_and_stale_claims()
+    test_burst_uses_bounded_pool()
+    test_enqueue_keeps_mail_in_database()
+    test_token_without_enqueue_is_never_sent()
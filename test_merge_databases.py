@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Проверка слияния баз SQLite (merge_databases.py)
+
+- общие записи обеих баз (та же запись с тем же id) не дублируются;
+- записи исходной базы с занятыми id получают новые id, ссылки на них
+  (участники, матчи, rally) обновляются;
+- записи таблиц без внешних ключей с теми же id, но другими данными
+  не теряются, а получают новые id;
+- соответствия id, перенесенные во временную таблицу, дают тот же результат;
+- standings не сливается, а пересобирается: строки совпадают с участниками
+  каждого турнира;
+- пробный запуск (--dry-run) сообщает о конфликтах и ничего не записывает.
+
+Запуск: python test_merge_databases.py  (или через pytest)
+"""
+import hashlib
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+from unittest import mock
+
+from merge_databases import DatabaseMerger
+from models import db, Match, Notification, Participant, Rally, Tournament, UserActivity
+from services.standings import load_standings
+from testing_support import create_test_app, fill_tournament
+
+
+def fill_database(path, participants, rallies=0):
+    """Добавляет турнир (и rally первого матча) в базу path"""
+    app = create_test_app(f'sqlite:///{path}')
+    with app.app_context():
+        db.create_all()
+        tournament_id = fill_tournament(participants)
+        match = Match.query.filter_by(tournament_id=tournament_id).order_by(Match.id).first()
+        now = datetime(2025, 5, 17, 12, 30)
+        db.session.add_all(Rally(match_id=match.id, tournament_id=tournament_id, set_number=1,
+                                 rally_date=now.date(), rally_time=now.time(), rally_datetime=now,
+                                 server_name='А', receiver_name='Б', server_won=True, score=f'{i}:0')
+                           for i in range(rallies))
+        db.session.commit()
+        db.engine.dispose()
+
+
+def create_databases(database_dir):
+    """Общая история ('Тест 3'), затем локально добавлен 'Тест 5', на сервере - 'Тест 4' с теми же id"""
+    base = os.path.join(database_dir, 'base.db')
+    fill_database(base, 3)
+    source = os.path.join(database_dir, 'source.db')
+    target = os.path.join(database_dir, 'target.db')
+    shutil.copy(base, source)
+    shutil.copy(base, target)
+    fill_database(source, 5, rallies=30)
+    fill_database(target, 4)
+    return source, target
+
+
+def tournament_summary(path):
+    """{турнир: (участников, матчей, rally, матчей со ссылками на чужих участников)}"""
+    conn = sqlite3.connect(path)
+    try:
+        summary = {}
+        for tournament_id, name in conn.execute(f'SELECT id, name FROM {Tournament.__tablename__}'):
+            participants = conn.execute('SELECT COUNT(*) FROM participant WHERE tournament_id = ?',
+                                        (tournament_id,)).fetchone()[0]
+            matches = conn.execute('SELECT COUNT(*) FROM "match" WHERE tournament_id = ?', (tournament_id,)).fetchone()[0]
+            rallies = conn.execute('SELECT COUNT(*) FROM rally JOIN "match" ON "match".id = rally.match_id '
+                                   'WHERE "match".tournament_id = ?', (tournament_id,)).fetchone()[0]
+            foreign = conn.execute(
+                'SELECT COUNT(*) FROM "match" m JOIN participant p ON p.id IN (m.participant1_id, m.participant2_id) '
+                'WHERE m.tournament_id = ? AND p.tournament_id != m.tournament_id', (tournament_id,)).fetchone()[0]
+            summary[name] = (participants, matches, rallies, foreign)
+        return summary
+    finally:
+        conn.close()
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_merge_remaps_conflicting_ids():
+    """Турнир, участники, матчи и rally исходной базы с занятыми id переносятся с новыми id"""
+    database_dir = tempfile.mkdtemp()
+    try:
+        source, target = create_databases(database_dir)
+        target_hash = file_hash(target)
+        expected = {'Тест 3': (3, 3, 0, 0), 'Тест 4': (4, 6, 0, 0), 'Тест 5': (5, 10, 30, 0)}
+
+        results = []
+        for memory_limit in (100000, 1):
+            output = os.path.join(database_dir, f'merged_{memory_limit}.db')
+            merger = DatabaseMerger(source, target, output, create_backup=False, batch_size=4,
+                                    memory_limit=memory_limit)
+            assert merger.merge()
+            assert tournament_summary(output) == expected
+            assert merger.stats['tournament'] == {'rows': 2, 'inserted': 1, 'skipped': 1, 'remapped': 1, 'ignored': 0}
+            # Участники 'Тест 3' - общие, 4 из 5 участников 'Тест 5' заняли id участников 'Тест 4'
+            assert merger.stats['participant']['skipped'] == 3 and merger.stats['participant']['remapped'] == 4
+            assert merger.stats['rally']['inserted'] == 30
+            if memory_limit == 1:
+                assert merger.id_mappings['match'].stored == 6
+            with sqlite3.connect(output) as conn:
+                results.append(conn.execute('SELECT id, participant1_id, participant2_id, winner_id, tournament_id '
+                                            'FROM "match" ORDER BY id').fetchall())
+        assert 'standings' not in merger.stats and 'tournament_version' not in merger.stats
+        # Соответствия во временной таблице дают тот же результат, что и в памяти
+        assert results[0] == results[1]
+        assert file_hash(target) == target_hash
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+    print("✅ Конфликтующие id пересчитаны, ссылки обновлены")
+
+
+def test_standings_are_rebuilt_after_merge():
+    """Строки standings результата - ровно участники своего турнира, места по матчам"""
+    database_dir = tempfile.mkdtemp()
+    try:
+        source, target = create_databases(database_dir)
+        output = os.path.join(database_dir, 'merged.db')
+        assert DatabaseMerger(source, target, output, create_backup=False).merge()
+
+        with sqlite3.connect(output) as conn:
+            standings = set(conn.execute('SELECT tournament_id, participant_id FROM standings'))
+            participants = set(conn.execute('SELECT tournament_id, id FROM participant'))
+        assert standings == participants and len(standings) == 3 + 4 + 5
+
+        # Таблица читается из standings, без расчета в памяти
+        app = create_test_app(f'sqlite:///{output}')
+        with app.app_context():
+            for tournament in Tournament.query.all():
+                participants = Participant.query.filter_by(tournament_id=tournament.id).order_by(Participant.name).all()
+                with mock.patch('services.standings.get_tournament_ranking') as fallback:
+                    ranking = load_standings(db, tournament, participants, Match)
+                fallback.assert_not_called()
+                assert [p_data['place'] for p_data in ranking] == list(range(1, len(participants) + 1))
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+    print("✅ Турнирная таблица пересобрана для всех турниров результата")
+
+
+def add_activity(path, prefix, count):
+    """Активность и уведомления администратора (user_id=1) с id 1..count"""
+    app = create_test_app(f'sqlite:///{path}')
+    with app.app_context():
+        db.session.add_all(UserActivity(user_type='viewer', session_id=f'{prefix}{i}', user_agent=prefix)
+                           for i in range(count))
+        db.session.add_all(Notification(user_id=1, title=f'{prefix} {i}', message=prefix) for i in range(count))
+        db.session.commit()
+        db.engine.dispose()
+
+
+def test_colliding_ids_without_references_are_kept():
+    """Разные записи с одинаковыми id (user_activity, notification) переносятся с новыми id"""
+    database_dir = tempfile.mkdtemp()
+    try:
+        source, target = create_databases(database_dir)
+        add_activity(source, 'local', 100)
+        add_activity(target, 'server', 100)
+        # Общая запись: одинаковая в обеих базах - не дублируется
+        for path in (source, target):
+            with sqlite3.connect(path) as conn:
+                conn.execute("UPDATE user_activity SET session_id = 'shared', user_agent = 'shared', "
+                             "last_activity = '2025-01-01 00:00:00', created_at = '2025-01-01 00:00:00' WHERE id = 1")
+
+        output = os.path.join(database_dir, 'merged.db')
+        merger = DatabaseMerger(source, target, output, create_backup=False, batch_size=16)
+        assert merger.merge()
+        assert merger.stats['user_activity'] == {'rows': 100, 'inserted': 99, 'skipped': 1, 'remapped': 99, 'ignored': 0}
+        assert merger.stats['notification'] == {'rows': 100, 'inserted': 100, 'skipped': 0, 'remapped': 100, 'ignored': 0}
+        with sqlite3.connect(output) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM user_activity WHERE user_agent = 'local'").fetchone()[0] == 99
+            assert conn.execute("SELECT COUNT(*) FROM user_activity WHERE user_agent = 'server'").fetchone()[0] == 99
+            assert conn.execute("SELECT COUNT(*) FROM notification WHERE user_id = 1").fetchone()[0] == 200
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+    print("✅ Записи с занятыми id и другими данными не теряются")
+
+
+def test_dry_run_reports_without_writing():
+    """Пробный запуск: те же итоги, конфликты в отчете, результат и бэкап не создаются"""
+    database_dir = tempfile.mkdtemp()
+    try:
+        source, target = create_databases(database_dir)
+        target_hash = file_hash(target)
+        output = os.path.join(database_dir, 'merged.db')
+
+        dry_run = DatabaseMerger(source, target, output, dry_run=True, batch_size=4, memory_limit=2)
+        report = io.StringIO()
+        with redirect_stdout(report):
+            assert dry_run.merge()
+        assert "id 2 занят → 3 (name='Тест 5')" in report.getvalue()
+        assert not os.path.exists(output)
+        assert file_hash(target) == target_hash
+        assert sorted(os.listdir(database_dir)) == ['base.db', 'source.db', 'target.db']
+
+        merger = DatabaseMerger(source, target, output, create_backup=False, batch_size=4)
+        assert merger.merge()
+        # Строки, которые отклонят прочие ограничения уникальности, пробный запуск считает добавленными
+        for table_name, stats in merger.stats.items():
+            expected = dict(stats, inserted=stats['inserted'] + stats['ignored'], ignored=0)
+            assert dry_run.stats[table_name] == expected, table_name
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+    print("✅ Пробный запуск сообщает о конфликтах и ничего не записывает")
+
+
+if __name__ == "__main__":
+    test_merge_remaps_conflicting_ids()
+    test_standings_are_rebuilt_after_merge()
+    test_colliding_ids_without_references_are_kept()
+    test_dry_run_reports_without_writing()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Проверка версионных миграций схемы (services/migrations.py, migrate.py)
+
+- новая база доводится до последней версии, повторный запуск ничего не делает;
+- старая база (таблицы без новых столбцов, повторяющиеся пароли) обновляется
+  без потери данных;
+- турниры из базы до таблицы standings получают ее строки при обновлении;
+- старт воркера - один запрос к schema_version, без хеширования пароля
+  администратора и без сброса измененного пароля.
+
+Запуск: python test_migrations.py  (или через pytest)
+"""
+from unittest import mock
+
+from sqlalchemy import event, inspect, text
+
+from models import db, Match, Participant, Settings, Standing, Tournament, User
+from services.migrations import ensure_schema, get_schema_version, latest_version, run_migrations
+from services.standings import load_standings
+from testing_support import close_file_app, create_file_app, fill_tournament
+
+LEGACY_SCHEMA = (
+    "CREATE TABLE tournament (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL)",
+    "CREATE TABLE tokens (id INTEGER PRIMARY KEY, email VARCHAR(120) NOT NULL, token INTEGER NOT NULL, "
+    "name VARCHAR(100) NOT NULL, is_used BOOLEAN, created_at DATETIME)",
+    "CREATE TABLE waiting_list (id INTEGER PRIMARY KEY, tournament_id INTEGER NOT NULL, "
+    "name VARCHAR(100) NOT NULL, skill_level VARCHAR(50) NOT NULL)",
+    "INSERT INTO tournament (id, name) VALUES (1, 'Старый турнир')",
+    "INSERT INTO tokens (id, email, token, name, created_at) VALUES "
+    "(1, 'a@test', 111111, 'А', '2024-01-01'), (2, 'b@test', 111111, 'Б', '2024-01-02'), "
+    "(3, 'c@test', 222222, 'В', '2024-01-03')",
+    "INSERT INTO waiting_list (id, tournament_id, name, skill_level) VALUES (1, 1, 'Игрок', 'хочу попробовать')",
+)
+
+
+def test_fresh_database():
+    """Новая база: все миграции по порядку, повторный запуск ничего не применяет"""
+    app, database_dir = create_file_app()
+    try:
+        with app.app_context():
+            applied = run_migrations(db)
+            assert [item.version for item in applied] == list(range(1, latest_version() + 1))
+            assert get_schema_version(db.engine) == latest_version()
+            assert run_migrations(db) == []
+
+            tables = set(inspect(db.engine).get_table_names())
+            assert {'tournament', 'match', 'tokens', 'standings', 'outbound_message', 'schema_version'} <= tables
+            assert User.query.filter_by(username='admin', role='администратор').count() == 1
+            assert Settings.get_setting('max_tokens') == '10'
+    finally:
+        close_file_app(app, database_dir)
+    print(f"✅ Новая база: {latest_version()} миграций, повторный запуск ничего не делает")
+
+
+def test_legacy_database_is_upgraded():
+    """Старая база: недостающие столбцы и индексы добавлены, данные сохранены"""
+    app, database_dir = create_file_app()
+    try:
+        with app.app_context():
+            with db.engine.begin() as conn:
+                for statement in LEGACY_SCHEMA:
+                    conn.execute(text(statement))
+
+            run_migrations(db)
+
+            with db.engine.connect() as conn:
+                tokens = conn.execute(text(
+                    "SELECT id, token, email_status, email_attempts, telegram_link_token FROM tokens ORDER BY id")).all()
+                waiting = conn.execute(text("SELECT name, status, telegram_token FROM waiting_list")).one()
+                tournament = conn.execute(text("SELECT name, start_time, end_time FROM tournament")).one()
+
+            # Первый из повторяющихся паролей остался, второй заменен
+            assert tokens[0].token == 111111 and tokens[1].token not in (111111, 222222)
+            assert tokens[2].token == 222222
+            # Пароли из базы до очереди писем не рассылаются повторно
+            assert all(row.email_status == 'new' and row.email_attempts == 0 for row in tokens)
+            assert tuple(waiting) == ('Игрок', 'ожидает', None)
+            assert tournament.name == 'Старый турнир' and tournament.start_time.startswith('09:00')
+
+            inspector = inspect(db.engine)
+            token_indexes = {index['name']: index for index in inspector.get_indexes('tokens')}
+            assert token_indexes['idx_tokens_token_unique']['unique']
+            assert 'ix_tokens_telegram_link_token' in token_indexes
+            assert 'idx_waiting_list_telegram_token' in {index['name'] for index in inspector.get_indexes('waiting_list')}
+            assert get_schema_version(db.engine) == latest_version()
+    finally:
+        close_file_app(app, database_dir)
+    print("✅ Старая база обновлена: столбцы, уникальные пароли и индексы, данные сохранены")
+
+
+def test_existing_tournaments_get_standings():
+    """Турниры, сохраненные до таблицы standings, получают строки при миграции"""
+    app, database_dir = create_file_app()
+    try:
+        with app.app_context():
+            run_migrations(db, target=10)
+            tournament_ids = [fill_tournament(4), fill_tournament(5)]
+            # База до таблицы standings: строк нет
+            db.session.query(Standing).delete()
+            db.session.commit()
+
+            assert [item.version for item in run_migrations(db)] == [11]
+            for tournament_id in tournament_ids:
+                tournament = db.session.get(Tournament, tournament_id)
+                participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(Participant.name).all()
+                rows = Standing.query.filter_by(tournament_id=tournament_id).all()
+                assert {row.participant_id for row in rows} == {participant.id for participant in participants}
+                with mock.patch('services.standings.get_tournament_ranking') as fallback:
+                    load_standings(db, tournament, participants, Match)
+                fallback.assert_not_called()
+    finally:
+        close_file_app(app, database_dir)
+    print("✅ Миграция 11 заполнила standings для существующих турниров")
+
+
+def test_worker_start_is_one_query():
+    """Старт воркера с актуальной схемой: один SELECT, пароль администратора не трогается"""
+    app, database_dir = create_file_app()
+    try:
+        with app.app_context():
+            run_migrations(db)
+            admin = User.query.filter_by(username='admin').one()
+            admin.password_hash = 'изменен-администратором'
+            db.session.commit()
+            engine = db.engine
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            with mock.patch('werkzeug.security.generate_password_hash', side_effect=AssertionError('хеширование')):
+                ensure_schema(app, db)
+                start_statements = list(statements)
+                # Повторный запуск миграций ничего не пишет
+                with app.app_context():
+                    assert run_migrations(db) == []
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+        assert len(start_statements) == 1 and 'schema_version' in start_statements[0], start_statements
+        assert not any(statement.lstrip().upper().startswith(('ALTER', 'CREATE', 'UPDATE', 'INSERT', 'DELETE'))
+                       for statement in statements), statements
+        with app.app_context():
+            assert User.query.filter_by(username='admin').one().password_hash == 'изменен-администратором'
+    finally:
+        close_file_app(app, database_dir)
+    print("✅ Старт воркера: 1 запрос к schema_version, пароль администратора не сбрасывается")
+
+
+def test_startup_migration_can_be_disabled():
+    """MIGRATE_ON_STARTUP=False: устаревшая схема не меняется при старте"""
+    app, database_dir = create_file_app(MIGRATE_ON_STARTUP=False)
+    try:
+        ensure_schema(app, db)
+        with app.app_context():
+            assert get_schema_version(db.engine) == 0
+            assert 'tournament' not in inspect(db.engine).get_table_names()
+        app.config['MIGRATE_ON_STARTUP'] = True
+        ensure_schema(app, db)
+        with app.app_context():
+            assert get_schema_version(db.engine) == latest_version()
+    finally:
+        close_file_app(app, database_dir)
+    print("✅ Без MIGRATE_ON_STARTUP схема обновляется только через migrate.py")
+
+
+if __name__ == "__main__":
+    test_fresh_database()
+    test_legacy_database_is_upgraded()
+    test_existing_tournaments_get_standings()
+    test_worker_start_is_one_query()
+    test_startup_migration_can_be_disabled()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Проверка PostgreSQL как базы приложения и переноса данных (migrate_to_postgresql.py)
+
+- DATABASE_URL используется приложением, postgres:// приводится к postgresql+psycopg://,
+  для PostgreSQL задаются параметры пула;
+- перенос копирует все таблицы моделей пачками (включая rally, tokens,
+  waiting_list, user_activity), заполняет столбцы, которых нет в старой базе,
+  и не затирает непустую базу без --replace;
+- с TEST_POSTGRES_URL (локальный PostgreSQL, пустая база) перенос идет через
+  COPY и проверяются последовательности id:
+      TEST_POSTGRES_URL=postgresql://postgres@localhost/quick_score_test python test_postgres_migration.py
+
+Запуск: python test_postgres_migration.py  (или через pytest)
+"""
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, func, select, text
+
+from migrate_to_postgresql import copy_database
+from models import db, Match, Rally, Token, Tournament, UserActivity, WaitingList
+from services.database_backend import engine_options, normalize_database_url
+from testing_support import create_test_app, fill_tournament
+
+TABLES = ['tournament', 'participant', 'match', 'rally', 'tokens', 'waiting_list', 'user_activity']
+
+
+def create_source_database(database_dir, participants=6):
+    """Старая база SQLite: турнир, розыгрыши, пароли, лист ожидания и активность; без rally.swap_count"""
+    path = os.path.join(database_dir, 'source.db')
+    app = create_test_app(f'sqlite:///{path}')
+    with app.app_context():
+        db.create_all()
+        tournament_id = fill_tournament(participants)
+        match = Match.query.filter_by(tournament_id=tournament_id).first()
+        now = datetime(2025, 5, 17, 12, 30, 15, 250000)
+        db.session.add_all(Rally(match_id=match.id, tournament_id=tournament_id, set_number=1,
+                                 rally_date=now.date(), rally_time=now.time(), rally_datetime=now,
+                                 server_name='Игрок "А"', receiver_name='Игрок, Б', server_won=i % 2 == 0,
+                                 score=f'{i}:0') for i in range(25))
+        db.session.add_all(Token(email=f'user{i}@test', token=5000 + i, name=f'Пользователь {i}',
+                                 telegram='' if i == 0 else None) for i in range(12))
+        db.session.add_all(WaitingList(tournament_id=tournament_id, name=f'Запасной {i}', skill_level='новичок')
+                           for i in range(3))
+        db.session.add_all(UserActivity(user_type='viewer', session_id=f's{i}', user_agent='Line1\nLine2')
+                           for i in range(9))
+        db.session.commit()
+        db.engine.dispose()
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn:
+        conn.execute(text('ALTER TABLE rally DROP COLUMN swap_count'))
+    engine.dispose()
+    return f'sqlite:///{path}'
+
+
+def table_counts(url):
+    engine = create_engine(normalize_database_url(url, instance_relative=False))
+    try:
+        with engine.connect() as conn:
+            return {name: conn.execute(text(f'SELECT COUNT(*) FROM "{name}"')).scalar() for name in TABLES}
+    finally:
+        engine.dispose()
+
+
+def test_database_url_and_pool_options():
+    """DATABASE_URL: postgres:// и путь от корня проекта; пул только для PostgreSQL"""
+    assert normalize_database_url(None) == 'sqlite:///tournament.db'
+    assert normalize_database_url('postgres://u:p@db/t') == 'postgresql+psycopg://u:p@db/t'
+    assert normalize_database_url('postgresql+psycopg2://u@db/t') == 'postgresql+psycopg2://u@db/t'
+    assert normalize_database_url('sqlite:///instance/tournament_dev.db') == 'sqlite:///tournament_dev.db'
+    assert normalize_database_url('sqlite:///instance/t.db', instance_relative=False) == 'sqlite:///instance/t.db'
+
+    assert engine_options({}, 'sqlite:///tournament.db') == {}
+    options = engine_options({'DB_POOL_SIZE': 7, 'DB_STATEMENT_TIMEOUT_MS': 1500}, 'postgresql://u@db/t')
+    assert options['pool_size'] == 7 and options['pool_pre_ping'] and options['pool_recycle'] == 1800
+    assert options['connect_args']['options'] == '-c statement_timeout=1500'
+    print("✅ DATABASE_URL и параметры пула PostgreSQL")
+
+
+def test_copy_all_tables_in_batches():
+    """Перенос SQLite -> SQLite пачками INSERT: все таблицы, значения и столбцы по умолчанию"""
+    database_dir = tempfile.mkdtemp()
+    try:
+        source_url = create_source_database(database_dir)
+        target_url = f"sqlite:///{os.path.join(database_dir, 'target.db')}"
+
+        copied = copy_database(source_url, target_url, batch_size=7, method='insert')
+        assert {name: copied[name] for name in TABLES} == table_counts(source_url)
+        assert copied['rally'] == 25 and copied['tokens'] == 12 and copied['user_activity'] == 9
+
+        engine = create_engine(target_url)
+        with engine.connect() as conn:
+            rally = Rally.__table__
+            row = conn.execute(select(rally).order_by(rally.c.id)).first()
+            assert row.server_name == 'Игрок "А"' and row.receiver_name == 'Игрок, Б' and row.server_won is True
+            assert row.rally_datetime == datetime(2025, 5, 17, 12, 30, 15, 250000)
+            # Столбца не было в старой базе - значение по умолчанию из модели
+            assert row.swap_count == 0
+            tokens = Token.__table__
+            assert conn.execute(select(tokens.c.telegram).where(tokens.c.token == 5000)).scalar() == ''
+            assert conn.execute(select(tokens.c.telegram).where(tokens.c.token == 5001)).scalar() is None
+            assert conn.execute(select(func.max(Tournament.__table__.c.id))).scalar() == 1
+        engine.dispose()
+
+        # Повторный перенос в заполненную базу - только с --replace
+        with pytest.raises(RuntimeError, match='--replace'):
+            copy_database(source_url, target_url, method='insert')
+        assert copy_database(source_url, target_url, method='insert', replace=True) == copied
+        assert table_counts(target_url) == table_counts(source_url)
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+    print("✅ Все таблицы перенесены пачками, повторный перенос требует --replace")
+
+
+@pytest.mark.skipif(not os.environ.get('TEST_POSTGRES_URL'), reason="нужен локальный PostgreSQL (TEST_POSTGRES_URL)")
+def test_copy_to_postgresql():
+    """Перенос в PostgreSQL через COPY: данные и последовательности id"""
+    target_url = os.environ['TEST_POSTGRES_URL']
+    database_dir = tempfile.mkdtemp()
+    try:
+        source_url = create_source_database(database_dir, participants=20)
+        copied = copy_database(source_url, target_url, batch_size=50, method='copy', replace=True)
+        assert {name: copied[name] for name in TABLES} == table_counts(source_url) == table_counts(target_url)
+
+        engine = create_engine(normalize_database_url(target_url))
+        with engine.connect() as conn:
+            max_match_id = conn.execute(text('SELECT MAX(id) FROM "match"')).scalar()
+            new_id = conn.execute(Match.__table__.insert().values(status='запланирован', is_removed=False)
+                                  .returning(Match.__table__.c.id)).scalar()
+            assert new_id == max_match_id + 1
+            row = conn.execute(select(Rally.__table__).order_by(Rally.__table__.c.id)).first()
+            assert row.server_name == 'Игрок "А"' and row.rally_datetime.microsecond == 250000
+            conn.rollback()
+        engine.dispose()
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+    print("✅ Перенос в PostgreSQL через COPY, последовательности id выставлены")
+
+
+if __name__ == "__main__":
+    test_database_url_and_pool_options()
+    test_copy_all_tables_in_batches()
+    if os.environ.get('TEST_POSTGRES_URL'):
+        test_copy_to_postgresql()
+    else:
+        print("⏭ Перенос в PostgreSQL пропущен: задайте TEST_POSTGRES_URL")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Проверка планов выполнения горячих запросов (routes/api.py, routes/main.py)
+
+Для каждого запроса выполняется EXPLAIN QUERY PLAN на схеме из моделей
+и проверяется, что таблица читается поиском по индексу, а не полным сканированием.
+
+Запуск: python test_query_plans.py  (или через pytest)
+"""
+from datetime import date
+
+from flask import Flask
+from sqlalchemy import text
+from sqlalchemy.dialects import sqlite
+
+from models import db, Match, Rally, MatchLog, Participant, Standing
+
+
+def hot_queries():
+    """Запросы из маршрутов: (описание, таблица, запрос)"""
+    return [
+        ('Матчи турнира по расписанию', 'match',
+         Match.query.filter_by(tournament_id=1, is_removed=False).order_by(Match.match_date, Match.match_time)),
+        ('Все матчи турнира (API обновлений)', 'match',
+         Match.query.filter_by(tournament_id=1).order_by(Match.match_date, Match.match_time)),
+        ('Следующий матч на площадке (пересчет расписания)', 'match',
+         Match.query.filter(Match.tournament_id == 1, Match.court_number == 2, Match.id != 5,
+                            Match.status != 'завершен', Match.match_number > 3).order_by(Match.match_number.asc())),
+        ('Матчи площадки на дату', 'match',
+         Match.query.filter(Match.tournament_id == 1, Match.court_number == 2,
+                            Match.match_date == date(2025, 1, 1))),
+        ('Активные участники по алфавиту', 'participant',
+         Participant.query.filter_by(tournament_id=1, is_active=True).order_by(Participant.name)),
+        ('Участники турнира по алфавиту', 'participant',
+         Participant.query.filter_by(tournament_id=1).order_by(Participant.name)),
+        ('Розыгрыши матча', 'rally',
+         Rally.query.filter_by(match_id=1, is_removed=False).order_by(Rally.rally_datetime.asc())),
+        ('Журнал матча', 'match_log',
+         MatchLog.query.filter(MatchLog.match_id.in_([1, 2, 3]))),
+        ('Журнал турнира', 'match_log',
+         MatchLog.query.filter_by(tournament_id=1)),
+        ('Турнирная таблица', 'standings',
+         Standing.query.filter_by(tournament_id=1).order_by(Standing.place)),
+    ]
+
+
+def explain(query):
+    """Возвращает строки плана SQLite для запроса"""
+    sql = str(query.statement.compile(dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True}))
+    return [row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def uses_index(plan, table):
+    """Таблица читается поиском по индексу (SEARCH ... USING INDEX / PRIMARY KEY)"""
+    table_steps = [step for step in plan if step.split(' ')[1:2] == [table]]
+    return bool(table_steps) and all(step.startswith('SEARCH') for step in table_steps)
+
+
+def test_hot_queries_use_indexes():
+    """Каждый горячий запрос использует индекс"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    failures = []
+    with app.app_context():
+        db.create_all()
+        for description, table, query in hot_queries():
+            plan = explain(query)
+            status = '✅' if uses_index(plan, table) else '❌'
+            print(f"{status} {description}: {'; '.join(plan)}")
+            if status == '❌':
+                failures.append(description)
+
+    assert not failures, f"Запросы без индекса: {failures}"
+
+
+if __name__ == "__main__":
+    test_hot_queries_use_indexes()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Проверка чтения зрительских маршрутов через движок только для чтения (services/read_replica.py)
+
+- GET /api/tournaments/<id>/updates и страница зрителя читают через
+  соединение mode=ro, основная база не используется;
+- маршруты судей (запись) работают с основной базой;
+- запись внутри зрительского маршрута идет в основную базу, а чтение
+  после нее - тоже из основной (реплика не видит незафиксированное).
+
+Запуск: python test_read_replica.py  (или через pytest)
+"""
+import pytest
+from flask import g
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from models import db, Match, Tournament
+from services.read_replica import READ_ENGINE_KEY, get_read_database_url, init_read_replica, sqlite_read_only_url
+from testing_support import close_file_app, create_file_app, create_test_app, fill_tournament
+
+
+class StatementLog:
+    """Запросы, выполненные каждым движком"""
+
+    def __init__(self, engines):
+        self.statements = {key: [] for key in engines}
+        for key, engine in engines.items():
+            event.listen(engine, 'before_cursor_execute', self._listener(key))
+
+    def _listener(self, key):
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            self.statements[key].append(statement.split()[0].upper())
+        return before_cursor_execute
+
+    def clear(self):
+        for statements in self.statements.values():
+            statements.clear()
+
+
+def fill_replica_app(app):
+    """Подключает движок только для чтения и создает турнир; возвращает (турнир, журнал запросов)"""
+    init_read_replica(app, db)
+    with app.app_context():
+        db.create_all()
+        tournament_id = fill_tournament(6)
+        log = StatementLog({None: db.engine, READ_ENGINE_KEY: app.extensions[READ_ENGINE_KEY]})
+    return tournament_id, log
+
+
+def test_read_only_url():
+    """Адрес движка: тот же файл SQLite с mode=ro, реплика из настроек, без движка для базы в памяти"""
+    assert sqlite_read_only_url('sqlite:///tournament.db') == 'sqlite:///file:tournament.db?mode=ro&uri=true'
+    assert sqlite_read_only_url('sqlite:////srv/app/t.db') == 'sqlite:///file:/srv/app/t.db?mode=ro&uri=true'
+    assert sqlite_read_only_url('sqlite://') is None
+    assert sqlite_read_only_url('postgresql://app@primary/tournaments') is None
+    replica = 'postgresql://app@replica/tournaments'
+    assert get_read_database_url({'SQLALCHEMY_DATABASE_URI': 'postgresql://app@primary/t',
+                                  'READ_DATABASE_URL': replica}) == 'postgresql+psycopg://app@replica/tournaments'
+    assert get_read_database_url({'SQLALCHEMY_DATABASE_URI': 'postgresql://app@primary/t'}) is None
+    assert get_read_database_url({'SQLALCHEMY_DATABASE_URI': 'sqlite:///t.db', 'READ_REPLICA_ENABLED': False}) is None
+    app = create_test_app()
+    assert init_read_replica(app, db) is None and READ_ENGINE_KEY not in app.extensions
+    print("✅ Адрес движка только для чтения")
+
+
+def test_spectator_routes_read_from_replica():
+    """Опрос /updates и страница зрителя не обращаются к основной базе"""
+    app, database_dir = create_file_app('replica.db', pages=True)
+    tournament_id, log = fill_replica_app(app)
+    try:
+        client = app.test_client()
+        for url in (f'/api/tournaments/{tournament_id}/updates', '/api/free-matches/updates',
+                    f'/tournament-spectator/{tournament_id}'):
+            log.clear()
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+            assert log.statements[READ_ENGINE_KEY], url
+            assert set(log.statements[READ_ENGINE_KEY]) <= {'SELECT', 'PRAGMA'}, log.statements
+            assert not log.statements[None], (url, log.statements[None])
+
+        # Движок действительно только для чтения и не добавлен в привязки общего db
+        assert list(db.metadatas) == [None]
+        with app.app_context():
+            with app.extensions[READ_ENGINE_KEY].connect() as connection:
+                with pytest.raises(OperationalError, match='readonly'):
+                    connection.execute(text('UPDATE tournament SET name = name'))
+            app.extensions[READ_ENGINE_KEY].dispose()
+    finally:
+        close_file_app(app, database_dir)
+    print("✅ Зрительские маршруты читают через соединение mode=ro")
+
+
+def test_writes_stay_on_primary():
+    """Вне зрительских маршрутов все запросы - в основную базу; запись в зрительском маршруте - тоже"""
+    app, database_dir = create_file_app('replica.db', pages=True)
+    tournament_id, log = fill_replica_app(app)
+    try:
+        with app.app_context():
+            # Обычный код (судья, администратор): движок только для чтения не используется
+            log.clear()
+            match = Match.query.filter_by(tournament_id=tournament_id).first()
+            match.set1_score1 = 17
+            db.session.commit()
+            assert log.statements[None] and not log.statements[READ_ENGINE_KEY]
+            db.session.remove()
+
+        with app.test_request_context():
+            g.read_replica = True
+            log.clear()
+            tournament = db.session.get(Tournament, tournament_id)
+            assert log.statements[READ_ENGINE_KEY] and not log.statements[None]
+
+            # Запись (как update_tournament_status на странице зрителя) уходит в основную базу
+            tournament.status = 'завершен'
+            db.session.flush()
+            assert 'UPDATE' in log.statements[None]
+            # До конца транзакции чтение - из основной базы: видна незафиксированная запись
+            log.clear()
+            status = db.session.execute(db.select(Tournament.status).filter_by(id=tournament_id)).scalar()
+            assert status == 'завершен' and not log.statements[READ_ENGINE_KEY]
+            db.session.commit()
+
+            # После фиксации чтение снова идет через движок только для чтения
+            log.clear()
+            assert db.session.get(Tournament, tournament_id).status == 'завершен'
+            assert log.statements[READ_ENGINE_KEY] and not log.statements[None]
+            db.session.remove()
+            app.extensions[READ_ENGINE_KEY].dispose()
+    finally:
+        close_file_app(app, database_dir)
+    print("✅ Запись - в основную базу, чтение после записи в транзакции - тоже")
+
+
+if __name__ == "__main__":
+    test_read_only_url()
+    test_spectator_routes_read_from_replica()
+    test_writes_stay_on_primary()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк создания расписания: ORM-объекты (по одному) и пакетная вставка (bulk=True)
+
+Для турнира из 40 участников (780 матчей) оба способа должны дать одинаковые
+матчи и турнирную таблицу; пакетная вставка - за меньшее число SQL-запросов
+и быстрее.
+
+Запуск: python test_schedule_bulk_insert.py  (или через pytest)
+"""
+import time
+from datetime import date, time as dt_time
+
+from sqlalchemy import event
+
+from models import db, Tournament, Participant, Match, Standing
+from routes.api import create_smart_schedule
+from testing_support import create_test_app
+
+PARTICIPANTS_COUNT = 40
+MATCH_FIELDS = ('participant1_id', 'participant2_id', 'status', 'match_date', 'match_time',
+                'court_number', 'match_number', 'sets_won_1', 'sets_won_2', 'winner_id')
+
+
+def create_tournament(name, participants_count):
+    """Турнир с участниками и двумя сыгранными матчами (их результаты должны сохраниться)"""
+    tournament = Tournament(name=name, court_count=4, match_duration=15, break_duration=2,
+                            start_date=date(2025, 1, 1), start_time=dt_time(9, 0), end_time=dt_time(21, 0))
+    db.session.add(tournament)
+    db.session.flush()
+    participants = [Participant(tournament_id=tournament.id, name=f'Игрок {i:02d}') for i in range(participants_count)]
+    db.session.add_all(participants)
+    db.session.flush()
+    for p1, p2 in ((participants[0], participants[1]), (participants[2], participants[3])):
+        db.session.add(Match(tournament_id=tournament.id, participant1_id=p1.id, participant2_id=p2.id,
+                             status='завершен', sets_won_1=2, sets_won_2=0, winner_id=p1.id))
+    db.session.commit()
+    return tournament.id
+
+
+def run_schedule(tournament_id, bulk):
+    """Создает расписание; возвращает (секунды, число SQL-запросов, число матчей)"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    tournament = db.session.get(Tournament, tournament_id)
+    participants = Participant.query.filter_by(tournament_id=tournament_id).all()
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        started = time.perf_counter()
+        created = create_smart_schedule(tournament, participants, Match, db, preserve_results=True, bulk=bulk)
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return elapsed, len(statements), created
+
+
+def schedule_snapshot(tournament_id):
+    """Матчи и места турнира без id (для сравнения двух турниров)"""
+    participant_index = {participant_id: index for index, (participant_id,) in enumerate(
+        db.session.query(Participant.id).filter_by(tournament_id=tournament_id).order_by(Participant.id))}
+
+    def normalize(field, value):
+        return participant_index.get(value) if field.endswith('_id') and value is not None else value
+
+    matches = [tuple(normalize(field, getattr(m, field)) for field in MATCH_FIELDS)
+               for m in Match.query.filter_by(tournament_id=tournament_id).order_by(Match.match_number)]
+    places = [(participant_index[row.participant_id], row.place, row.points)
+              for row in Standing.query.filter_by(tournament_id=tournament_id).order_by(Standing.place)]
+    return matches, places
+
+
+def test_bulk_schedule_matches_orm_schedule_and_is_faster():
+    """Пакетная вставка дает то же расписание за меньшее число запросов и время"""
+    app = create_test_app()
+    with app.app_context():
+        db.create_all()
+        orm_id = create_tournament('ORM', PARTICIPANTS_COUNT)
+        bulk_id = create_tournament('Bulk', PARTICIPANTS_COUNT)
+
+        orm_seconds, orm_queries, orm_created = run_schedule(orm_id, bulk=False)
+        bulk_seconds, bulk_queries, bulk_created = run_schedule(bulk_id, bulk=True)
+
+        expected_matches = PARTICIPANTS_COUNT * (PARTICIPANTS_COUNT - 1) // 2
+        assert orm_created == bulk_created == expected_matches
+        assert schedule_snapshot(orm_id) == schedule_snapshot(bulk_id)
+        assert Match.query.filter_by(tournament_id=bulk_id, status='завершен').count() == 2
+
+        assert bulk_queries < orm_queries
+        assert bulk_seconds < orm_seconds
+
+    print(f"✅ {expected_matches} матчей: ORM {orm_seconds * 1000:.0f} мс, {orm_queries} SQL-запросов; "
+          f"пакетно {bulk_seconds * 1000:.0f} мс, {bulk_queries} SQL-запросов")
+
+
+if __name__ == "__main__":
+    test_bulk_schedule_matches_orm_schedule_and_is_faster()
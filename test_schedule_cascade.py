@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Проверка каскадного пересчета расписания площадки после завершения матча
+
+recalculate_schedule_after_match_completion должен сдвигать всю очередь
+площадки за фиксированное число SQL-запросов и один commit, независимо
+от количества оставшихся матчей.
+
+Запуск: python test_schedule_cascade.py  (или через pytest)
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from models import db, Tournament, Participant, Match
+from routes.api import recalculate_schedule_after_match_completion
+from testing_support import create_test_app
+
+MAX_QUERIES = 8  # матч + турнир + очередь площадки + пакетные UPDATE + версия
+
+
+def fill_court_queue(queue_length):
+    """Турнир с одной площадкой: первый матч завершен, остальные ждут в очереди"""
+    tournament = Tournament(name=f'Очередь {queue_length}', match_duration=15, break_duration=2, court_count=1)
+    db.session.add(tournament)
+    db.session.flush()
+
+    participants = [Participant(tournament_id=tournament.id, name=f'Игрок {i:03d}') for i in range(2)]
+    db.session.add_all(participants)
+    db.session.flush()
+
+    matches = []
+    for number in range(1, queue_length + 2):
+        start = datetime(2025, 1, 1, 9, 0) + timedelta(minutes=17 * (number - 1))
+        match = Match(tournament_id=tournament.id, participant1_id=participants[0].id,
+                      participant2_id=participants[1].id, match_number=number, court_number=1,
+                      match_date=start.date(), match_time=start.time())
+        matches.append(match)
+    matches[0].status = 'завершен'
+    matches[0].sets_won_1, matches[0].sets_won_2 = 2, 0
+    db.session.add_all(matches)
+    db.session.commit()
+    return matches[0].id
+
+
+def run_recalculation(app, match_id):
+    """Выполняет пересчет и возвращает (число запросов, число commit)"""
+    statements = []
+    commits = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    with app.app_context():
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'commit', on_commit)
+        try:
+            recalculate_schedule_after_match_completion(match_id, Tournament, Match, db)
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+            event.remove(engine, 'commit', on_commit)
+    return len(statements), len(commits)
+
+
+def test_cascade_cost_does_not_depend_on_queue_length():
+    """Сдвиг очереди из 3 и из 60 матчей стоит одинаковое число запросов и один commit"""
+    app = create_test_app()
+    with app.app_context():
+        db.create_all()
+        short_id = fill_court_queue(3)
+        long_id = fill_court_queue(60)
+
+    short_queries, short_commits = run_recalculation(app, short_id)
+    started = datetime.now()
+    long_queries, long_commits = run_recalculation(app, long_id)
+
+    assert short_commits == long_commits == 1
+    assert long_queries == short_queries, f"{short_queries} запросов для 3 матчей, {long_queries} для 60"
+    assert long_queries <= MAX_QUERIES
+
+    with app.app_context():
+        completed = db.session.get(Match, long_id)
+        queue = Match.query.filter(Match.tournament_id == completed.tournament_id,
+                                   Match.id != long_id).order_by(Match.match_number).all()
+        starts = [datetime.combine(m.match_date, m.match_time) for m in queue]
+
+        assert completed.actual_end_time is not None
+        # Следующий матч - через перерыв после завершения, остальные - через длительность + перерыв
+        assert started <= starts[0] <= datetime.now() + timedelta(minutes=2)
+        assert queue[0].actual_start_time == starts[0]
+        assert all(b - a == timedelta(minutes=17) for a, b in zip(starts, starts[1:]))
+
+    print(f"✅ Очередь из 60 матчей: {long_queries} SQL-запросов, {long_commits} commit")
+
+
+if __name__ == "__main__":
+    test_cascade_cost_does_not_depend_on_queue_length()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Проверка раскладки расписания по площадкам (create_smart_schedule + services/scheduler.py)
+
+Для нескольких сочетаний участников и площадок проверяет, что:
+- каждая пара играет ровно один матч;
+- участник не играет два матча в одном слоте, площадка не занята дважды;
+- соблюдается минимальный отдых между матчами участника;
+- день заканчивается не позже, чем при прежней раскладке по турам
+  (тур занимает столько слотов, сколько нужно для его матчей на площадках).
+
+Запуск: python test_schedule_optimizer.py  (или через pytest)
+"""
+import math
+from datetime import date, datetime, time as dt_time
+from itertools import combinations
+
+from models import db, Tournament, Participant, Match
+from routes.api import create_smart_schedule, create_round_robin_schedule
+from services.scheduler import makespan_lower_bound
+from testing_support import create_test_app
+
+# (участников, площадок)
+CASES = [(5, 4), (8, 3), (10, 4), (12, 4), (16, 6)]
+SLOT_MINUTES = 17  # match_duration + break_duration
+
+
+def round_per_slot_makespan(participants, court_count):
+    """Длительность прежней раскладки: тур занимает ceil(матчей тура / площадок) слотов"""
+    return sum(math.ceil(len(round_matches) / court_count)
+               for round_matches in create_round_robin_schedule(participants))
+
+
+def schedule_tournament(participants_count, court_count, finished_pairs=0):
+    """Создает турнир и расписание; возвращает (турнир, участники, матчи)"""
+    tournament = Tournament(name=f'Расписание {participants_count}x{court_count}', court_count=court_count,
+                            match_duration=15, break_duration=2, start_date=date(2025, 1, 1),
+                            start_time=dt_time(9, 0), end_time=dt_time(23, 0))
+    db.session.add(tournament)
+    db.session.flush()
+    participants = [Participant(tournament_id=tournament.id, name=f'Игрок {i:02d}') for i in range(participants_count)]
+    db.session.add_all(participants)
+    db.session.commit()
+
+    if finished_pairs:
+        for p1, p2 in list(combinations(participants, 2))[:finished_pairs]:
+            db.session.add(Match(tournament_id=tournament.id, participant1_id=p1.id, participant2_id=p2.id,
+                                 status='завершен', sets_won_1=2, sets_won_2=0, winner_id=p1.id))
+        db.session.commit()
+
+    create_smart_schedule(tournament, participants, Match, db)
+    matches = Match.query.filter_by(tournament_id=tournament.id).order_by(Match.match_number).all()
+    return tournament, participants, matches
+
+
+def check_schedule(participants, matches, court_count, rest_slots=0):
+    """Проверяет ограничения расписания; возвращает число слотов"""
+    pairs = [tuple(sorted((m.participant1_id, m.participant2_id))) for m in matches]
+    assert sorted(pairs) == sorted(tuple(sorted((a.id, b.id))) for a, b in combinations(participants, 2))
+
+    # Номер слота - по времени от начала (пустые слоты тоже считаются)
+    starts = [datetime.combine(m.match_date, m.match_time) for m in matches]
+    first_start = min(starts)
+
+    seen_courts = set()
+    participant_slots = {}
+    for match, start in zip(matches, starts):
+        slot = int((start - first_start).total_seconds() // (SLOT_MINUTES * 60))
+        assert 1 <= match.court_number <= court_count
+        assert (slot, match.court_number) not in seen_courts, "Площадка занята дважды"
+        seen_courts.add((slot, match.court_number))
+        for participant_id in (match.participant1_id, match.participant2_id):
+            participant_slots.setdefault(participant_id, []).append(slot)
+
+    for participant_id, played in participant_slots.items():
+        played.sort()
+        assert all(b - a > rest_slots for a, b in zip(played, played[1:])), \
+            f"Участник {participant_id} играет без отдыха: {played}"
+
+    assert [m.match_number for m in matches] == list(range(1, len(matches) + 1))
+    return max(slot for played in participant_slots.values() for slot in played) + 1
+
+
+def test_schedule_packs_courts_and_finishes_earlier():
+    """Расписание корректно и не длиннее прежнего; в большинстве случаев - короче"""
+    app = create_test_app()
+    improved = 0
+    with app.app_context():
+        db.create_all()
+        for participants_count, court_count in CASES:
+            _, participants, matches = schedule_tournament(participants_count, court_count)
+            slots = check_schedule(participants, matches, court_count)
+
+            previous = round_per_slot_makespan(participants, court_count)
+            pairs = [(m.participant1_id, m.participant2_id) for m in matches]
+            lower_bound = makespan_lower_bound(pairs, court_count)
+            assert lower_bound <= slots <= previous
+            improved += slots < previous
+            print(f"✅ {participants_count} участников, {court_count} площадки: {slots} слотов "
+                  f"(было {previous}, нижняя граница {lower_bound})")
+    assert improved >= 3
+
+
+def test_schedule_respects_minimum_rest_and_results():
+    """Минимальный отдых между матчами и сохранение сыгранных матчей"""
+    app = create_test_app()
+    # Отдых 20 минут при перерыве 2 минуты - участник пропускает один слот (15 + 2 минут)
+    app.config['SCHEDULE_MIN_REST_MINUTES'] = 20
+    with app.app_context():
+        db.create_all()
+        _, participants, matches = schedule_tournament(8, 2, finished_pairs=5)
+        check_schedule(participants, matches, 2, rest_slots=1)
+
+        finished = [m for m in matches if m.status == 'завершен']
+        assert len(finished) == 5
+        assert all(m.sets_won_1 == 2 and m.winner_id == m.participant1_id for m in finished)
+        # Сыгранные матчи ставятся первыми в своих слотах
+        assert matches[0].status == 'завершен'
+    print("✅ Отдых между матчами и сохранение результатов")
+
+
+if __name__ == "__main__":
+    test_schedule_packs_courts_and_finishes_earlier()
+    test_schedule_respects_minimum_rest_and_results()
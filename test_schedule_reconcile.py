@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Проверка сверки расписания (create_smart_schedule(..., reconcile=True))
+
+При добавлении участника в идущий турнир существующие матчи (время, площадка,
+результаты, розыгрыши) не меняются - добавляются только матчи нового участника.
+При выбывании участника его матчи помечаются удаленными, остальные не меняются.
+Принятие заявок из листа ожидания (/accept-waiting) тоже только сверяет расписание.
+
+Запуск: python test_schedule_reconcile.py  (или через pytest)
+"""
+from datetime import date, datetime, time as dt_time
+
+from models import db, Tournament, Participant, Match, Rally, Standing, WaitingList
+from routes.api import create_smart_schedule
+from testing_support import create_test_app, csrf_headers
+
+MATCH_FIELDS = ('participant1_id', 'participant2_id', 'status', 'match_date', 'match_time', 'court_number',
+                'match_number', 'sets_won_1', 'sets_won_2', 'winner_id', 'is_removed', 'updated_at')
+
+
+def matches_snapshot(tournament_id):
+    """{id матча: поля} для всех матчей турнира, включая удаленные"""
+    return {m.id: tuple(getattr(m, field) for field in MATCH_FIELDS)
+            for m in Match.query.filter_by(tournament_id=tournament_id)}
+
+
+def active_pairs(tournament_id):
+    return sorted(tuple(sorted((m.participant1_id, m.participant2_id)))
+                  for m in Match.query.filter_by(tournament_id=tournament_id, is_removed=False))
+
+
+def test_reconcile_touches_only_changed_pairs():
+    """Сверка меняет только матчи добавленных и выбывших участников"""
+    app = create_test_app()
+    with app.app_context():
+        db.create_all()
+        tournament = Tournament(name='Сверка', court_count=3, match_duration=15, break_duration=2,
+                                start_date=date(2025, 1, 1), start_time=dt_time(9, 0), end_time=dt_time(21, 0))
+        db.session.add(tournament)
+        db.session.flush()
+        db.session.add_all(Participant(tournament_id=tournament.id, name=f'Игрок {i}') for i in range(8))
+        db.session.commit()
+        participants = Participant.query.filter_by(tournament_id=tournament.id).order_by(Participant.id).all()
+        assert create_smart_schedule(tournament, participants, Match, db, bulk=True) == 28
+
+        # Турнир идет: часть матчей сыграна, в одном есть розыгрыши
+        played = Match.query.filter_by(tournament_id=tournament.id).order_by(Match.match_number).limit(6).all()
+        for match in played:
+            match.status = 'завершен'
+            match.sets_won_1, match.sets_won_2, match.winner_id = 2, 0, match.participant1_id
+        db.session.add_all(Rally(match_id=played[0].id, tournament_id=tournament.id, set_number=1,
+                                 server_name='Игрок 0', receiver_name='Игрок 1', server_won=True, score=f'{i}:0')
+                           for i in range(1, 4))
+        db.session.commit()
+        before = matches_snapshot(tournament.id)
+
+        # Опоздавший участник: добавляются только его 8 матчей после последнего матча расписания
+        late = Participant(tournament_id=tournament.id, name='Опоздавший')
+        db.session.add(late)
+        db.session.commit()
+        participants.append(late)
+        assert create_smart_schedule(tournament, participants, Match, db, reconcile=True) == 36
+
+        after = matches_snapshot(tournament.id)
+        assert {match_id: after[match_id] for match_id in before} == before
+        new_matches = [Match.query.get(match_id) for match_id in set(after) - set(before)]
+        assert len(new_matches) == 8
+        assert all(late.id in (m.participant1_id, m.participant2_id) for m in new_matches)
+        last_start = max(datetime.combine(row[3], row[4]) for row in before.values())
+        assert all(datetime.combine(m.match_date, m.match_time) > last_start for m in new_matches)
+        assert sorted(m.match_number for m in new_matches) == list(range(29, 37))
+        assert Rally.query.filter_by(match_id=played[0].id).count() == 3
+
+        # Повторная сверка без изменений состава ничего не меняет
+        unchanged = matches_snapshot(tournament.id)
+        assert create_smart_schedule(tournament, participants, Match, db, reconcile=True) == 36
+        assert matches_snapshot(tournament.id) == unchanged
+
+        # Выбывший участник: его матчи помечаются удаленными, остальные не меняются
+        leaving = participants.pop(1)
+        assert create_smart_schedule(tournament, participants, Match, db, reconcile=True) == 28
+        final = matches_snapshot(tournament.id)
+        changed = {match_id for match_id in unchanged if final[match_id] != unchanged[match_id]}
+        removed = {m.id for m in Match.query.filter_by(tournament_id=tournament.id, is_removed=True)}
+        assert changed == removed and len(removed) == 8
+        assert all(leaving.id in unchanged[match_id][:2] for match_id in removed)
+        assert active_pairs(tournament.id) == sorted(
+            tuple(sorted((a.id, b.id))) for i, a in enumerate(participants) for b in participants[i + 1:])
+
+        # Таблица мест пересчитана вместе с изменениями (участник остался в турнире, но без матчей)
+        assert Standing.query.filter_by(tournament_id=tournament.id).count() == 9
+
+    print("✅ Сверка расписания: добавлено 8 и удалено 8 матчей, остальные матчи и розыгрыши не изменены")
+
+
+def test_accept_waiting_list_keeps_existing_matches():
+    """Принятые из листа ожидания получают свои матчи, существующие матчи не меняются"""
+    app = create_test_app()
+    with app.app_context():
+        db.create_all()
+        tournament = Tournament(name='Лист ожидания', admin_id=1, court_count=2, match_duration=15,
+                                break_duration=2, start_date=date(2025, 1, 1), start_time=dt_time(9, 0),
+                                end_time=dt_time(21, 0))
+        db.session.add(tournament)
+        db.session.flush()
+        db.session.add_all(Participant(tournament_id=tournament.id, name=f'Игрок {i}') for i in range(6))
+        db.session.commit()
+        participants = Participant.query.filter_by(tournament_id=tournament.id).all()
+        assert create_smart_schedule(tournament, participants, Match, db, bulk=True) == 15
+        for match in Match.query.filter_by(tournament_id=tournament.id).order_by(Match.match_number).limit(4):
+            match.status = 'завершен'
+            match.sets_won_1, match.sets_won_2, match.winner_id = 2, 1, match.participant1_id
+        waiting = [WaitingList(tournament_id=tournament.id, name=f'Запасной {i}', skill_level='хочу попробовать')
+                   for i in range(2)]
+        db.session.add_all(waiting)
+        db.session.commit()
+        tournament_id, waiting_ids = tournament.id, [entry.id for entry in waiting]
+        before = matches_snapshot(tournament_id)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_id'] = 1
+    response = client.post(f'/api/tournaments/{tournament_id}/accept-waiting', json={'waiting_ids': waiting_ids},
+                           headers=csrf_headers(client))
+    assert response.status_code == 200 and response.get_json()['accepted_count'] == 2, response.get_json()
+
+    with app.app_context():
+        after = matches_snapshot(tournament_id)
+        assert {match_id: after[match_id] for match_id in before} == before
+        # 6 + 6 матчей с прежними участниками и матч запасных между собой
+        assert len(after) == 15 + 13
+        assert len(active_pairs(tournament_id)) == len(set(active_pairs(tournament_id))) == 28
+
+    print("✅ Лист ожидания: добавлено 13 матчей, существующие матчи не изменены")
+
+
+if __name__ == "__main__":
+    test_reconcile_touches_only_changed_pairs()
+    test_accept_waiting_list_keeps_existing_matches()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Проверка кэша сессий и буфера посещений (utils/session_manager.py, utils/session_middleware.py)
+
+- повторные просмотры страниц под require_valid_session не обращаются к базе
+  и ничего в нее не пишут;
+- посещения записываются одним пакетным UPDATE;
+- завершение сессии администратором и выход сбрасывают кэш сразу;
+- проверка активности по email (require_active_session) кэширует только
+  токен, запись которого сама активна.
+
+Запуск: python test_session_cache.py  (или через pytest)
+"""
+from datetime import datetime, timedelta
+
+from models import db, UserActivity
+from utils import session_manager as sessions
+from utils.session_middleware import require_valid_session, get_session_manager
+from testing_support import StatementCounter, create_test_app
+
+PAGE_VIEWS = 20
+
+
+def create_admin_session(email, token):
+    db.session.add(UserActivity(user_type='admin', user_id=email, email=email, login_token=token,
+                                is_active=True, is_terminated=False, pages_visited_count=1,
+                                expires_at=datetime.utcnow() + timedelta(hours=2)))
+    db.session.commit()
+
+
+def test_page_views_use_cache_and_buffer_visits():
+    """Просмотры страниц без записи в базу, посещения - одним UPDATE"""
+    app = create_test_app()
+
+    @app.route('/test-admin-page')
+    @require_valid_session
+    def admin_page():
+        return 'ok'
+
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        sessions.invalidate_session_cache()
+        sessions.flush_page_visits(db, UserActivity, force=True)
+        create_admin_session('admin@test', 'token-1')
+    with client.session_transaction() as sess:
+        sess['session_token'] = 'token-1'
+        sess['admin_email'] = 'admin@test'
+
+    with StatementCounter(app) as statements:
+        assert client.get('/test-admin-page').status_code == 200
+    assert statements and all(statement.lstrip().startswith('SELECT') for statement in statements)
+
+    with StatementCounter(app) as statements:
+        for _ in range(PAGE_VIEWS - 1):
+            assert client.get('/test-admin-page').status_code == 200
+    assert statements == [], f"Просмотры из кэша выполнили {len(statements)} запросов"
+
+    # Пакетная запись посещений
+    with app.app_context():
+        with StatementCounter(app) as statements:
+            assert sessions.flush_page_visits(db, UserActivity, force=True) == 1
+        assert len(statements) == 1 and statements[0].lstrip().startswith('UPDATE')
+        record = UserActivity.query.filter_by(login_token='token-1').one()
+        assert record.pages_visited_count == 1 + PAGE_VIEWS
+        assert record.last_page == 'admin_page'
+
+    print(f"✅ {PAGE_VIEWS} просмотров: запросы только при первом, посещения записаны одним UPDATE")
+
+
+def test_termination_and_logout_invalidate_cache():
+    """Завершенная сессия перестает проходить проверку сразу, без ожидания TTL"""
+    app = create_test_app()
+    with app.app_context(), app.test_request_context():
+        db.create_all()
+        sessions.invalidate_session_cache()
+        manager = get_session_manager()
+        create_admin_session('user@test', 'token-2')
+        create_admin_session('other@test', 'token-3')
+
+        assert manager.validate_session('token-2', 'user@test')[0]
+        assert manager.validate_session('token-3', 'other@test')[0]
+        assert sessions.get_cached_session('token-2', 'user@test')
+        manager.track_page_visit('token-2', 'admin_dashboard')
+
+        assert manager.terminate_session_by_admin('user@test', 'admin@system')
+        is_valid, _, error = manager.validate_session('token-2', 'user@test')
+        assert not is_valid and error
+        # Посещения из буфера записаны вместе с завершением
+        record = UserActivity.query.filter_by(login_token='token-2').one()
+        assert record.is_terminated and record.pages_visited_count == 2 and record.last_page == 'admin_dashboard'
+
+        assert manager.logout_session('token-3')
+        assert not sessions.get_cached_session('token-3', 'other@test')
+        assert not manager.validate_session('token-3', 'other@test')[0]
+
+    print("✅ Завершение и выход сбрасывают кэш сессий")
+
+
+def test_active_session_check_caches_only_own_token():
+    """Активная сессия того же email не делает чужой токен валидным в кэше"""
+    app = create_test_app()
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        sessions.invalidate_session_cache()
+        create_admin_session('admin@test', 'token-4')
+        create_admin_session('admin@test', 'token-5')
+        with app.test_request_context():
+            assert get_session_manager().logout_session('token-5')
+    with client.session_transaction() as sess:
+        sess['admin_id'] = 1
+        sess['admin_email'] = 'admin@test'
+        sess['session_token'] = 'token-5'
+
+    # Страница открывается по активной сессии token-4, но token-5 в кэш не попадает
+    client.get('/admin-dashboard')
+    assert not sessions.get_cached_session('token-5', 'admin@test')
+    with app.app_context(), app.test_request_context():
+        assert not get_session_manager().validate_session('token-5', 'admin@test')[0]
+
+    with client.session_transaction() as sess:
+        sess['session_token'] = 'token-4'
+    client.get('/admin-dashboard')
+    assert sessions.get_cached_session('token-4', 'admin@test')
+    print("✅ Проверка по email кэширует только собственный токен сессии")
+
+
+if __name__ == "__main__":
+    test_page_views_use_cache_and_buffer_visits()
+    test_termination_and_logout_invalidate_cache()
+    test_active_session_check_caches_only_own_token()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Проверка настройки соединений SQLite (services/sqlite_tuning.py)
+
+- PRAGMA из конфигурации выполняются на каждом новом соединении;
+- SQLITE_TUNING_ENABLED=false оставляет параметры SQLite по умолчанию;
+- в режиме WAL чтение не ждет незафиксированную запись другого соединения.
+
+Запуск: python test_sqlite_tuning.py  (или через pytest)
+"""
+from sqlalchemy import text
+
+from models import db
+from services.sqlite_tuning import init_sqlite_tuning, read_sqlite_pragmas
+from testing_support import close_file_app, create_file_app, fill_tournament
+
+
+def test_pragmas_applied_from_config():
+    """Каждое соединение получает journal_mode, busy_timeout, synchronous, cache_size и mmap_size"""
+    app, database_dir = create_file_app(SQLITE_JOURNAL_MODE='wal', SQLITE_BUSY_TIMEOUT_MS=2500,
+                                        SQLITE_SYNCHRONOUS='normal', SQLITE_CACHE_SIZE_KB=4096,
+                                        SQLITE_MMAP_SIZE=1024 * 1024)
+    try:
+        installed = init_sqlite_tuning(app, db)
+        assert installed
+        with app.app_context():
+            # Два соединения пула одновременно: настроено каждое
+            with db.engine.connect() as first, db.engine.connect() as second:
+                for connection in (first, second):
+                    pragmas = read_sqlite_pragmas(connection)
+                    assert pragmas['journal_mode'] == 'wal'
+                    assert pragmas['busy_timeout'] == 2500
+                    assert pragmas['synchronous'] == 1  # NORMAL
+                    assert pragmas['cache_size'] == -4096
+                    assert pragmas['mmap_size'] == 1024 * 1024
+    finally:
+        close_file_app(app, database_dir)
+    print("✅ PRAGMA из конфигурации выполняются на каждом соединении")
+
+
+def test_disabled_keeps_sqlite_defaults():
+    """SQLITE_TUNING_ENABLED=false: журнал отката, как раньше"""
+    app, database_dir = create_file_app(SQLITE_TUNING_ENABLED=False)
+    try:
+        installed = init_sqlite_tuning(app, db)
+        assert not installed
+        with app.app_context():
+            with db.engine.connect() as connection:
+                assert read_sqlite_pragmas(connection)['journal_mode'] == 'delete'
+    finally:
+        close_file_app(app, database_dir)
+    print("✅ Настройка отключается в config.py")
+
+
+def test_reader_not_blocked_by_open_write():
+    """Пока писатель держит незафиксированную транзакцию, зритель читает последнюю зафиксированную версию"""
+    app, database_dir = create_file_app(SQLITE_BUSY_TIMEOUT_MS=200)
+    try:
+        init_sqlite_tuning(app, db)
+        with app.app_context():
+            db.create_all()
+            tournament_id = fill_tournament(4)
+            db.session.remove()
+            with db.engine.connect() as writer, db.engine.connect() as reader:
+                writer.exec_driver_sql('BEGIN IMMEDIATE')
+                writer.execute(text('UPDATE "match" SET set1_score1 = 15 WHERE tournament_id = :id'),
+                               {'id': tournament_id})
+                # Судья сохранил счет, но еще не зафиксировал - чтение не ждет блокировку
+                scores = reader.execute(text('SELECT set1_score1 FROM "match" WHERE tournament_id = :id'),
+                                        {'id': tournament_id}).scalars().all()
+                assert scores and 15 not in scores
+                writer.exec_driver_sql('COMMIT')
+                assert reader.execute(text('SELECT COUNT(*) FROM "match" WHERE set1_score1 = 15')).scalar() == len(scores)
+    finally:
+        close_file_app(app, database_dir)
+    print("✅ WAL: чтение не блокируется открытой транзакцией записи")
+
+
+if __name__ == "__main__":
+    test_pragmas_applied_from_config()
+    test_disabled_keeps_sqlite_defaults()
+    test_reader_not_blocked_by_open_write()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Проверка турнирной таблицы (services/standings.py)
+
+Вносит в турнир серию результатов (новые, исправленные, отменённые) и после
+каждого commit сравнивает таблицу standings и таблицу из памяти с полным
+пересчётом calculate_participant_ranking. Между изменениями результатов
+матчи турнира не должны перечитываться из базы.
+
+Страница зрителя берет места из standings, но игры, победы и очки
+показывает только по завершенным матчам.
+
+Запуск: python test_standings_incremental.py  (или через pytest)
+"""
+import random
+
+from flask import template_rendered
+
+from models import db, Tournament, Participant, Match, Standing
+from routes.main import calculate_participant_ranking
+from services import standings
+from services.standings import get_tournament_ranking, load_standings, rebuild_standings
+from services.tournament_updates import deduplicate_matches
+from testing_support import create_test_app, fill_tournament
+
+CHANGES_COUNT = 60
+
+
+def ranking_snapshot(ranking):
+    """Места и статистика без ORM-объектов (для сравнения)"""
+    return [(p['participant'].id, p['place'], p['points'], p['wins'], p['losses'], p['games'],
+             p['sets_won'], p['sets_lost'], p['set_difference'], sorted(p['head_to_head'].items()))
+            for p in ranking]
+
+
+def full_ranking(tournament_id):
+    tournament = db.session.get(Tournament, tournament_id)
+    participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(Participant.name).all()
+    matches = Match.query.filter_by(tournament_id=tournament_id, is_removed=False).order_by(
+        Match.match_date, Match.match_time).all()
+    return ranking_snapshot(calculate_participant_ranking(participants, deduplicate_matches(matches), tournament))
+
+
+def store_ranking(tournament_id):
+    tournament = db.session.get(Tournament, tournament_id)
+    participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(Participant.name).all()
+    return ranking_snapshot(get_tournament_ranking(db, tournament, participants, Match))
+
+
+def table_ranking(tournament_id):
+    """Рейтинг из таблицы standings (без личных встреч - их в таблице нет)"""
+    tournament = db.session.get(Tournament, tournament_id)
+    participants = Participant.query.filter_by(tournament_id=tournament_id).order_by(Participant.name).all()
+    return [row[:-1] for row in ranking_snapshot(load_standings(db, tournament, participants, Match))]
+
+
+def without_head_to_head(ranking):
+    return [row[:-1] for row in ranking]
+
+
+def set_random_result(match, rng):
+    """Новый результат, исправление, матч в процессе или отмена результата"""
+    kind = rng.choice(['win1', 'win2', 'live', 'revert'])
+    if kind == 'revert':
+        match.status = 'запланирован'
+        match.set1_score1 = match.set1_score2 = match.set2_score1 = match.set2_score2 = None
+        match.set3_score1 = match.set3_score2 = None
+        match.sets_won_1 = match.sets_won_2 = None
+        match.winner_id = None
+    elif kind == 'live':
+        match.status = 'в_процессе'
+        match.set1_score1, match.set1_score2 = 21, rng.randint(0, 19)
+        match.set2_score1, match.set2_score2 = rng.randint(0, 15), rng.randint(0, 15)
+        match.sets_won_1, match.sets_won_2 = 1, 0
+    else:
+        loser_points = [rng.randint(0, 19) for _ in range(2)]
+        match.status = 'завершен'
+        if kind == 'win1':
+            match.set1_score1, match.set1_score2 = 21, loser_points[0]
+            match.set2_score1, match.set2_score2 = 21, loser_points[1]
+            match.sets_won_1, match.sets_won_2 = 2, 0
+            match.winner_id = match.participant1_id
+        else:
+            match.set1_score1, match.set1_score2 = loser_points[0], 21
+            match.set2_score1, match.set2_score2 = loser_points[1], 21
+            match.sets_won_1, match.sets_won_2 = 0, 2
+            match.winner_id = match.participant2_id
+
+
+def test_incremental_standings_match_full_recalculation():
+    """Таблица standings и таблица из памяти совпадают с полным пересчётом после каждого изменения"""
+    rng = random.Random(42)
+    app = create_test_app()
+
+    # Считаем, сколько раз матчи турнира перечитывались для пересборки таблицы
+    rebuilds = []
+    load_ranked_matches = standings._load_ranked_matches
+
+    def counting_load(*args, **kwargs):
+        rebuilds.append(args)
+        return load_ranked_matches(*args, **kwargs)
+
+    standings._load_ranked_matches = counting_load
+    try:
+        with app.app_context():
+            db.create_all()
+            tournament_id = fill_tournament(10)
+
+            # Строки standings записаны вместе с матчами
+            assert Standing.query.filter_by(tournament_id=tournament_id).count() == 10
+            assert table_ranking(tournament_id) == without_head_to_head(full_ranking(tournament_id))
+            assert store_ranking(tournament_id) == full_ranking(tournament_id)
+            rebuilds.clear()
+
+            match_ids = [match_id for (match_id,) in db.session.query(Match.id).filter_by(tournament_id=tournament_id)]
+            for _ in range(CHANGES_COUNT):
+                match = db.session.get(Match, rng.choice(match_ids))
+                set_random_result(match, rng)
+                db.session.commit()
+
+                expected = full_ranking(tournament_id)
+                assert table_ranking(tournament_id) == without_head_to_head(expected)
+                assert store_ranking(tournament_id) == expected
+            assert not rebuilds, f"Таблица пересобиралась {len(rebuilds)} раз вместо инкрементального обновления"
+
+            # Структурное изменение (переименование участника) - таблица пересобирается
+            participant = Participant.query.filter_by(tournament_id=tournament_id).first()
+            participant.name = 'Я ' + participant.name
+            db.session.commit()
+            assert rebuilds
+            assert table_ranking(tournament_id) == without_head_to_head(full_ranking(tournament_id))
+
+            # Восстановление испорченной таблицы
+            db.session.execute(Standing.__table__.update().values(points=100, place=1))
+            db.session.commit()
+            rebuild_standings(db.session, tournament_id)
+            db.session.commit()
+            assert table_ranking(tournament_id) == without_head_to_head(full_ranking(tournament_id))
+    finally:
+        standings._load_ranked_matches = load_ranked_matches
+
+    print(f"✅ {CHANGES_COUNT} изменений: таблица standings совпадает с полным пересчётом без перечитывания матчей")
+
+
+def test_spectator_stats_count_completed_matches_only():
+    """Матч в процессе входит в standings, но не в игры и очки страницы зрителя"""
+    app = create_test_app(pages=True)
+    with app.app_context():
+        db.create_all()
+        tournament_id = fill_tournament(3)
+        live = Match.query.filter_by(tournament_id=tournament_id, match_number=1).one()
+        live.status = 'в_процессе'
+        live.set1_score1, live.set1_score2 = 21, 10
+        live.sets_won_1, live.sets_won_2 = 1, 0
+        db.session.commit()
+        leader_id = live.participant1_id
+        assert Standing.query.filter_by(tournament_id=tournament_id, participant_id=leader_id).one().games == 2
+
+    rendered = []
+
+    def record(sender, template, context, **extra):
+        rendered.append(context)
+
+    with template_rendered.connected_to(record, app):
+        assert app.test_client().get(f'/tournament-spectator/{tournament_id}').status_code == 200
+    stats = {item['participant'].id: item['stats'] for item in rendered[0]['participants_with_stats']}
+    assert (stats[leader_id]['games'], stats[leader_id]['matches_played'], stats[leader_id]['wins']) == (1, 1, 1)
+    assert stats[leader_id]['set_difference'] == 2
+    assert stats[leader_id]['sets_won'] == 3  # статистика сетов, как и раньше, из рейтинга
+    assert sum(item['games'] for item in stats.values()) == 2
+    print("✅ Страница зрителя: игры и очки только по завершенным матчам")
+
+
+if __name__ == "__main__":
+    test_incremental_standings_match_full_recalculation()
+    test_spectator_stats_count_completed_matches_only()
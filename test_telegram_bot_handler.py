@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Проверка обработчика бота (telegram_bot_handler.py) на заглушке Bot API
+
+- пачка getUpdates обрабатывается пулом потоков: чаты параллельно,
+  сообщения одного чата - по порядку;
+- запросы идут через пул keep-alive соединений, а не новое соединение
+  на каждый запрос;
+- смещение getUpdates сдвигается после обработки пачки.
+
+Запуск: python test_telegram_bot_handler.py  (или через pytest)
+"""
+import logging
+import time
+
+from routes.telegram_stub import serve_telegram_stub
+from telegram_bot_handler import TelegramBotHandler
+
+LATENCY_MS = 50
+CHATS = 20
+
+
+def test_batch_is_processed_concurrently_over_pooled_connections():
+    """40 команд из 20 чатов: ответы по порядку, быстрее последовательной обработки, мало соединений"""
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server, api_url, state = serve_telegram_stub(latency_ms=LATENCY_MS)
+    handler = TelegramBotHandler('test-token', telegram_api_url=api_url, workers=8)
+    try:
+        state.add_updates([{'chat_id': 100 + i, 'text': '/id'} for i in range(CHATS)] +
+                          [{'chat_id': 100 + i, 'text': '/help'} for i in range(CHATS)])
+
+        updates = handler.get_updates()
+        assert len(updates) == 2 * CHATS
+        started = time.perf_counter()
+        handler.process_updates(updates)
+        elapsed = time.perf_counter() - started
+
+        assert len(state.messages) == 2 * CHATS
+        for i in range(CHATS):
+            replies = [m['text'] for m in state.messages if m['chat_id'] == str(100 + i)]
+            assert len(replies) == 2 and 'Ваш Chat ID' in replies[0] and 'Справка' in replies[1]
+        # Последовательно: 40 x 50 мс = 2 с
+        assert elapsed < 2 * CHATS * LATENCY_MS / 1000.0 / 2, elapsed
+
+        # Соединения переиспользуются: не больше, чем потоков (+ long polling)
+        pool = handler.http.get_adapter(api_url).poolmanager.connection_from_url(api_url)
+        assert pool.num_connections <= handler.workers + 1, pool.num_connections
+
+        # Обработанные обновления подтверждены смещением
+        assert handler.last_update_id == 2 * CHATS
+        assert handler.get_updates() == []
+    finally:
+        handler.close()
+        server.shutdown()
+
+    print(f"✅ {2 * CHATS} команд из {CHATS} чатов: {elapsed * 1000:.0f} мс "
+          f"(последовательно ~{2 * CHATS * LATENCY_MS} мс), {pool.num_connections} соединений")
+
+
+if __name__ == "__main__":
+    test_batch_is_processed_concurrently_over_pooled_connections()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Проверка очереди исходящих сообщений Telegram (services/telegram_outbox.py)
+
+- обработчик приглашений только ставит сообщения в очередь, без HTTP-запросов;
+- фоновая отправка идет на локальную заглушку Bot API (routes/telegram_stub.py),
+  результаты пачки записываются одним UPDATE;
+- соблюдается интервал сообщений в один чат, ошибки повторяются с паузой,
+  403 не повторяется; одно сообщение не забирается дважды.
+
+Запуск: python test_telegram_outbox.py  (или через pytest)
+"""
+import threading
+from datetime import date, datetime, time as dt_time
+
+from flask import Flask
+from sqlalchemy import event
+from werkzeug.serving import make_server
+
+from models import db, Tournament, Participant, Match, OutboundMessage
+from routes.telegram_stub import create_telegram_stub_routes
+from services.telegram_outbox import RateLimiter, TelegramOutbox, enqueue_telegram_message
+from testing_support import create_test_app, csrf_headers
+
+ADMIN_ID = 1
+OUTBOX_SETTINGS = dict(TELEGRAM_BOT_TOKEN='test-token', TELEGRAM_OUTBOX_BACKOFF_SECONDS=5,
+                       TELEGRAM_CHAT_INTERVAL_SECONDS=1)
+
+
+def start_stub_server():
+    """Заглушка Bot API на свободном порту; возвращает (сервер, адрес, список принятых сообщений)"""
+    stub_app = Flask('telegram_stub')
+    create_telegram_stub_routes(stub_app)
+    server = make_server('127.0.0.1', 0, stub_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/telegram-stub', stub_app.extensions['telegram_stub']
+
+
+def test_invite_only_enqueues_and_worker_delivers():
+    """Приглашения ставятся в очередь, отправка - пачкой через заглушку"""
+    server, api_url, delivered = start_stub_server()
+    app = create_test_app(TELEGRAM_API_URL=api_url, **OUTBOX_SETTINGS)
+    outbox = TelegramOutbox()
+    outbox.init_app(app, db, OutboundMessage)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['admin_id'] = ADMIN_ID
+
+    try:
+        with app.app_context():
+            db.create_all()
+            tournament = Tournament(name='Очередь', admin_id=ADMIN_ID, start_date=date(2025, 1, 1),
+                                    start_time=dt_time(9, 0))
+            db.session.add(tournament)
+            db.session.flush()
+            first = Participant(tournament_id=tournament.id, name='Анна', telegram='1001')
+            second = Participant(tournament_id=tournament.id, name='Борис', telegram='1002')
+            db.session.add_all([first, second])
+            db.session.flush()
+            match = Match(tournament_id=tournament.id, participant1_id=first.id, participant2_id=second.id,
+                          match_date=date(2025, 1, 1), match_time=dt_time(9, 0), court_number=1, match_number=1)
+            db.session.add(match)
+            db.session.commit()
+            tournament_id, match_id = tournament.id, match.id
+
+        response = client.post(f'/api/tournaments/{tournament_id}/matches/{match_id}/invite',
+                               json={'participant1_name': 'Анна', 'participant2_name': 'Борис',
+                                     'match_time': '09:00', 'match_court': 1},
+                               headers=csrf_headers(client))
+        assert response.status_code == 200, response.get_json()
+        assert sorted(response.get_json()['sent']) == ['Анна', 'Борис']
+        assert delivered == []
+
+        with app.app_context():
+            assert OutboundMessage.query.filter_by(status='pending').count() == 2
+
+            statements = []
+            engine = db.engine
+
+            def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement.split()[0])
+
+            event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+            try:
+                assert outbox.drain_once() == 2
+            finally:
+                event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+            assert statements == ['SELECT', 'UPDATE', 'SELECT', 'UPDATE'], statements
+
+            assert sorted(message['chat_id'] for message in delivered) == ['1001', '1002']
+            assert all(message['parse_mode'] == 'HTML' for message in delivered)
+            sent = OutboundMessage.query.filter_by(status='sent').all()
+            assert len(sent) == 2 and all(m.attempts == 1 and m.sent_at for m in sent)
+            assert outbox.drain_once() == 0
+    finally:
+        server.shutdown()
+
+    print("✅ Приглашения поставлены в очередь без HTTP-запросов, отправлены одной пачкой")
+
+
+def test_rate_limit_retries_and_single_claim():
+    """Интервал одного чата, повторы с паузой, 403 без повторов, без повторного захвата"""
+    server, api_url, delivered = start_stub_server()
+    app = create_test_app(TELEGRAM_API_URL=api_url, **OUTBOX_SETTINGS)
+    outbox = TelegramOutbox()
+    outbox.init_app(app, db, OutboundMessage)
+    try:
+        with app.app_context(), app.test_request_context():
+            db.create_all()
+            for text in ('первое', 'второе', 'третье'):
+                assert enqueue_telegram_message(text, telegram_contact='2001', commit=False)
+            for chat_id in ('stub-500', 'stub-429', 'stub-403'):
+                assert enqueue_telegram_message('ошибка', telegram_contact=chat_id, commit=False)
+            db.session.commit()
+
+            # Сообщения, уже забранные воркером, другой воркер не забирает
+            claimed = outbox._claim_batch()
+            assert len(claimed) == 6
+            other = TelegramOutbox()
+            other.init_app(app, db, OutboundMessage)
+            assert other._claim_batch() == []
+            OutboundMessage.query.update({'status': 'pending', 'claim_token': None, 'claimed_at': None})
+            db.session.commit()
+
+            assert outbox.drain_once() == 6
+            # В чат 2001 за одну пачку ушло одно сообщение, остальные отложены без траты попытки
+            assert [m['text'] for m in delivered] == ['первое']
+            waiting = OutboundMessage.query.filter_by(recipient='2001', status='pending').all()
+            assert len(waiting) == 2 and all(m.attempts == 0 for m in waiting)
+
+            by_chat = {m.recipient: m for m in OutboundMessage.query.filter(OutboundMessage.recipient.like('stub-%'))}
+            assert by_chat['stub-403'].status == 'failed' and by_chat['stub-403'].attempts == 1
+            for chat_id, delay in (('stub-500', 5), ('stub-429', 1)):
+                message = by_chat[chat_id]
+                assert message.status == 'pending' and message.attempts == 1 and message.last_error
+                seconds = (message.next_attempt_at - datetime.utcnow()).total_seconds()
+                assert delay - 1 < seconds <= delay, (chat_id, seconds)
+            assert 0 < outbox._retry_in <= 1
+    finally:
+        server.shutdown()
+
+    print("✅ Интервал чата, повторы с паузой, 403 без повторов, сообщения не забираются дважды")
+
+
+def test_rate_limiter_global_limit():
+    """Не больше per_second сообщений за скользящую секунду"""
+    limiter = RateLimiter(per_second=3, chat_interval=1.0)
+    for i in range(3):
+        assert limiter.global_delay(now=10.0) == 0
+        limiter.record(f'chat-{i}', now=10.0)
+    assert abs(limiter.global_delay(now=10.2) - 0.8) < 1e-9
+    assert limiter.global_delay(now=11.0) == 0
+    assert abs(limiter.chat_delay('chat-0', now=10.5) - 0.5) < 1e-9
+    print("✅ Общий лимит и интервал чата")
+
+
+if __name__ == "__main__":
+    test_invite_only_enqueues_and_worker_delivers()
+    test_rate_limit_retries_and_single_claim()
+    test_rate_limiter_global_limit()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Проверка приема обновлений бота через webhook (/api/telegram/webhook)
+
+На записанных обновлениях Telegram (test_telegram_webhook_updates.json):
+- deep link /start привязывает Chat ID к заявке без HTTP-запроса к API,
+  ответ бота ставится в очередь отправки;
+- повторная доставка того же update_id не обрабатывается второй раз;
+- запрос без верного секрета отклоняется, при выключенном режиме - 404.
+
+Запуск: python test_telegram_webhook.py  (или через pytest)
+"""
+import json
+import os
+from datetime import date, time as dt_time
+from unittest import mock
+
+from models import db, Tournament, WaitingList, OutboundMessage, TelegramUpdate
+from telegram_bot_handler import TelegramBotHandler
+from testing_support import create_test_app
+
+SECRET = 'webhook-secret'
+WEBHOOK_SETTINGS = dict(TELEGRAM_BOT_TOKEN='test-token', TELEGRAM_WEBHOOK_ENABLED=True, TELEGRAM_WEBHOOK_SECRET=SECRET)
+UPDATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_telegram_webhook_updates.json')
+
+
+def load_updates():
+    with open(UPDATES_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def post_update(client, update, secret=SECRET):
+    return client.post('/api/telegram/webhook', json=update,
+                       headers={'X-Telegram-Bot-Api-Secret-Token': secret})
+
+
+def test_deep_link_and_duplicates():
+    """/start с токеном привязывает заявку, повтор update_id пропускается"""
+    updates = load_updates()
+    app = create_test_app(**WEBHOOK_SETTINGS)
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        tournament = Tournament(name='Webhook', admin_id=1, start_date=date(2025, 1, 1), start_time=dt_time(9, 0))
+        db.session.add(tournament)
+        db.session.flush()
+        db.session.add(WaitingList(tournament_id=tournament.id, name='Анна', skill_level='хочу попробовать',
+                                   telegram_token='wl-token-anna'))
+        db.session.commit()
+
+        # Ни одного HTTP-запроса: ни к API приложения, ни к Bot API
+        with mock.patch('requests.Session.request', side_effect=AssertionError('HTTP-запрос')):
+            response = post_update(client, updates['start_deep_link'])
+            assert response.status_code == 200 and response.get_json()['status'] == 'processed'
+            assert post_update(client, updates['start_deep_link']).get_json()['status'] == 'duplicate'
+            assert post_update(client, updates['id_command']).get_json()['status'] == 'processed'
+            assert post_update(client, updates['edited_message']).get_json()['status'] == 'ignored'
+
+        db.session.expire_all()
+        assert WaitingList.query.one().telegram == '505001'
+        assert TelegramUpdate.query.count() == 3
+
+        replies = OutboundMessage.query.order_by(OutboundMessage.id).all()
+        assert [m.recipient for m in replies] == ['505001', '505002']
+        assert 'успешно подключен' in replies[0].body
+        assert '505002' in replies[1].body
+        assert all(m.status == 'pending' for m in replies)
+    print("✅ Deep link привязан без HTTP, ответы в очереди, повтор update_id пропущен")
+
+
+def test_secret_and_disabled_mode():
+    """Неверный или не заданный секрет - 403, режим выключен - 404, обновление без update_id - 400"""
+    updates = load_updates()
+    app = create_test_app(**WEBHOOK_SETTINGS)
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        assert post_update(client, updates['id_command'], secret='wrong').status_code == 403
+        assert post_update(client, {'message': {}}).status_code == 400
+        assert TelegramUpdate.query.count() == 0 and OutboundMessage.query.count() == 0
+
+    # Webhook включен, но секрет не задан - обновления не принимаются даже без заголовка
+    no_secret = create_test_app(**dict(WEBHOOK_SETTINGS, TELEGRAM_WEBHOOK_SECRET=None))
+    with no_secret.app_context():
+        db.create_all()
+        client = no_secret.test_client()
+        assert client.post('/api/telegram/webhook', json=updates['id_command']).status_code == 403
+        assert post_update(client, updates['id_command'], secret='').status_code == 403
+        assert TelegramUpdate.query.count() == 0 and OutboundMessage.query.count() == 0
+
+    # setWebhook без секрета не вызывается
+    handler = TelegramBotHandler('test-token', workers=1, delete_webhook=False)
+    with mock.patch.object(handler.http, 'post') as post:
+        assert handler.set_webhook('https://example.test/api/telegram/webhook', None) is False
+    post.assert_not_called()
+    handler.close()
+
+    disabled = create_test_app(**dict(WEBHOOK_SETTINGS, TELEGRAM_WEBHOOK_ENABLED=False))
+    with disabled.app_context():
+        db.create_all()
+        assert post_update(disabled.test_client(), updates['id_command']).status_code == 404
+    print("✅ Неверный секрет - 403, выключенный webhook - 404, некорректное обновление - 400")
+
+
+if __name__ == "__main__":
+    test_deep_link_and_duplicates()
+    test_secret_and_disabled_mode()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Регрессионный тест количества SQL-запросов для /api/tournaments/<id>/updates
+
+Создаёт турнир на 32 участника (496 матчей) во временной базе в памяти
+и проверяет, что API обновлений выполняет фиксированное число запросов,
+не зависящее от размера турнира.
+
+Также проверяет ETag: повторный опрос без изменений возвращает 304.
+
+Запуск: python test_tournament_updates_queries.py  (или через pytest)
+"""
+import time
+
+from sqlalchemy import event
+
+from models import db, Match
+from testing_support import create_test_app, fill_tournament
+
+PARTICIPANTS_COUNT = 32
+MAX_QUERIES = 5  # версия + турнир + участники + матчи + standings
+
+
+def count_update_queries(app, tournament_id, headers=None):
+    """Выполняет запрос к API обновлений и возвращает (количество SQL-запросов, время, ответ)"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.get(f'/api/tournaments/{tournament_id}/updates', headers=headers or {})
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return len(statements), elapsed, response
+
+
+def test_tournament_updates_query_count():
+    """Количество запросов к базе не зависит от числа участников"""
+    app = create_test_app()
+    with app.app_context():
+        db.create_all()
+        small_id = fill_tournament(4)
+        large_id = fill_tournament(PARTICIPANTS_COUNT)
+
+    small_queries, _, small_response = count_update_queries(app, small_id)
+    large_queries, elapsed, large_response = count_update_queries(app, large_id)
+
+    assert small_response.status_code == 200
+    assert large_response.status_code == 200
+    data = large_response.get_json()
+    assert data['success'] is True
+    assert len(data['matches']) == PARTICIPANTS_COUNT * (PARTICIPANTS_COUNT - 1) // 2
+    assert len(data['participants_stats']) == PARTICIPANTS_COUNT
+    assert all(m['participant1_name'] and m['participant2_name'] for m in data['matches'])
+
+    assert large_queries <= MAX_QUERIES, f"Слишком много запросов: {large_queries}"
+    assert large_queries == small_queries
+
+    print(f"✅ {PARTICIPANTS_COUNT} участников: {large_queries} SQL-запросов, {elapsed * 1000:.1f} мс")
+
+
+def test_tournament_updates_etag():
+    """Без изменений - 304 одним запросом; после записи матча - новые данные"""
+    app = create_test_app()
+    with app.app_context():
+        db.create_all()
+        tournament_id = fill_tournament(8)
+
+    _, _, first = count_update_queries(app, tournament_id)
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag
+
+    queries, _, cached = count_update_queries(app, tournament_id, {'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert queries == 1, f"Ответ 304 должен стоить один запрос, выполнено: {queries}"
+
+    with app.app_context():
+        match = Match.query.filter_by(tournament_id=tournament_id, status='запланирован').first()
+        match.set1_score1, match.set1_score2 = 5, 3
+        match.status = 'в_процессе'
+        db.session.commit()
+
+    _, _, changed = count_update_queries(app, tournament_id, {'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+    print(f"✅ ETag: 304 за {queries} запрос, новая версия после изменения матча")
+
+
+if __name__ == "__main__":
+    test_tournament_updates_query_count()
+    test_tournament_updates_etag()
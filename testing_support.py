@@ -0,0 +1,122 @@
+"""
+Общие заготовки для тестов test_*.py
+
+Тесты импортируют приложение и данные отсюда, а не друг из друга:
+- create_test_app - приложение с маршрутами и базой в памяти (или по database_uri);
+- create_file_app / close_file_app - то же с базой во временном файле;
+- csrf_headers - заголовок X-CSRFToken для POST/PUT/DELETE тестового клиента;
+- StatementCounter - SQL-запросы к базе приложения внутри блока with;
+- fill_tournament - турнир с круговым расписанием, половина матчей завершена.
+
+Модуль не является тестом (pytest его не собирает).
+"""
+import os
+import shutil
+import tempfile
+from datetime import date, time as dt_time
+from itertools import combinations
+
+from flask import Flask
+from flask_login import LoginManager
+from flask_wtf.csrf import CSRFProtect, generate_csrf
+from sqlalchemy import event
+
+from models import (db, User, Tournament, Participant, Match, Notification, MatchLog, Token,
+                    WaitingList, Settings, Player, Rally)
+from routes import register_routes
+from services.change_version import init_change_tracking
+from services.standings import init_standings_tracking, drop_standings
+
+# Адрес, по которому тестовый клиент получает CSRF-токен
+CSRF_TOKEN_URL = '/test-csrf-token'
+
+
+def create_test_app(database_uri='sqlite://', pages=False, **config):
+    """
+    Создаёт приложение с базой в памяти (или database_uri) и зарегистрированными маршрутами
+
+    Args:
+        database_uri: Адрес базы (по умолчанию - SQLite в памяти)
+        pages: Подключить CSRFProtect и LoginManager - шаблоны страниц используют
+               csrf_token() и current_user
+        **config: Дополнительные настройки app.config
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = 'test'
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config.update(config)
+    db.init_app(app)
+    init_change_tracking()
+    init_standings_tracking()
+    # Таблицы в памяти процесса относятся к базе предыдущего теста
+    drop_standings()
+    register_routes(app, db, User, Tournament, Participant, Match, Notification, MatchLog, Token, WaitingList, Settings, Player, Rally)
+    app.add_url_rule(CSRF_TOKEN_URL, 'test_csrf_token', generate_csrf)
+    if pages:
+        CSRFProtect(app)
+        LoginManager(app).user_loader(lambda user_id: None)
+    return app
+
+
+def create_file_app(name='test.db', pages=False, **config):
+    """Приложение с базой во временном файле; возвращает (app, директория базы)"""
+    database_dir = tempfile.mkdtemp()
+    app = create_test_app(f"sqlite:///{os.path.join(database_dir, name)}", pages=pages, **config)
+    return app, database_dir
+
+
+def close_file_app(app, database_dir):
+    """Закрывает соединения и удаляет временную директорию базы"""
+    with app.app_context():
+        db.engine.dispose()
+    shutil.rmtree(database_dir, ignore_errors=True)
+
+
+def csrf_headers(client):
+    return {'X-CSRFToken': client.get(CSRF_TOKEN_URL).get_data(as_text=True)}
+
+
+class StatementCounter:
+    """Считает SQL-запросы к базе приложения"""
+
+    def __init__(self, app):
+        with app.app_context():
+            self.engine = db.engine
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self.statements
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+def fill_tournament(participants_count):
+    """Создаёт турнир с круговым расписанием, половина матчей завершена"""
+    tournament = Tournament(name=f'Тест {participants_count}', points_to_win=21, sets_to_win=2)
+    db.session.add(tournament)
+    db.session.flush()
+
+    participants = [Participant(tournament_id=tournament.id, name=f'Игрок {i:03d}') for i in range(participants_count)]
+    db.session.add_all(participants)
+    db.session.flush()
+
+    for number, (p1, p2) in enumerate(combinations(participants, 2), start=1):
+        match = Match(tournament_id=tournament.id, participant1_id=p1.id, participant2_id=p2.id,
+                      match_number=number, court_number=number % 4 + 1,
+                      match_date=date(2025, 1, 1), match_time=dt_time(9 + number // 60 % 12, number % 60))
+        if number % 2 == 0:
+            match.status = 'завершен'
+            match.set1_score1, match.set1_score2 = 21, 15
+            match.set2_score1, match.set2_score2 = 21, 18
+            match.sets_won_1, match.sets_won_2 = 2, 0
+            match.winner_id = p1.id
+        db.session.add(match)
+    db.session.commit()
+    return tournament.id
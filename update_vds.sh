@@ -90,6 +90,18 @@ echo "   Коммит: ${NEW_COMMIT:0:7}"
 echo "   Сообщение: $NEW_MSG"
 echo ""
 
+# Применяем миграции схемы базы данных до перезапуска (воркеры при старте только сверяют версию схемы)
+echo "🗄️  Применение миграций базы данных..."
+PYTHON_BIN="python3"
+if [ -x "venv/bin/python" ]; then
+    PYTHON_BIN="venv/bin/python"
+fi
+if ! "$PYTHON_BIN" migrate.py; then
+    echo "❌ Ошибка: Миграции базы данных не применены"
+    exit 1
+fi
+echo ""
+
 # Перезапускаем приложение
 echo "🔄 Перезапуск приложения..."
 if command -v systemctl >/dev/null 2>&1; then
@@ -0,0 +1,245 @@
+"""
+Отложенная запись активности пользователей (write-behind) в user_activity
+
+Запросы только добавляют события в буфер в памяти процесса; фоновый поток
+записывает накопленное раз в ACTIVITY_FLUSH_SECONDS секунд или после
+ACTIVITY_FLUSH_EVENTS событий - одной транзакцией с пакетными UPDATE/INSERT.
+При остановке процесса буфер записывается (atexit).
+
+Буферизуются:
+- посещения страниц сессий администраторов (по login_token):
+  pages_visited_count, last_activity, page_visited/last_page;
+- активность из track_user_activity (по user_type, user_id, session_id):
+  last_activity, page_visited, ip_address, user_agent.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import bindparam
+
+logger = logging.getLogger(__name__)
+
+# Значения по умолчанию (переопределяются ACTIVITY_FLUSH_SECONDS / ACTIVITY_FLUSH_EVENTS в config.py)
+ACTIVITY_FLUSH_SECONDS = 10
+ACTIVITY_FLUSH_EVENTS = 500
+
+
+class ActivityBuffer:
+    """Буфер активности пользователей с пакетной записью"""
+
+    def __init__(self, flush_seconds=ACTIVITY_FLUSH_SECONDS, flush_events=ACTIVITY_FLUSH_EVENTS):
+        self.flush_seconds = flush_seconds
+        self.flush_events = flush_events
+        self._lock = threading.Lock()
+        # {login_token: {'count', 'page', 'last_activity'}}
+        self._visits = {}
+        # {(user_type, user_id, session_id): {'page', 'ip_address', 'user_agent', 'last_activity'}}
+        self._activity = {}
+        self._events = 0
+        self._flushed_at = time.monotonic()
+
+        self._app = None
+        self._db = None
+        self._UserActivity = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+
+    # ----- накопление -----
+
+    def add_visit(self, session_token, page_url=None):
+        """Посещение страницы сессией администратора (page_url=None - только активность)"""
+        with self._lock:
+            visit = self._visits.setdefault(session_token, {'count': 0, 'page': None, 'last_activity': None})
+            if page_url is not None:
+                visit['count'] += 1
+                visit['page'] = page_url
+            visit['last_activity'] = datetime.utcnow()
+            self._events += 1
+        self._after_add()
+
+    def pop_visit(self, session_token):
+        """Забирает из буфера посещения одной сессии (для записи вместе с ее завершением)"""
+        with self._lock:
+            return self._visits.pop(session_token, None)
+
+    def add_activity(self, user_type, user_id, session_id, page_visited, ip_address, user_agent):
+        """Активность пользователя (аналог обновления/создания записи в track_user_activity)"""
+        with self._lock:
+            self._activity[(user_type, user_id, session_id)] = {
+                'page': page_visited,
+                'ip_address': ip_address,
+                'user_agent': user_agent,
+                'last_activity': datetime.utcnow()
+            }
+            self._events += 1
+        self._after_add()
+
+    def pending_count(self):
+        """Количество записей, ожидающих записи"""
+        with self._lock:
+            return len(self._visits) + len(self._activity)
+
+    def is_due(self):
+        with self._lock:
+            return self._is_due_locked()
+
+    def _is_due_locked(self):
+        return (self._events >= self.flush_events
+                or time.monotonic() - self._flushed_at >= self.flush_seconds)
+
+    def _after_add(self):
+        """Запускает фоновый поток в процессе и будит его при переполнении буфера"""
+        if self._app is None:
+            return
+        self._ensure_thread()
+        with self._lock:
+            overflow = self._events >= self.flush_events
+        if overflow:
+            self._wakeup.set()
+
+    # ----- запись -----
+
+    def flush(self, db, UserActivity):
+        """
+        Записывает накопленное одной транзакцией
+
+        Returns:
+            int: количество записанных (обновленных или созданных) записей
+        """
+        with self._lock:
+            visits, self._visits = self._visits, {}
+            activity, self._activity = self._activity, {}
+            self._events = 0
+            self._flushed_at = time.monotonic()
+        if not visits and not activity:
+            return 0
+
+        try:
+            with db.engine.begin() as connection:
+                if visits:
+                    _write_visits(connection, db, UserActivity, visits)
+                if activity:
+                    _write_activity(connection, UserActivity, activity)
+        except Exception as e:
+            logger.error(f"Ошибка при записи активности пользователей ({len(visits) + len(activity)} записей): {e}")
+            return 0
+        return len(visits) + len(activity)
+
+    def maybe_flush(self, db, UserActivity):
+        """Запись, если пора (используется, когда фоновый поток не запущен)"""
+        if self._thread is not None and self._thread_pid == os.getpid():
+            return 0
+        if not self.is_due():
+            return 0
+        return self.flush(db, UserActivity)
+
+    # ----- фоновый поток -----
+
+    def init_app(self, app, db, UserActivity):
+        """Подключает фоновую запись для приложения (поток стартует при первом событии в процессе)"""
+        self._app = app
+        self._db = db
+        self._UserActivity = UserActivity
+        self.flush_seconds = app.config.get('ACTIVITY_FLUSH_SECONDS', self.flush_seconds)
+        self.flush_events = app.config.get('ACTIVITY_FLUSH_EVENTS', self.flush_events)
+        atexit.register(self.shutdown)
+
+    def _ensure_thread(self):
+        # После fork воркера gunicorn поток родителя не существует - запускаем свой
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='activity-buffer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            try:
+                with self._app.app_context():
+                    self.flush(self._db, self._UserActivity)
+            except Exception as e:
+                logger.error(f"Ошибка фоновой записи активности: {e}")
+
+    def shutdown(self):
+        """Записывает остаток буфера при остановке процесса"""
+        if self._app is None or not self.pending_count():
+            return
+        try:
+            with self._app.app_context():
+                written = self.flush(self._db, self._UserActivity)
+            logger.info(f"Записано {written} записей активности при остановке")
+        except Exception as e:
+            logger.error(f"Ошибка записи активности при остановке: {e}")
+
+
+def _write_visits(connection, db, UserActivity, visits):
+    """Посещения сессий администраторов: один UPDATE на все сессии"""
+    table = UserActivity.__table__
+    statement = table.update().where(table.c.login_token == bindparam('token')).values(
+        pages_visited_count=table.c.pages_visited_count + bindparam('visits'),
+        last_activity=bindparam('activity_at'),
+        page_visited=db.func.coalesce(bindparam('page'), table.c.page_visited),
+        last_page=db.func.coalesce(bindparam('page'), table.c.last_page)
+    )
+    connection.execute(statement, [
+        {'token': token, 'visits': visit['count'], 'activity_at': visit['last_activity'], 'page': visit['page']}
+        for token, visit in visits.items()
+    ])
+
+
+def _write_activity(connection, UserActivity, activity):
+    """Активность по (user_type, user_id, session_id): UPDATE существующих записей, INSERT новых"""
+    from sqlalchemy import select
+
+    table = UserActivity.__table__
+    session_ids = {session_id for (_, _, session_id) in activity}
+    existing = {
+        (row.user_type, row.user_id, row.session_id)
+        for row in connection.execute(
+            select(table.c.user_type, table.c.user_id, table.c.session_id)
+            .where(table.c.session_id.in_(session_ids))
+        )
+    }
+
+    updates, inserts = [], []
+    for (user_type, user_id, session_id), data in activity.items():
+        params = {'u_user_type': user_type, 'u_user_id': user_id, 'u_session_id': session_id,
+                  'page_visited': data['page'], 'ip_address': data['ip_address'],
+                  'user_agent': data['user_agent'], 'last_activity': data['last_activity']}
+        (updates if (user_type, user_id, session_id) in existing else inserts).append(params)
+
+    if updates:
+        # user_id может быть NULL (зрители) - сравнение через IS NOT DISTINCT FROM
+        statement = table.update().where(
+            table.c.user_type == bindparam('u_user_type'),
+            table.c.user_id.is_not_distinct_from(bindparam('u_user_id')),
+            table.c.session_id == bindparam('u_session_id')
+        ).values(page_visited=bindparam('page_visited'), ip_address=bindparam('ip_address'),
+                 user_agent=bindparam('user_agent'), last_activity=bindparam('last_activity'), is_active=True)
+        connection.execute(statement, updates)
+    if inserts:
+        connection.execute(table.insert(), [
+            {'user_type': params['u_user_type'], 'user_id': params['u_user_id'], 'session_id': params['u_session_id'],
+             'page_visited': params['page_visited'], 'ip_address': params['ip_address'],
+             'user_agent': params['user_agent'], 'last_activity': params['last_activity'], 'is_active': True}
+            for params in inserts
+        ])
+
+
+# Единый буфер на процесс
+activity_buffer = ActivityBuffer()
+
+
+def init_activity_buffer(app, db, UserActivity):
+    """Включает фоновую запись буфера активности для приложения"""
+    activity_buffer.init_app(app, db, UserActivity)
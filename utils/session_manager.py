@@ -3,12 +3,90 @@
 """
 import secrets
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
 from flask import request, session
 from sqlalchemy import and_, or_
 
+from utils.activity_buffer import activity_buffer
+
 logger = logging.getLogger(__name__)
 
+# Кэш проверенных сессий в памяти процесса: {токен: (время проверки, email, expires_at)}.
+# Завершение сессии в этом процессе сбрасывает кэш сразу, в других процессах -
+# не позже чем через SESSION_CACHE_TTL_SECONDS.
+SESSION_CACHE_TTL_SECONDS = 30
+_session_cache = {}
+_session_cache_lock = threading.Lock()
+
+# Посещения страниц копятся в буфере активности (utils/activity_buffer.py)
+# и записываются в user_activity пакетом
+
+def get_cached_session(session_token, email):
+    """True, если сессия недавно проверена и еще не истекла"""
+    with _session_cache_lock:
+        cached = _session_cache.get(session_token)
+    if not cached:
+        return False
+    checked_at, cached_email, expires_at = cached
+    if cached_email != email or time.monotonic() - checked_at > SESSION_CACHE_TTL_SECONDS:
+        return False
+    return expires_at is None or expires_at > datetime.utcnow()
+
+
+def cache_valid_session(session_token, email, expires_at=None):
+    """Запоминает успешную проверку сессии"""
+    with _session_cache_lock:
+        _session_cache[session_token] = (time.monotonic(), email, expires_at)
+
+
+def invalidate_session_cache(session_token=None, email=None):
+    """Сбрасывает кэш сессии по токену, все сессии email или весь кэш"""
+    with _session_cache_lock:
+        if session_token is None and email is None:
+            _session_cache.clear()
+            return
+        for token, (_, cached_email, _) in list(_session_cache.items()):
+            if token == session_token or (email is not None and cached_email == email):
+                del _session_cache[token]
+
+
+def buffer_page_visit(session_token, page_url=None):
+    """Добавляет посещение страницы (или просто активность, если page_url=None) в буфер"""
+    activity_buffer.add_visit(session_token, page_url)
+
+
+def pop_page_visits(session_token):
+    """Забирает из буфера посещения одной сессии (для записи вместе с ее завершением)"""
+    return activity_buffer.pop_visit(session_token)
+
+
+def flush_page_visits(db, UserActivity, force=False):
+    """
+    Записывает буфер активности одной транзакцией
+
+    Без force запись выполняется, только если фоновая запись не запущена
+    и подошел срок (ACTIVITY_FLUSH_SECONDS / ACTIVITY_FLUSH_EVENTS).
+
+    Returns:
+        int: количество записанных записей
+    """
+    if force:
+        return activity_buffer.flush(db, UserActivity)
+    return activity_buffer.maybe_flush(db, UserActivity)
+
+
+def apply_page_visits(session_record):
+    """Переносит посещения сессии из буфера в загруженную запись (перед ее сохранением)"""
+    visit = pop_page_visits(session_record.login_token)
+    if visit:
+        session_record.pages_visited_count = (session_record.pages_visited_count or 0) + visit['count']
+        session_record.last_activity = visit['last_activity']
+        if visit['page'] is not None:
+            session_record.page_visited = visit['page']
+            session_record.last_page = visit['page']
+
 class SessionManager:
     """Класс для управления сессиями администраторов"""
     
@@ -142,6 +220,7 @@ class SessionManager:
             
             terminated_count = 0
             for session_record in active_sessions:
+                apply_page_visits(session_record)
                 session_record.is_active = False
                 session_record.is_terminated = True
                 session_record.terminated_by = admin_email
@@ -151,6 +230,7 @@ class SessionManager:
                 terminated_count += 1
             
             self.db.session.commit()
+            invalidate_session_cache(email=email)
             
             logger.info(f"Завершено {terminated_count} сессий для {email} администратором {admin_email}")
             return True
@@ -164,6 +244,10 @@ class SessionManager:
         """
         Проверяет валидность сессии
         
+        Недавно проверенная сессия берется из кэша без запроса к базе
+        (session_data в этом случае None). Время активности не записывается
+        сразу, а копится в буфере посещений.
+        
         Args:
             session_id (str): ID сессии
             email (str): Email пользователя
@@ -171,6 +255,10 @@ class SessionManager:
         Returns:
             tuple: (is_valid, session_data, error_message)
         """
+        if get_cached_session(session_id, email):
+            buffer_page_visit(session_id)
+            return True, None, None
+        
         try:
             session_record = self.UserActivity.query.filter(
                 and_(
@@ -183,11 +271,12 @@ class SessionManager:
                 return False, None, "Сессия не найдена"
             
             if not session_record.is_valid():
+                invalidate_session_cache(session_id)
                 return False, session_record, "Сессия недействительна"
             
-            # Обновляем время последней активности
-            session_record.last_activity = datetime.utcnow()
-            self.db.session.commit()
+            # Время последней активности запишется вместе с посещениями страниц
+            buffer_page_visit(session_id)
+            cache_valid_session(session_id, email, session_record.expires_at)
             
             return True, session_record, None
             
@@ -299,6 +388,9 @@ class SessionManager:
         """
         Отслеживает посещение страницы
         
+        Посещение добавляется в буфер в памяти; буфер записывается в базу
+        пакетом (flush_page_visits), обычный просмотр страницы ничего не пишет.
+        
         Args:
             session_token (str): Токен сессии
             page_url (str): URL страницы
@@ -307,21 +399,9 @@ class SessionManager:
             bool: Успешность операции
         """
         try:
-            session_record = self.UserActivity.query.filter(
-                self.UserActivity.login_token == session_token
-            ).first()
-            
-            if session_record and session_record.is_valid():
-                session_record.last_activity = datetime.utcnow()
-                session_record.page_visited = page_url
-                session_record.last_page = page_url
-                session_record.pages_visited_count += 1
-                
-                self.db.session.commit()
-                return True
-            
-            return False
-            
+            buffer_page_visit(session_token, page_url)
+            flush_page_visits(self.db, self.UserActivity)
+            return True
         except Exception as e:
             logger.error(f"Ошибка при отслеживании посещения страницы: {e}")
             return False
@@ -342,7 +422,9 @@ class SessionManager:
                 self.UserActivity.login_token == session_token
             ).first()
             
+            invalidate_session_cache(session_token)
             if session_record:
+                apply_page_visits(session_record)
                 session_record.is_active = False
                 session_record.logout_reason = reason
                 session_record.session_duration = session_record.calculate_duration()
@@ -3,11 +3,23 @@ Middleware для проверки сессий и отслеживания ак
 """
 import logging
 from functools import wraps
-from flask import session, request, redirect, url_for, jsonify
+from flask import session, request, redirect, url_for, jsonify, flash, current_app
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+_session_manager = None
+
+
+def get_session_manager():
+    """Общий SessionManager процесса (модели и db не меняются между запросами)"""
+    global _session_manager
+    if _session_manager is None:
+        from models import db, UserActivity
+        from utils.session_manager import create_session_manager
+        _session_manager = create_session_manager(db, UserActivity)
+    return _session_manager
+
 def require_valid_session(f):
     """
     Декоратор для проверки валидности сессии администратора
@@ -20,16 +32,8 @@ def require_valid_session(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        from utils.session_manager import create_session_manager
-        from models import create_models
-        
-        # Получаем модели - используем глобальный db из app context
-        from app import db
-        models = create_models(db)
-        UserActivity = models['UserActivity']
-        
-        # Создаем менеджер сессий
-        session_manager = create_session_manager(None, UserActivity)  # db будет получен из app context
+        # Проверка берется из кэша сессий, посещение пишется в буфер - без записи в базу
+        session_manager = get_session_manager()
         
         # Получаем данные сессии
         session_token = session.get('session_token')
@@ -90,12 +94,10 @@ def track_user_activity(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         from utils.user_activity import track_user_activity
-        from models import create_models
+        from models import db, UserActivity
         
-        # Получаем модели - используем глобальный db из app context
-        from app import db
-        models = create_models(db)
-        UserActivity = models['UserActivity']
+        if not current_app.config.get('ENABLE_PAGE_TRACKING', True):
+            return f(*args, **kwargs)
         
         # Определяем тип пользователя
         user_type = 'viewer'
@@ -111,7 +113,7 @@ def track_user_activity(f):
         # Отслеживаем активность
         try:
             track_user_activity(
-                db=None,  # db будет получен из app context
+                db=db,
                 UserActivity=UserActivity,
                 user_type=user_type,
                 user_id=user_id,
@@ -136,16 +138,7 @@ def cleanup_expired_sessions(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        from utils.session_manager import create_session_manager
-        from models import create_models
-        
-        # Получаем модели - используем глобальный db из app context
-        from app import db
-        models = create_models(db)
-        UserActivity = models['UserActivity']
-        
-        # Создаем менеджер сессий
-        session_manager = create_session_manager(None, UserActivity)
+        session_manager = get_session_manager()
         
         # Очищаем истекшие сессии (выполняем не чаще чем раз в 5 минут)
         last_cleanup = session.get('last_cleanup')
@@ -3,10 +3,73 @@
 """
 import requests
 import logging
+import threading
+from collections import namedtuple
+from requests.adapters import HTTPAdapter
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Адрес Bot API по умолчанию (переопределяется TELEGRAM_API_URL, например локальной заглушкой)
+TELEGRAM_API_URL = 'https://api.telegram.org'
+
+# Результат одной попытки доставки: retry_after - пауза от Telegram при 429,
+# permanent - повтор не поможет (неверный chat_id, бот заблокирован)
+DeliveryResult = namedtuple('DeliveryResult', 'ok status_code retry_after error permanent')
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Общий requests.Session процесса (переиспользует соединения с Bot API)"""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                http_session = requests.Session()
+                http_session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=10))
+                http_session.mount('http://', HTTPAdapter(pool_connections=2, pool_maxsize=10))
+                _http_session = http_session
+    return _http_session
+
+
+def deliver_telegram_message(chat_id, message, parse_mode='HTML', bot_token=None, api_url=None, timeout=10):
+    """
+    Одна попытка отправки сообщения через Bot API (sendMessage)
+    
+    Returns:
+        DeliveryResult
+    """
+    bot_token = bot_token or Config.TELEGRAM_BOT_TOKEN
+    if not bot_token:
+        return DeliveryResult(False, None, None, 'Telegram bot token не задан', True)
+    
+    url = f"{(api_url or getattr(Config, 'TELEGRAM_API_URL', None) or TELEGRAM_API_URL).rstrip('/')}/bot{bot_token}/sendMessage"
+    payload = {'chat_id': chat_id, 'text': message}
+    if parse_mode:
+        payload['parse_mode'] = parse_mode
+    
+    try:
+        response = get_http_session().post(url, data=payload, timeout=timeout)
+    except requests.exceptions.Timeout:
+        return DeliveryResult(False, None, None, 'Timeout', False)
+    except requests.exceptions.RequestException as e:
+        return DeliveryResult(False, None, None, str(e), False)
+    
+    if response.status_code == 200:
+        return DeliveryResult(True, 200, None, None, False)
+    
+    try:
+        error_info = response.json()
+    except ValueError:
+        error_info = {'description': response.text}
+    retry_after = (error_info.get('parameters') or {}).get('retry_after')
+    # 400 (неверный chat_id) и 403 (бот заблокирован) повторять бесполезно
+    permanent = response.status_code in (400, 401, 403, 404)
+    return DeliveryResult(False, response.status_code, retry_after,
+                          error_info.get('description') or str(error_info), permanent)
+
 
 def send_telegram_message(message: str, telegram_contact: str = None) -> bool:
     """
@@ -43,44 +106,29 @@ def send_telegram_message(message: str, telegram_contact: str = None) -> bool:
         
         logger.debug(f"Telegram настройки: Chat ID={chat_id}, Token={'*****' + bot_token[-10:] if len(bot_token) > 10 else '****'}")
         
-        # URL для Telegram Bot API
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        
-        # Параметры запроса
-        payload = {
-            'chat_id': chat_id,
-            'text': message,
-            'parse_mode': 'HTML'  # Поддержка HTML форматирования
-        }
-        
         logger.info(f"Отправка сообщения в Telegram (chat_id: {chat_id})")
         
-        # Отправляем запрос (используем data вместо json для совместимости)
-        response = requests.post(url, data=payload, timeout=10)
-        
-        # Проверяем ответ
-        if response.status_code == 200:
+        result = deliver_telegram_message(chat_id, message, bot_token=bot_token)
+        if result.ok:
             logger.info(f"✅ Сообщение успешно отправлено в Telegram (получатель: {chat_id})")
             return True
-        else:
-            error_info = response.json() if response.headers.get('content-type') == 'application/json' else response.text
-            logger.error(f"❌ Ошибка при отправке в Telegram: {response.status_code} - {error_info}")
-            
-            # Дополнительная информация для популярных ошибок
-            if response.status_code == 400:
-                logger.error(f"💡 Подсказка: Проверьте правильность chat_id ({chat_id}). Пользователь должен был написать боту первым (/start)")
-            elif response.status_code == 403:
-                logger.error(f"💡 Подсказка: Бот заблокирован пользователем или пользователь не начал диалог с ботом")
-            
-            return False
-            
-    except requests.exceptions.Timeout:
-        logger.error("Timeout при отправке сообщения в Telegram")
-        return False
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка при отправке запроса в Telegram: {e}")
+        
+        log_delivery_error(chat_id, result)
         return False
+            
     except Exception as e:
         logger.error(f"Непредвиденная ошибка при отправке в Telegram: {e}")
         return False
 
+
+
+def log_delivery_error(chat_id, result):
+    """Пишет в лог ошибку доставки с подсказкой для популярных случаев"""
+    if result.status_code is None:
+        logger.error(f"Ошибка при отправке запроса в Telegram (chat_id: {chat_id}): {result.error}")
+        return
+    logger.error(f"❌ Ошибка при отправке в Telegram: {result.status_code} - {result.error}")
+    if result.status_code == 400:
+        logger.error(f"💡 Подсказка: Проверьте правильность chat_id ({chat_id}). Пользователь должен был написать боту первым (/start)")
+    elif result.status_code == 403:
+        logger.error(f"💡 Подсказка: Бот заблокирован пользователем или пользователь не начал диалог с ботом")
@@ -4,56 +4,38 @@
 from datetime import datetime, timedelta
 from flask import request, session
 
+from utils.activity_buffer import activity_buffer
+
 def track_user_activity(db, UserActivity, user_type, user_id=None, page_visited=None):
     """
     Отслеживает активность пользователя
     
+    Активность добавляется в буфер в памяти (utils/activity_buffer.py) и
+    записывается в базу пакетом, запрос страницы ничего не пишет.
+    
     Args:
-        db: Экземпляр базы данных
+        db: Экземпляр базы данных (None - models.db)
         UserActivity: Модель UserActivity
         user_type: Тип пользователя ('admin', 'participant', 'viewer')
         user_id: ID пользователя (email, имя и т.д.)
         page_visited: Последняя посещенная страница
     """
     try:
-        # Получаем информацию о сессии
-        session_id = session.get('session_id', 'anonymous')
-        ip_address = request.remote_addr
-        user_agent = request.headers.get('User-Agent', '')
+        if db is None:
+            from models import db
         
-        # Ищем существующую активность для этого пользователя
-        existing_activity = UserActivity.query.filter_by(
+        activity_buffer.add_activity(
             user_type=user_type,
             user_id=user_id,
-            session_id=session_id
-        ).first()
-        
-        if existing_activity:
-            # Обновляем существующую запись
-            existing_activity.last_activity = datetime.utcnow()
-            existing_activity.page_visited = page_visited or request.endpoint
-            existing_activity.ip_address = ip_address
-            existing_activity.user_agent = user_agent
-            existing_activity.is_active = True
-        else:
-            # Создаем новую запись
-            new_activity = UserActivity(
-                user_type=user_type,
-                user_id=user_id,
-                session_id=session_id,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                page_visited=page_visited or request.endpoint,
-                last_activity=datetime.utcnow(),
-                is_active=True
-            )
-            db.session.add(new_activity)
-        
-        db.session.commit()
+            session_id=session.get('session_id', 'anonymous'),
+            page_visited=page_visited or request.endpoint,
+            ip_address=request.remote_addr,
+            user_agent=request.headers.get('User-Agent', '')
+        )
+        activity_buffer.maybe_flush(db, UserActivity)
         
     except Exception as e:
         print(f"Ошибка при отслеживании активности: {e}")
-        db.session.rollback()
 
 def get_active_users_count(db, UserActivity, minutes_threshold=30):
     """